@@ -0,0 +1,91 @@
+"""
+W-2 barcode fast-path benchmark: PDF417 decoding vs. preprocessing plus full-page OCR.
+
+Renders synthetic W-2 pages (see ``synthetic_corpus``) with the box values
+also encoded in a PDF417 barcode, then times both paths per page and checks
+that the decoded fields match the ground truth. Requires zxing-cpp; the OCR
+side additionally needs Tesseract (skip it with ``--no-ocr``).
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.barcode_benchmark --pages 20
+"""
+from typing import Any, Dict, List
+import argparse
+import json
+import time
+import numpy as np
+
+from .synthetic_corpus import make_fields, render_page, _lines
+from ..src.barcode_reader import W2BarcodeReader, W2_BARCODE_FIELDS
+from ..src.document_processor import DocumentProcessor
+from ..src.ocr_pool import OCREnginePool, OCRPoolConfig
+
+def _payload(fields: Dict[str, str], year: int) -> str:
+    values = ["W2", "1", str(year)] + [fields.get(name, "").replace(",", "") for name in W2_BARCODE_FIELDS]
+    return "|".join(values)
+
+def render_w2(rng: np.random.Generator, year: int = 2023) -> Dict[str, Any]:
+    """Render a W-2 page with a PDF417 barcode in the lower half."""
+    import zxingcpp
+
+    fields = make_fields(rng, 'W-2')
+    page = np.array(render_page(_lines('W-2', year, fields)))
+    barcode = zxingcpp.create_barcode(_payload(fields, year), zxingcpp.BarcodeFormat.PDF417)
+    symbol = np.array(zxingcpp.write_barcode_to_image(barcode, scale=4))
+    page[2300:2300 + symbol.shape[0], 200:200 + symbol.shape[1]] = symbol
+    return {'page': page, 'fields': fields}
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    return {
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+    }
+
+def run(pages: int, ocr: bool = True, seed: int = 0) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    corpus = [render_w2(rng) for _ in range(pages)]
+
+    reader = W2BarcodeReader()
+    decode_latencies = []
+    correct = 0
+    for sample in corpus:
+        start = time.perf_counter()
+        result = reader.read(sample['page'])
+        decode_latencies.append(time.perf_counter() - start)
+        expected = {k: v.replace(",", "") for k, v in sample['fields'].items()}
+        if result is not None and all(result['fields'].get(k) == v for k, v in expected.items()):
+            correct += 1
+
+    results = {
+        'pages': pages,
+        'barcode': {**_percentiles(decode_latencies), 'field_accuracy': correct / pages},
+    }
+
+    if ocr:
+        pool = OCREnginePool(OCRPoolConfig(size=1, health_check_interval=0))
+        try:
+            pool.start()
+            processor = DocumentProcessor(temp_dir="temp", ocr_pool=pool)
+            ocr_latencies = []
+            for sample in corpus:
+                start = time.perf_counter()
+                # The OCR pass a page without a barcode gets in the pipeline
+                processor.adaptive_ocr.recognize(sample['page'])
+                ocr_latencies.append(time.perf_counter() - start)
+        finally:
+            pool.close()
+        results['ocr'] = _percentiles(ocr_latencies)
+        results['saved_p50_ms'] = results['ocr']['p50_ms'] - results['barcode']['p50_ms']
+        results['speedup'] = float(np.median(ocr_latencies) / np.median(decode_latencies))
+
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--no-ocr", action="store_true", help="Only time barcode decoding")
+    args = parser.parse_args()
+    print(json.dumps(run(args.pages, ocr=not args.no_ocr), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Batch analysis benchmark: ``TaxAnalyzer.analyze_document`` per document vs. ``analyze_batch``.
+
+Builds a mixed batch of OCR-like W-2 and 1099-NEC texts (see
+``field_scanner_benchmark``) and analyzes it both ways. Reports microseconds
+per document for each path, for field extraction alone (normalizing and
+scanning the text, which both paths do), and the per-document overhead on
+top of it. With ``--workers`` above 1 the batch is also analyzed across
+worker processes. Checks that both paths agree on totals and validity.
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.batch_analysis_benchmark --documents 5000 --kb 1 --workers 4
+"""
+from typing import Any, Dict, List, Tuple
+import argparse
+import json
+import time
+import numpy as np
+
+from .field_scanner_benchmark import make_texts
+from ..src.analyzers.analyzer_factory import AnalyzerFactory
+from ..src.parsed_document import normalized_texts
+from ..src.tax_analyzer import TaxAnalyzer
+
+def make_batch(documents: int, kb: int, seed: int = 0) -> Tuple[List[str], List[str]]:
+    """Interleaved W-2 and 1099-NEC texts and their document types."""
+    w2 = make_texts('W-2', documents - documents // 2, kb, seed)
+    nec = make_texts('1099-NEC', documents // 2, kb, seed + 1)
+    texts, doc_types = [], []
+    for i in range(documents):
+        source, doc_type = (w2, 'w2') if i % 2 == 0 else (nec, '1099')
+        texts.append(source[i // 2])
+        doc_types.append(doc_type)
+    return doc_types, texts
+
+def _best(run, repeats: int) -> Tuple[float, Any]:
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def _extract(doc_types: List[str], texts: List[str]) -> None:
+    """The work both paths share: normalizing and scanning every text."""
+    normalized, lowered = normalized_texts(texts)
+    for doc_type, text, lower in zip(doc_types, normalized, lowered):
+        AnalyzerFactory.get_analyzer(doc_type).field_scanner.scan(text, lower)
+
+def _mismatches(single: List[Dict[str, Any]], batch: Any) -> int:
+    mismatches = 0
+    for i, analysis in enumerate(single):
+        row = batch.row(i)
+        if row['validation.is_valid'] != analysis['validation']['is_valid']:
+            mismatches += 1
+        elif any(row[f'totals.{name}'] != value for name, value in analysis['totals'].items()):
+            mismatches += 1
+    return mismatches
+
+def run(documents: int = 5000, kb: int = 1, workers: int = 1, repeats: int = 3, seed: int = 0) -> Dict[str, Any]:
+    doc_types, texts = make_batch(documents, kb, seed)
+    analyzer = TaxAnalyzer(batch_workers=1)
+    extract, _ = _best(lambda: _extract(doc_types, texts), repeats)
+    single, single_results = _best(lambda: [analyzer.analyze_document(t, x) for t, x in zip(doc_types, texts)], repeats)
+    batch, batch_result = _best(lambda: analyzer.analyze_batch(doc_types, texts), repeats)
+
+    per_doc = lambda seconds: round(seconds / documents * 1e6, 1)
+    results = {
+        'documents': documents,
+        'text_kb': round(sum(len(t) for t in texts) / documents / 1024, 1),
+        'extraction_us_per_doc': per_doc(extract),
+        'single_us_per_doc': per_doc(single),
+        'batch_us_per_doc': per_doc(batch),
+        'single_overhead_us_per_doc': per_doc(single - extract),
+        'batch_overhead_us_per_doc': per_doc(max(batch - extract, 0.0)),
+        'speedup': round(single / batch, 2),
+        'mismatches': _mismatches(single_results, batch_result),
+        'columns': len(batch_result.column_names),
+    }
+    if workers > 1:
+        parallel_analyzer = TaxAnalyzer(batch_workers=workers, parallel_min_documents=1)
+        # The best of the repeats excludes starting the worker processes, which are kept between batches
+        parallel, parallel_result = _best(lambda: parallel_analyzer.analyze_batch(doc_types, texts), repeats)
+        parallel_analyzer.shutdown()
+        results['workers'] = workers
+        results['parallel_us_per_doc'] = per_doc(parallel)
+        results['parallel_speedup'] = round(single / parallel, 2)
+        results['parallel_matches_batch'] = all(
+            np.array_equal(batch_result[name], parallel_result[name], equal_nan=batch_result[name].dtype.kind == 'f')
+            for name in batch_result.column_names if batch_result[name].dtype != object
+        )
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--kb", type=int, default=1, help="Approximate OCR text size per document")
+    parser.add_argument("--workers", type=int, default=1, help="Also analyze the batch across this many processes")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.documents, args.kb, args.workers, args.repeats), indent=2))
+
+if __name__ == "__main__":
+    main()
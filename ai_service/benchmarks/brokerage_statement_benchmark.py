@@ -0,0 +1,131 @@
+"""
+1099-B benchmark: streaming ``BrokerageStatementParser`` vs. one regex over the whole statement.
+
+Generates composite brokerage statements of increasing length (sections by
+holding period and basis reporting, a heading per security, rows with
+quantities, VARIOUS acquisition dates, placeholders and wash sales) page by
+page, and reports lots/sec, tracemalloc peak memory and whether the totals
+match the generated ones, for the streaming parser (pages generated as it
+reads them) and for ``re.finditer`` over the joined text collecting a dict
+per row.
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.brokerage_statement_benchmark --lots 1000 10000 100000
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+import argparse
+import json
+import re
+import time
+import tracemalloc
+import numpy as np
+
+from ..src.analyzers.brokerage_statement import BrokerageStatement, BrokerageStatementParser
+
+SECTIONS = (
+    'SHORT-TERM TRANSACTIONS FOR COVERED TAX LOTS',
+    'SHORT-TERM TRANSACTIONS FOR NONCOVERED TAX LOTS',
+    'LONG-TERM TRANSACTIONS FOR COVERED TAX LOTS',
+    'LONG-TERM TRANSACTIONS FOR NONCOVERED TAX LOTS',
+)
+ROW = re.compile(
+    r'^(\d{2}/\d{2}/\d{2}) ([\d.]+) ([\d,]+\.\d{2}) (\d{2}/\d{2}/\d{2}|VARIOUS) ([\d,]+\.\d{2}) \S+ (\S+)(?: W)? (\(?[\d,]+\.\d{2}\)?)$',
+    re.MULTILINE
+)
+
+def _money(value: float) -> str:
+    return f'({-value:,.2f})' if value < 0 else f'{value:,.2f}'
+
+def make_statement(lots: int, expected: Dict[str, float], seed: int = 0, rows_per_page: int = 45) -> Iterator[str]:
+    """Pages of a statement with ``lots`` rows, adding the generated totals to ``expected``."""
+    rng = np.random.default_rng(seed)
+    lines: List[str] = ['2024 Composite Form 1099 Brokerage Statement', '2024 Form 1099-B']
+    per_section = -(-lots // len(SECTIONS))
+    for i in range(lots):
+        if i % per_section == 0:
+            lines.append(SECTIONS[i // per_section])
+            lines.append('1c- Date sold Quantity 1d- Proceeds 1b- Date acquired 1e- Cost or other basis 1f- Accrued mkt disc 1g- Wash sale loss disallowed Gain or loss(-)')
+        if i % 12 == 0:
+            security = int(rng.integers(0, 400))
+            lines.append(f'SECURITY {security} COMMON STOCK / CUSIP: {security:08d}9 / Symbol: S{security}')
+        proceeds = round(float(rng.uniform(100, 20000)), 2)
+        basis = round(proceeds * float(rng.uniform(0.6, 1.3)), 2)
+        wash = round(basis - proceeds, 2) if basis > proceeds and rng.random() < 0.1 else 0.0
+        gain = round(proceeds - basis + wash, 2) + 0.0
+        acquired = 'VARIOUS' if rng.random() < 0.05 else f'{int(rng.integers(1, 13)):02d}/{int(rng.integers(1, 29)):02d}/23'
+        wash_text = f'{wash:,.2f} W' if wash else '...'
+        lines.append(
+            f'{int(rng.integers(1, 13)):02d}/{int(rng.integers(1, 29)):02d}/24 {float(rng.integers(1, 500)):.3f} '
+            f'{proceeds:,.2f} {acquired} {basis:,.2f} ... {wash_text} {_money(gain)}'
+        )
+        expected['lots'] = expected.get('lots', 0) + 1
+        for name, value in (('proceeds', proceeds), ('cost_basis', basis), ('wash_sale_disallowed', wash), ('gain', gain)):
+            expected[name] = expected.get(name, 0.0) + value
+        if len(lines) >= rows_per_page:
+            yield '\n'.join(lines)
+            lines = []
+    if lines:
+        yield '\n'.join(lines)
+
+def _matches(totals: Dict[str, float], expected: Dict[str, float]) -> bool:
+    return all(abs(totals[name] - expected[name]) < 0.01 * expected['lots'] for name in ('proceeds', 'cost_basis', 'wash_sale_disallowed', 'gain'))
+
+def _streaming(pages: List[str]) -> BrokerageStatement:
+    return BrokerageStatementParser().parse(pages)
+
+def _single_regex(pages: List[str]) -> Dict[str, Any]:
+    text = '\n\n'.join(pages)
+    amount = lambda value: -float(value.strip('()').replace(',', '')) if value.startswith('(') else float(value.replace(',', ''))
+    rows = []
+    for match in ROW.finditer(text):
+        sold, quantity, proceeds, acquired, basis, wash, gain = match.groups()
+        rows.append({
+            'date_sold': sold, 'quantity': float(quantity), 'proceeds': amount(proceeds), 'date_acquired': acquired,
+            'cost_basis': amount(basis), 'wash_sale_disallowed': 0.0 if wash == '...' else amount(wash), 'gain': amount(gain)
+        })
+    totals = {name: sum(row[name] for row in rows) for name in ('proceeds', 'cost_basis', 'wash_sale_disallowed', 'gain')}
+    return {'lots': len(rows), **totals}
+
+def _peak_mb(parse: Callable[[Iterable[str]], Any], pages: Iterable[str]) -> float:
+    tracemalloc.start()
+    parse(pages)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return round(peak / 2 ** 20, 2)
+
+def run(sizes: List[int], seed: int = 0) -> List[Dict[str, Any]]:
+    results = []
+    for lots in sizes:
+        expected: Dict[str, float] = {}
+        pages = list(make_statement(lots, expected, seed))
+        start = time.perf_counter()
+        statement = _streaming(pages)
+        streaming_time = time.perf_counter() - start
+        start = time.perf_counter()
+        regex = _single_regex(pages)
+        regex_time = time.perf_counter() - start
+        del pages
+        # Peak memory of parsing pages as they are generated, vs. the whole statement at once
+        results.append({
+            'lots': lots,
+            'streaming': {
+                'lots_per_sec': round(statement.lots / streaming_time),
+                'peak_mb': _peak_mb(_streaming, make_statement(lots, {}, seed)),
+                'totals_match': statement.lots == expected['lots'] and _matches(statement.totals, expected)
+            },
+            'single_regex': {
+                'lots_per_sec': round(regex['lots'] / regex_time),
+                'peak_mb': _peak_mb(lambda generated: _single_regex(list(generated)), make_statement(lots, {}, seed)),
+                'totals_match': regex['lots'] == expected['lots'] and _matches(regex, expected)
+            }
+        })
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lots", type=int, nargs='+', default=[1000, 10000, 100000], help="Statement lengths in lots")
+    args = parser.parse_args()
+    print(json.dumps(run(args.lots), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Image decode benchmark: spooling an upload to disk vs. decoding it from memory.
+
+Encodes a synthetic W-2 page (see ``synthetic_corpus``) as a 300 DPI scan
+(JPEG and PNG) and as a 12 MP phone photo, then decodes each the way
+``/process`` used to (write a temp file, ``ImageTiler.load_image``) and the
+in-memory way (``ImageTiler.decode_image`` on the request bytes).
+
+Per path and image it reports latency, the peak of the Python/NumPy
+allocations seen by tracemalloc (also as a number of page-sized buffers) and
+the peak RSS growth of a fresh process doing the same decode, which also
+covers the C-level buffers of PIL and libjpeg that tracemalloc cannot see
+(Linux only; skip it with ``--no-rss``).
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.decode_benchmark --repeats 20
+"""
+from typing import Any, Callable, Dict
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+from .synthetic_corpus import make_fields, render_page, _lines
+from ..src.image_tiling import ImageTiler
+
+def make_images(seed: int = 0) -> Dict[str, bytes]:
+    """Encoded test images keyed by name."""
+    rng = np.random.default_rng(seed)
+    page = render_page(_lines('W-2', 2023, make_fields(rng, 'W-2')))
+    photo = page.convert('RGB').resize((3024, 4032))
+    images = {}
+    for name, image, fmt, options in (
+        ('scan_300dpi.jpg', page, 'JPEG', {'quality': 90, 'dpi': (300, 300)}),
+        ('scan_300dpi.png', page, 'PNG', {'dpi': (300, 300)}),
+        ('photo_12mp.jpg', photo, 'JPEG', {'quality': 90}),
+    ):
+        buf = io.BytesIO()
+        image.save(buf, format=fmt, **options)
+        images[name] = buf.getvalue()
+    return images
+
+def decode_spooled(tiler: ImageTiler, name: str, data: bytes) -> np.ndarray:
+    """The previous path: write the upload to a temp file and decode it with PIL."""
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(name)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return tiler.load_image(path)
+    finally:
+        os.remove(path)
+
+def decode_in_memory(tiler: ImageTiler, name: str, data: bytes) -> np.ndarray:
+    return tiler.decode_image(data)
+
+PATHS: Dict[str, Callable[[ImageTiler, str, bytes], np.ndarray]] = {
+    'spooled': decode_spooled,
+    'in_memory': decode_in_memory,
+}
+
+def _traced(func: Callable[[], np.ndarray]) -> Dict[str, float]:
+    """Peak of the Python/NumPy allocations of one call, as seen by tracemalloc."""
+    tracemalloc.start()
+    page = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'peak_mb': round(peak / 1e6, 2),
+        # Page-sized buffers alive at once (the decoded page itself counts as one)
+        'page_buffers': round(peak / float(page.nbytes), 1),
+    }
+
+def _peak_rss_kb() -> int:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return 0
+
+def _rss_child(path: str, name: str, data: bytes, queue: Any) -> None:
+    tiler = ImageTiler()
+    # Reset the peak RSS so the interpreter and library imports are not counted (Linux only)
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+    baseline = _peak_rss_kb()
+    PATHS[path](tiler, name, data)
+    queue.put((_peak_rss_kb() - baseline) / 1e3)
+
+def _rss_growth_mb(path: str, name: str, data: bytes) -> float:
+    """Peak RSS growth of a fresh process running one decode."""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_rss_child, args=(path, name, data, queue))
+    process.start()
+    growth = queue.get(timeout=120)
+    process.join()
+    return round(growth, 2)
+
+def run(repeats: int = 20, rss: bool = True, seed: int = 0) -> Dict[str, Any]:
+    images = make_images(seed)
+    results = {}
+    for name, data in images.items():
+        entry = {'bytes': len(data)}
+        outputs = {}
+        for path, decode in PATHS.items():
+            tiler = ImageTiler()
+            latencies = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                outputs[path] = decode(tiler, name, data)
+                latencies.append(time.perf_counter() - start)
+            entry[path] = {
+                'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 2),
+                'p95_ms': round(float(np.percentile(latencies, 95)) * 1000, 2),
+                **_traced(lambda: decode(tiler, name, data)),
+            }
+            if rss:
+                entry[path]['rss_growth_mb'] = _rss_growth_mb(path, name, data)
+        spooled, in_memory = outputs['spooled'], outputs['in_memory']
+        entry['shape'] = list(in_memory.shape)
+        # Both paths should produce the same page; any difference here is a decoder mismatch
+        entry['mean_abs_diff'] = round(float(np.mean(np.abs(spooled.astype(np.int16) - in_memory))), 3) \
+            if spooled.shape == in_memory.shape else None
+        entry['speedup'] = round(entry['spooled']['p50_ms'] / entry['in_memory']['p50_ms'], 2)
+        results[name] = entry
+    return {'repeats': repeats, 'images': results}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--no-rss", action="store_true", help="Skip the per-path subprocess RSS measurement")
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeats, rss=not args.no_rss), indent=2))
+
+if __name__ == "__main__":
+    main()
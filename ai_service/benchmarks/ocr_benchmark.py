@@ -0,0 +1,79 @@
+"""
+OCR engine benchmark: per-page pytesseract subprocess vs. the persistent OCR pool.
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.ocr_benchmark --pages 40 --workers 4
+"""
+from typing import Any, Callable, Dict, List
+import argparse
+import json
+import time
+import numpy as np
+from PIL import Image, ImageDraw
+
+from ..src.ocr_pool import OCREnginePool, OCRPoolConfig
+
+def render_page(index: int, size=(1275, 1650)) -> np.ndarray:
+    """Render a simple grayscale W-2 style page at ~150 DPI."""
+    image = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(image)
+    lines = [
+        "Form W-2 Wage and Tax Statement 2023",
+        f"Employer's name ACME Corporation {index}",
+        "EIN: 12-3456789",
+        "SSN: 123-45-6789",
+        f"Box 1 {50000 + index * 17:,}.00",
+        f"Box 2 {8000 + index * 3:,}.00",
+        "State: CA",
+    ]
+    for row, line in enumerate(lines):
+        draw.text((100, 100 + row * 60), line, fill=0)
+    return np.array(image)
+
+def _time_pages(ocr: Callable[[np.ndarray], str], pages: List[np.ndarray]) -> Dict[str, Any]:
+    latencies = []
+    start = time.perf_counter()
+    for page in pages:
+        page_start = time.perf_counter()
+        ocr(page)
+        latencies.append(time.perf_counter() - page_start)
+    elapsed = time.perf_counter() - start
+    return {
+        "pages": len(pages),
+        "pages_per_sec": len(pages) / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+    }
+
+def run(pages: int, workers: int) -> Dict[str, Any]:
+    import pytesseract
+
+    corpus = [render_page(i) for i in range(pages)]
+    results = {"subprocess": _time_pages(pytesseract.image_to_string, corpus)}
+
+    pool = OCREnginePool(OCRPoolConfig(size=workers, health_check_interval=0))
+    try:
+        # Start-up (engine + traineddata load) is paid once, outside the hot path
+        startup = time.perf_counter()
+        pool.start()
+        pool.image_to_string(corpus[0])
+        results["pool_startup_ms"] = (time.perf_counter() - startup) * 1000
+        results["pool"] = _time_pages(pool.image_to_string, corpus)
+    finally:
+        pool.close()
+
+    results["speedup"] = (
+        results["pool"]["pages_per_sec"] / results["subprocess"]["pages_per_sec"]
+        if results["subprocess"]["pages_per_sec"] else None
+    )
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(run(args.pages, args.workers), indent=2))
+
+if __name__ == "__main__":
+    main()
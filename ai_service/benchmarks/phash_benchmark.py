@@ -0,0 +1,76 @@
+"""
+Near-duplicate index benchmark: Hamming-radius lookups over random page signatures.
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.phash_benchmark --entries 1000000 --queries 2000
+"""
+from typing import Any, Dict
+import argparse
+import json
+import time
+import numpy as np
+
+from ..src.phash_index import PageHashIndex
+
+def _random_signatures(rng: np.random.Generator, count: int) -> np.ndarray:
+    high = rng.integers(0, 2 ** 63, size=(count, 2), dtype=np.uint64)
+    return high * np.uint64(2) + rng.integers(0, 2, size=(count, 2), dtype=np.uint64)
+
+def _flip_bits(signature: np.ndarray, rng: np.random.Generator, flips: int) -> np.ndarray:
+    flipped = signature.copy()
+    for bit in rng.choice(128, size=flips, replace=False):
+        flipped[bit // 64] ^= np.uint64(1) << np.uint64(bit % 64)
+    return flipped
+
+def run(entries: int, queries: int, max_distance: int, incremental: int = 5000, seed: int = 0) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    signatures = _random_signatures(rng, entries)
+    index = PageHashIndex(max_distance=max_distance)
+
+    start = time.perf_counter()
+    index.add_many(signatures[:entries - incremental], np.arange(entries - incremental))
+    build_s = time.perf_counter() - start
+
+    # Pages stored while serving go through the insert buffer
+    start = time.perf_counter()
+    for ref in range(entries - incremental, entries):
+        index.add((int(signatures[ref, 0]), int(signatures[ref, 1])), ref)
+    incremental_s = time.perf_counter() - start
+
+    latencies = []
+    found = 0
+    for _ in range(queries):
+        # Half the queries are planted near-duplicates, half are unseen pages
+        if rng.random() < 0.5:
+            ref = int(rng.integers(entries))
+            query = _flip_bits(signatures[ref], rng, int(rng.integers(0, max_distance + 1)))
+        else:
+            ref, query = None, _random_signatures(rng, 1)[0]
+        start = time.perf_counter()
+        match = index.nearest((int(query[0]), int(query[1])))
+        latencies.append(time.perf_counter() - start)
+        if ref is not None and match is not None and match[0] == ref:
+            found += 1
+
+    stats = index.get_stats()
+    return {
+        "entries": len(index),
+        "max_distance": max_distance,
+        "build_s": build_s,
+        "incremental_adds_per_sec": incremental / incremental_s if incremental_s else None,
+        "query_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "query_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "avg_candidates": stats['avg_candidates'],
+        "planted_found": found,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--max-distance", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(args.entries, args.queries, args.max_distance), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+End-to-end OCR pipeline benchmark on the synthetic W-2/1099 corpus.
+
+Runs DocumentProcessor (with automatic classification) and the tax analyzers
+over every corpus document and reports throughput, latency, peak RSS and
+classification/field accuracy as JSON. With --baseline, the results are
+compared against a saved run and the exit status is 1 if any metric
+regressed by more than --tolerance.
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.pipeline_benchmark --corpus corpus/ --output results.json
+    python -m ai_service.benchmarks.pipeline_benchmark --corpus corpus/ --baseline results.json
+"""
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+import numpy as np
+
+from ..src.tax_analyzer import TaxAnalyzer
+from .synthetic_corpus import generate_corpus, load_manifest
+
+# Metric -> True if higher is better
+COMPARED_METRICS = {
+    'pages_per_sec': True,
+    'page_latency_p50_ms': False,
+    'page_latency_p95_ms': False,
+    'peak_rss_mb': False,
+    'classification_accuracy': True,
+    'field_accuracy': True
+}
+
+def normalize(value: Any) -> str:
+    """Normalize a field value for comparison (case, whitespace, $ and thousands separators)."""
+    return re.sub(r'[\s$,]', '', str(value)).lower()
+
+def score_fields(expected: Dict[str, str], extracted: Dict[str, Any]) -> Dict[str, bool]:
+    """Per-field exact-match results for the ground-truth fields of a document."""
+    return {
+        field: field in extracted and normalize(extracted[field]) == normalize(value)
+        for field, value in expected.items()
+    }
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak resident set size of this process and of its (terminated) children, in MB."""
+    # ru_maxrss is reported in KB on Linux and in bytes on macOS
+    unit = 1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    }
+
+def _run_document(processor: Any, analyzer: TaxAnalyzer, corpus_dir: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    result = processor.process_document(os.path.join(corpus_dir, entry['file']), None)
+    elapsed = time.perf_counter() - start
+
+    record = {
+        'file': entry['file'],
+        'form_type': entry['form_type'],
+        'variant': entry['distortions']['variant'],
+        'pages': entry['pages'],
+        'latency_ms': elapsed * 1000,
+        'success': bool(result.get('success'))
+    }
+    if not record['success']:
+        record['error'] = result.get('error')
+        record['fields'] = {field: False for field in entry['fields']}
+        return record
+
+    classification = result.get('classification') or {}
+    record['predicted_form_type'] = classification.get('form_type')
+    record['predicted_year'] = classification.get('year')
+
+    text = "\n".join(page['text'] for page in result['results'])
+    analysis = analyzer.analyze_document(entry['doc_type'], text)
+    record['fields'] = score_fields(entry['fields'], analysis.get('data', {}))
+    return record
+
+def summarize(records: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    """Aggregate per-document records into benchmark metrics."""
+    pages = sum(r['pages'] for r in records)
+    page_latencies = [r['latency_ms'] / r['pages'] for r in records]
+    field_results = [ok for r in records for ok in r['fields'].values()]
+
+    by_field: Dict[str, List[bool]] = {}
+    by_variant: Dict[str, List[bool]] = {}
+    for r in records:
+        for field, ok in r['fields'].items():
+            by_field.setdefault(field, []).append(ok)
+            by_variant.setdefault(r['variant'], []).append(ok)
+
+    return {
+        'documents': len(records),
+        'pages': pages,
+        'failures': sum(1 for r in records if not r['success']),
+        'wall_time_s': wall_time,
+        'pages_per_sec': pages / wall_time if wall_time else 0.0,
+        'page_latency_p50_ms': float(np.percentile(page_latencies, 50)) if records else 0.0,
+        'page_latency_p95_ms': float(np.percentile(page_latencies, 95)) if records else 0.0,
+        'classification_accuracy': (
+            sum(1 for r in records if r.get('predicted_form_type') == r['form_type']) / len(records)
+            if records else 0.0
+        ),
+        'field_accuracy': float(np.mean(field_results)) if field_results else 0.0,
+        'field_accuracy_by_field': {f: float(np.mean(v)) for f, v in sorted(by_field.items())},
+        'field_accuracy_by_variant': {v: float(np.mean(ok)) for v, ok in sorted(by_variant.items())}
+    }
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """
+    Compare results against a baseline run.
+
+    A metric regresses when it is worse than the baseline by more than
+    ``tolerance`` (relative).
+    """
+    comparison = {}
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        if metric not in results or metric not in baseline:
+            continue
+        current, previous = results[metric], baseline[metric]
+        change = (current - previous) / previous if previous else 0.0
+        worse = -change if higher_is_better else change
+        comparison[metric] = {
+            'baseline': previous,
+            'current': current,
+            'change': change,
+            'regressed': worse > tolerance
+        }
+    return comparison
+
+def run(
+    corpus_dir: str,
+    processor: Optional[Any] = None,
+    concurrency: int = 1,
+    workers: int = 1
+) -> Dict[str, Any]:
+    """
+    Benchmark the pipeline over a generated corpus.
+
+    Args:
+        corpus_dir: Directory containing the corpus and its manifest
+        processor: DocumentProcessor to benchmark; by default one is created
+            with its own OCR pool of ``workers`` processes
+        concurrency: Number of documents processed at once
+        workers: OCR pool size when creating the default processor
+    """
+    manifest = load_manifest(corpus_dir)
+    analyzer = TaxAnalyzer()
+    pool = None
+    if processor is None:
+        from ..src.document_processor import DocumentProcessor
+        from ..src.ocr_pool import OCREnginePool, OCRPoolConfig
+
+        pool = OCREnginePool(OCRPoolConfig(size=workers, health_check_interval=0))
+        pool.start()
+        processor = DocumentProcessor(temp_dir=tempfile.mkdtemp(prefix="bench_"), ocr_pool=pool)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            records = list(executor.map(
+                lambda entry: _run_document(processor, analyzer, corpus_dir, entry),
+                manifest['documents']
+            ))
+        wall_time = time.perf_counter() - start
+    finally:
+        if pool is not None:
+            # Worker RSS is only reported once the workers have exited
+            pool.close()
+
+    rss = peak_rss_mb()
+    results = summarize(records, wall_time)
+    results.update({
+        'peak_rss_mb': rss['self'],
+        'peak_worker_rss_mb': rss['children'],
+        'concurrency': concurrency,
+        'seed': manifest.get('seed'),
+        'records': records
+    })
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", required=True, help="Corpus directory (generated if it has no manifest)")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--baseline", help="Baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.corpus, 'manifest.json')):
+        generate_corpus(args.corpus, args.documents, args.seed)
+
+    results = run(args.corpus, concurrency=args.concurrency, workers=args.workers)
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['comparison'] = compare(results, json.load(f), args.tolerance)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+    if any(m['regressed'] for m in results.get('comparison', {}).values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
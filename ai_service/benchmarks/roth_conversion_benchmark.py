@@ -0,0 +1,107 @@
+"""
+Roth conversion benchmark: ``RothConversionOptimizer`` over 30-year horizons.
+
+Optimizes random retirement plans (balance, age, projected income, heirs'
+income) and reports the dynamic program's latency percentiles and grid sizes,
+the latency of cached results, and the lifetime tax savings of the optimized
+schedules against the best "fill up to the top of a bracket every year" rule,
+the usual hand-made conversion plan. Brute force is not timed: with the
+default grid it would try ``states ** years`` schedules.
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.roth_conversion_benchmark --plans 50 --years 30
+"""
+from typing import Any, Dict, List
+import argparse
+import json
+import time
+import numpy as np
+
+from ..src.roth_optimizer import RothConversionOptimizer
+
+def make_plans(count: int, years: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    plans = []
+    for _ in range(count):
+        working = int(rng.integers(0, 8))
+        wages, pension = float(rng.choice([40000.0, 80000.0, 150000.0])), float(rng.choice([0.0, 20000.0, 40000.0]))
+        plans.append({
+            'traditional_balance': float(np.round(rng.lognormal(13.3, 0.7), 2)),
+            'age': int(rng.integers(55, 72)),
+            'years': years,
+            'other_income': [wages] * working + [pension],
+            'growth_rate': float(rng.choice([0.03, 0.05, 0.07])),
+            'tax_year': int(rng.choice([2023, 2024])),
+            'filing_status': str(rng.choice(['single', 'married_filing_jointly'])),
+            'heir_income': float(rng.choice([50000.0, 120000.0, 250000.0]))
+        })
+    return plans
+
+def _bracket_fill(optimizer: RothConversionOptimizer, plan: Dict[str, Any]) -> float:
+    """Lowest lifetime tax of converting up to the top of the same bracket every year."""
+    plan = optimizer._normalize(plan)
+    schedules = optimizer._schedules(plan)
+    _, rmd_fractions = optimizer._rmd_ages(plan)
+    growth, discount = 1.0 + plan['growth_rate'], 1.0 + plan['discount_rate']
+    best = np.inf
+    for bracket in range(len(schedules[0][0].thresholds)):
+        balance, lifetime_tax = plan['traditional_balance'], 0.0
+        for t, (schedule, deduction) in enumerate(schedules):
+            rmd = balance * rmd_fractions[t]
+            income = plan['other_income'][t] + rmd - deduction
+            top = schedule.thresholds[bracket + 1] if bracket + 1 < len(schedule.thresholds) else np.inf
+            conversion = min(max(top - income, 0.0), balance - rmd)
+            lifetime_tax += float(schedule.tax(max(income + conversion, 0.0))) / discount ** t
+            balance = (balance - rmd - conversion) * growth
+        lifetime_tax += float(optimizer._heir_tax(plan, schedules[-1][0], np.array(balance)))
+        best = min(best, lifetime_tax)
+    return best
+
+def run(plans: int = 50, years: int = 30, max_states: int = 250, time_budget_ms: float = 500.0, seed: int = 0) -> Dict[str, Any]:
+    optimizer = RothConversionOptimizer(max_states=max_states, time_budget_ms=time_budget_ms, cache_size=plans)
+    sample = make_plans(plans, years, seed)
+    optimizer.optimize({**sample[0], 'years': 2})
+
+    latencies, states, savings, advantage = [], [], [], []
+    for plan in sample:
+        start = time.perf_counter()
+        result = optimizer.optimize(plan)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        states.append(result['states'])
+        savings.append(result['savings'])
+        advantage.append(_bracket_fill(optimizer, plan) - result['lifetime_tax'])
+
+    cached = []
+    for plan in sample:
+        start = time.perf_counter()
+        optimizer.optimize(plan)
+        cached.append((time.perf_counter() - start) * 1000.0)
+
+    latencies, cached, advantage = np.array(latencies), np.array(cached), np.array(advantage)
+    return {
+        'plans': plans,
+        'years': years,
+        'time_budget_ms': time_budget_ms,
+        'states_min': int(min(states)),
+        'states_max': int(max(states)),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'max_ms': round(float(latencies.max()), 2),
+        'cached_p50_ms': round(float(np.percentile(cached, 50)), 3),
+        'mean_savings_vs_no_conversion': round(float(np.mean(savings)), 2),
+        'mean_savings_vs_bracket_fill': round(float(advantage.mean()), 2),
+        'plans_worse_than_bracket_fill': int((advantage < -0.01).sum()),
+        'stats': optimizer.get_stats()
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, default=50)
+    parser.add_argument("--years", type=int, default=30, help="Planning horizon of every plan")
+    parser.add_argument("--max-states", type=int, default=250, help="Balance grid points of the dynamic program")
+    parser.add_argument("--time-budget-ms", type=float, default=500.0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.plans, args.years, args.max_states, args.time_budget_ms), indent=2))
+
+if __name__ == "__main__":
+    main()
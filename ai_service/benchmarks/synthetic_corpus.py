@@ -0,0 +1,186 @@
+"""
+Reproducible synthetic corpus of rendered W-2 and 1099 documents with ground truth.
+
+Each document is rendered at 300 DPI from randomly generated (but seeded)
+field values, optionally degraded with skew, noise and JPEG artifacts, and
+saved as PNG, JPEG or multi-page PDF. ``manifest.json`` records, per file,
+the form, year, page count, distortions and the expected analyzer fields.
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.synthetic_corpus --output corpus/ --documents 40
+"""
+from typing import Any, Dict, List, Tuple
+import argparse
+import json
+import os
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+PAGE_SIZE = (2550, 3300)  # US letter at 300 DPI
+FORM_TYPES = ['W-2', '1099-NEC', '1099-MISC', '1099-INT']
+YEARS = [2022, 2023, 2024]
+STATES = ['CA', 'NY', 'TX', 'WA', 'IL', 'MA']
+COMPANIES = ['ACME Corporation', 'Globex LLC', 'Initech Inc', 'Umbrella Partners', 'Stark Industries']
+PEOPLE = ['John Doe', 'Jane Smith', 'Maria Garcia', 'Wei Chen', 'Amit Patel']
+TITLES = {
+    'W-2': 'Wage and Tax Statement',
+    '1099-NEC': 'Nonemployee Compensation',
+    '1099-MISC': 'Miscellaneous Information',
+    '1099-INT': 'Interest Income'
+}
+
+def _amount(rng: np.random.Generator, low: float, high: float) -> str:
+    return f"{rng.uniform(low, high):,.2f}"
+
+def _tin(rng: np.random.Generator, groups: Tuple[int, ...]) -> str:
+    return "-".join("".join(str(d) for d in rng.integers(0, 10, size=n)) for n in groups)
+
+def make_fields(rng: np.random.Generator, form_type: str) -> Dict[str, str]:
+    """Random field values, keyed by the analyzer field names they should be extracted as."""
+    state = str(rng.choice(STATES))
+    if form_type == 'W-2':
+        wages = rng.uniform(20000, 250000)
+        return {
+            'employer_name': str(rng.choice(COMPANIES)),
+            'employer_ein': _tin(rng, (2, 7)),
+            'employee_name': str(rng.choice(PEOPLE)),
+            'employee_ssn': _tin(rng, (3, 2, 4)),
+            'wages': f"{wages:,.2f}",
+            'federal_tax': f"{wages * rng.uniform(0.08, 0.25):,.2f}",
+            'social_security_wages': f"{min(wages, 160200):,.2f}",
+            'social_security_tax': f"{min(wages, 160200) * 0.062:,.2f}",
+            'medicare_wages': f"{wages:,.2f}",
+            'medicare_tax': f"{wages * 0.0145:,.2f}",
+            'state': state
+        }
+    return {
+        'payer_name': str(rng.choice(COMPANIES)),
+        'payer_tin': _tin(rng, (2, 7)),
+        'recipient_name': str(rng.choice(PEOPLE)),
+        'recipient_tin': _tin(rng, (3, 2, 4)),
+        'nonemployee_compensation': _amount(rng, 500, 90000),
+        'federal_tax_withheld': _amount(rng, 0, 5000),
+        'state': state
+    }
+
+def _lines(form_type: str, year: int, fields: Dict[str, str]) -> List[str]:
+    header = f"Form {form_type} {TITLES[form_type]} {year}"
+    if form_type == 'W-2':
+        return [
+            header,
+            f"Employer's name {fields['employer_name']}",
+            f"EIN: {fields['employer_ein']}",
+            f"Employee's name {fields['employee_name']}",
+            f"SSN: {fields['employee_ssn']}",
+            f"Box 1 ${fields['wages']}",
+            f"Box 2 ${fields['federal_tax']}",
+            f"Box 3 ${fields['social_security_wages']}",
+            f"Box 4 ${fields['social_security_tax']}",
+            f"Box 5 ${fields['medicare_wages']}",
+            f"Box 6 ${fields['medicare_tax']}",
+            f"State: {fields['state']}"
+        ]
+    return [
+        header,
+        f"Payer's name {fields['payer_name']}",
+        f"Payer's TIN {fields['payer_tin']}",
+        f"Recipient's name {fields['recipient_name']}",
+        f"Recipient's TIN {fields['recipient_tin']}",
+        f"Box 1 ${fields['nonemployee_compensation']}",
+        f"Box 4 ${fields['federal_tax_withheld']}",
+        f"State: {fields['state']}"
+    ]
+
+def render_page(lines: List[str], font_size: int = 48) -> Image.Image:
+    """Render text lines onto a white letter-size grayscale page."""
+    page = Image.new('L', PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=font_size)
+    for row, line in enumerate(lines):
+        draw.text((200, 250 + row * int(font_size * 2.2)), line, fill=0, font=font)
+    return page
+
+def distort(page: Image.Image, rng: np.random.Generator, skew: float, noise: float) -> Image.Image:
+    """Apply a skew (degrees, counter-clockwise) and additive Gaussian noise."""
+    if skew:
+        page = page.rotate(skew, resample=Image.BILINEAR, fillcolor=255)
+    if noise:
+        pixels = np.asarray(page, dtype=np.float32)
+        pixels += rng.normal(0.0, noise, size=pixels.shape)
+        page = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return page
+
+def generate_corpus(output_dir: str, documents: int = 40, seed: int = 0) -> Dict[str, Any]:
+    """
+    Render a synthetic corpus into ``output_dir`` and write its manifest.
+
+    Args:
+        output_dir: Directory for the documents and ``manifest.json``
+        documents: Number of documents to generate
+        seed: Random seed; the same seed always yields the same corpus
+
+    Returns:
+        The manifest dictionary
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    entries = []
+
+    for index in range(documents):
+        form_type = FORM_TYPES[index % len(FORM_TYPES)]
+        year = int(rng.choice(YEARS))
+        fields = make_fields(rng, form_type)
+        # Cycle through clean, noisy+skewed, JPEG and multi-page PDF variants
+        variant = ('clean', 'degraded', 'jpeg', 'pdf')[(index // 2) % 4]
+        skew = float(np.round(rng.uniform(-4, 4), 2)) if variant != 'clean' else 0.0
+        noise = float(rng.uniform(8, 20)) if variant == 'degraded' else 0.0
+
+        page = distort(render_page(_lines(form_type, year, fields)), rng, skew, noise)
+        name = f"{index:04d}_{form_type.lower().replace('-', '')}"
+        pages = 1
+        jpeg_quality = None
+        if variant == 'jpeg':
+            jpeg_quality = int(rng.integers(25, 60))
+            filename = f"{name}.jpg"
+            page.save(os.path.join(output_dir, filename), quality=jpeg_quality)
+        elif variant == 'pdf':
+            # Copy B plus a continuation page of instructions
+            filename = f"{name}.pdf"
+            instructions = render_page([f"Instructions for {form_type}"] + ["Keep for your records."] * 10)
+            page.save(os.path.join(output_dir, filename), save_all=True, append_images=[instructions], resolution=300)
+            pages = 2
+        else:
+            filename = f"{name}.png"
+            page.save(os.path.join(output_dir, filename), dpi=(300, 300))
+
+        entries.append({
+            'file': filename,
+            'doc_type': 'w2' if form_type == 'W-2' else '1099',
+            'form_type': form_type,
+            'year': year,
+            'pages': pages,
+            'distortions': {'variant': variant, 'skew': skew, 'noise': noise, 'jpeg_quality': jpeg_quality},
+            'fields': fields
+        })
+
+    manifest = {'seed': seed, 'documents': entries}
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def load_manifest(corpus_dir: str) -> Dict[str, Any]:
+    """Load the manifest of a previously generated corpus."""
+    with open(os.path.join(corpus_dir, 'manifest.json')) as f:
+        return json.load(f)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    manifest = generate_corpus(args.output, args.documents, args.seed)
+    print(f"Wrote {len(manifest['documents'])} documents to {args.output}")
+
+if __name__ == "__main__":
+    main()
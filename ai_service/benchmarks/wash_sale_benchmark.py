@@ -0,0 +1,101 @@
+"""
+Wash sale benchmark: ``TaxLotEngine`` vs. comparing every sale at a loss with every purchase.
+
+Generates the trade history of an active trader (20 securities traded
+several times a day for two years, prices following random walks, sales
+about the size of a purchase and never more than the shares held) and
+reports trades/sec of the engine, whose binary searches find the
+purchases within 30 days of each sale at a loss, and of the same engine
+with that search replaced by a pairwise comparison with every purchase of
+the security, whether both give the same lots, and the number of wash
+sales and harvesting candidates found. Nearly every sale at a loss of
+such a history is a wash sale, and replacement shares split lots, so
+there are several realized lots per sale.
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.wash_sale_benchmark --trades 1000 10000 100000
+"""
+from typing import Any, Dict, Iterator, List, Optional
+import argparse
+import json
+import time
+import numpy as np
+
+from ..src.tax_lots import TaxLotEngine
+
+class PairwiseTaxLotEngine(TaxLotEngine):
+    """The engine with replacement purchases found by comparing the sale with every purchase of the security."""
+    def _replacements(self, buy_days: List[int], eligible: List[float], skip: List[int], lot: int, sale_day: int) -> Iterator[int]:
+        for j, day in enumerate(buy_days):
+            if abs(day - sale_day) <= self.window_days and eligible[j] > 1e-9 and j != lot:
+                yield j
+
+def make_trades(count: int, securities: int = 20, days: int = 500, seed: int = 0) -> Dict[str, Any]:
+    """Columns of ``count`` trades of ``securities`` securities over ``days`` days."""
+    rng = np.random.default_rng(seed)
+    security = rng.integers(0, securities, count)
+    day = np.sort(rng.integers(0, days, count))
+    prices = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, (days, securities)), axis=0))
+    price = np.round(prices[day, security] * rng.uniform(0.99, 1.01, count), 2)
+    held = np.zeros(securities, dtype=np.int64)
+    side, quantity = [], []
+    for s, sell in zip(security.tolist(), (rng.random(count) < 0.45).tolist()):
+        if sell and held[s]:
+            shares = int(rng.integers(1, min(held[s], 200) + 1))
+            held[s] -= shares
+            side.append('sell')
+        else:
+            shares = int(rng.integers(1, 200))
+            held[s] += shares
+            side.append('buy')
+        quantity.append(shares)
+    return {
+        'security': np.char.add('S', security.astype(str)),
+        'date': np.datetime64('2023-01-02') + day,
+        'side': side,
+        'quantity': quantity,
+        'price': price,
+        'prices': {f'S{s}': float(prices[-1, s]) for s in range(securities)}
+    }
+
+def run(sizes: List[int], pairwise_max: Optional[int] = None, seed: int = 0) -> List[Dict[str, Any]]:
+    engine, pairwise = TaxLotEngine(), PairwiseTaxLotEngine()
+    results = []
+    for count in sizes:
+        trades = make_trades(count, seed=seed)
+        start = time.perf_counter()
+        ledger = engine.process(trades)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        opportunities = engine.harvest(ledger, trades['prices'], taxable_income=150000.0)
+        harvest_ms = (time.perf_counter() - start) * 1000.0
+        result = {
+            'trades': count,
+            'realized_lots': len(ledger.realized),
+            'open_lots': len(ledger.open_lots),
+            'wash_sales': int((ledger.realized['wash_sale_disallowed'] > 0).sum()),
+            'harvesting_candidates': len(opportunities),
+            'windowed': {'trades_per_sec': round(count / elapsed), 'elapsed_s': round(elapsed, 3), 'harvest_ms': round(harvest_ms, 2)},
+            'pairwise': None
+        }
+        if pairwise_max is None or count <= pairwise_max:
+            start = time.perf_counter()
+            compared = pairwise.process(trades)
+            elapsed = time.perf_counter() - start
+            result['pairwise'] = {
+                'trades_per_sec': round(count / elapsed),
+                'elapsed_s': round(elapsed, 3),
+                'results_match': bool(np.array_equal(compared.realized, ledger.realized) and np.array_equal(compared.open_lots, ledger.open_lots))
+            }
+        results.append(result)
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trades", type=int, nargs='+', default=[1000, 10000, 100000], help="History lengths in trades")
+    parser.add_argument("--pairwise-max", type=int, default=None, help="Longest history to run the pairwise comparison on")
+    args = parser.parse_args()
+    print(json.dumps(run(args.trades, args.pairwise_max), indent=2))
+
+if __name__ == "__main__":
+    main()
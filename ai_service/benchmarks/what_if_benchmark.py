@@ -0,0 +1,107 @@
+"""
+What-if benchmark: ``WhatIfEngine.sweep`` vs. taxing each scenario in a Python loop.
+
+Sweeps random households (wages, current contributions, HSA coverage, age,
+itemized deductions) over 401(k) deferral and HSA levels and the standard vs.
+itemized deduction. Reports per-sweep latency percentiles of the vectorized
+sweep, the time of the same scenarios taxed one ``TaxEngine.compute`` call at
+a time, and the largest difference between the two.
+
+Usage (from the repository root):
+    python -m ai_service.benchmarks.what_if_benchmark --households 200 --step 250
+"""
+from typing import Any, Dict, List
+import argparse
+import json
+import time
+import numpy as np
+
+from ..src.tax_engine import get_tax_engine
+from ..src.what_if import WhatIfEngine
+
+def make_households(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    households = []
+    for _ in range(count):
+        households.append({
+            'wages': float(np.round(rng.lognormal(11.2, 0.6), 2)),
+            'deferrals': float(rng.choice([0.0, 2000.0, 6000.0])),
+            'hsa_contributions': float(rng.choice([0.0, 1000.0])),
+            'hsa_coverage': rng.choice(['self_only', 'family', None]),
+            'itemized_deductions': float(rng.choice([0.0, 12000.0, 25000.0])),
+            'age': int(rng.integers(25, 65)),
+            'tax_year': int(rng.choice([2023, 2024])),
+            'filing_status': str(rng.choice(['single', 'married_filing_jointly', 'head_of_household']))
+        })
+    return households
+
+def _loop(engine: WhatIfEngine, household: Dict[str, Any], sweep: Dict[str, Any]) -> float:
+    """Tax every scenario of a sweep's grid one call at a time; largest difference from the sweep."""
+    tax_engine = engine.tax_engine
+    year, status = sweep['tax_year'], sweep['filing_status']
+    standard = tax_engine.schedule(year, status).standard_deduction
+    step, limits = sweep['step'], sweep['limits']
+    income = household['wages'] + household['deferrals'] + household['hsa_contributions']
+    levels = lambda limit: np.unique(np.append(np.arange(0.0, min(limit, income), step), min(limit, income)))
+    curve = {point['contributions']: point['tax'] for point in sweep['savings_curve']}
+    best: Dict[float, float] = {}
+    for deferral in levels(limits['elective_deferral']):
+        for hsa in levels(limits['hsa']):
+            taxes = [
+                float(tax_engine.compute(income - deferral - hsa, year, status, deduction)['tax'])
+                for deduction in {standard, max(standard, household['itemized_deductions'])}
+            ]
+            total = round(deferral + hsa, 2)
+            best[total] = min(best.get(total, np.inf), min(taxes))
+    return max(abs(curve[total] - tax) for total, tax in best.items() if total in curve)
+
+def run(households: int = 200, step: float = 250.0, repeats: int = 3, seed: int = 0, loop_households: int = 10) -> Dict[str, Any]:
+    engine = WhatIfEngine(get_tax_engine(), step=step)
+    sample = make_households(households, seed)
+    engine.sweep(sample[0])
+
+    latencies, scenarios = [], 0
+    for household in sample:
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            sweep = engine.sweep(household)
+            best = min(best, time.perf_counter() - start)
+        latencies.append(best * 1000.0)
+        scenarios += sweep['scenarios']
+
+    loop_time, loop_scenarios, difference = 0.0, 0, 0.0
+    for household in sample[:loop_households]:
+        sweep = engine.sweep(household)
+        start = time.perf_counter()
+        difference = max(difference, _loop(engine, household, sweep))
+        loop_time += time.perf_counter() - start
+        loop_scenarios += sweep['scenarios']
+
+    latencies = np.array(latencies)
+    sweep_ms_per_scenario = latencies.sum() / scenarios
+    loop_ms_per_scenario = loop_time * 1000.0 / loop_scenarios
+    return {
+        'households': households,
+        'step': step,
+        'scenarios_per_sweep': round(scenarios / households),
+        'sweep_p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'sweep_p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'sweep_us_per_scenario': round(sweep_ms_per_scenario * 1000.0, 3),
+        'loop_us_per_scenario': round(loop_ms_per_scenario * 1000.0, 1),
+        'loop_ms_per_sweep': round(loop_ms_per_scenario * scenarios / households, 1),
+        'speedup': round(loop_ms_per_scenario / sweep_ms_per_scenario, 1),
+        'max_tax_difference': round(difference, 6),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--households", type=int, default=200)
+    parser.add_argument("--step", type=float, default=250.0, help="Spacing of contribution levels in dollars")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--loop-households", type=int, default=10, help="Households also taxed scenario by scenario")
+    args = parser.parse_args()
+    print(json.dumps(run(args.households, args.step, args.repeats, loop_households=args.loop_households), indent=2))
+
+if __name__ == "__main__":
+    main()
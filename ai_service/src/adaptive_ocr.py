@@ -0,0 +1,234 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import time
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]  # left, top, right, bottom
+
+class AdaptiveOCR:
+    """
+    Two-pass OCR: a low-resolution pass over the whole page, then a full
+    resolution pass over the regions Tesseract was unsure about.
+
+    Most of a tax form (labels, instructions, boilerplate) is read reliably
+    at ``low_dpi``; the first pass therefore costs a fraction of a full
+    resolution pass. Words below ``min_confidence`` are grouped into line
+    regions, cropped from the full-resolution page and recognized again.
+    The new words replace the old ones only if their mean confidence is
+    higher, so a re-OCR can never make a region worse, and the page text is
+    rebuilt from the merged words.
+    """
+    def __init__(
+        self,
+        ocr_func: Callable[[np.ndarray], Dict[str, Any]],
+        preprocess_func: Callable[[np.ndarray], np.ndarray],
+        source_dpi: int = 300,
+        low_dpi: int = 150,
+        min_confidence: float = 70.0,
+        max_regions: int = 40,
+        line_gap: float = 2.0,
+        padding: int = 8
+    ):
+        self.ocr_func = ocr_func
+        self.preprocess_func = preprocess_func
+        self.source_dpi = source_dpi
+        self.low_dpi = low_dpi
+        self.min_confidence = min_confidence
+        self.max_regions = max_regions
+        self.line_gap = line_gap
+        self.padding = padding
+        self.stats = {
+            'pages': 0,
+            'words': 0,
+            'low_confidence_words': 0,
+            'reocr_pages': 0,
+            'reocr_regions': 0,
+            'improved_regions': 0,
+            'first_pass_time': 0.0,
+            'reocr_time': 0.0
+        }
+
+    def recognize(self, gray: np.ndarray, dpi: Optional[float] = None) -> Dict[str, Any]:
+        """
+        OCR a page, re-reading low-confidence regions at full resolution.
+
+        Args:
+            gray: Grayscale page
+            dpi: Resolution of the page (default: ``source_dpi``); pages at
+                ``low_dpi`` or less get a single full-resolution pass
+
+        Returns:
+            Dict with ``text``, ``words`` (boxes in page coordinates),
+            ``confidence`` (0-1) and ``reocr`` (regions re-read and improved)
+        """
+        start_time = time.perf_counter()
+        scale = min(1.0, self.low_dpi / float(dpi or self.source_dpi))
+        height, width = gray.shape[:2]
+        if scale < 1.0:
+            size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            low = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        else:
+            low = gray
+        page = self.ocr_func(self.preprocess_func(low))
+        text = page['text']
+        words = self._scale_words(page['words'], 1.0 / scale)
+        self.stats['first_pass_time'] += time.perf_counter() - start_time
+
+        reocr = {'regions': 0, 'improved': 0}
+        if scale < 1.0:
+            regions = self._low_confidence_regions(words)
+            if regions:
+                reocr_start = time.perf_counter()
+                separators = self._separators(text, words['text'])
+                for region in regions[:self.max_regions]:
+                    reocr['regions'] += 1
+                    replaced = self._reocr_region(gray, region, words, separators)
+                    if replaced is not None:
+                        words, separators = replaced
+                        reocr['improved'] += 1
+                if reocr['improved']:
+                    text = self._join(words, separators)
+                self.stats['reocr_time'] += time.perf_counter() - reocr_start
+                self.stats['reocr_pages'] += 1
+
+        confidences = [conf for conf in words['conf'] if conf >= 0]
+        self.stats['pages'] += 1
+        self.stats['words'] += len(words['text'])
+        self.stats['reocr_regions'] += reocr['regions']
+        self.stats['improved_regions'] += reocr['improved']
+        return {
+            'text': text,
+            'words': words,
+            'confidence': float(np.mean(confidences)) / 100.0 if confidences else 0.0,
+            'reocr': reocr
+        }
+
+    def _scale_words(self, words: Dict[str, List[Any]], factor: float, offset: Tuple[int, int] = (0, 0)) -> Dict[str, List[Any]]:
+        scaled = {key: list(values) for key, values in words.items()}
+        for key, shift in (('left', offset[0]), ('top', offset[1]), ('width', 0), ('height', 0)):
+            if key in scaled:
+                scaled[key] = [int(round(v * factor)) + shift for v in scaled[key]]
+        return scaled
+
+    def _low_confidence_regions(self, words: Dict[str, List[Any]]) -> List[Box]:
+        """Merge low-confidence word boxes that sit on the same text line into regions."""
+        boxes = []
+        for idx, conf in enumerate(words['conf']):
+            if 0 <= conf < self.min_confidence:
+                left, top = words['left'][idx], words['top'][idx]
+                boxes.append((left, top, left + words['width'][idx], top + words['height'][idx]))
+        self.stats['low_confidence_words'] += len(boxes)
+
+        regions: List[List[int]] = []
+        for box in sorted(boxes, key=lambda b: (b[1], b[0])):
+            height = box[3] - box[1]
+            for region in regions:
+                overlap = min(region[3], box[3]) - max(region[1], box[1])
+                gap = max(box[0] - region[2], region[0] - box[2])
+                if overlap > 0.5 * min(height, region[3] - region[1]) and gap <= self.line_gap * height:
+                    region[:] = [min(region[0], box[0]), min(region[1], box[1]), max(region[2], box[2]), max(region[3], box[3])]
+                    break
+            else:
+                regions.append(list(box))
+        # Re-read the regions with the most area first; money boxes are wide
+        regions.sort(key=lambda r: (r[2] - r[0]) * (r[3] - r[1]), reverse=True)
+        return [tuple(region) for region in regions]
+
+    @staticmethod
+    def _separators(text: str, tokens: List[str]) -> Optional[List[str]]:
+        """
+        Whitespace of ``text`` before each word and after the last, or None
+        if the text is not exactly the words in order.
+        """
+        separators, position = [], 0
+        for token in tokens:
+            found = text.find(token, position)
+            if found < 0 or text[position:found].strip():
+                return None
+            separators.append(text[position:found])
+            position = found + len(token)
+        if text[position:].strip():
+            return None
+        separators.append(text[position:])
+        return separators
+
+    @staticmethod
+    def _join(words: Dict[str, List[Any]], separators: Optional[List[str]]) -> str:
+        """
+        Page text of the words: with the first pass's whitespace, or without it
+        one line per run of words whose boxes overlap vertically.
+        """
+        if separators is not None:
+            return "".join(sep + token for sep, token in zip(separators, words['text'])) + separators[-1]
+        lines: List[List[str]] = []
+        bottom = None
+        for idx, token in enumerate(words['text']):
+            top = words['top'][idx]
+            center = top + words['height'][idx] / 2.0
+            if bottom is None or center > bottom:
+                lines.append([])
+                bottom = top + words['height'][idx]
+            lines[-1].append(token)
+        return "\n".join(" ".join(line) for line in lines)
+
+    def _reocr_region(
+        self,
+        gray: np.ndarray,
+        region: Box,
+        words: Dict[str, List[Any]],
+        separators: Optional[List[str]]
+    ) -> Optional[Tuple[Dict[str, List[Any]], Optional[List[str]]]]:
+        """Re-OCR one region at full resolution; return the merged words and separators if it improved."""
+        left, top, right, bottom = region
+        pad = self.padding + (bottom - top) // 4
+        height, width = gray.shape[:2]
+        x1, y1 = max(0, left - pad), max(0, top - pad)
+        x2, y2 = min(width, right + pad), min(height, bottom + pad)
+        if x2 <= x1 or y2 <= y1:
+            return None
+
+        # Words of the first pass whose centers fall inside the region
+        inside = [
+            idx for idx in range(len(words['text']))
+            if left <= words['left'][idx] + words['width'][idx] / 2.0 <= right
+            and top <= words['top'][idx] + words['height'][idx] / 2.0 <= bottom
+        ]
+        if not inside or inside != list(range(inside[0], inside[-1] + 1)):
+            return None
+
+        crop = self.ocr_func(self.preprocess_func(gray[y1:y2, x1:x2]))
+        new_words = self._scale_words(crop['words'], 1.0, (x1, y1))
+        old_conf = np.mean([words['conf'][idx] for idx in inside])
+        new_conf = [conf for conf in new_words['conf'] if conf >= 0]
+        if not new_conf or np.mean(new_conf) <= old_conf:
+            return None
+
+        first, last = inside[0], inside[-1]
+        if separators is not None and any('\n' in sep for sep in separators[first + 1:last + 1]):
+            # The words span a line break in the page text; keep the first pass
+            return None
+
+        count = len(new_words['text'])
+        merged = {
+            key: values[:first] + list(new_words.get(key, [None] * count)) + values[last + 1:]
+            for key, values in words.items()
+        }
+        if separators is not None:
+            # The region keeps the whitespace around it; its new words are one line
+            separators = separators[:first + 1] + [" "] * (count - 1) + separators[last + 1:]
+        return merged, separators
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get adaptive OCR statistics."""
+        pages = self.stats['pages']
+        return {
+            **self.stats,
+            'low_dpi': self.low_dpi,
+            'min_confidence': self.min_confidence,
+            'reocr_rate': self.stats['reocr_pages'] / pages if pages else 0.0,
+            'regions_per_page': self.stats['reocr_regions'] / pages if pages else 0.0,
+            'low_confidence_rate': self.stats['low_confidence_words'] / self.stats['words'] if self.stats['words'] else 0.0
+        }
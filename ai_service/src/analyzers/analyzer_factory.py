@@ -1,47 +1,131 @@
-from typing import Dict, Any, Type
-from .w2_analyzer import W2Analyzer
-from .form1099_analyzer import Form1099Analyzer
+from typing import Dict, Any, Type, Union
+import importlib
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Packages can provide analyzers for more document types under this entry point group, e.g.
+# [project.entry-points."ai_service.analyzers"]
+# 1099-r = "my_package.analyzers:Form1099RAnalyzer"
+ENTRY_POINT_GROUP = "ai_service.analyzers"
+
+# "module:Class"; a module starting with "." is relative to this package
+_REFERENCE = re.compile(r'^\.?[\w.]+:\w+$')
 
 class AnalyzerFactory:
-    """Factory class for creating document analyzers."""
-    
-    _analyzers: Dict[str, Type] = {
-        'w2': W2Analyzer,
-        '1099': Form1099Analyzer
+    """
+    Factory class for creating document analyzers.
+
+    Analyzers are registered as classes or as ``"module:Class"`` references,
+    which are imported only when their document type is first requested, so
+    registering more analyzers costs nothing at startup. Analyzers compile
+    their patterns once and keep no per-request state, so each class is
+    instantiated once and the instance is shared by all callers and threads.
+    """
+
+    _analyzers: Dict[str, Union[Type, str]] = {
+        'w2': '.w2_analyzer:W2Analyzer',
+        '1099': '.form1099_analyzer:Form1099Analyzer'
     }
-    
+    # Shared instances by document type, and by class for types registered to the same analyzer
+    _by_type: Dict[str, Any] = {}
+    _instances: Dict[Type, Any] = {}
+    _entry_points_loaded = False
+    _lock = threading.RLock()
+
     @classmethod
     def get_analyzer(cls, doc_type: str) -> Any:
         """
         Get the appropriate analyzer for the document type.
-        
+
         Args:
             doc_type: Type of document to analyze
-            
+
         Returns:
-            Instance of the appropriate analyzer
-            
+            Shared instance of the appropriate analyzer
+
         Raises:
             ValueError: If document type is not supported
         """
-        analyzer_class = cls._analyzers.get(doc_type.lower())
-        if not analyzer_class:
-            raise ValueError(f"Unsupported document type: {doc_type}")
-        
-        return analyzer_class()
-    
+        key = doc_type.lower()
+        analyzer = cls._by_type.get(key)
+        if analyzer is not None:
+            return analyzer
+
+        with cls._lock:
+            analyzer = cls._by_type.get(key)
+            if analyzer is not None:
+                return analyzer
+            if key not in cls._analyzers:
+                cls._load_entry_points()
+            reference = cls._analyzers.get(key)
+            if reference is None:
+                raise ValueError(f"Unsupported document type: {doc_type}")
+
+            analyzer_class = cls._resolve(reference)
+            analyzer = cls._instances.get(analyzer_class)
+            if analyzer is None:
+                analyzer = analyzer_class()
+                cls._instances[analyzer_class] = analyzer
+            cls._by_type[key] = analyzer
+            return analyzer
+
     @classmethod
-    def register_analyzer(cls, doc_type: str, analyzer_class: Type) -> None:
+    def register_analyzer(cls, doc_type: str, analyzer_class: Union[Type, str]) -> None:
         """
         Register a new document analyzer.
-        
+
         Args:
             doc_type: Type of document the analyzer handles
-            analyzer_class: Class of the analyzer to register
+            analyzer_class: Class of the analyzer to register, or a
+                ``"module:Class"`` reference imported on first use
+
+        Raises:
+            TypeError: If ``analyzer_class`` is neither a class nor a reference
         """
-        cls._analyzers[doc_type.lower()] = analyzer_class
-    
+        if isinstance(analyzer_class, str):
+            if not _REFERENCE.match(analyzer_class):
+                raise TypeError(f"Analyzer reference must look like 'module:Class', got {analyzer_class!r}")
+        elif not isinstance(analyzer_class, type):
+            raise TypeError(f"Analyzer must be a class, got {type(analyzer_class).__name__}")
+
+        key = doc_type.lower()
+        with cls._lock:
+            cls._analyzers[key] = analyzer_class
+            cls._by_type.pop(key, None)
+
     @classmethod
     def get_supported_types(cls) -> list:
         """Get list of supported document types."""
-        return list(cls._analyzers.keys()) 
\ No newline at end of file
+        with cls._lock:
+            cls._load_entry_points()
+            return list(cls._analyzers.keys())
+
+    @classmethod
+    def _resolve(cls, reference: Union[Type, str]) -> Type:
+        """Import the class behind a ``"module:Class"`` reference."""
+        if not isinstance(reference, str):
+            return reference
+        module_name, _, class_name = reference.partition(':')
+        module = importlib.import_module(module_name, package=__package__)
+        return getattr(module, class_name)
+
+    @classmethod
+    def _load_entry_points(cls) -> None:
+        """Add analyzers advertised by installed packages; explicit registrations take precedence."""
+        if cls._entry_points_loaded:
+            return
+        cls._entry_points_loaded = True
+        try:
+            from importlib.metadata import entry_points
+            discovered = entry_points(group=ENTRY_POINT_GROUP)
+        except Exception as e:
+            logger.warning(f"Could not read analyzer entry points: {str(e)}")
+            return
+        for entry_point in discovered:
+            if _REFERENCE.match(entry_point.value):
+                cls._analyzers.setdefault(entry_point.name.lower(), entry_point.value)
+            else:
+                logger.warning(f"Ignoring analyzer entry point {entry_point.name}: {entry_point.value!r}")
@@ -0,0 +1,448 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import date
+import re
+import logging
+import numpy as np
+from ..parsed_document import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# One row per sold lot; descriptions and CUSIPs are stored once per security
+LOT_DTYPE = np.dtype([
+    ('security', np.int32),
+    ('quantity', np.float64),
+    ('date_acquired', 'datetime64[D]'),
+    ('date_sold', 'datetime64[D]'),
+    ('proceeds', np.float64),
+    ('cost_basis', np.float64),
+    ('market_discount', np.float64),
+    ('wash_sale_disallowed', np.float64),
+    ('gain', np.float64),
+    ('term', np.int8),
+    ('covered', np.int8),
+    ('page', np.int32),
+])
+TERMS = ('unknown', 'short_term', 'long_term')
+COVERED = ('unknown', 'covered', 'noncovered')
+AMOUNTS = ('proceeds', 'cost_basis', 'market_discount', 'wash_sale_disallowed', 'gain')
+# Net capital losses deductible against other income each year; the rest carries forward
+CAPITAL_LOSS_LIMIT = 3000.0
+
+_DATE = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})$')
+_NUMBER = re.compile(r'^(\()?(-)?\$?((?:\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d+))?|\.\d+)(\))?(-)?$')
+_PLACEHOLDERS = frozenset(('...', '--', '-'))
+_CUSIP = re.compile(r'(?:^|\s)(?:CUSIP(?: number)?[:#]?\s*)?([0-9]{3}[0-9A-Z]{5}[0-9])(?=\s|$)', re.IGNORECASE)
+_SECURITY = re.compile(r'^(?P<description>.*?)[\s/,]*CUSIP(?: number)?[:#]?\s*(?P<cusip>[0-9]{3}[0-9A-Z]{5}[0-9])\b', re.IGNORECASE)
+_TERM = re.compile(r'\b(short|long)[- ]term\b', re.IGNORECASE)
+_FORM_8949_BOX = re.compile(r'\bBox ([ABDE])\b')
+_BOXES = {'A': (1, 1), 'B': (1, 2), 'D': (2, 1), 'E': (2, 2)}
+_NAT = np.datetime64('NaT', 'D')
+
+def _date(token: str) -> Optional[date]:
+    match = _DATE.match(token)
+    if match is None:
+        return None
+    month, day, year = (int(part) for part in match.groups())
+    if year < 100:
+        year += 2000 if year < 70 else 1900
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+def _number(token: str) -> Optional[Tuple[float, bool]]:
+    """Value of a numeric token and whether it is written as money (two decimals, sign or parentheses)."""
+    if token in _PLACEHOLDERS:
+        return 0.0, True
+    match = _NUMBER.match(token)
+    if match is None:
+        return None
+    opening, minus, digits, decimals, closing, trailing_minus = match.groups()
+    if (opening is None) != (closing is None):
+        return None
+    value = float(digits.replace(',', ''))
+    negative = bool(opening or minus or trailing_minus)
+    money = negative or (decimals is not None and len(decimals) == 2)
+    return (-value if negative else value), money
+
+def _token(token: str) -> Optional[Tuple[str, Any]]:
+    """Kind and value of a token of a row's values: date, various, number, blank (placeholder) or code; None otherwise."""
+    if token[0].isdigit():
+        if '/' in token:
+            parsed = _date(token)
+            return None if parsed is None else ('date', parsed)
+    elif token in _PLACEHOLDERS:
+        return 'blank', (0.0, True)
+    elif len(token) == 1:
+        return ('code', token.upper()) if token.isalpha() else None
+    elif token.lower() == 'various':
+        return 'various', None
+    elif token[0] not in '(-.$':
+        return None
+    number = _number(token)
+    return None if number is None else ('number', number)
+
+def _held_over_a_year(acquired: date, sold: date) -> bool:
+    try:
+        anniversary = acquired.replace(year=acquired.year + 1)
+    except ValueError:
+        # Acquired on February 29
+        anniversary = date(acquired.year + 1, 3, 1)
+    return sold > anniversary
+
+class BrokerageStatement:
+    """
+    Transactions of one 1099-B or composite brokerage statement, parsed a page at a time.
+
+    Rows go into a fixed-size columnar buffer (``LOT_DTYPE``); when it is
+    full it is handed back to the caller as one chunk and reused, and the
+    totals by holding period and basis reporting are updated from the whole
+    chunk. Memory therefore depends on the chunk size and the number of
+    distinct securities, not on the length of the statement. The section
+    (short/long term, covered/noncovered) and the security a row belongs to
+    carry over from earlier lines and pages.
+    """
+    def __init__(self, chunk_rows: int = 4096, keep_lots: int = 500):
+        """
+        Args:
+            chunk_rows: Lots buffered before a chunk is emitted
+            keep_lots: Lots kept as ``lot_details`` for the summary
+        """
+        self.chunk_rows = chunk_rows
+        self.keep_lots = keep_lots
+        self.securities: List[Tuple[str, Optional[str]]] = []
+        self._security_index: Dict[Tuple[str, Optional[str]], int] = {}
+        self._buffer = np.zeros(chunk_rows, dtype=LOT_DTYPE)
+        self._size = 0
+        self._kept: List[np.ndarray] = []
+        self._kept_rows = 0
+        categories = len(TERMS) * len(COVERED)
+        self._counts = np.zeros(categories, dtype=np.int64)
+        self._sums = {name: np.zeros(categories) for name in AMOUNTS}
+        self.lots = 0
+        self.pages = 0
+        self.unparsed_rows = 0
+        self.unreconciled_lots = 0
+        self._term = 0
+        self._covered = 0
+        self._security = -1
+
+    def feed(self, page: str) -> List[np.ndarray]:
+        """
+        Parse one page.
+
+        Returns:
+            The chunks of lots completed by this page (usually none)
+        """
+        chunks = []
+        for line in normalize_text(page).split('\n'):
+            if line and self._parse_line(line) and self._size == self.chunk_rows:
+                chunks.append(self._flush())
+        self.pages += 1
+        return chunks
+
+    def close(self) -> List[np.ndarray]:
+        """Emit the lots still buffered."""
+        return [self._flush()] if self._size else []
+
+    def _parse_line(self, line: str) -> bool:
+        """Read a section heading, a security heading or a lot; True if a lot was added."""
+        tokens = line.split(' ')
+        # The row's values are the longest run of dates, numbers and codes at the end of the line
+        values = []
+        start = len(tokens)
+        while start > 0:
+            value = _token(tokens[start - 1])
+            if value is None:
+                break
+            values.append(value)
+            start -= 1
+        values.reverse()
+        # Codes and placeholders cannot start the values; they end the description
+        skip = 0
+        while skip < len(values) and values[skip][0] in ('code', 'blank'):
+            skip += 1
+        dates = [i for i, (kind, _) in enumerate(values) if kind in ('date', 'various') and i >= skip]
+        if len(dates) < 2:
+            if self._looks_like_row(tokens):
+                self.unparsed_rows += 1
+            else:
+                self._parse_heading(line)
+            return False
+        # A date in the description (e.g. a bond's maturity) belongs to it, but a
+        # quantity printed before the dates has decimals (10.000), unlike a number ending a description
+        first = dates[-2]
+        if first > skip and values[first - 1][0] == 'number' and '.' in tokens[start + first - 1]:
+            first -= 1
+        if not self._add_lot(' '.join(tokens[:start + first]), values[first:]):
+            self.unparsed_rows += 1
+            return False
+        return True
+
+    @staticmethod
+    def _looks_like_row(tokens: List[str]) -> bool:
+        """Whether a line that is not a lot has a date and amounts, like a row OCR garbled."""
+        kinds = [value[0] for value in map(_token, tokens) if value is not None]
+        return 'date' in kinds and kinds.count('number') >= 2
+
+    def _parse_heading(self, line: str) -> None:
+        box = _FORM_8949_BOX.search(line)
+        if box is not None:
+            self._term, self._covered = _BOXES[box.group(1)]
+        else:
+            term = _TERM.search(line)
+            if term is not None:
+                self._term = 1 if term.group(1).lower() == 'short' else 2
+                lowered = line.lower()
+                if 'noncovered' in lowered or 'not covered' in lowered or 'non-covered' in lowered:
+                    self._covered = 2
+                elif 'covered' in lowered:
+                    self._covered = 1
+                else:
+                    self._covered = 0
+        security = _SECURITY.match(line)
+        if security is not None:
+            self._security = self._intern(security.group('description').strip(' /,'), security.group('cusip').upper())
+
+    def _intern(self, description: str, cusip: Optional[str]) -> int:
+        key = (description, cusip)
+        index = self._security_index.get(key)
+        if index is None:
+            index = len(self.securities)
+            self.securities.append(key)
+            self._security_index[key] = index
+        return index
+
+    def _add_lot(self, prefix: str, values: List[Tuple[str, Any]]) -> bool:
+        """Add the lot of a row from its description prefix and classified values, False if they do not form one."""
+        dates, numbers, wash_marked = [], [], None
+        for kind, value in values:
+            if kind == 'date' or kind == 'various':
+                dates.append(value)
+            elif kind == 'code':
+                if value == 'W' and numbers:
+                    # Amount flagged as a disallowed wash sale loss
+                    wash_marked = len(numbers) - 1
+            else:
+                numbers.append(value)
+        if len(dates) != 2 or len(numbers) < 3 or dates == [None, None]:
+            return False
+
+        layout = self._layout(numbers, wash_marked)
+        if layout is None:
+            return False
+        quantity, proceeds, basis, discount, wash, gain, reconciled = layout
+        if not reconciled:
+            self.unreconciled_lots += 1
+
+        known = [d for d in dates if d is not None]
+        acquired = min(known) if len(known) == 2 else None
+        sold = max(known)
+        term = self._term
+        if term == 0 and acquired is not None:
+            term = 2 if _held_over_a_year(acquired, sold) else 1
+
+        security = self._security
+        if prefix:
+            cusip = _CUSIP.search(prefix)
+            description = prefix[:cusip.start()] if cusip else prefix
+            security = self._intern(description.strip(' /,'), cusip.group(1).upper() if cusip else None)
+        elif security < 0:
+            security = self._intern('', None)
+
+        self._buffer[self._size] = (
+            security, np.nan if quantity is None else quantity,
+            _NAT if acquired is None else np.datetime64(acquired, 'D'), np.datetime64(sold, 'D'),
+            proceeds, basis, discount, wash, gain, term, self._covered, self.pages
+        )
+        self._size += 1
+        return True
+
+    @staticmethod
+    def _layout(numbers: List[Tuple[float, bool]], wash_marked: Optional[int]) -> Optional[Tuple]:
+        """
+        Assign a row's numbers to quantity, proceeds, basis, adjustments and gain.
+
+        Brokers differ in whether they print the quantity and which
+        adjustment columns they show, so the layouts are tried in turn and the
+        first whose gain is proceeds less basis (with or without the
+        adjustments) wins. Without one, the quantity is assumed present when
+        the first number is not written as money.
+        """
+        values = [value for value, _ in numbers]
+        candidates = []
+        for offset in (1, 0):
+            if offset and numbers[0][0] < 0:
+                continue
+            rest = values[offset:]
+            if len(rest) < 3 or len(rest) > 5:
+                continue
+            proceeds, basis, adjustments, gain = rest[0], rest[1], rest[2:-1], rest[-1]
+            if len(adjustments) == 2:
+                discount, wash = adjustments
+            elif adjustments and wash_marked is not None and wash_marked != offset + 2:
+                discount, wash = adjustments[0], 0.0
+            else:
+                discount, wash = 0.0, (adjustments[0] if adjustments else 0.0)
+            quantity = values[0] if offset else None
+            reconciled = min(abs(gain - (proceeds - basis + discount + wash)), abs(gain - (proceeds - basis))) < 0.011
+            candidates.append((quantity, proceeds, basis, discount, wash, gain, reconciled))
+        for candidate in candidates:
+            if candidate[-1]:
+                return candidate
+        if not candidates:
+            return None
+        first_is_money = numbers[0][1]
+        return candidates[-1] if first_is_money and len(candidates) > 1 else candidates[0]
+
+    def _flush(self) -> np.ndarray:
+        """Take the buffered lots as a chunk and add them to the totals."""
+        chunk = self._buffer[:self._size].copy()
+        self._size = 0
+        category = chunk['term'].astype(np.int64) * len(COVERED) + chunk['covered']
+        size = len(self._counts)
+        self._counts += np.bincount(category, minlength=size)
+        for name in AMOUNTS:
+            self._sums[name] += np.bincount(category, weights=chunk[name], minlength=size)
+        self.lots += len(chunk)
+        if self._kept_rows < self.keep_lots:
+            kept = chunk[:self.keep_lots - self._kept_rows]
+            self._kept.append(kept)
+            self._kept_rows += len(kept)
+        return chunk
+
+    def records(self, chunk: np.ndarray) -> List[Dict[str, Any]]:
+        """Lots of a chunk as dicts, with their security's description and CUSIP."""
+        records = []
+        for row in chunk.tolist():
+            security, quantity, acquired, sold, proceeds, basis, discount, wash, gain, term, covered, page = row
+            description, cusip = self.securities[security]
+            records.append({
+                'description': description,
+                'cusip': cusip,
+                'quantity': None if quantity != quantity else quantity,
+                'date_acquired': acquired.isoformat() if acquired is not None else 'VARIOUS',
+                'date_sold': sold.isoformat(),
+                'proceeds': proceeds,
+                'cost_basis': basis,
+                'market_discount': discount,
+                'wash_sale_disallowed': wash,
+                'gain': gain,
+                'term': TERMS[term],
+                'covered': COVERED[covered],
+                'page': page + 1
+            })
+        return records
+
+    @property
+    def totals(self) -> Dict[str, float]:
+        """Totals of the lots emitted so far."""
+        totals = {name: round(float(self._sums[name].sum()), 2) for name in AMOUNTS}
+        gains = self._sums['gain'].reshape(len(TERMS), len(COVERED)).sum(axis=1)
+        for term, gain in zip(TERMS, gains):
+            totals[f'{term}_gain'] = round(float(gain), 2)
+        return totals
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts, totals, totals by holding period and basis reporting, and the kept lots."""
+        categories = {}
+        for index in np.flatnonzero(self._counts):
+            term, covered = divmod(int(index), len(COVERED))
+            entry = {'lots': int(self._counts[index])}
+            entry.update({name: round(float(self._sums[name][index]), 2) for name in AMOUNTS})
+            categories[f'{TERMS[term]}_{COVERED[covered]}'] = entry
+        return {
+            'lots': self.lots,
+            'pages': self.pages,
+            'securities': len(self.securities),
+            'unparsed_rows': self.unparsed_rows,
+            'unreconciled_lots': self.unreconciled_lots,
+            'totals': self.totals,
+            'by_category': categories,
+            'lot_details': [record for chunk in self._kept for record in self.records(chunk)]
+        }
+
+class BrokerageStatementParser:
+    """
+    Streaming parser of 1099-B transaction tables.
+
+    Composite brokerage statements list hundreds to thousands of sold lots
+    over dozens of pages, one row per lot: description and CUSIP (often on a
+    heading line above the security's lots), dates acquired and sold,
+    quantity, proceeds, cost basis, accrued market discount, wash sale loss
+    disallowed and gain or loss, under section headings giving the holding
+    period and whether the basis was reported to the IRS. Pages are parsed
+    one at a time into ``BrokerageStatement`` chunks.
+    """
+    def __init__(self, chunk_rows: int = 4096, keep_lots: int = 500):
+        """
+        Args:
+            chunk_rows: Lots buffered before a chunk is emitted
+            keep_lots: Lots kept as ``lot_details`` for the summary
+        """
+        self.chunk_rows = chunk_rows
+        self.keep_lots = keep_lots
+
+    def stream(self) -> BrokerageStatement:
+        """A statement to ``feed`` pages to."""
+        return BrokerageStatement(self.chunk_rows, self.keep_lots)
+
+    def iter_lots(self, pages: Iterable[str], statement: Optional[BrokerageStatement] = None) -> Iterator[np.ndarray]:
+        """
+        Chunks of lots of a statement, reading ``pages`` only as far as needed.
+
+        Args:
+            pages: Text of each page, e.g. as OCR produces them
+            statement: Statement to parse into (default: a new one); its
+                ``summary`` has the totals once the chunks are consumed
+        """
+        statement = statement or self.stream()
+        for page in pages:
+            yield from statement.feed(page)
+        yield from statement.close()
+
+    def parse(self, pages: Iterable[str]) -> BrokerageStatement:
+        """Parse a whole statement, keeping only its totals and ``keep_lots`` lots."""
+        statement = self.stream()
+        for _ in self.iter_lots(pages, statement):
+            pass
+        return statement
+
+def tax_efficiency_score(totals: Dict[str, float], ordinary_dividends: float = 0.0, qualified_dividends: float = 0.0) -> float:
+    """
+    Share of positive investment income taxed at long-term capital gains
+    rates (long-term gains and qualified dividends); 1.0 without any.
+
+    Args:
+        totals: ``short_term_gain``, ``long_term_gain`` and optionally ``unknown_gain``
+        ordinary_dividends: Ordinary dividends, including the qualified ones
+        qualified_dividends: Qualified dividends
+    """
+    preferential = max(totals['long_term_gain'], 0.0) + qualified_dividends
+    income = max(totals['short_term_gain'], 0.0) + max(totals['long_term_gain'], 0.0) + max(totals.get('unknown_gain', 0.0), 0.0) + ordinary_dividends
+    return round(preferential / income, 4) if income > 0 else 1.0
+
+def investment_fields(
+    summary: Dict[str, Any],
+    ordinary_dividends: float = 0.0,
+    qualified_dividends: float = 0.0
+) -> Dict[str, Any]:
+    """
+    ``InvestmentCalculation`` fields of a parsed statement.
+
+    See ``tax_efficiency_score`` for the score. The loss carryforward is the
+    net capital loss beyond ``CAPITAL_LOSS_LIMIT``.
+    """
+    totals = summary['totals']
+    return {
+        'cost_basis': totals['cost_basis'],
+        'current_value': totals['proceeds'],
+        'realized_gains': totals['gain'],
+        'unrealized_gains': 0.0,
+        'qualified_dividends': qualified_dividends,
+        'ordinary_dividends': ordinary_dividends,
+        'tax_efficiency_score': tax_efficiency_score(totals, ordinary_dividends, qualified_dividends),
+        'wash_sale_adjustments': totals['wash_sale_disallowed'],
+        'tax_lot_details': summary['lot_details'],
+        'tax_loss_carryforward': round(max(-totals['gain'] - CAPITAL_LOSS_LIMIT, 0.0), 2)
+    }
@@ -0,0 +1,196 @@
+from typing import Dict, Iterable, List, Optional, Pattern, Sequence, Tuple
+import re
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Characters that end the literal prefix of a pattern
+_METACHARS = set('.^$*+?{}[]|()')
+_QUANTIFIERS = set('*+?{')
+
+def _literal_prefix(pattern: str) -> str:
+    """The literal text every match of ``pattern`` starts with (``Box 12`` for ``Box 12\\s*...``)."""
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                # Character class or backreference (\s, \d, \1, ...)
+                break
+            char = pattern[i + 1]
+            i += 2
+        elif char in _METACHARS:
+            break
+        else:
+            i += 1
+        if i < len(pattern) and pattern[i] in _QUANTIFIERS:
+            # The last character is optional or repeated
+            break
+        prefix.append(char)
+    return ''.join(prefix)
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """
+    Regex matching any of ``words``, as a prefix tree so each position is
+    checked one character at a time instead of once per word. Where one word
+    extends another, the longer one is preferred.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        end = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            # The word may also stop here; the longer continuation is tried first
+            return '(?:' + body + ')?' if len(branches) == 1 else body + '?'
+        return body
+
+    return build(trie)
+
+class FieldScanner:
+    """
+    Extracts all fields of a form in one pass over the OCR text.
+
+    Field patterns start with a literal label (``Box 12``, ``EIN:``). The
+    labels are compiled once into a single prefix-tree regex that walks the
+    text; only where a label occurs are the candidate field patterns, each
+    also compiled once, tried at that position. Candidates are tried longest
+    label first (``Box 12`` before ``Box 1``), and a position is read as the
+    longest label whose pattern matches there, so ``Box 12a D 500`` does not
+    give Box 1 the value ``2``. A shorter-label field that also matches there
+    only falls back to that reading if its own label never matches: OCR often
+    runs a label into its amount (``Box 112,000.00`` is usually Box 1), and a
+    separate ``re.search`` per pattern found those. The next match may start
+    inside the previous one, so fields on the same line as a free-text value
+    are still found. Each field keeps its first match, except ``repeated``
+    fields, which collect every match (e.g. the Box 12 code/amount pairs).
+    """
+    def __init__(self, patterns: Dict[str, str], repeated: Iterable[str] = (), flags: int = re.IGNORECASE):
+        """
+        Args:
+            patterns: Regex per field, starting with a literal label and
+                with at least one capture group
+            repeated: Fields for which all matches are collected
+            flags: Regex flags applied to all patterns
+
+        Raises:
+            ValueError: If a pattern has no literal label or no capture group
+        """
+        self.fields = list(patterns)
+        self.repeated = frozenset(repeated)
+        self._fold = str.lower if flags & re.IGNORECASE else (lambda s: s)
+
+        compiled: Dict[str, Pattern] = {}
+        labels: Dict[str, str] = {}
+        for field, pattern in patterns.items():
+            compiled[field] = re.compile(pattern, flags)
+            labels[field] = self._fold(_literal_prefix(pattern))
+            if not labels[field]:
+                raise ValueError(f"Pattern for {field} does not start with a literal label")
+            if compiled[field].groups < 1:
+                raise ValueError(f"Pattern for {field} has no capture group")
+
+        # For each label the scanner can stop at, the patterns to try there (with their
+        # label lengths): those whose label is a prefix of it, longest label first, then in declared order
+        self._candidates: Dict[str, List[Tuple[str, int, Pattern]]] = {}
+        for label in set(labels.values()):
+            fields = [f for f in self.fields if label.startswith(labels[f])]
+            fields.sort(key=lambda f: -len(labels[f]))
+            self._candidates[label] = [(f, len(labels[f]), compiled[f]) for f in fields]
+        self.regex = re.compile(_trie_regex(self._candidates), flags)
+        # Case-insensitive matching is several times slower in ``re``; when lowercasing
+        # keeps offsets (e.g. ASCII text), labels are found in a lowercased copy
+        self._folded_regex = re.compile(self.regex.pattern) if flags & re.IGNORECASE else None
+
+    def scan(self, text: str, lowered: Optional[str] = None) -> Dict[str, List[Tuple[str, ...]]]:
+        """
+        Find all fields in ``text``.
+
+        Args:
+            text: OCR text of a form
+            lowered: ``text.lower()``, if the caller already has it
+
+        Returns:
+            Captured groups per field, in text order; a list with a single
+            entry for non-repeated fields. Fields without a match are omitted.
+        """
+        found: Dict[str, List[Tuple[str, ...]]] = {}
+        # First matches of fields at positions read as a longer label, used if the field has no other
+        fallback: Dict[str, List[Tuple[str, ...]]] = {}
+        # Once every single-valued field is found, only repeated ones are left to look for
+        remaining = len(self.fields) - len(self.repeated)
+        search, haystack = self.regex.search, text
+        if self._folded_regex is not None:
+            lowered = text.lower() if lowered is None else lowered
+            # Each character lowercases to at least one, so equal lengths mean equal offsets
+            if len(lowered) == len(text):
+                search, haystack = self._folded_regex.search, lowered
+        fold = self._fold
+        pos = 0
+        while remaining or self.repeated:
+            label = search(haystack, pos)
+            if label is None:
+                break
+            start = label.start()
+            # Length of the label this position is read as, once a pattern has matched
+            read_as = None
+            for field, length, pattern in self._candidates[fold(label.group())]:
+                single = field not in self.repeated
+                if read_as is not None and length < read_as:
+                    if single and field not in found and field not in fallback:
+                        match = pattern.match(text, start)
+                        if match is not None:
+                            fallback[field] = [match.groups()]
+                    continue
+                if single and field in found and read_as is not None:
+                    continue
+                match = pattern.match(text, start)
+                if match is None:
+                    continue
+                read_as = length
+                if not single:
+                    found.setdefault(field, []).append(match.groups())
+                elif field not in found:
+                    found[field] = [match.groups()]
+                    remaining -= 1
+            pos = start + 1
+        for field, groups in fallback.items():
+            found.setdefault(field, groups)
+        return found
+
+def first_values(scans: Sequence[Dict[str, List[Tuple[str, ...]]]], field: str) -> np.ndarray:
+    """First captured value of ``field`` in each of a batch of scans, None where it was not found."""
+    values = np.empty(len(scans), dtype=object)
+    values[:] = [found[field][0][0] if field in found else None for found in scans]
+    return values
+
+def _amount(value: str) -> float:
+    try:
+        return float(value.replace(',', ''))
+    except ValueError:
+        return 0.0
+
+def parse_amounts(values: np.ndarray) -> np.ndarray:
+    """
+    Parse a column of extracted amounts (``1,250.00``) to floats.
+
+    Missing values (None) become NaN; values that do not parse become 0.0,
+    as in the analyzers' ``_parse_amount``.
+    """
+    # float() on each value is faster than NumPy's conversion of a string array
+    return np.array([np.nan if value is None else _amount(value) for value in values], dtype=np.float64)
+
+def mismatches(values: np.ndarray, pattern: str) -> np.ndarray:
+    """True where a value was found but does not match ``pattern``."""
+    regex = re.compile(pattern)
+    return np.array([value is not None and regex.match(value) is None for value in values], dtype=bool)
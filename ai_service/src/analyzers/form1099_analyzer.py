@@ -1,13 +1,37 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Sequence, Union
 import re
 import logging
 from datetime import datetime
+from types import MappingProxyType
+import numpy as np
+from .brokerage_statement import BrokerageStatementParser, CAPITAL_LOSS_LIMIT, investment_fields
+from .field_scanner import FieldScanner, first_values, mismatches, parse_amounts
+from ..parsed_document import ParsedDocument, normalized_texts
+from ..tax_engine import get_tax_engine
 
 logger = logging.getLogger(__name__)
 
 class Form1099Analyzer:
+    INCOME_FIELDS = ('nonemployee_compensation', 'state_income', 'local_income')
+    # Income on the federal return: the state and local boxes report the same income again,
+    # and qualified dividends are part of the ordinary dividends
+    FEDERAL_INCOME_FIELDS = ('nonemployee_compensation', 'ordinary_dividends')
+    TAX_FIELDS = ('federal_tax_withheld', 'state_tax_withheld', 'local_tax_withheld')
+    # Forms reporting non-employee compensation, subject to self-employment tax
+    SELF_EMPLOYMENT_FORMS = ('1099-MISC', '1099-NEC')
+    # Totals of the 1099-B transactions, from the statement's totals
+    TRANSACTION_TOTALS = MappingProxyType({
+        'total_proceeds': 'proceeds',
+        'total_cost_basis': 'cost_basis',
+        'total_wash_sale_disallowed': 'wash_sale_disallowed',
+        'short_term_gain': 'short_term_gain',
+        'long_term_gain': 'long_term_gain',
+        'realized_gains': 'gain'
+    })
+
     def __init__(self):
-        self.field_patterns = {
+        self.field_patterns = MappingProxyType({
+            'tax_year': r'Form 1099-[A-Z]+[^\d\n]*((?:19|20)\d{2})',
             'payer_name': r'Payer\'s name\s*([^\n]+)',
             'payer_tin': r'Payer\'s TIN\s*(\d{2}-\d{7})',
             'payer_address': r'Payer\'s address\s*([^\n]+)',
@@ -22,10 +46,17 @@ class Form1099Analyzer:
             'state_income': r'State income\s*\$?([\d,]+\.?\d*)',
             'local_tax_withheld': r'Box 18\s*\$?([\d,]+\.?\d*)',
             'local': r'Local:\s*([^\n]+)',
-            'local_income': r'Local income\s*\$?([\d,]+\.?\d*)'
-        }
+            'local_income': r'Local income\s*\$?([\d,]+\.?\d*)',
+            'ordinary_dividends': r'1a\W*Total ordinary dividends\s*\$?([\d,]+\.?\d*)',
+            'qualified_dividends': r'1b\W*Qualified dividends\s*\$?([\d,]+\.?\d*)'
+        })
+        # All patterns in one pass over the text
+        self.field_scanner = FieldScanner(self.field_patterns)
+        self.tax_engine = get_tax_engine()
+        # 1099-B and composite statements: transaction tables, a page at a time
+        self.statement_parser = BrokerageStatementParser()
         
-        self.form_types = {
+        self.form_types = MappingProxyType({
             '1099-MISC': 'Miscellaneous Income',
             '1099-NEC': 'Non-Employee Compensation',
             '1099-INT': 'Interest Income',
@@ -35,37 +66,45 @@ class Form1099Analyzer:
             '1099-R': 'Distributions from Pensions, Annuities, etc.',
             '1099-S': 'Proceeds from Real Estate Transactions',
             '1099-K': 'Payment Card and Third Party Network Transactions'
-        }
+        })
 
-    def analyze(self, text: str, image: Any = None) -> Dict[str, Any]:
+    def analyze(self, text: Union[str, ParsedDocument], image: Any = None) -> Dict[str, Any]:
         """
         Analyze 1099 form text and extract relevant information.
         
         Args:
-            text: OCR extracted text from 1099 form
+            text: OCR extracted text from 1099 form, or the form already parsed
+                by ``DocumentProcessor``
             image: Optional image data for additional analysis
             
         Returns:
             Dictionary containing extracted 1099 information
         """
         try:
+            document = ParsedDocument.of(text)
+            
             # Determine form type
-            form_type = self._determine_form_type(text)
+            form_type = self._determine_form_type(document)
             
             # Extract basic information
-            extracted_data = self._extract_fields(text)
+            extracted_data = self._extract_fields(document)
             extracted_data['form_type'] = form_type
             
+            # Parse 1099-B transactions
+            transactions = None
+            if self._has_transactions(document.lower):
+                transactions = self.statement_parser.parse(document.page_texts()).summary()
+            
             # Validate extracted data
-            validation_results = self._validate_data(extracted_data)
+            validation_results = self._validate_data(extracted_data, transactions)
             
             # Calculate totals
-            totals = self._calculate_totals(extracted_data)
+            totals = self._calculate_totals(extracted_data, transactions)
             
             # Generate insights
             insights = self._generate_insights(extracted_data, totals)
             
-            return {
+            result = {
                 'success': True,
                 'type': '1099',
                 'form_type': form_type,
@@ -74,6 +113,11 @@ class Form1099Analyzer:
                 'totals': totals,
                 'insights': insights
             }
+            if transactions is not None:
+                dividends = {field: self._parse_amount(extracted_data.get(field)) for field in ('ordinary_dividends', 'qualified_dividends')}
+                result['transactions'] = transactions
+                result['investment_calculations'] = investment_fields(transactions, **dividends)
+            return result
             
         except Exception as e:
             logger.error(f"Error analyzing 1099: {str(e)}")
@@ -82,26 +126,108 @@ class Form1099Analyzer:
                 'error': str(e)
             }
     
-    def _determine_form_type(self, text: str) -> str:
+    def analyze_batch(self, texts: Sequence[Union[str, ParsedDocument]]) -> Dict[str, np.ndarray]:
+        """
+        Analyze many 1099 forms at once, returning columns instead of one dict per form.
+        
+        Fields are extracted form by form with the compiled scanner; validation,
+        totals and insights are computed on whole columns.
+        
+        Args:
+            texts: OCR extracted text of each 1099 form, or forms already parsed
+                by ``DocumentProcessor``
+            
+        Returns:
+            Arrays with one entry per form, named after the ``analyze`` result:
+            ``form_type``, ``data.<field>`` (extracted text, None if not found),
+            ``validation.is_valid`` and one ``validation.<check>`` flag per
+            error or warning, ``totals.<total>`` and ``insights.<insight>``
+        """
+        normalized, lowered = normalized_texts(texts)
+        scans = [self.field_scanner.scan(text, lower) for text, lower in zip(normalized, lowered)]
+        form_types = np.array([self._first_form_type(lower) for lower in lowered], dtype=object)
+        columns = {'form_type': form_types}
+        for field in self.field_patterns:
+            columns[f'data.{field}'] = first_values(scans, field)
+
+        present = {field[5:]: columns[field] != None for field in columns if field.startswith('data.')}  # noqa: E711
+        amounts = {field: parse_amounts(columns[f'data.{field}']) for field in self.INCOME_FIELDS + self.TAX_FIELDS}
+        self_employment_form = np.isin(form_types, self.SELF_EMPLOYMENT_FORMS)
+
+        # Validation: the flags are the errors and warnings of ``_validate_data``
+        columns['validation.missing_payer_tin'] = ~present['payer_tin']
+        columns['validation.missing_recipient_tin'] = ~present['recipient_tin']
+        columns['validation.missing_nonemployee_compensation'] = self_employment_form & ~present['nonemployee_compensation']
+        columns['validation.invalid_recipient_tin'] = mismatches(columns['data.recipient_tin'], r'^\d{3}-\d{2}-\d{4}$')
+        columns['validation.invalid_payer_tin'] = mismatches(columns['data.payer_tin'], r'^\d{2}-\d{7}$')
+        columns['validation.is_valid'] = ~np.logical_or.reduce([
+            columns[f'validation.{check}'] for check in (
+                'missing_payer_tin', 'missing_recipient_tin', 'missing_nonemployee_compensation',
+                'invalid_recipient_tin', 'invalid_payer_tin'
+            )
+        ])
+        # NaN (field not found) compares False
+        compensation = amounts['nonemployee_compensation']
+        columns['validation.federal_tax_withheld_unusually_high'] = amounts['federal_tax_withheld'] > compensation * 0.37
+
+        # Totals
+        columns['totals.total_income'] = np.nansum([amounts[field] for field in self.INCOME_FIELDS], axis=0)
+        columns['totals.total_taxes_withheld'] = np.nansum([amounts[field] for field in self.TAX_FIELDS], axis=0)
+
+        # Insights
+        self_employment = self_employment_form & (compensation > 0)
+        columns['insights.self_employment'] = self_employment
+        years = {year: self.tax_engine.nearest_year(int(year) if year else None) for year in set(columns['data.tax_year'])}
+        se_tax = self.tax_engine.self_employment_tax(
+            np.where(self_employment, compensation, 0.0),
+            np.array([years[year] for year in columns['data.tax_year']], dtype=np.int64)
+        )
+        columns['insights.self_employment_tax'] = np.where(self_employment, se_tax, 0.0)
+        columns['insights.state_tax'] = present['state'] & (amounts['state_income'] > 0)
+
+        # 1099-B transactions
+        statements = {
+            i: self.statement_parser.parse([text])
+            for i, (text, lower) in enumerate(zip(normalized, lowered)) if self._has_transactions(lower)
+        }
+        for name, total in self.TRANSACTION_TOTALS.items():
+            column = np.full(len(lowered), np.nan)
+            for i, statement in statements.items():
+                column[i] = statement.totals[total]
+            columns[f'totals.{name}'] = column
+        for check, count in (('unparsed_transaction_rows', 'unparsed_rows'), ('unreconciled_transactions', 'unreconciled_lots')):
+            columns[f'validation.{check}'] = np.array([i in statements and getattr(statements[i], count) > 0 for i in range(len(lowered))], dtype=bool)
+        columns['insights.wash_sales'] = columns['totals.total_wash_sale_disallowed'] > 0
+        columns['insights.capital_loss_carryforward'] = columns['totals.realized_gains'] < -CAPITAL_LOSS_LIMIT
+        return columns
+
+    def _determine_form_type(self, text: Union[str, ParsedDocument]) -> str:
         """Determine the type of 1099 form."""
+        return self._first_form_type(ParsedDocument.of(text).lower)
+    
+    def _has_transactions(self, lowered: str) -> bool:
+        """Whether a form is, or a composite statement includes, a 1099-B."""
+        return '1099-b' in lowered
+    
+    def _first_form_type(self, lowered: str) -> str:
         for form_type in self.form_types.keys():
-            if form_type.lower() in text.lower():
+            if form_type.lower() in lowered:
                 return form_type
         return '1099-UNKNOWN'
     
-    def _extract_fields(self, text: str) -> Dict[str, Any]:
+    def _extract_fields(self, text: Union[str, ParsedDocument]) -> Dict[str, Any]:
         """Extract fields from 1099 text using regex patterns."""
         extracted = {}
+        matches = ParsedDocument.of(text).scan(self.field_scanner)
         
-        for field, pattern in self.field_patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                extracted[field] = match.group(1)
+        for field in self.field_patterns:
+            if field in matches:
+                extracted[field] = matches[field][0][0]
         
         return extracted
     
-    def _validate_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Validate extracted 1099 data."""
+    def _validate_data(self, data: Dict[str, Any], transactions: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Validate extracted 1099 data and the summary of its 1099-B transactions."""
         validation = {
             'is_valid': True,
             'errors': [],
@@ -110,7 +236,7 @@ class Form1099Analyzer:
         
         # Check required fields based on form type
         required_fields = ['payer_tin', 'recipient_tin']
-        if data.get('form_type') in ['1099-MISC', '1099-NEC']:
+        if data.get('form_type') in self.SELF_EMPLOYMENT_FORMS:
             required_fields.append('nonemployee_compensation')
         
         for field in required_fields:
@@ -136,37 +262,35 @@ class Form1099Analyzer:
             if tax > comp * 0.37:  # Maximum tax rate
                 validation['warnings'].append("Federal tax withheld seems unusually high")
         
+        if transactions is not None:
+            if transactions['unparsed_rows']:
+                validation['warnings'].append(f"{transactions['unparsed_rows']} transaction rows could not be read")
+            if transactions['unreconciled_lots']:
+                validation['warnings'].append(f"Gain or loss of {transactions['unreconciled_lots']} lots does not equal proceeds less basis")
+        
         return validation
     
-    def _calculate_totals(self, data: Dict[str, Any]) -> Dict[str, float]:
-        """Calculate totals from 1099 data."""
+    def _calculate_totals(self, data: Dict[str, Any], transactions: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+        """Calculate totals from 1099 data and its 1099-B transactions."""
         totals = {
             'total_income': 0.0,
             'total_taxes_withheld': 0.0
         }
         
         # Calculate income
-        income_fields = [
-            'nonemployee_compensation',
-            'state_income',
-            'local_income'
-        ]
-        
-        for field in income_fields:
+        for field in self.INCOME_FIELDS:
             if field in data:
                 totals['total_income'] += self._parse_amount(data[field])
         
         # Calculate taxes withheld
-        tax_fields = [
-            'federal_tax_withheld',
-            'state_tax_withheld',
-            'local_tax_withheld'
-        ]
-        
-        for field in tax_fields:
+        for field in self.TAX_FIELDS:
             if field in data:
                 totals['total_taxes_withheld'] += self._parse_amount(data[field])
         
+        if transactions is not None:
+            for name, total in self.TRANSACTION_TOTALS.items():
+                totals[name] = transactions['totals'][total]
+        
         return totals
     
     def _generate_insights(self, data: Dict[str, Any], totals: Dict[str, float]) -> Dict[str, Any]:
@@ -177,7 +301,7 @@ class Form1099Analyzer:
         }
         
         # Check for self-employment implications
-        if data.get('form_type') in ['1099-MISC', '1099-NEC']:
+        if data.get('form_type') in self.SELF_EMPLOYMENT_FORMS:
             if 'nonemployee_compensation' in data:
                 comp = self._parse_amount(data['nonemployee_compensation'])
                 if comp > 0:
@@ -188,7 +312,8 @@ class Form1099Analyzer:
                     })
                     
                     # Calculate estimated self-employment tax
-                    se_tax = comp * 0.153  # 15.3% of net earnings
+                    tax_year = self.tax_engine.nearest_year(int(data['tax_year']) if 'tax_year' in data else None)
+                    se_tax = float(self.tax_engine.self_employment_tax(comp, tax_year))
                     insights['recommendations'].append({
                         'type': 'estimated_tax',
                         'message': f'Consider setting aside ${se_tax:.2f} for self-employment tax',
@@ -205,6 +330,20 @@ class Form1099Analyzer:
                     'priority': 'medium'
                 })
         
+        # Check 1099-B transactions
+        if totals.get('total_wash_sale_disallowed', 0.0) > 0:
+            insights['tax_implications'].append({
+                'type': 'wash_sales',
+                'message': f'${totals["total_wash_sale_disallowed"]:.2f} of losses were disallowed as wash sales and added to the basis of replacement shares',
+                'priority': 'medium'
+            })
+        if totals.get('realized_gains', 0.0) < -CAPITAL_LOSS_LIMIT:
+            insights['recommendations'].append({
+                'type': 'capital_loss_carryforward',
+                'message': f'${-totals["realized_gains"] - CAPITAL_LOSS_LIMIT:.2f} of net capital losses carry forward to next year',
+                'priority': 'medium'
+            })
+        
         return insights
     
     def _parse_amount(self, amount_str: str) -> float:
@@ -212,4 +351,4 @@ class Form1099Analyzer:
         try:
             return float(amount_str.replace(',', ''))
         except (ValueError, AttributeError):
-            return 0.0 
\ No newline at end of file
+            return 0.0
@@ -1,13 +1,25 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Sequence, Union
 import re
 import logging
 from datetime import datetime
+from types import MappingProxyType
+import numpy as np
+from .field_scanner import FieldScanner, first_values, mismatches, parse_amounts
+from ..parsed_document import ParsedDocument, normalized_texts
+from ..tax_engine import get_tax_engine
 
 logger = logging.getLogger(__name__)
 
 class W2Analyzer:
+    REQUIRED_FIELDS = ('employer_ein', 'employee_ssn', 'wages', 'federal_tax')
+    TAX_FIELDS = ('federal_tax', 'social_security_tax', 'medicare_tax', 'state_tax', 'local_tax')
+    RETIREMENT_CODES = frozenset(['D', 'E', 'F', 'G', 'S'])
+    HSA_CODES = frozenset(['W'])
+    ROTH_CODES = frozenset(['AA', 'BB', 'EE'])
+
     def __init__(self):
-        self.field_patterns = {
+        self.field_patterns = MappingProxyType({
+            'tax_year': r'Form W-2[^\d\n]*((?:19|20)\d{2})',
             'employer_ein': r'EIN:\s*(\d{2}-\d{7})',
             'employer_name': r'Employer\'s name\s*([^\n]+)',
             'employer_address': r'Employer\'s address\s*([^\n]+)',
@@ -24,7 +36,7 @@ class W2Analyzer:
             'allocated_tips': r'Box 8\s*\$?([\d,]+\.?\d*)',
             'dependent_care': r'Box 10\s*\$?([\d,]+\.?\d*)',
             'nonqualified_plans': r'Box 11\s*\$?([\d,]+\.?\d*)',
-            'deferrals': r'Box 12\s*([A-Z])\s*\$?([\d,]+\.?\d*)',
+            'deferrals': r'Box 12[a-d]?\s*([A-Z]{1,2})\s*\$?([\d,]+\.?\d*)',
             'state': r'State:\s*([A-Z]{2})',
             'state_id': r'State ID number:\s*([^\n]+)',
             'state_wages': r'State wages\s*\$?([\d,]+\.?\d*)',
@@ -32,9 +44,12 @@ class W2Analyzer:
             'local': r'Local:\s*([^\n]+)',
             'local_wages': r'Local wages\s*\$?([\d,]+\.?\d*)',
             'local_tax': r'Local income tax\s*\$?([\d,]+\.?\d*)'
-        }
+        })
+        # All patterns in one pass over the text; Box 12 lists up to four codes
+        self.field_scanner = FieldScanner(self.field_patterns, repeated=('deferrals',))
+        self.tax_engine = get_tax_engine()
         
-        self.box12_codes = {
+        self.box12_codes = MappingProxyType({
             'A': 'Uncollected social security or RRTA tax on tips',
             'B': 'Uncollected Medicare tax on tips',
             'C': 'Taxable cost of group-term life insurance over $50,000',
@@ -64,14 +79,15 @@ class W2Analyzer:
             'FF': 'Permitted benefits under a qualified small employer health reimbursement arrangement',
             'GG': 'Income from qualified equity grants under section 83(i)',
             'HH': 'Aggregate deferrals under section 83(i) elections as of the close of such calendar year'
-        }
+        })
 
-    def analyze(self, text: str, image: Any = None) -> Dict[str, Any]:
+    def analyze(self, text: Union[str, ParsedDocument], image: Any = None) -> Dict[str, Any]:
         """
         Analyze W-2 form text and extract relevant information.
         
         Args:
-            text: OCR extracted text from W-2 form
+            text: OCR extracted text from W-2 form, or the form already parsed
+                by ``DocumentProcessor``
             image: Optional image data for additional analysis
             
         Returns:
@@ -80,7 +96,27 @@ class W2Analyzer:
         try:
             # Extract basic information
             extracted_data = self._extract_fields(text)
+        except Exception as e:
+            logger.error(f"Error analyzing W-2: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        
+        return self.analyze_fields(extracted_data)
+    
+    def analyze_fields(self, extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analyze W-2 fields that were already extracted, e.g. from the form's barcode.
+        
+        Args:
+            extracted_data: Fields keyed like ``field_patterns``, with Box 12
+                entries under ``deferrals``
             
+        Returns:
+            Dictionary containing W-2 information, as returned by ``analyze``
+        """
+        try:
             # Validate extracted data
             validation_results = self._validate_data(extracted_data)
             
@@ -106,27 +142,94 @@ class W2Analyzer:
                 'error': str(e)
             }
     
-    def _extract_fields(self, text: str) -> Dict[str, Any]:
+    def analyze_batch(self, texts: Sequence[Union[str, ParsedDocument]]) -> Dict[str, np.ndarray]:
+        """
+        Analyze many W-2 forms at once, returning columns instead of one dict per form.
+        
+        Fields are extracted form by form with the compiled scanner; validation,
+        totals and insights are computed on whole columns.
+        
+        Args:
+            texts: OCR extracted text of each W-2 form, or forms already parsed
+                by ``DocumentProcessor``
+            
+        Returns:
+            Arrays with one entry per form, named after the ``analyze`` result:
+            ``data.<field>`` (extracted text, None if not found),
+            ``validation.is_valid`` and one ``validation.<check>`` flag per
+            error or warning, ``totals.<total>`` and ``insights.<insight>``
+        """
+        normalized, lowered = normalized_texts(texts)
+        scans = [self.field_scanner.scan(text, lower) for text, lower in zip(normalized, lowered)]
+        columns = {}
+        for field in self.field_patterns:
+            if field != 'deferrals':
+                columns[f'data.{field}'] = first_values(scans, field)
+
+        deferrals = np.empty(len(scans), dtype=object)
+        for i, found in enumerate(scans):
+            if 'deferrals' in found:
+                deferrals[i] = self._deferral_entries(found['deferrals'])
+        columns['data.deferrals'] = deferrals
+
+        present = {field[5:]: values != None for field, values in columns.items()}  # noqa: E711
+        amounts = {field: parse_amounts(columns[f'data.{field}']) for field in ('wages', 'social_security_wages') + self.TAX_FIELDS}
+
+        # Validation: the flags are the errors and warnings of ``_validate_data``
+        errors = []
+        for field in self.REQUIRED_FIELDS:
+            columns[f'validation.missing_{field}'] = ~present[field]
+            errors.append(columns[f'validation.missing_{field}'])
+        columns['validation.invalid_ssn'] = mismatches(columns['data.employee_ssn'], r'^\d{3}-\d{2}-\d{4}$')
+        columns['validation.invalid_ein'] = mismatches(columns['data.employer_ein'], r'^\d{2}-\d{7}$')
+        errors.extend([columns['validation.invalid_ssn'], columns['validation.invalid_ein']])
+        columns['validation.is_valid'] = ~np.logical_or.reduce(errors)
+        # NaN (field not found) compares False
+        columns['validation.social_security_wages_exceed_wages'] = amounts['social_security_wages'] > amounts['wages']
+
+        # Totals
+        columns['totals.total_wages'] = np.nan_to_num(amounts['wages'])
+        columns['totals.total_taxes'] = np.nansum([amounts[field] for field in self.TAX_FIELDS], axis=0)
+        columns['totals.total_deferrals'] = np.array([sum(d['amount'] for d in entries) if entries else 0.0 for entries in deferrals])
+
+        # Insights: recommendations are made only for forms with Box 12 entries
+        years = {year: self.tax_engine.nearest_year(int(year) if year else None) for year in set(columns['data.tax_year'])}
+        rates = self.tax_engine.compute(
+            columns['totals.total_wages'], np.array([years[year] for year in columns['data.tax_year']], dtype=np.int64)
+        )['marginal_rate']
+        unique_rates, inverse = np.unique(rates, return_inverse=True)
+        columns['insights.tax_bracket'] = np.array([f"{rate:.0%}" for rate in unique_rates], dtype=object)[inverse]
+        codes = [{d['code'] for d in entries} if entries else None for entries in deferrals]
+        columns['insights.recommend_retirement'] = np.array([c is not None and not (c & self.RETIREMENT_CODES) for c in codes], dtype=bool)
+        columns['insights.recommend_hsa'] = np.array([c is not None and not (c & self.HSA_CODES) for c in codes], dtype=bool)
+        return columns
+
+    def _extract_fields(self, text: Union[str, ParsedDocument]) -> Dict[str, Any]:
         """Extract fields from W-2 text using regex patterns."""
         extracted = {}
+        matches = ParsedDocument.of(text).scan(self.field_scanner)
         
-        for field, pattern in self.field_patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                if field == 'deferrals':
-                    code = match.group(1)
-                    amount = match.group(2)
-                    if 'deferrals' not in extracted:
-                        extracted['deferrals'] = []
-                    extracted['deferrals'].append({
-                        'code': code,
-                        'description': self.box12_codes.get(code, 'Unknown'),
-                        'amount': self._parse_amount(amount)
-                    })
-                else:
-                    extracted[field] = match.group(1)
+        for field in self.field_patterns:
+            if field not in matches:
+                continue
+            if field == 'deferrals':
+                extracted['deferrals'] = self._deferral_entries(matches[field])
+            else:
+                extracted[field] = matches[field][0][0]
         
         return extracted
+
+    def _deferral_entries(self, matches: Sequence[tuple]) -> list:
+        """Box 12 entries from the scanner's (code, amount) matches."""
+        entries = []
+        for code, amount in matches:
+            code = code.upper()
+            entries.append({
+                'code': code,
+                'description': self.box12_codes.get(code, 'Unknown'),
+                'amount': self._parse_amount(amount)
+            })
+        return entries
     
     def _validate_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Validate extracted W-2 data."""
@@ -137,8 +240,7 @@ class W2Analyzer:
         }
         
         # Check required fields
-        required_fields = ['employer_ein', 'employee_ssn', 'wages', 'federal_tax']
-        for field in required_fields:
+        for field in self.REQUIRED_FIELDS:
             if field not in data:
                 validation['is_valid'] = False
                 validation['errors'].append(f"Missing required field: {field}")
@@ -177,8 +279,7 @@ class W2Analyzer:
             totals['total_wages'] = self._parse_amount(data['wages'])
         
         # Calculate taxes
-        tax_fields = ['federal_tax', 'social_security_tax', 'medicare_tax', 'state_tax', 'local_tax']
-        for field in tax_fields:
+        for field in self.TAX_FIELDS:
             if field in data:
                 totals['total_taxes'] += self._parse_amount(data[field])
         
@@ -192,15 +293,14 @@ class W2Analyzer:
     def _generate_insights(self, data: Dict[str, Any], totals: Dict[str, float]) -> Dict[str, Any]:
         """Generate insights from W-2 data."""
         insights = {
-            'tax_bracket': self._estimate_tax_bracket(totals['total_wages']),
+            'tax_bracket': self._estimate_tax_bracket(totals['total_wages'], int(data['tax_year']) if 'tax_year' in data else None),
             'potential_deductions': [],
             'recommendations': []
         }
         
         # Check for retirement contributions
         if 'deferrals' in data:
-            retirement_codes = ['D', 'E', 'F', 'G', 'S']
-            has_retirement = any(d['code'] in retirement_codes for d in data['deferrals'])
+            has_retirement = any(d['code'] in self.RETIREMENT_CODES for d in data['deferrals'])
             if not has_retirement:
                 insights['recommendations'].append({
                     'type': 'retirement',
@@ -210,8 +310,7 @@ class W2Analyzer:
         
         # Check for health savings
         if 'deferrals' in data:
-            hsa_codes = ['W']
-            has_hsa = any(d['code'] in hsa_codes for d in data['deferrals'])
+            has_hsa = any(d['code'] in self.HSA_CODES for d in data['deferrals'])
             if not has_hsa:
                 insights['recommendations'].append({
                     'type': 'hsa',
@@ -228,20 +327,13 @@ class W2Analyzer:
         except (ValueError, AttributeError):
             return 0.0
     
-    def _estimate_tax_bracket(self, income: float) -> str:
-        """Estimate tax bracket based on income."""
-        brackets = [
-            (0, 11000, '10%'),
-            (11001, 44725, '12%'),
-            (44726, 95375, '22%'),
-            (95376, 182100, '24%'),
-            (182101, 231250, '32%'),
-            (231251, 578125, '35%'),
-            (578126, float('inf'), '37%')
-        ]
-        
-        for lower, upper, rate in brackets:
-            if lower <= income <= upper:
-                return rate
-        
-        return 'Unknown' 
\ No newline at end of file
+    def _estimate_tax_bracket(self, income: float, tax_year: Optional[int] = None) -> str:
+        """
+        Estimate the federal tax bracket of W-2 wages.
+        
+        A W-2 does not show the filing status, so the bracket is that of a single
+        filer taking the standard deduction, in the form's tax year (or the
+        closest year with tax parameters).
+        """
+        rate = self.tax_engine.compute(income, self.tax_engine.nearest_year(tax_year))['marginal_rate']
+        return f"{float(rate):.0%}"
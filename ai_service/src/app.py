@@ -1,7 +1,11 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Path, Body
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Path, Body, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any, List, Optional
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Any, AsyncIterator, List, Optional
 from pydantic import BaseModel, Field
+import json
 import logging
 import os
 from pathlib import Path
@@ -9,9 +13,25 @@ import shutil
 import uuid
 from datetime import datetime
 
-from .document_processor import DocumentProcessor
+from .document_processor import DocumentProcessor, PIPELINE_VERSION
 from .tax_analyzer import TaxAnalyzer
+from .tax_engine import FILING_STATUSES, get_tax_engine
+from .what_if import get_what_if_engine, household_from_w2
+from .roth_optimizer import get_roth_optimizer
+from .tax_lots import get_tax_lot_engine
+from .retirement_projection import get_retirement_projector, plan_from_w2
 from .cache import CacheMiddleware, get_cache, init_cache_warmup, get_cache_warmup
+from .ocr_pool import get_ocr_pool
+from .image_tiling import ImageTiler
+from .ocr_store import get_ocr_store
+from .blob_store import get_blob_store, BlobNotFoundError
+from .parsed_document import get_document_store
+from .phash_index import PageHashIndex
+from .job_queue import Job, JobQueue, QueueFullError, job_events
+from .batch_processor import BatchProcessor, BatchTooLargeError, BatchValidationError, IMAGE_EXTENSIONS
+from .upload_manager import (
+    get_upload_manager, UploadError, UploadNotFoundError, OffsetMismatchError, ChecksumMismatchError
+)
 
 # Configure logging
 logging.basicConfig(
@@ -42,6 +62,9 @@ class ProcessResponse(BaseModel):
     confidence: float = Field(..., description="OCR confidence score")
     processing_time: float = Field(..., description="Time taken to process the document in seconds")
     metadata: Dict[str, Any] = Field(..., description="Additional document metadata")
+    blob_hash: Optional[str] = Field(None, description="SHA-256 of the stored document; pass it as `blob_hash` to process it again without re-uploading")
+    blob_ref: Optional[str] = Field(None, description="Reference to the stored document, required with `blob_hash` to read, reprocess or release it")
+    analysis: Optional[Dict[str, Any]] = Field(None, description="Analyzer output when requested with `analyze=true`")
 
     class Config:
         schema_extra = {
@@ -56,10 +79,204 @@ class ProcessResponse(BaseModel):
                     "page_count": 1,
                     "document_type": "W-2",
                     "year": 2023
+                },
+                "blob_hash": "9f2c4b1a7e3d5c6b8a9f0e1d2c3b4a5968778695a4b3c2d1e0f9a8b7c6d5e4f3",
+                "blob_ref": "1b4e28ba2fa1411d9b6d0c5e7a3f8c21"
+            }
+        }
+
+class JobSubmittedResponse(BaseModel):
+    job_id: str = Field(..., description="Identifier of the queued processing job")
+    status: str = Field(..., description="Initial job status")
+    status_url: str = Field(..., description="URL to poll for job progress and results")
+    events_url: str = Field(..., description="Server-Sent Events stream of per-page results")
+    blob_hash: Optional[str] = Field(None, description="SHA-256 of the stored document")
+    blob_ref: Optional[str] = Field(None, description="Reference to the stored document, released when the job expires")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "job_id": "7c9e6679-7425-40de-944b-e07fc1f90ae7",
+                "status": "queued",
+                "status_url": "/process/status/7c9e6679-7425-40de-944b-e07fc1f90ae7",
+                "events_url": "/process/7c9e6679-7425-40de-944b-e07fc1f90ae7/events",
+                "blob_hash": "9f2c4b1a7e3d5c6b8a9f0e1d2c3b4a5968778695a4b3c2d1e0f9a8b7c6d5e4f3",
+                "blob_ref": "1b4e28ba2fa1411d9b6d0c5e7a3f8c21"
+            }
+        }
+
+class JobStatusResponse(BaseModel):
+    job_id: str = Field(..., description="Identifier of the processing job")
+    status: str = Field(..., description="Job status (queued/processing/completed/failed)")
+    progress: Dict[str, Any] = Field(..., description="Page-level progress of the job")
+    result: Optional[Dict[str, Any]] = Field(None, description="Processing result once the job has completed")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    metadata: Dict[str, Any] = Field(..., description="Job metadata")
+    created_at: datetime = Field(..., description="Time the job was queued")
+    started_at: Optional[datetime] = Field(None, description="Time processing started")
+    completed_at: Optional[datetime] = Field(None, description="Time processing finished")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "job_id": "7c9e6679-7425-40de-944b-e07fc1f90ae7",
+                "status": "processing",
+                "progress": {
+                    "pages_done": 2,
+                    "pages_total": 5,
+                    "percent": 40.0
+                },
+                "result": None,
+                "error": None,
+                "metadata": {
+                    "filename": "1099_composite.pdf",
+                    "doc_type": "1099"
+                },
+                "created_at": "2024-03-20T10:30:00Z",
+                "started_at": "2024-03-20T10:30:01Z",
+                "completed_at": None
+            }
+        }
+
+class QueueStatsResponse(BaseModel):
+    queued: int = Field(..., description="Jobs waiting for a worker")
+    running: int = Field(..., description="Jobs currently being processed")
+    max_workers: int = Field(..., description="Maximum number of concurrently running jobs")
+    max_queue_depth: int = Field(..., description="Maximum number of pending jobs before new jobs are rejected")
+    utilization: float = Field(..., description="Pending jobs as a fraction of the maximum queue depth")
+    submitted: int = Field(..., description="Total jobs submitted")
+    completed: int = Field(..., description="Total jobs completed")
+    failed: int = Field(..., description="Total jobs failed")
+    rejected: int = Field(..., description="Total jobs rejected because the queue was full")
+    avg_wait_time: float = Field(..., description="Average time jobs waited in the queue in seconds")
+    avg_run_time: float = Field(..., description="Average job processing time in seconds")
+    tracked_jobs: int = Field(..., description="Number of jobs whose status is still retained")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "queued": 3,
+                "running": 2,
+                "max_workers": 2,
+                "max_queue_depth": 50,
+                "utilization": 0.1,
+                "submitted": 120,
+                "completed": 112,
+                "failed": 3,
+                "rejected": 0,
+                "avg_wait_time": 1.8,
+                "avg_run_time": 6.4,
+                "tracked_jobs": 120
+            }
+        }
+
+class OCRStatsResponse(BaseModel):
+    adaptive_ocr: Dict[str, Any] = Field(..., description="Low-DPI first pass and selective re-OCR statistics")
+    barcode: Dict[str, Any] = Field(..., description="W-2 barcode decoding statistics")
+    page_index: Optional[Dict[str, Any]] = Field(None, description="Near-duplicate page index statistics")
+    ocr_store: Optional[Dict[str, Any]] = Field(None, description="OCR result store statistics")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "adaptive_ocr": {
+                    "pages": 240,
+                    "words": 51200,
+                    "low_confidence_words": 1830,
+                    "reocr_pages": 96,
+                    "reocr_regions": 410,
+                    "improved_regions": 322,
+                    "low_dpi": 150,
+                    "min_confidence": 70.0,
+                    "reocr_rate": 0.4,
+                    "regions_per_page": 1.71,
+                    "low_confidence_rate": 0.036
+                },
+                "barcode": {
+                    "attempts": 180,
+                    "decoded": 41,
+                    "available": True,
+                    "decode_rate": 0.228,
+                    "avg_decode_ms": 13.2
+                },
+                "page_index": {
+                    "entries": 15230,
+                    "queries": 240,
+                    "matches": 12,
+                    "avg_query_ms": 0.08
+                },
+                "ocr_store": {
+                    "hits": 35,
+                    "misses": 240,
+                    "documents": 1180,
+                    "hit_rate": 0.127
                 }
             }
         }
 
+class UploadCreateRequest(BaseModel):
+    filename: str = Field(..., description="File name; its extension applies to every part")
+    size: Optional[int] = Field(None, gt=0, description="Size in bytes of a single-file upload")
+    part_sizes: Optional[List[int]] = Field(None, description="Size in bytes of each page image of a multi-part upload")
+    doc_type: Optional[str] = Field(None, description="Type of document (w2, 1099, etc.); classified automatically when omitted")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "filename": "1099_composite.pdf",
+                "size": 31457280,
+                "doc_type": "1099"
+            }
+        }
+
+class BlobResponse(BaseModel):
+    hash: str = Field(..., description="SHA-256 of the document, used to reference it in later requests")
+    size: int = Field(..., description="Size in bytes")
+    refs: int = Field(..., description="Number of uploads referencing the document")
+    deduplicated: bool = Field(False, description="Whether identical content was already stored")
+    ref: str = Field(..., description="This upload's reference; send it as `Blob-Ref` to read or release the document")
+    expires: Optional[float] = Field(None, description="When the reference expires (Unix time)")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "hash": "9f2c4b1a7e3d5c6b8a9f0e1d2c3b4a5968778695a4b3c2d1e0f9a8b7c6d5e4f3",
+                "size": 248331,
+                "refs": 1,
+                "deduplicated": False,
+                "ref": "1b4e28ba2fa1411d9b6d0c5e7a3f8c21",
+                "expires": 1710973800.0
+            }
+        }
+
+class UploadStatusResponse(BaseModel):
+    upload_id: str = Field(..., description="Identifier of the resumable upload")
+    filename: str = Field(..., description="Original file name")
+    doc_type: Optional[str] = Field(None, description="Type of document")
+    status: str = Field(..., description="Upload status (uploading/finalized)")
+    size: int = Field(..., description="Total size of the upload in bytes")
+    offset: int = Field(..., description="Bytes received so far")
+    parts: List[Dict[str, Any]] = Field(..., description="Size, offset and completion of each part")
+    job_id: Optional[str] = Field(None, description="Processing job already started for the upload")
+    expires_at: datetime = Field(..., description="Time after which an unfinished upload is discarded")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "upload_id": "3f2b8c1e9a4d4e6f8b7a6c5d4e3f2a1b",
+                "filename": "1099_composite.pdf",
+                "doc_type": "1099",
+                "status": "uploading",
+                "size": 31457280,
+                "offset": 16777216,
+                "parts": [
+                    {"part": 0, "size": 31457280, "offset": 16777216, "complete": False}
+                ],
+                "job_id": None,
+                "expires_at": "2024-03-21T10:30:00Z"
+            }
+        }
+
 class TaxRecommendation(BaseModel):
     category: str = Field(..., description="Category of the recommendation (e.g., Tax Filing, Investment Strategy)")
     items: List[str] = Field(..., description="List of specific recommendations for this category")
@@ -70,6 +287,8 @@ class TaxBracket(BaseModel):
     max_income: Optional[float] = Field(None, description="Maximum income for this bracket (None for highest bracket)")
 
 class TaxCalculation(BaseModel):
+    tax_year: Optional[int] = Field(None, description="Tax year whose brackets and deductions were applied")
+    filing_status: Optional[str] = Field(None, description="Filing status the tax was calculated for")
     taxable_income: float = Field(..., description="Total taxable income")
     effective_tax_rate: float = Field(..., description="Effective tax rate (as decimal)")
     marginal_tax_rate: float = Field(..., description="Marginal tax rate (as decimal)")
@@ -249,10 +468,12 @@ class AnalyzeResponse(BaseModel):
                     "social_security": 4650.00,
                     "medicare": 1088.00,
                     "estimated_tax_rate": 20.00,
-                    "has_retirement_plan": true,
-                    "has_health_insurance": true
+                    "has_retirement_plan": True,
+                    "has_health_insurance": True
                 },
                 "tax_calculations": {
+                    "tax_year": 2023,
+                    "filing_status": "single",
                     "taxable_income": 75000.00,
                     "effective_tax_rate": 0.20,
                     "marginal_tax_rate": 0.22,
@@ -325,8 +546,8 @@ class AnalyzeResponse(BaseModel):
                     "required_minimum_distribution": None,
                     "catch_up_contributions": 0.00,
                     "roth_conversion_opportunity": 10000.00,
-                    "backdoor_roth_opportunity": true,
-                    "mega_backdoor_roth_opportunity": false,
+                    "backdoor_roth_opportunity": True,
+                    "mega_backdoor_roth_opportunity": False,
                     "hsa_contribution_limit": 3650.00,
                     "ira_contribution_limit": 6000.00,
                     "roth_ira_contribution_limit": 6000.00,
@@ -604,7 +825,235 @@ class AnalyzeResponse(BaseModel):
                 "processing_time": 1.3
             }
         }
-    }
+
+class WhatIfRequest(BaseModel):
+    wages: float = Field(..., ge=0, description="W-2 Box 1 wages, which exclude current pre-tax deferrals and payroll HSA contributions")
+    other_income: float = Field(0.0, description="Other income included in adjusted gross income")
+    deferrals: float = Field(0.0, ge=0, description="Current pre-tax 401(k) elective deferrals")
+    hsa_contributions: float = Field(0.0, ge=0, description="Current HSA contributions")
+    hsa_coverage: Optional[str] = Field(None, description="HDHP coverage: self_only or family; omit if not HSA-eligible")
+    itemized_deductions: float = Field(0.0, ge=0, description="Total itemized deductions")
+    age: Optional[int] = Field(None, ge=0, description="Age at the end of the tax year, for catch-up contributions")
+    tax_year: Optional[int] = Field(None, description="Tax year; defaults to the latest available")
+    filing_status: str = Field("single", description="Filing status")
+    max_contributions: Optional[float] = Field(None, ge=0, description="Most the household can contribute to the 401(k) and HSA in total")
+    step: Optional[float] = Field(None, gt=0, description="Spacing of candidate contribution levels in dollars")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "wages": 120000.00,
+                "deferrals": 5000.00,
+                "hsa_contributions": 1000.00,
+                "hsa_coverage": "family",
+                "itemized_deductions": 16000.00,
+                "age": 52,
+                "tax_year": 2024,
+                "filing_status": "single",
+                "max_contributions": 20000.00
+            }
+        }
+
+class WhatIfResponse(BaseModel):
+    tax_year: int = Field(..., description="Tax year swept")
+    filing_status: str = Field(..., description="Filing status swept")
+    scenarios: int = Field(..., description="Number of scenarios evaluated")
+    step: float = Field(..., description="Spacing of candidate contribution levels used")
+    limits: Dict[str, float] = Field(..., description="Elective deferral and HSA limits applied, including catch-up contributions")
+    baseline: Dict[str, Any] = Field(..., description="Tax with the current contributions")
+    optimum: Dict[str, Any] = Field(..., description="Scenario with the largest savings within max_contributions")
+    savings_curve: List[Dict[str, float]] = Field(..., description="Best savings at each total contribution")
+    tax_optimization_strategies: List[TaxOptimizationStrategy] = Field(..., description="Adjustments to reach the optimum")
+    elapsed_ms: float = Field(..., description="Time taken by the sweep in milliseconds")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "tax_year": 2024,
+                "filing_status": "single",
+                "scenarios": 8610,
+                "step": 250.0,
+                "limits": {"elective_deferral": 30500.0, "hsa": 8300.0},
+                "baseline": {"deferrals": 5000.0, "hsa_contributions": 1000.0, "itemize": True, "taxable_income": 104000.0, "tax": 18002.5},
+                "optimum": {"deferrals": 11750.0, "hsa_contributions": 8250.0, "itemize": True, "taxable_income": 90000.0, "tax": 14853.0, "savings": 3149.5, "marginal_rate": 0.22},
+                "savings_curve": [
+                    {"contributions": 0.0, "deferrals": 0.0, "hsa_contributions": 0.0, "tax": 19442.5, "savings": -1440.0},
+                    {"contributions": 20000.0, "deferrals": 11750.0, "hsa_contributions": 8250.0, "tax": 14853.0, "savings": 3149.5}
+                ],
+                "tax_optimization_strategies": [],
+                "elapsed_ms": 1.4
+            }
+        }
+
+class RothConversionRequest(BaseModel):
+    traditional_balance: float = Field(..., ge=0, description="Traditional IRA/401(k) balance at the start of the first year")
+    age: int = Field(..., ge=0, description="Age at the start of the first year")
+    years: int = Field(30, ge=1, le=60, description="Planning horizon in years")
+    other_income: List[float] = Field([0.0], description="Taxable income besides RMDs and conversions, per year; the last amount repeats")
+    growth_rate: float = Field(0.05, ge=0, description="Yearly growth of the traditional balance")
+    discount_rate: Optional[float] = Field(None, ge=0, description="Rate discounting future taxes; defaults to the growth rate")
+    tax_year: Optional[int] = Field(None, description="First tax year; defaults to the latest available")
+    filing_status: str = Field("single", description="Filing status")
+    heir_income: Optional[float] = Field(None, ge=0, description="Heirs' taxable income; defaults to the last year's other income")
+    heir_years: int = Field(10, ge=1, description="Years over which heirs withdraw the remaining balance")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "traditional_balance": 1000000.00,
+                "age": 60,
+                "years": 30,
+                "other_income": [60000.00, 60000.00, 60000.00, 60000.00, 60000.00, 60000.00, 60000.00, 35000.00],
+                "growth_rate": 0.05,
+                "tax_year": 2024,
+                "filing_status": "single",
+                "heir_income": 120000.00
+            }
+        }
+
+class RothConversionResponse(BaseModel):
+    roth_conversion_opportunity: Dict[str, Any] = Field(..., description="Whether converting pays, by how much and in which years")
+    retirement_tax_planning: Dict[str, Any] = Field(..., description="Lifetime tax with and without conversions and the yearly schedule")
+    states: int = Field(..., description="Balance grid points of the dynamic program")
+    step: float = Field(..., description="Spacing of the balance grid in dollars")
+    cached: bool = Field(..., description="Whether the result came from the cache")
+    elapsed_ms: float = Field(..., description="Time taken by the optimization in milliseconds")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "roth_conversion_opportunity": {
+                    "recommended": True,
+                    "lifetime_tax_savings": 47329.87,
+                    "total_conversions": 1621754.84,
+                    "first_year_conversion": 52071.59,
+                    "conversion_years": [2024, 2025, 2026, 2027, 2028]
+                },
+                "retirement_tax_planning": {
+                    "lifetime_tax": 241033.25,
+                    "baseline_lifetime_tax": 288363.12,
+                    "rmd_start_age": 75,
+                    "terminal_balance": 0.0,
+                    "conversion_schedule": [
+                        {"tax_year": 2024, "age": 60, "traditional_balance": 1000000.0, "rmd": 0.0, "conversion": 52071.59, "other_income": 60000.0, "taxable_income": 97471.59, "tax": 16496.75, "marginal_rate": 0.22}
+                    ]
+                },
+                "states": 250,
+                "step": 17357.2,
+                "cached": False,
+                "elapsed_ms": 109.8
+            }
+        }
+
+class RetirementProjectionRequest(BaseModel):
+    age: int = Field(..., ge=0, description="Current age")
+    retirement_age: int = Field(67, ge=0, description="Age at retirement")
+    end_age: int = Field(95, ge=1, description="Age the projection ends at")
+    traditional_balance: float = Field(0.0, ge=0, description="Traditional IRA/401(k) balance")
+    roth_balance: float = Field(0.0, ge=0, description="Roth IRA/401(k) balance")
+    taxable_balance: float = Field(0.0, ge=0, description="Taxable brokerage balance")
+    traditional_contribution: float = Field(0.0, ge=0, description="Yearly pre-tax contributions until retirement, employer match included")
+    roth_contribution: float = Field(0.0, ge=0, description="Yearly Roth contributions until retirement")
+    taxable_contribution: float = Field(0.0, ge=0, description="Yearly taxable savings until retirement")
+    contribution_growth: float = Field(0.0, description="Yearly real growth of contributions")
+    expected_return: float = Field(0.06, gt=-1, description="Expected yearly return")
+    volatility: float = Field(0.15, ge=0, description="Standard deviation of yearly returns")
+    inflation: float = Field(0.025, gt=-1, description="Yearly inflation")
+    annual_spending: Optional[float] = Field(None, ge=0, description="Yearly spending in retirement before tax; defaults to withdrawal_rate of the balance at retirement")
+    withdrawal_rate: float = Field(0.04, ge=0, description="Share of the balance at retirement spent every year without annual_spending")
+    social_security: float = Field(0.0, ge=0, description="Yearly Social Security benefit from retirement")
+    pension: float = Field(0.0, ge=0, description="Yearly pension from retirement")
+    tax_drag: float = Field(0.003, ge=0, lt=1, description="Share of the taxable balance lost to tax on dividends every year")
+    tax_year: Optional[int] = Field(None, description="Tax year of the brackets; defaults to the latest available")
+    filing_status: str = Field("single", description="Filing status")
+    seed: int = Field(0, ge=0, description="Seed of the simulated returns")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "age": 45,
+                "end_age": 85,
+                "traditional_balance": 300000.00,
+                "roth_balance": 50000.00,
+                "traditional_contribution": 20000.00,
+                "social_security": 24000.00,
+                "tax_year": 2024,
+                "filing_status": "single"
+            }
+        }
+
+class RetirementProjectionResponse(BaseModel):
+    retirement_income_projection: Dict[str, Any] = Field(..., description="Success probability and percentile bands of balances and after-tax income")
+    required_minimum_distributions: Dict[str, Any] = Field(..., description="RMD starting age and percentile bands of RMDs by year")
+    paths: int = Field(..., description="Paths simulated")
+    cached: bool = Field(..., description="Whether the result came from the cache")
+    elapsed_ms: float = Field(..., description="Time taken by the projection in milliseconds")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "retirement_income_projection": {
+                    "paths": 10000,
+                    "seed": 0,
+                    "ages": [45, 46, 47],
+                    "retirement_age": 67,
+                    "end_age": 85,
+                    "success_probability": 0.9973,
+                    "depletion_age": 83,
+                    "balance_at_retirement": {"p5": 524407.96, "p25": 841553.38, "p50": 1188084.23, "p75": 1697921.56, "p95": 2965015.12},
+                    "first_year_income": {"p5": 23615.0, "p25": 32272.68, "p50": 44470.56, "p75": 62355.15, "p95": 101888.47},
+                    "balance_bands": {"p5": [300326.32, 297245.91, 300341.89], "p50": [379263.75, 408968.01, 438814.75], "p95": [478750.15, 563843.44, 648639.32]},
+                    "income_bands": {"p5": [0.0, 0.0, 0.0], "p50": [0.0, 0.0, 0.0], "p95": [0.0, 0.0, 0.0]}
+                },
+                "required_minimum_distributions": {
+                    "start_age": 75,
+                    "first_year": 2054,
+                    "first_rmd": 46153.34,
+                    "lifetime_total": {"p5": 173815.84, "p25": 324331.76, "p50": 501008.36, "p75": 782094.12, "p95": 1540406.33},
+                    "schedule": [
+                        {"age": 75, "tax_year": 2054, "p5": 17601.47, "p25": 31264.42, "p50": 46153.34, "p75": 69769.13, "p95": 129837.92}
+                    ]
+                },
+                "paths": 10000,
+                "cached": False,
+                "elapsed_ms": 61.4
+            }
+        }
+
+class TradeRecord(BaseModel):
+    security: str = Field(..., description="Symbol or CUSIP; trades of the same security must use the same one")
+    date: str = Field(..., description="Trade date (YYYY-MM-DD)")
+    side: str = Field(..., description="buy or sell")
+    quantity: float = Field(..., gt=0, description="Shares bought or sold")
+    price: float = Field(..., ge=0, description="Price per share")
+    fees: float = Field(0.0, ge=0, description="Commissions and fees, added to the cost of a purchase and taken from the proceeds of a sale")
+
+class TaxLotRequest(BaseModel):
+    trades: List[TradeRecord] = Field(..., description="Trade history; trades of one day are applied in the order given")
+    prices: Dict[str, float] = Field({}, description="Current price per share by security, for unrealized gains and loss harvesting")
+    as_of: Optional[str] = Field(None, description="Date of a harvesting sale (YYYY-MM-DD); defaults to the last trade date")
+    taxable_income: Optional[float] = Field(None, ge=0, description="Ordinary taxable income, for the tax harvesting would save")
+    tax_year: Optional[int] = Field(None, description="Tax year of the rates; defaults to the latest available")
+    filing_status: str = Field("single", description="Filing status")
+    ordinary_dividends: float = Field(0.0, ge=0, description="Ordinary dividends, for the tax efficiency score")
+    qualified_dividends: float = Field(0.0, ge=0, description="Qualified dividends, for the tax efficiency score")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "trades": [
+                    {"security": "XYZ", "date": "2024-01-02", "side": "buy", "quantity": 100, "price": 50.00},
+                    {"security": "XYZ", "date": "2024-03-01", "side": "sell", "quantity": 100, "price": 40.00},
+                    {"security": "XYZ", "date": "2024-03-15", "side": "buy", "quantity": 60, "price": 42.00},
+                    {"security": "ABC", "date": "2023-02-01", "side": "buy", "quantity": 20, "price": 150.00, "fees": 4.95}
+                ],
+                "prices": {"XYZ": 41.00, "ABC": 120.00},
+                "as_of": "2024-06-03",
+                "taxable_income": 95000.00,
+                "tax_year": 2024,
+                "filing_status": "single"
+            }
+        }
 
 class CacheStatsResponse(BaseModel):
     cache: Dict[str, Any] = Field(..., description="Cache statistics")
@@ -682,6 +1131,18 @@ app = FastAPI(
             "name": "Documents",
             "description": "Document processing and analysis operations"
         },
+        {
+            "name": "Uploads",
+            "description": "Resumable chunked uploads of large documents"
+        },
+        {
+            "name": "Blobs",
+            "description": "Content-addressed storage of uploaded documents"
+        },
+        {
+            "name": "Planning",
+            "description": "What-if tax planning scenarios"
+        },
         {
             "name": "Cache",
             "description": "Cache management operations"
@@ -710,27 +1171,95 @@ app.add_middleware(CacheMiddleware, cache=cache)
 cache_warmup = init_cache_warmup(app, cache)
 
 # Initialize processors
-document_processor = DocumentProcessor()
+ocr_pool = get_ocr_pool()
+# Parsed documents are kept for /analyze under the document_id returned by /process
+document_store = get_document_store()
+document_processor = DocumentProcessor(
+    ocr_pool=ocr_pool,
+    image_tiler=ImageTiler(max_page_pixels=int(os.environ.get("MAX_PAGE_PIXELS", "9000000"))),
+    ocr_store=get_ocr_store(PIPELINE_VERSION),
+    page_index=PageHashIndex(max_distance=int(os.environ.get("PHASH_MAX_DISTANCE", "10"))),
+    near_duplicate_min_similarity=float(os.environ.get("NEAR_DUPLICATE_MIN_SIMILARITY", "0.7")),
+    ocr_low_dpi=int(os.environ.get("OCR_LOW_DPI", "150")),
+    ocr_min_confidence=float(os.environ.get("OCR_MIN_CONFIDENCE", "70")),
+    document_store=document_store
+)
 tax_analyzer = TaxAnalyzer()
+# Compile the tax parameters at startup rather than on the first analysis
+tax_engine = get_tax_engine()
+what_if_engine = get_what_if_engine()
+roth_optimizer = get_roth_optimizer()
+tax_lot_engine = get_tax_lot_engine()
+retirement_projector = get_retirement_projector()
+job_queue = JobQueue(
+    max_workers=int(os.environ.get("PROCESS_MAX_WORKERS", "2")),
+    max_queue_depth=int(os.environ.get("PROCESS_MAX_QUEUE_DEPTH", "50"))
+)
+# Images up to this size are decoded in memory; larger files and PDFs are spooled to disk
+MEMORY_DECODE_MAX_BYTES = int(os.environ.get("MEMORY_DECODE_MAX_MB", "10")) * 1024 * 1024
+batch_processor = BatchProcessor(
+    document_processor,
+    max_concurrency=int(os.environ.get("BATCH_MAX_CONCURRENCY", "4")),
+    max_documents=int(os.environ.get("BATCH_MAX_DOCUMENTS", "50")),
+    max_batch_bytes=int(os.environ.get("BATCH_MAX_MB", "200")) * 1024 * 1024,
+    memory_decode_max_bytes=MEMORY_DECODE_MAX_BYTES
+)
+upload_manager = get_upload_manager()
+# How long a pipelined job waits for the next page of a multi-part upload
+UPLOAD_PART_TIMEOUT = float(os.environ.get("UPLOAD_PART_TIMEOUT", "600"))
 
-# Create upload directory
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Uploaded documents are kept by content hash for reprocessing (under UPLOAD_DIR by default)
+blob_store = get_blob_store()
+
+def _release_job_blobs(job_ids: List[str]) -> None:
+    """Drop the blob references held by expired jobs, so their documents go with them."""
+    for job_id in job_ids:
+        blob_store.release_owner(f"job:{job_id}")
+
+job_queue.add_removal_listener(_release_job_blobs)
+
+@app.exception_handler(HTTPException)
+async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
+    """Return HTTP errors as JSON; their details carry datetimes, which need encoding."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": jsonable_encoder(exc.detail)},
+        headers=exc.headers
+    )
 
 @app.on_event("startup")
 async def startup_event():
-    """Start cache warming on application startup."""
+    """Start cache warming and OCR workers on application startup."""
     await cache_warmup.start()
+    ocr_pool.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Stop cache warming on application shutdown."""
+    """Stop cache warming and OCR workers on application shutdown."""
     await cache_warmup.stop()
+    job_queue.shutdown(wait=False)
+    batch_processor.shutdown(wait=False)
+    tax_analyzer.shutdown(wait=False)
+    ocr_pool.close()
+    document_processor.ocr_store.close()
+    blob_store.close()
 
 @app.post(
     "/process",
     response_model=ProcessResponse,
     responses={
+        200: {
+            "description": "Processing result, or per-page results streamed as newline-delimited JSON (stream=true)",
+            "content": {
+                "application/x-ndjson": {
+                    "example": "{\"type\": \"page\", \"page\": 1, \"text\": \"...\", \"data\": {...}, \"pages_total\": 6}\n"
+                }
+            }
+        },
+        202: {
+            "model": JobSubmittedResponse,
+            "description": "Document accepted for asynchronous processing (async=true)"
+        },
         400: {
             "model": ErrorResponse,
             "description": "Invalid file type or format",
@@ -757,6 +1286,19 @@ async def shutdown_event():
                 }
             }
         },
+        503: {
+            "model": ErrorResponse,
+            "description": "Processing queue is full (async=true)",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Processing queue is full (50 jobs pending)",
+                        "code": "QUEUE_FULL",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        },
         500: {
             "model": ErrorResponse,
             "description": "Internal server error",
@@ -779,6 +1321,22 @@ async def shutdown_event():
     - Supports PDF, JPG, JPEG, and PNG files
     - Maximum file size: 10MB
     - Returns extracted text and metadata
+    - With `async=true`, returns `202` with a job ID immediately; poll
+      `GET /process/status/{job_id}` for progress and results, or follow
+      `GET /process/{job_id}/events` to receive each page as it finishes
+    - With `stream=true`, each page's text and extracted fields are streamed as
+      newline-delimited JSON (`{"type": "page", ...}`) as soon as that page is
+      finished, followed by a `{"type": "complete", ...}` summary line
+    - Without `doc_type`, the form (W-2 or 1099 variant) and its year are
+      classified from a low-resolution header OCR before the full-page pass
+    - Uploaded documents are kept in the blob store and the response carries
+      their SHA-256 as `blob_hash` and a reference as `blob_ref`; send both
+      instead of `file` to process the same document again without
+      re-uploading it. The document is kept as long as the parsed document
+      (or the job, in async mode)
+    - The parsed document is kept under the returned `document_id`; pass it to
+      `POST /analyze` instead of the text, or set `analyze=true` to get the
+      analysis in the same response (or in the job result)
     
     ## Supported Document Types
     
@@ -1373,11 +1931,38 @@ async def shutdown_event():
     """
 )
 async def process_document(
-    file: UploadFile = File(..., description="The tax document to process"),
+    file: Optional[UploadFile] = File(None, description="The tax document to process"),
+    blob_hash: Optional[str] = Query(None, description="SHA-256 of a previously uploaded document, instead of `file`"),
+    blob_ref: Optional[str] = Query(None, description="The `blob_ref` returned when the document was stored, required with `blob_hash`"),
+    doc_type: Optional[str] = Query(None, description="Type of document (w2, 1099, etc.); classified automatically when omitted"),
+    async_mode: bool = Query(False, alias="async", description="Queue the document and return a job ID immediately"),
+    stream: bool = Query(False, description="Stream per-page results as newline-delimited JSON"),
+    analyze: bool = Query(False, description="Also run the tax analyzer on the parsed document"),
     cache: bool = Query(True, description="Whether to cache the results")
 ) -> ProcessResponse:
     """Process a tax document."""
     try:
+        if (file is None) == (blob_hash is None):
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "detail": "Provide either a file or a blob_hash",
+                    "code": "INVALID_REQUEST",
+                    "timestamp": datetime.now()
+                }
+            )
+        
+        if blob_hash is not None:
+            if not blob_store.has_ref(blob_hash, blob_ref):
+                raise _blob_not_found(blob_hash)
+            if async_mode:
+                return _job_submitted(_queue_blob(blob_hash, blob_ref, doc_type, None, analyze))
+            if stream:
+                job = _queue_blob(blob_hash, blob_ref, doc_type, None, analyze)
+                return StreamingResponse(_ndjson_events(job), media_type="application/x-ndjson")
+            result = await run_in_threadpool(_process_blob, blob_hash, doc_type)
+            return _process_response(result, blob_hash, blob_ref, analyze)
+        
         # Validate file type
         if not file.filename.lower().endswith(('.pdf', '.jpg', '.jpeg', '.png')):
             raise HTTPException(
@@ -1389,26 +1974,29 @@ async def process_document(
                 }
             )
         
-        # Save file temporarily
-        file_path = f"temp_{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        if async_mode:
+            return await _submit_processing_job(file, doc_type, analyze)
         
-        # Process document
-        result = document_processor.process_document(file_path)
+        if stream:
+            job = await _queue_upload(file, doc_type, analyze)
+            return StreamingResponse(_ndjson_events(job), media_type="application/x-ndjson")
         
-        # Clean up
-        os.remove(file_path)
+        # The stored document is kept as long as its parse (store it with POST /blobs to keep it longer);
+        # storing and OCR block, so both run off the event loop
+        suffix = os.path.splitext(file.filename)[1].lower()
+        if suffix in IMAGE_EXTENSIONS and file.size is not None and file.size <= MEMORY_DECODE_MAX_BYTES:
+            # Small images are decoded straight from the request buffer
+            data = await file.read()
+            blob = await run_in_threadpool(blob_store.put_bytes, data, ttl=document_store.ttl)
+            result = await run_in_threadpool(document_processor.process_bytes, data, doc_type)
+        else:
+            # Large images and PDFs are streamed into the blob store and read back from there
+            blob = await run_in_threadpool(blob_store.put, file.file, ttl=document_store.ttl)
+            result = await run_in_threadpool(_process_blob, blob["hash"], doc_type)
         
-        return ProcessResponse(
-            document_id=str(uuid.uuid4()),
-            status="success",
-            text=result.get("text", ""),
-            confidence=result.get("confidence", 0.0),
-            processing_time=result.get("processing_time", 0.0),
-            metadata=result.get("metadata", {})
-        )
+        return _process_response(result, blob["hash"], blob["ref"], analyze)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}")
         raise HTTPException(
@@ -1420,49 +2008,1067 @@ async def process_document(
             }
         )
 
-@app.post(
-    "/analyze",
-    response_model=AnalyzeResponse,
+def _process_response(result: Dict[str, Any], blob_hash: str, blob_ref: str, analyze: bool = False) -> ProcessResponse:
+    return ProcessResponse(
+        document_id=result.get("document_id") or str(uuid.uuid4()),
+        status="success",
+        text=result.get("text", ""),
+        confidence=result.get("confidence", 0.0),
+        processing_time=result.get("processing_time", 0.0),
+        metadata=result.get("metadata", {}),
+        blob_hash=blob_hash,
+        blob_ref=blob_ref,
+        analysis=_analyze_processed(result) if analyze else None
+    )
+
+def _analyze_processed(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Analyze a just-processed document from its stored parse, without re-parsing its text."""
+    document = document_store.get(result["document_id"]) if result.get("document_id") else None
+    if document is None:
+        return None
+    return tax_analyzer.analyze_document(document.doc_type or "generic", document)
+
+def _blob_not_found(blob_hash: str) -> HTTPException:
+    return HTTPException(
+        status_code=404,
+        detail={
+            "detail": f"Unknown blob: {blob_hash}",
+            "code": "BLOB_NOT_FOUND",
+            "timestamp": datetime.now()
+        }
+    )
+
+def _process_blob(blob_hash: str, doc_type: Optional[str]) -> Dict[str, Any]:
+    """Run the OCR pipeline on a stored document."""
+    with blob_store.local_file(blob_hash) as file_path:
+        return document_processor.process_document(file_path, doc_type, content_hash=blob_hash)
+
+def _run_blob_job(job, blob_hash: str, doc_type: Optional[str], analyze: bool = False) -> Dict[str, Any]:
+    """Run the OCR/analysis pipeline for a queued job on a stored document."""
+    with blob_store.local_file(blob_hash) as file_path:
+        result = document_processor.process_document(
+            file_path, doc_type, progress_callback=job.update_progress,
+            page_callback=job.add_page, content_hash=blob_hash
+        )
+    if analyze:
+        result["analysis"] = _analyze_processed(result)
+    return result
+
+def _queue_blob(
+    blob_hash: str,
+    blob_ref: str,
+    doc_type: Optional[str],
+    filename: Optional[str],
+    analyze: bool = False,
+    job_id: Optional[str] = None
+) -> Job:
+    """Queue a stored document for background processing."""
+    try:
+        return job_queue.submit(
+            _run_blob_job, blob_hash, doc_type, analyze,
+            metadata={"filename": filename, "doc_type": doc_type, "blob_hash": blob_hash, "blob_ref": blob_ref},
+            job_id=job_id
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "detail": str(e),
+                "code": "QUEUE_FULL",
+                "timestamp": datetime.now()
+            },
+            headers={"Retry-After": "30"}
+        )
+
+async def _queue_upload(file: UploadFile, doc_type: Optional[str], analyze: bool = False) -> Job:
+    """Store an upload in the blob store and queue it for background processing."""
+    # The job owns the stored document, which is released when the job expires
+    job_id = str(uuid.uuid4())
+    blob = await run_in_threadpool(blob_store.put, file.file, owner=f"job:{job_id}")
+    try:
+        return _queue_blob(blob["hash"], blob["ref"], doc_type, file.filename, analyze, job_id)
+    except HTTPException:
+        await run_in_threadpool(blob_store.release, blob["hash"], blob["ref"])
+        raise
+
+def _job_submitted(job: Job) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content=JobSubmittedResponse(
+            job_id=job.job_id,
+            status=job.status,
+            status_url=f"/process/status/{job.job_id}",
+            events_url=f"/process/{job.job_id}/events",
+            blob_hash=job.metadata.get("blob_hash"),
+            blob_ref=job.metadata.get("blob_ref")
+        ).dict()
+    )
+
+async def _submit_processing_job(file: UploadFile, doc_type: Optional[str], analyze: bool = False) -> JSONResponse:
+    """Queue an upload and return its job ID immediately."""
+    return _job_submitted(await _queue_upload(file, doc_type, analyze))
+
+async def _ndjson_events(job: Job) -> AsyncIterator[str]:
+    """Per-page results of a job as newline-delimited JSON, ending with a summary line."""
+    async for event, data in job_events(job):
+        if event != "keepalive":
+            yield json.dumps({"type": event, **data}, default=str) + "\n"
+
+async def _sse_events(job: Job, start: int) -> AsyncIterator[str]:
+    """Per-page results of a job as Server-Sent Events; page events carry the page number as ID."""
+    async for event, data in job_events(job, start=start):
+        if event == "keepalive":
+            yield ": keepalive\n\n"
+            continue
+        event_id = f"id: {data['page']}\n" if event == "page" else ""
+        yield f"{event_id}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get(
+    "/process/status/{job_id}",
+    response_model=JobStatusResponse,
+    responses={
+        404: {
+            "model": ErrorResponse,
+            "description": "Unknown or expired job",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Job not found",
+                        "code": "JOB_NOT_FOUND",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Documents"],
+    summary="Get processing job status",
+    description="""
+    Get the progress and, once finished, the result of an asynchronous processing job.
+    
+    ## Example Request
+    ```bash
+    curl -X GET "http://localhost:8000/process/status/7c9e6679-7425-40de-944b-e07fc1f90ae7" \\
+         -H "Authorization: Bearer {token}"
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "job_id": "7c9e6679-7425-40de-944b-e07fc1f90ae7",
+        "status": "processing",
+        "progress": {
+            "pages_done": 2,
+            "pages_total": 5,
+            "percent": 40.0
+        },
+        "result": null,
+        "error": null,
+        "metadata": {
+            "filename": "1099_composite.pdf",
+            "doc_type": "1099"
+        },
+        "created_at": "2024-03-20T10:30:00Z",
+        "started_at": "2024-03-20T10:30:01Z",
+        "completed_at": null
+    }
+    ```
+    """
+)
+async def get_job_status(job_id: str) -> JobStatusResponse:
+    """Get processing job status."""
+    # Lookups may prune expired jobs, releasing their stored documents
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "detail": "Job not found",
+                "code": "JOB_NOT_FOUND",
+                "timestamp": datetime.now()
+            }
+        )
+    return JobStatusResponse(**job.to_dict())
+
+@app.get(
+    "/process/{job_id}/events",
     responses={
         200: {
-            "description": "Successful analysis",
+            "description": "Per-page results streamed as Server-Sent Events",
+            "content": {
+                "text/event-stream": {
+                    "example": "id: 1\nevent: page\ndata: {\"page\": 1, \"text\": \"...\", \"data\": {...}, \"pages_total\": 6}\n\n"
+                }
+            }
+        },
+        404: {
+            "model": ErrorResponse,
+            "description": "Unknown or expired job",
             "content": {
                 "application/json": {
                     "example": {
-                        "document_id": "aa0e8400-e29b-41d4-a716-446655440000",
-                        "doc_type": "W-2",
-                        "analysis": {
-                            "wages": 75000.00,
-                            "federal_tax": 15000.00,
-                            "state_tax": 3750.00,
-                            "social_security": 4650.00,
-                            "medicare": 1088.00,
-                            "estimated_tax_rate": 20.00,
-                            "has_retirement_plan": true,
-                            "has_health_insurance": true
-                        },
-                        "tax_calculations": {
-                            "taxable_income": 75000.00,
-                            "effective_tax_rate": 0.20,
-                            "marginal_tax_rate": 0.22,
-                            "tax_brackets": [
-                                {
-                                    "rate": 0.10,
-                                    "min_income": 0.00,
-                                    "max_income": 11000.00
-                                },
-                                {
-                                    "rate": 0.12,
-                                    "min_income": 11000.00,
-                                    "max_income": 44725.00
-                                },
-                                {
-                                    "rate": 0.22,
-                                    "min_income": 44725.00,
-                                    "max_income": 95375.00
-                                }
-                            ],
-                            "total_tax": 15000.00,
+                        "detail": "Job not found",
+                        "code": "JOB_NOT_FOUND",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Documents"],
+    summary="Stream per-page results of a processing job",
+    description="""
+    Follow an asynchronous processing job (`POST /process?async=true`) with
+    Server-Sent Events. Each page's text and extracted fields are sent as soon
+    as that page is finished, so the first box values of a long 1099 composite
+    statement can be shown while later pages are still being processed.
+    
+    - `page` events carry the page result and `pages_total`; their ID is the page number
+    - Reconnecting with `Last-Event-ID` resumes after that page
+    - A final `complete` event carries the document-level result (document type,
+      classification, confidence), or `failed` carries the error
+    - Comment lines are sent as keep-alives while a page is in progress
+    
+    ## Example Request
+    ```bash
+    curl -N "http://localhost:8000/process/7c9e6679-7425-40de-944b-e07fc1f90ae7/events" \\
+         -H "Authorization: Bearer {token}"
+    ```
+    
+    ## Example Response
+    ```
+    id: 1
+    event: page
+    data: {"page": 1, "text": "Form W-2 Wage and Tax Statement 2023...", "data": {"type": "w2", ...}, "confidence": 0.93, "pages_total": 2}
+    
+    id: 2
+    event: page
+    data: {"page": 2, "text": "...", "data": {"type": "w2", ...}, "confidence": 0.91, "pages_total": 2}
+    
+    event: complete
+    data: {"job_id": "7c9e6679-7425-40de-944b-e07fc1f90ae7", "success": true, "doc_type": "w2", "pages": 2, "confidence": 0.92}
+    ```
+    """
+)
+async def stream_job_events(
+    job_id: str,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+) -> StreamingResponse:
+    """Stream per-page results of a processing job."""
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "detail": "Job not found",
+                "code": "JOB_NOT_FOUND",
+                "timestamp": datetime.now()
+            }
+        )
+    start = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return StreamingResponse(
+        _sse_events(job, start),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get(
+    "/process/queue",
+    response_model=QueueStatsResponse,
+    tags=["Documents"],
+    summary="Get processing queue metrics",
+    description="""
+    Get depth and throughput metrics for the asynchronous processing queue.
+    
+    ## Example Request
+    ```bash
+    curl -X GET "http://localhost:8000/process/queue" \\
+         -H "Authorization: Bearer {token}"
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "queued": 3,
+        "running": 2,
+        "max_workers": 2,
+        "max_queue_depth": 50,
+        "utilization": 0.1,
+        "submitted": 120,
+        "completed": 112,
+        "failed": 3,
+        "rejected": 0,
+        "avg_wait_time": 1.8,
+        "avg_run_time": 6.4,
+        "tracked_jobs": 120
+    }
+    ```
+    """
+)
+async def get_queue_stats() -> QueueStatsResponse:
+    """Get processing queue metrics."""
+    return QueueStatsResponse(**await run_in_threadpool(job_queue.get_stats))
+
+@app.get(
+    "/process/ocr-stats",
+    response_model=OCRStatsResponse,
+    tags=["Documents"],
+    summary="Get OCR pipeline metrics",
+    description="""
+    Get statistics of the OCR pipeline: how often the low-DPI first pass
+    needed selective re-OCR of low-confidence regions (`reocr_rate`), W-2
+    barcode decodes, near-duplicate page reuse and the OCR result store.
+    
+    ## Example Request
+    ```bash
+    curl -X GET "http://localhost:8000/process/ocr-stats" \\
+         -H "Authorization: Bearer {token}"
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "adaptive_ocr": {
+            "pages": 240,
+            "words": 51200,
+            "low_confidence_words": 1830,
+            "reocr_pages": 96,
+            "reocr_regions": 410,
+            "improved_regions": 322,
+            "reocr_rate": 0.4,
+            "regions_per_page": 1.71
+        },
+        "barcode": {
+            "attempts": 180,
+            "decoded": 41,
+            "decode_rate": 0.228
+        },
+        "page_index": {
+            "entries": 15230,
+            "matches": 12
+        },
+        "ocr_store": {
+            "hits": 35,
+            "misses": 240,
+            "hit_rate": 0.127
+        }
+    }
+    ```
+    """
+)
+async def get_ocr_stats() -> OCRStatsResponse:
+    """Get OCR pipeline metrics."""
+    return OCRStatsResponse(**document_processor.get_stats())
+
+def _upload_error(e: UploadError) -> HTTPException:
+    """Map an upload manager error to its HTTP error response."""
+    if isinstance(e, UploadNotFoundError):
+        return HTTPException(
+            status_code=404,
+            detail={"detail": str(e), "code": "UPLOAD_NOT_FOUND", "timestamp": datetime.now()}
+        )
+    if isinstance(e, OffsetMismatchError):
+        # Tell the client where to resume
+        return HTTPException(
+            status_code=409,
+            detail={"detail": str(e), "code": "OFFSET_MISMATCH", "timestamp": datetime.now()},
+            headers={"Upload-Offset": str(e.expected)}
+        )
+    code = "CHECKSUM_MISMATCH" if isinstance(e, ChecksumMismatchError) else "INVALID_UPLOAD"
+    return HTTPException(
+        status_code=400,
+        detail={"detail": str(e), "code": code, "timestamp": datetime.now()}
+    )
+
+def _run_upload_job(job, upload_id: str, file_path: str, doc_type: Optional[str], content_hash: Optional[str]) -> Dict[str, Any]:
+    """Keep a finalized single-file upload as a blob, process it in place, then release its workspace."""
+    try:
+        # Hard-linked into the blob store on the filesystem backend, so nothing is copied
+        blob = blob_store.put_file(file_path, content_hash, owner=f"job:{job.job_id}")
+        job.metadata["blob_ref"] = blob["ref"]
+        return document_processor.process_document(
+            file_path, doc_type, progress_callback=job.update_progress,
+            page_callback=job.add_page, content_hash=content_hash
+        )
+    finally:
+        upload_manager.release(upload_id)
+
+def _run_pipelined_upload_job(job, upload_id: str, part_count: int, doc_type: Optional[str]) -> Dict[str, Any]:
+    """OCR the page images of a multi-part upload in order, each as soon as it has arrived."""
+    try:
+        pages = (
+            document_processor.image_tiler.load_image(path)
+            for path in upload_manager.iter_parts(upload_id, timeout=UPLOAD_PART_TIMEOUT)
+        )
+        return document_processor.process_pages(
+            part_count, pages, doc_type,
+            progress_callback=job.update_progress, page_callback=job.add_page
+        )
+    finally:
+        upload_manager.release(upload_id)
+
+def _submit_upload_job(upload_id: str, expected: Optional[str], func, *args: Any, metadata: Dict[str, Any]) -> Optional[Job]:
+    """
+    Start an upload's processing job, unless a concurrent request already has.
+
+    The job ID is claimed on the upload before the job is submitted, so of two
+    requests that both saw ``expected`` only one starts a job (two would share,
+    and each release, one workspace).
+
+    Returns:
+        The job, or None if the queue is full or another request's job is not queued yet
+    """
+    job_id = str(uuid.uuid4())
+    if not upload_manager.claim_job(upload_id, job_id, expected):
+        current = upload_manager.status(upload_id)["job_id"]
+        return job_queue.get(current) if current else None
+    try:
+        return job_queue.submit(func, *args, metadata=metadata, job_id=job_id)
+    except QueueFullError:
+        # Give the claim back, so a later request can retry
+        upload_manager.claim_job(upload_id, expected, job_id)
+        return None
+
+def _start_pipelined_job(status: Dict[str, Any], expected: Optional[str] = None) -> Optional[Job]:
+    """Start processing a multi-part upload once its first part has arrived; None if the queue is full."""
+    job = _submit_upload_job(
+        status["upload_id"], expected,
+        _run_pipelined_upload_job, status["upload_id"], len(status["parts"]), status["doc_type"],
+        metadata={"filename": status["filename"], "doc_type": status["doc_type"], "upload_id": status["upload_id"]}
+    )
+    if job is not None:
+        status["job_id"] = job.job_id
+    return job
+
+async def _read_chunk(request: Request) -> bytes:
+    """Read a chunk's body, refusing one over the chunk size limit before it is all in memory."""
+    limit = upload_manager.max_chunk_size
+    too_large = UploadError(f"Chunks may be at most {limit} bytes")
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > limit:
+        raise _upload_error(too_large)
+    data = bytearray()
+    async for piece in request.stream():
+        data.extend(piece)
+        if len(data) > limit:
+            raise _upload_error(too_large)
+    return bytes(data)
+
+@app.post(
+    "/uploads",
+    response_model=UploadStatusResponse,
+    status_code=201,
+    responses={
+        400: {
+            "model": ErrorResponse,
+            "description": "Unsupported file type or invalid size",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Upload size must be between 1 byte and 104857600 bytes",
+                        "code": "INVALID_UPLOAD",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Uploads"],
+    summary="Create a resumable upload",
+    description="""
+    Start a resumable, chunked upload for large scans sent over unreliable
+    connections.
+    
+    - Send `size` for a single PDF or image, or `part_sizes` for a document
+      scanned as one image per page
+    - Upload the bytes with `PATCH /uploads/{upload_id}`, then call
+      `POST /uploads/{upload_id}/finalize`
+    - Page images of a multi-part upload are OCR'd as soon as each one has
+      arrived; the job is reported as `job_id` while later pages upload
+    - Unfinished uploads are discarded after `UPLOAD_EXPIRY_HOURS`
+    
+    ## Example Request
+    ```bash
+    curl -X POST "http://localhost:8000/uploads" \\
+         -H "Authorization: Bearer {token}" \\
+         -H "Content-Type: application/json" \\
+         -d '{"filename": "1099_composite.pdf", "size": 31457280, "doc_type": "1099"}'
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "upload_id": "3f2b8c1e9a4d4e6f8b7a6c5d4e3f2a1b",
+        "filename": "1099_composite.pdf",
+        "doc_type": "1099",
+        "status": "uploading",
+        "size": 31457280,
+        "offset": 0,
+        "parts": [
+            {"part": 0, "size": 31457280, "offset": 0, "complete": false}
+        ],
+        "job_id": null,
+        "expires_at": "2024-03-21T10:30:00Z"
+    }
+    ```
+    """
+)
+async def create_upload(request: UploadCreateRequest) -> UploadStatusResponse:
+    """Create a resumable upload."""
+    part_sizes = request.part_sizes or ([request.size] if request.size else [])
+    try:
+        return UploadStatusResponse(**upload_manager.create(request.filename, part_sizes, request.doc_type))
+    except UploadError as e:
+        raise _upload_error(e)
+
+@app.patch(
+    "/uploads/{upload_id}",
+    response_model=UploadStatusResponse,
+    responses={
+        400: {
+            "model": ErrorResponse,
+            "description": "Chunk checksum mismatch, oversized chunk or unknown part",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Chunk checksum does not match",
+                        "code": "CHECKSUM_MISMATCH",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        },
+        404: {
+            "model": ErrorResponse,
+            "description": "Unknown or expired upload"
+        },
+        409: {
+            "model": ErrorResponse,
+            "description": "Chunk does not start at the part's current offset; the `Upload-Offset` header has the offset to resume from",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Chunk starts at offset 8388608, expected 16777216",
+                        "code": "OFFSET_MISMATCH",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Uploads"],
+    summary="Upload a chunk",
+    description="""
+    Append a chunk to a part of a resumable upload. The request body is the
+    raw chunk bytes.
+    
+    - `Upload-Offset` must equal the part's current offset; after a dropped
+      connection, get it from `GET /uploads/{upload_id}`
+    - `Upload-Checksum` (optional) is the hex SHA-256 of the chunk; corrupt
+      chunks are rejected and not written
+    - Chunks may be at most `UPLOAD_MAX_CHUNK_MB` megabytes
+    
+    ## Example Request
+    ```bash
+    curl -X PATCH "http://localhost:8000/uploads/3f2b8c1e9a4d4e6f8b7a6c5d4e3f2a1b?part=0" \\
+         -H "Authorization: Bearer {token}" \\
+         -H "Content-Type: application/offset+octet-stream" \\
+         -H "Upload-Offset: 8388608" \\
+         -H "Upload-Checksum: 9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08" \\
+         --data-binary @chunk_0001.bin
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "upload_id": "3f2b8c1e9a4d4e6f8b7a6c5d4e3f2a1b",
+        "filename": "1099_composite.pdf",
+        "doc_type": "1099",
+        "status": "uploading",
+        "size": 31457280,
+        "offset": 16777216,
+        "parts": [
+            {"part": 0, "size": 31457280, "offset": 16777216, "complete": false}
+        ],
+        "job_id": null,
+        "expires_at": "2024-03-21T10:30:00Z"
+    }
+    ```
+    """
+)
+async def upload_chunk(
+    request: Request,
+    upload_id: str,
+    part: int = Query(0, ge=0, description="Zero-based part number"),
+    upload_offset: int = Header(..., alias="Upload-Offset", ge=0, description="Offset of the chunk within the part"),
+    upload_checksum: Optional[str] = Header(None, alias="Upload-Checksum", description="Hex SHA-256 of the chunk")
+) -> UploadStatusResponse:
+    """Upload a chunk."""
+    data = await _read_chunk(request)
+    try:
+        # Writing and hashing the chunk is file I/O, kept off the event loop
+        status = await run_in_threadpool(upload_manager.write_chunk, upload_id, part, upload_offset, data, upload_checksum)
+    except UploadError as e:
+        raise _upload_error(e)
+    
+    if status["part_completed"] is not None and len(status["parts"]) > 1 and status["job_id"] is None:
+        _start_pipelined_job(status)
+    return UploadStatusResponse(**status)
+
+@app.get(
+    "/uploads/{upload_id}",
+    response_model=UploadStatusResponse,
+    responses={
+        404: {
+            "model": ErrorResponse,
+            "description": "Unknown or expired upload",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Upload not found",
+                        "code": "UPLOAD_NOT_FOUND",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Uploads"],
+    summary="Get upload offsets",
+    description="""
+    Get how many bytes of each part have been received, to resume an
+    interrupted upload from the right offset.
+    
+    ## Example Request
+    ```bash
+    curl -X GET "http://localhost:8000/uploads/3f2b8c1e9a4d4e6f8b7a6c5d4e3f2a1b" \\
+         -H "Authorization: Bearer {token}"
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "upload_id": "3f2b8c1e9a4d4e6f8b7a6c5d4e3f2a1b",
+        "filename": "w2_scan.jpg",
+        "doc_type": null,
+        "status": "uploading",
+        "size": 5242880,
+        "offset": 3670016,
+        "parts": [
+            {"part": 0, "size": 2097152, "offset": 2097152, "complete": true},
+            {"part": 1, "size": 3145728, "offset": 1572864, "complete": false}
+        ],
+        "job_id": "7c9e6679-7425-40de-944b-e07fc1f90ae7",
+        "expires_at": "2024-03-21T10:30:00Z"
+    }
+    ```
+    """
+)
+async def get_upload_status(upload_id: str) -> UploadStatusResponse:
+    """Get upload offsets."""
+    try:
+        return UploadStatusResponse(**upload_manager.status(upload_id))
+    except UploadError as e:
+        raise _upload_error(e)
+
+@app.post(
+    "/uploads/{upload_id}/finalize",
+    response_model=JobSubmittedResponse,
+    status_code=202,
+    responses={
+        400: {
+            "model": ErrorResponse,
+            "description": "Upload incomplete or checksum mismatch",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Parts [1] are incomplete",
+                        "code": "INVALID_UPLOAD",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        },
+        404: {
+            "model": ErrorResponse,
+            "description": "Unknown or expired upload"
+        },
+        503: {
+            "model": ErrorResponse,
+            "description": "Processing queue is full; retry after the indicated delay"
+        }
+    },
+    tags=["Uploads"],
+    summary="Finalize an upload and process it",
+    description="""
+    Complete a resumable upload and queue it for processing. The file is
+    processed in place from its upload workspace, and the SHA-256 computed
+    while it was uploaded keys the OCR result store, so the file is not
+    read again before OCR starts.
+    
+    - `checksum` (optional) is the hex SHA-256 of the whole file of a single-part upload
+    - For multi-part uploads whose pages are already being processed, the running job is returned
+    - Finalizing again returns the same job
+    
+    ## Example Request
+    ```bash
+    curl -X POST "http://localhost:8000/uploads/3f2b8c1e9a4d4e6f8b7a6c5d4e3f2a1b/finalize" \\
+         -H "Authorization: Bearer {token}"
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "job_id": "7c9e6679-7425-40de-944b-e07fc1f90ae7",
+        "status": "queued",
+        "status_url": "/process/status/7c9e6679-7425-40de-944b-e07fc1f90ae7",
+        "events_url": "/process/7c9e6679-7425-40de-944b-e07fc1f90ae7/events"
+    }
+    ```
+    """
+)
+async def finalize_upload(
+    upload_id: str,
+    checksum: Optional[str] = Query(None, description="Hex SHA-256 of the whole file")
+) -> JSONResponse:
+    """Finalize an upload and process it."""
+    try:
+        status = upload_manager.status(upload_id)
+        # Rehashes a part from disk if the service restarted mid-upload
+        upload = await run_in_threadpool(upload_manager.finalize, upload_id, checksum)
+    except UploadError as e:
+        raise _upload_error(e)
+    
+    job = job_queue.get(upload["job_id"]) if upload["job_id"] else None
+    if job is None:
+        if len(upload["paths"]) == 1:
+            job = _submit_upload_job(
+                upload_id, upload["job_id"],
+                _run_upload_job, upload_id, upload["paths"][0], status["doc_type"], upload["content_hash"],
+                metadata={
+                    "filename": status["filename"], "doc_type": status["doc_type"],
+                    "upload_id": upload_id, "blob_hash": upload["content_hash"]
+                }
+            )
+        else:
+            job = _start_pipelined_job(status, upload["job_id"])
+        if job is None:
+            # The upload stays finalized; the client retries finalize later
+            raise HTTPException(
+                status_code=503,
+                detail={
+                    "detail": "Processing queue is full",
+                    "code": "QUEUE_FULL",
+                    "timestamp": datetime.now()
+                },
+                headers={"Retry-After": "30"}
+            )
+    
+    return _job_submitted(job)
+
+@app.post(
+    "/blobs",
+    response_model=BlobResponse,
+    status_code=201,
+    tags=["Blobs"],
+    summary="Store a document",
+    description="""
+    Store a document without processing it. Documents are keyed by the SHA-256
+    of their content, so uploading the same file twice stores it once and
+    returns the same hash. Pass the hash as `blob_hash` and the returned
+    `ref` as `blob_ref` to `POST /process` to process the document without
+    sending it again.
+    
+    Every upload gets its own `ref`, which is needed to read or release the
+    document and expires after `BLOB_TTL` seconds (default one day). The
+    document is deleted once all its references are released or expired.
+    
+    Documents sent to `/process` or `/uploads` are stored the same way; their
+    hash and reference are returned as `blob_hash` and `blob_ref`, and last
+    as long as the parsed document or the processing job.
+    
+    ## Example Request
+    ```bash
+    curl -X POST "http://localhost:8000/blobs" \\
+         -H "Authorization: Bearer {token}" \\
+         -F "file=@w2_form.pdf"
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "hash": "9f2c4b1a7e3d5c6b8a9f0e1d2c3b4a5968778695a4b3c2d1e0f9a8b7c6d5e4f3",
+        "size": 248331,
+        "refs": 1,
+        "deduplicated": false,
+        "ref": "1b4e28ba2fa1411d9b6d0c5e7a3f8c21",
+        "expires": 1710973800.0
+    }
+    ```
+    """
+)
+async def put_blob(
+    file: UploadFile = File(..., description="The document to store")
+) -> BlobResponse:
+    """Store a document."""
+    return BlobResponse(**await run_in_threadpool(blob_store.put, file.file))
+
+@app.get(
+    "/blobs/{blob_hash}",
+    responses={
+        200: {
+            "description": "Document content",
+            "content": {"application/octet-stream": {}}
+        },
+        404: {
+            "model": ErrorResponse,
+            "description": "Unknown blob hash, or a reference that is not to it",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Unknown blob: 9f2c4b1a7e3d5c6b8a9f0e1d2c3b4a5968778695a4b3c2d1e0f9a8b7c6d5e4f3",
+                        "code": "BLOB_NOT_FOUND",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Blobs"],
+    summary="Download a stored document",
+    description="""
+    Stream a stored document back to a holder of one of its references. Content
+    never changes for a given hash, so responses carry the hash as `ETag` and
+    may be cached indefinitely.
+    
+    ## Example Request
+    ```bash
+    curl -X GET "http://localhost:8000/blobs/9f2c4b1a7e3d5c6b8a9f0e1d2c3b4a5968778695a4b3c2d1e0f9a8b7c6d5e4f3" \\
+         -H "Authorization: Bearer {token}" \\
+         -H "Blob-Ref: 1b4e28ba2fa1411d9b6d0c5e7a3f8c21" \\
+         -o w2_form.pdf
+    ```
+    """
+)
+async def get_blob(
+    blob_hash: str,
+    blob_ref: str = Header(..., alias="Blob-Ref", description="A reference to the document, as returned when it was stored")
+) -> StreamingResponse:
+    """Download a stored document."""
+    info = blob_store.info(blob_hash)
+    if info is None or not blob_store.has_ref(blob_hash, blob_ref):
+        raise _blob_not_found(blob_hash)
+    try:
+        chunks = blob_store.iter_chunks(blob_hash)
+    except BlobNotFoundError:
+        # Released between the lookup and the read
+        raise _blob_not_found(blob_hash)
+    return StreamingResponse(
+        chunks,
+        media_type="application/octet-stream",
+        headers={
+            "Content-Length": str(info["size"]),
+            "ETag": f'"{blob_hash}"',
+            "Cache-Control": "private, max-age=31536000, immutable"
+        }
+    )
+
+@app.delete(
+    "/blobs/{blob_hash}",
+    responses={
+        404: {
+            "model": ErrorResponse,
+            "description": "Unknown blob hash, or a reference that is not to it",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Unknown blob: 9f2c4b1a7e3d5c6b8a9f0e1d2c3b4a5968778695a4b3c2d1e0f9a8b7c6d5e4f3",
+                        "code": "BLOB_NOT_FOUND",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Blobs"],
+    summary="Release a stored document",
+    description="""
+    Drop the reference to a stored document given in `Blob-Ref`. The content
+    is deleted once no references remain.
+    
+    ## Example Request
+    ```bash
+    curl -X DELETE "http://localhost:8000/blobs/9f2c4b1a7e3d5c6b8a9f0e1d2c3b4a5968778695a4b3c2d1e0f9a8b7c6d5e4f3" \\
+         -H "Authorization: Bearer {token}" \\
+         -H "Blob-Ref: 1b4e28ba2fa1411d9b6d0c5e7a3f8c21"
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "hash": "9f2c4b1a7e3d5c6b8a9f0e1d2c3b4a5968778695a4b3c2d1e0f9a8b7c6d5e4f3",
+        "refs": 0,
+        "deleted": true
+    }
+    ```
+    """
+)
+async def delete_blob(
+    blob_hash: str,
+    blob_ref: str = Header(..., alias="Blob-Ref", description="The reference to release, as returned when the document was stored")
+) -> Dict[str, Any]:
+    """Release a stored document."""
+    try:
+        refs = await run_in_threadpool(blob_store.release, blob_hash, blob_ref)
+    except BlobNotFoundError:
+        raise _blob_not_found(blob_hash)
+    return {"hash": blob_hash, "refs": refs, "deleted": refs == 0}
+
+@app.post(
+    "/process/batch",
+    responses={
+        200: {
+            "description": "Per-document results streamed as newline-delimited JSON",
+            "content": {
+                "application/x-ndjson": {
+                    "example": "{\"type\": \"document\", \"index\": 1, \"filename\": \"1099_int.pdf\", \"success\": true, \"pages\": 1, \"results\": [...], \"processing_time\": 2.1}\n"
+                }
+            }
+        },
+        400: {
+            "model": ErrorResponse,
+            "description": "Empty batch, unsupported file type or too many documents",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Batch exceeds maximum of 50 documents",
+                        "code": "INVALID_BATCH",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        },
+        413: {
+            "model": ErrorResponse,
+            "description": "Uploaded files exceed the batch size limit",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Batch exceeds maximum size of 209715200 bytes",
+                        "code": "BATCH_TOO_LARGE",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Documents"],
+    summary="Process a batch of tax documents",
+    description="""
+    Process multiple tax documents (or a zip archive of documents) in one request.
+    
+    - Supports PDF, JPG, JPEG and PNG files, and zip archives containing them
+    - Uploads may total `BATCH_MAX_MB` (default 200MB), and archives may
+      expand to 200MB between them
+    - Documents are processed concurrently, up to `max_concurrency` at a time
+    - Results are streamed as newline-delimited JSON, one line per document in
+      completion order, followed by a summary line
+    
+    ## Example Request
+    ```bash
+    curl -N -X POST "http://localhost:8000/process/batch?doc_type=1099" \\
+         -H "Authorization: Bearer {token}" \\
+         -F "files=@client_folder.zip"
+    ```
+    
+    ## Example Response
+    ```
+    {"type": "document", "index": 2, "filename": "1099_int.pdf", "success": true, "pages": 1, "results": [...], "processing_time": 2.1}
+    {"type": "document", "index": 0, "filename": "1099_div.pdf", "success": true, "pages": 2, "results": [...], "processing_time": 3.4}
+    {"type": "summary", "documents": 2, "succeeded": 2, "failed": 0, "concurrency": 4, "processing_time": 3.5}
+    ```
+    """
+)
+async def process_batch(
+    files: List[UploadFile] = File(..., description="Tax documents or zip archives to process"),
+    doc_type: Optional[str] = Query(None, description="Type of the documents (w2, 1099, etc.); classified per document when omitted"),
+    max_concurrency: Optional[int] = Query(None, ge=1, description="Maximum documents processed at once (capped by the server)")
+) -> StreamingResponse:
+    """Process a batch of tax documents."""
+    try:
+        # The form parser spools large files to disk; refuse an oversized batch before reading it into memory
+        batch_processor.check_batch_size([file.size for file in files])
+        uploads = [(file.filename, await file.read()) for file in files]
+        documents = batch_processor.expand_uploads(uploads)
+    except BatchTooLargeError as e:
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "detail": str(e),
+                "code": "BATCH_TOO_LARGE",
+                "timestamp": datetime.now()
+            }
+        )
+    except BatchValidationError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "detail": str(e),
+                "code": "INVALID_BATCH",
+                "timestamp": datetime.now()
+            }
+        )
+    
+    return StreamingResponse(
+        batch_processor.stream(documents, doc_type, max_concurrency),
+        media_type="application/x-ndjson"
+    )
+
+@app.post(
+    "/analyze",
+    response_model=AnalyzeResponse,
+    responses={
+        200: {
+            "description": "Successful analysis",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "document_id": "aa0e8400-e29b-41d4-a716-446655440000",
+                        "doc_type": "W-2",
+                        "analysis": {
+                            "wages": 75000.00,
+                            "federal_tax": 15000.00,
+                            "state_tax": 3750.00,
+                            "social_security": 4650.00,
+                            "medicare": 1088.00,
+                            "estimated_tax_rate": 20.00,
+                            "has_retirement_plan": True,
+                            "has_health_insurance": True
+                        },
+                        "tax_calculations": {
+                            "tax_year": 2023,
+                            "filing_status": "single",
+                            "taxable_income": 75000.00,
+                            "effective_tax_rate": 0.20,
+                            "marginal_tax_rate": 0.22,
+                            "tax_brackets": [
+                                {
+                                    "rate": 0.10,
+                                    "min_income": 0.00,
+                                    "max_income": 11000.00
+                                },
+                                {
+                                    "rate": 0.12,
+                                    "min_income": 11000.00,
+                                    "max_income": 44725.00
+                                },
+                                {
+                                    "rate": 0.22,
+                                    "min_income": 44725.00,
+                                    "max_income": 95375.00
+                                }
+                            ],
+                            "total_tax": 15000.00,
                             "credits": {
                                 "retirement_savings": 200.00,
                                 "child_tax_credit": 0.00,
@@ -1514,8 +3120,8 @@ async def process_document(
                             "required_minimum_distribution": None,
                             "catch_up_contributions": 0.00,
                             "roth_conversion_opportunity": 10000.00,
-                            "backdoor_roth_opportunity": true,
-                            "mega_backdoor_roth_opportunity": false,
+                            "backdoor_roth_opportunity": True,
+                            "mega_backdoor_roth_opportunity": False,
                             "hsa_contribution_limit": 3650.00,
                             "ira_contribution_limit": 6000.00,
                             "roth_ira_contribution_limit": 6000.00,
@@ -1797,18 +3403,64 @@ async def process_document(
         },
         400: {"model": ErrorResponse, "description": "Invalid input"},
         401: {"model": ErrorResponse, "description": "Unauthorized"},
+        404: {
+            "model": ErrorResponse,
+            "description": "Unknown or expired document_id",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Unknown document: 550e8400-e29b-41d4-a716-446655440000",
+                        "code": "DOCUMENT_NOT_FOUND",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        },
+        422: {
+            "model": ErrorResponse,
+            "description": "Document could not be analyzed",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Unsupported document type: 1040",
+                        "code": "ANALYSIS_ERROR",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        },
         500: {"model": ErrorResponse, "description": "Internal server error"}
     },
     description="""
     Analyze processed document data and extract tax-relevant information.
     
     - Supports W-2 and 1099 forms
+    - Send the `document_id` returned by `POST /process` instead of `text`
+      to analyze the document parsed during processing; `doc_type` then
+      defaults to the classified type
     - Returns analysis results and recommendations
     - Includes confidence scores and processing time
-    - Provides detailed tax calculations
-    - Includes investment and retirement calculations
+    - Provides detailed tax calculations for the document's tax year, or
+      `tax_year`, and `filing_status` (default `single`), from the tax
+      parameters of `TAX_PARAMETERS_DIR`
+    - Includes investment and retirement calculations; for 1099-B and composite
+      brokerage statements, the transaction tables are parsed page by page into
+      lots and totals by holding period (`analysis.transactions`), which fill
+      `investment_calculations`
+    - For W-2s sent with the employee's `age` (and optionally the current
+      `retirement_balance`), projects the Box 12 deferrals to retirement by
+      Monte Carlo simulation (see `POST /retirement-projection`), within
+      `RETIREMENT_TIME_BUDGET_MS`, into `retirement_calculations`
     - Offers tax optimization strategies
     
+    ## Analyzing a Processed Document
+    ```bash
+    curl -X POST "http://localhost:8000/analyze" \\
+         -H "Authorization: Bearer {token}" \\
+         -H "Content-Type: application/json" \\
+         -d '{"document_id": "550e8400-e29b-41d4-a716-446655440000"}'
+    ```
+    
     ## Document Type Examples
     
     ### W-2 Form Analysis (with Detailed Tax Calculations)
@@ -1838,6 +3490,8 @@ async def process_document(
             "has_health_insurance": true
         },
         "tax_calculations": {
+            "tax_year": 2023,
+            "filing_status": "single",
             "taxable_income": 75000.00,
             "effective_tax_rate": 0.20,
             "marginal_tax_rate": 0.22,
@@ -2192,17 +3846,112 @@ async def process_document(
     """
 )
 async def analyze_document(
-    doc_type: str = Body(..., description="Type of document to analyze"),
-    text: str = Body(..., description="Processed document text"),
+    doc_type: Optional[str] = Body(None, description="Type of document to analyze; defaults to the processed document's type"),
+    text: Optional[str] = Body(None, description="Processed document text"),
+    document_id: Optional[str] = Body(None, description="ID returned by /process, instead of `text`"),
+    tax_year: Optional[int] = Body(None, description="Tax year to calculate for; defaults to the document's"),
+    filing_status: str = Body("single", description=f"Filing status to calculate for: one of {', '.join(FILING_STATUSES)}"),
+    age: Optional[int] = Body(None, ge=0, description="Employee's age; with a W-2, adds a Monte Carlo retirement projection"),
+    retirement_balance: float = Body(0.0, ge=0, description="Current pre-tax retirement savings, for the retirement projection"),
     cache: bool = Query(True, description="Whether to cache the results")
 ) -> AnalyzeResponse:
     """Analyze processed document data."""
+    if (text is None) == (document_id is None):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "detail": "Provide either text or a document_id",
+                "code": "INVALID_REQUEST",
+                "timestamp": datetime.now()
+            }
+        )
+    document = text
+    if document_id is not None:
+        document = document_store.get(document_id)
+        if document is None:
+            raise HTTPException(
+                status_code=404,
+                detail={
+                    "detail": f"Unknown document: {document_id}",
+                    "code": "DOCUMENT_NOT_FOUND",
+                    "timestamp": datetime.now()
+                }
+            )
+        doc_type = doc_type or document.doc_type
+    if not doc_type:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "detail": "doc_type is required with text",
+                "code": "INVALID_REQUEST",
+                "timestamp": datetime.now()
+            }
+        )
+    if filing_status not in FILING_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "detail": f"Unknown filing status: {filing_status}",
+                "code": "INVALID_REQUEST",
+                "timestamp": datetime.now()
+            }
+        )
+    
+    result = tax_analyzer.analyze_document(doc_type, document)
+    try:
+        tax_calculations = tax_analyzer.calculate_tax(doc_type, result, tax_year, filing_status)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "detail": str(e),
+                "code": "INVALID_REQUEST",
+                "timestamp": datetime.now()
+            }
+        )
+    if tax_calculations is None:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "detail": result.get("error", "Analysis failed"),
+                "code": "ANALYSIS_ERROR",
+                "timestamp": datetime.now()
+            }
+        )
+    
+    retirement_calculations = None
+    if age is not None and "total_wages" in result.get("totals", {}):
+        plan = plan_from_w2(result["data"], age, retirement_balance, tax_calculations["tax_year"], filing_status)
+        try:
+            projection = retirement_projector.project(plan)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "detail": str(e),
+                    "code": "INVALID_REQUEST",
+                    "timestamp": datetime.now()
+                }
+            )
+        retirement_calculations = RetirementCalculation(
+            total_contributions=plan["traditional_contribution"] + plan["roth_contribution"],
+            employer_match=0.0,
+            **retirement_projector.retirement_fields(projection)
+        )
+    
     try:
-        result = tax_analyzer.analyze_document(doc_type, text)
+        strategies = []
+        if "total_wages" in result.get("totals", {}):
+            household = household_from_w2(result["data"], result["totals"], tax_calculations["tax_year"], filing_status)
+            strategies = what_if_engine.strategies(what_if_engine.sweep(household))
         return AnalyzeResponse(
-            document_id=str(uuid.uuid4()),
+            document_id=document_id or str(uuid.uuid4()),
             doc_type=doc_type,
-            analysis=result.get("analysis", {}),
+            analysis=result,
+            tax_calculations=tax_calculations,
+            tax_optimization_strategies=strategies,
+            investment_calculations=result.get("investment_calculations"),
+            retirement_calculations=retirement_calculations,
             recommendations=result.get("recommendations", []),
             confidence=result.get("confidence", 0.0),
             processing_time=result.get("processing_time", 0.0)
@@ -2218,6 +3967,368 @@ async def analyze_document(
             }
         )
 
+@app.post(
+    "/what-if",
+    response_model=WhatIfResponse,
+    responses={
+        400: {
+            "model": ErrorResponse,
+            "description": "Unsupported tax year, filing status or HSA coverage",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "No tax parameters for 2019 single",
+                        "code": "INVALID_REQUEST",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Planning"],
+    summary="Sweep what-if contribution scenarios",
+    description="""
+    Evaluate a household's federal income tax across every combination of
+    401(k) deferral levels, HSA contribution levels and standard vs. itemized
+    deductions, in one vectorized pass.
+    
+    - Candidate levels are spaced `step` dollars apart (default 250) up to the
+      tax year's limits, including catch-up contributions for `age`
+    - Large grids are coarsened to at most `WHAT_IF_MAX_SCENARIOS` scenarios
+      (default 50000), which keeps a sweep to a few milliseconds
+    - Returns the savings relative to the current contributions at each total
+      contribution, the optimum within `max_contributions`, and the strategies
+      to reach it
+    
+    ## Example Request
+    ```bash
+    curl -X POST "http://localhost:8000/what-if" \\
+         -H "Authorization: Bearer {token}" \\
+         -H "Content-Type: application/json" \\
+         -d '{"wages": 120000, "deferrals": 5000, "hsa_contributions": 1000, "hsa_coverage": "family", "itemized_deductions": 16000, "age": 52, "tax_year": 2024, "max_contributions": 20000}'
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "tax_year": 2024,
+        "filing_status": "single",
+        "scenarios": 8610,
+        "step": 250.0,
+        "limits": {"elective_deferral": 30500.0, "hsa": 8300.0},
+        "baseline": {"deferrals": 5000.0, "hsa_contributions": 1000.0, "itemize": true, "taxable_income": 104000.0, "tax": 18002.5},
+        "optimum": {"deferrals": 11750.0, "hsa_contributions": 8250.0, "itemize": true, "taxable_income": 90000.0, "tax": 14853.0, "savings": 3149.5, "marginal_rate": 0.22},
+        "savings_curve": [
+            {"contributions": 0.0, "deferrals": 0.0, "hsa_contributions": 0.0, "tax": 19442.5, "savings": -1440.0},
+            {"contributions": 20000.0, "deferrals": 11750.0, "hsa_contributions": 8250.0, "tax": 14853.0, "savings": 3149.5}
+        ],
+        "tax_optimization_strategies": [...],
+        "elapsed_ms": 1.4
+    }
+    ```
+    """
+)
+async def what_if(request: WhatIfRequest) -> WhatIfResponse:
+    """Sweep what-if contribution scenarios."""
+    household = request.dict(exclude={"max_contributions", "step"})
+    try:
+        sweep = what_if_engine.sweep(household, request.max_contributions, request.step)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "detail": str(e),
+                "code": "INVALID_REQUEST",
+                "timestamp": datetime.now()
+            }
+        )
+    return WhatIfResponse(**sweep, tax_optimization_strategies=what_if_engine.strategies(sweep))
+
+@app.post(
+    "/roth-conversion",
+    response_model=RothConversionResponse,
+    responses={
+        400: {
+            "model": ErrorResponse,
+            "description": "Unsupported filing status or invalid plan",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "No tax parameters for 2024 married",
+                        "code": "INVALID_REQUEST",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Planning"],
+    summary="Optimize a multi-year Roth conversion schedule",
+    description="""
+    Choose how much of a traditional IRA/401(k) to convert to a Roth account
+    each year to minimize the present value of lifetime federal income tax,
+    given projected other income, required minimum distributions and the
+    bracket thresholds of each year. The balance left at the end of the
+    horizon is taxed as heirs withdraw it over `heir_years`.
+    
+    - Solved by dynamic programming over a grid of balances, O(years x states^2)
+      rather than the exponential number of schedules a brute force tries
+    - The grid has at most `ROTH_MAX_STATES` points (default 250) and is made
+      coarser when an optimization would exceed `ROTH_TIME_BUDGET_MS` (default 500)
+    - Results are cached by a fingerprint of the plan and of the tax parameters
+    
+    ## Example Request
+    ```bash
+    curl -X POST "http://localhost:8000/roth-conversion" \\
+         -H "Authorization: Bearer {token}" \\
+         -H "Content-Type: application/json" \\
+         -d '{"traditional_balance": 1000000, "age": 60, "years": 30, "other_income": [60000, 60000, 60000, 60000, 60000, 60000, 60000, 35000], "tax_year": 2024, "heir_income": 120000}'
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "roth_conversion_opportunity": {
+            "recommended": true,
+            "lifetime_tax_savings": 47329.87,
+            "total_conversions": 1621754.84,
+            "first_year_conversion": 52071.59,
+            "conversion_years": [2024, 2025, ..., 2053]
+        },
+        "retirement_tax_planning": {
+            "lifetime_tax": 241033.25,
+            "baseline_lifetime_tax": 288363.12,
+            "rmd_start_age": 75,
+            "terminal_balance": 0.0,
+            "conversion_schedule": [...]
+        },
+        "states": 250,
+        "step": 17357.2,
+        "cached": false,
+        "elapsed_ms": 109.8
+    }
+    ```
+    """
+)
+async def roth_conversion(request: RothConversionRequest) -> RothConversionResponse:
+    """Optimize a multi-year Roth conversion schedule."""
+    plan = {key: value for key, value in request.dict().items() if value is not None}
+    try:
+        result = roth_optimizer.optimize(plan)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "detail": str(e),
+                "code": "INVALID_REQUEST",
+                "timestamp": datetime.now()
+            }
+        )
+    return RothConversionResponse(
+        **roth_optimizer.retirement_fields(result),
+        states=result["states"],
+        step=result["step"],
+        cached=result["cached"],
+        elapsed_ms=result["elapsed_ms"]
+    )
+
+@app.post(
+    "/retirement-projection",
+    response_model=RetirementProjectionResponse,
+    responses={
+        400: {
+            "model": ErrorResponse,
+            "description": "Unsupported filing status or invalid plan",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "end_age must be after age, and at most 80 years later",
+                        "code": "INVALID_REQUEST",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Planning"],
+    summary="Project retirement savings and income by Monte Carlo simulation",
+    description="""
+    Simulate thousands of paths of yearly returns from today to `end_age`:
+    contributions until retirement, then spending drawn from the taxable,
+    traditional and Roth accounts, required minimum distributions and
+    federal income tax on the ordinary income. Returns percentile bands of
+    the balance, after-tax income and RMDs by year and the probability that
+    spending is met to `end_age`, in today's dollars.
+    
+    - All paths of a year are simulated in one array operation, and saving
+      years in closed form for every path and year at once
+    - `RETIREMENT_PATHS` paths (default 10000), fewer when a projection would
+      exceed `RETIREMENT_TIME_BUDGET_MS` (default 100)
+    - Returns come from a generator seeded with `seed`, so a plan always
+      gives the same projection; results are cached by a fingerprint
+    
+    ## Example Request
+    ```bash
+    curl -X POST "http://localhost:8000/retirement-projection" \\
+         -H "Authorization: Bearer {token}" \\
+         -H "Content-Type: application/json" \\
+         -d '{"age": 45, "end_age": 85, "traditional_balance": 300000, "roth_balance": 50000, "traditional_contribution": 20000, "social_security": 24000, "tax_year": 2024}'
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "retirement_income_projection": {
+            "paths": 10000,
+            "seed": 0,
+            "ages": [45, 46, ..., 84],
+            "retirement_age": 67,
+            "end_age": 85,
+            "success_probability": 0.9973,
+            "depletion_age": 83,
+            "balance_at_retirement": {"p5": 524407.96, "p25": 841553.38, "p50": 1188084.23, "p75": 1697921.56, "p95": 2965015.12},
+            "first_year_income": {"p5": 23615.0, "p25": 32272.68, "p50": 44470.56, "p75": 62355.15, "p95": 101888.47},
+            "balance_bands": {"p5": [...], "p25": [...], "p50": [...], "p75": [...], "p95": [...]},
+            "income_bands": {"p5": [...], "p25": [...], "p50": [...], "p75": [...], "p95": [...]}
+        },
+        "required_minimum_distributions": {
+            "start_age": 75,
+            "first_year": 2054,
+            "first_rmd": 46153.34,
+            "lifetime_total": {"p5": 173815.84, "p25": 324331.76, "p50": 501008.36, "p75": 782094.12, "p95": 1540406.33},
+            "schedule": [
+                {"age": 75, "tax_year": 2054, "p5": 17601.47, "p25": 31264.42, "p50": 46153.34, "p75": 69769.13, "p95": 129837.92},
+                ...
+            ]
+        },
+        "paths": 10000,
+        "cached": false,
+        "elapsed_ms": 61.4
+    }
+    ```
+    """
+)
+async def retirement_projection(request: RetirementProjectionRequest) -> RetirementProjectionResponse:
+    """Project retirement savings and income by Monte Carlo simulation."""
+    try:
+        result = retirement_projector.project(request.dict())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "detail": str(e),
+                "code": "INVALID_REQUEST",
+                "timestamp": datetime.now()
+            }
+        )
+    return RetirementProjectionResponse(
+        **retirement_projector.retirement_fields(result),
+        paths=result["paths"],
+        cached=result["cached"],
+        elapsed_ms=result["elapsed_ms"]
+    )
+
+@app.post(
+    "/tax-lots",
+    response_model=InvestmentCalculation,
+    responses={
+        400: {
+            "model": ErrorResponse,
+            "description": "Invalid trades or unsupported filing status",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Trade side must be buy or sell",
+                        "code": "INVALID_REQUEST",
+                        "timestamp": "2024-03-20T10:30:00Z"
+                    }
+                }
+            }
+        }
+    },
+    tags=["Planning"],
+    summary="Track tax lots, wash sales and loss harvesting candidates",
+    description="""
+    Match the sales of a trade history to lots first-in first-out and apply
+    the wash sale rule: a loss is disallowed to the extent the same security
+    was bought within 30 days before or after the sale, and is added to the
+    basis of the replacement shares, which also take on the holding period
+    of the shares sold. Open lots with a loss at the given prices are ranked
+    as tax loss harvesting candidates.
+    
+    - Purchases in each sale's window are found by binary search in the
+      security's sorted purchase dates, O(n log n) for n trades
+    - Candidates are ranked by the tax saved at the marginal rates of
+      `taxable_income` (by the loss without it); lots whose sale would itself
+      be a wash sale come last
+    - At most `TAX_LOT_MAX_DETAILS` open lots (default 500) and
+      `TAX_LOT_MAX_OPPORTUNITIES` candidates (default 50) are returned
+    
+    ## Example Request
+    ```bash
+    curl -X POST "http://localhost:8000/tax-lots" \\
+         -H "Authorization: Bearer {token}" \\
+         -H "Content-Type: application/json" \\
+         -d '{"trades": [{"security": "XYZ", "date": "2024-01-02", "side": "buy", "quantity": 100, "price": 50}, {"security": "XYZ", "date": "2024-03-01", "side": "sell", "quantity": 100, "price": 40}, {"security": "XYZ", "date": "2024-03-15", "side": "buy", "quantity": 60, "price": 42}, {"security": "ABC", "date": "2023-02-01", "side": "buy", "quantity": 20, "price": 150, "fees": 4.95}], "prices": {"XYZ": 41, "ABC": 120}, "as_of": "2024-06-03", "taxable_income": 95000, "tax_year": 2024}'
+    ```
+    
+    ## Example Response
+    ```json
+    {
+        "cost_basis": 6124.95,
+        "current_value": 4860.0,
+        "realized_gains": -400.0,
+        "unrealized_gains": -1264.95,
+        "qualified_dividends": 0.0,
+        "ordinary_dividends": 0.0,
+        "tax_efficiency_score": 1.0,
+        "wash_sale_adjustments": 600.0,
+        "tax_lot_details": [
+            {"security": "ABC", "quantity": 20.0, "date_acquired": "2023-02-01", "date_bought": "2023-02-01", "cost_basis": 3004.95, "wash_sale_adjustment": 0.0, "buy": 3},
+            {"security": "XYZ", "quantity": 60.0, "date_acquired": "2024-01-16", "date_bought": "2024-03-15", "cost_basis": 3120.0, "wash_sale_adjustment": 600.0, "buy": 2}
+        ],
+        "tax_loss_carryforward": 0.0,
+        "wash_sale_analysis": {
+            "wash_sales": 1,
+            "disallowed_loss": 600.0,
+            "deferred_in_open_lots": 600.0,
+            "by_security": [{"security": "XYZ", "wash_sales": 1, "disallowed_loss": 600.0}],
+            "unmatched_quantity": 0.0,
+            "recommendations": [...]
+        },
+        "tax_loss_harvesting_opportunities": [
+            {"security": "XYZ", "quantity": 60.0, "date_acquired": "2024-01-16", "term": "short_term", "cost_basis": 3120.0, "market_value": 2460.0, "unrealized_loss": 660.0, "tax_savings": 145.2, "wash_sale_risk": false, "repurchase_after": "2024-07-04"},
+            {"security": "ABC", "quantity": 20.0, "date_acquired": "2023-02-01", "term": "long_term", "cost_basis": 3004.95, "market_value": 2400.0, "unrealized_loss": 604.95, "tax_savings": 90.74, "wash_sale_risk": false, "repurchase_after": "2024-07-04"}
+        ]
+    }
+    ```
+    """
+)
+async def tax_lots(request: TaxLotRequest) -> InvestmentCalculation:
+    """Track tax lots, wash sales and loss harvesting candidates."""
+    try:
+        ledger = tax_lot_engine.process([trade.dict() for trade in request.trades])
+        fields = tax_lot_engine.investment_fields(
+            ledger,
+            request.prices,
+            as_of=request.as_of,
+            taxable_income=request.taxable_income,
+            tax_year=request.tax_year,
+            filing_status=request.filing_status,
+            ordinary_dividends=request.ordinary_dividends,
+            qualified_dividends=request.qualified_dividends
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "detail": str(e),
+                "code": "INVALID_REQUEST",
+                "timestamp": datetime.now()
+            }
+        )
+    return InvestmentCalculation(**fields)
+
 @app.post(
     "/cache/invalidate",
     response_model=Dict[str, str],
@@ -2475,8 +4586,10 @@ async def warm_cache() -> Dict[str, Any]:
 )
 async def health_check() -> HealthResponse:
     """Health check endpoint."""
+    # Pinging the workers blocks for up to their timeout; keep it off the event loop
+    pool_health = await run_in_threadpool(ocr_pool.health_check)
     return HealthResponse(
-        status="healthy",
+        status="healthy" if pool_health["healthy"] else "degraded",
         version="1.0.0",
         timestamp=datetime.now()
     )
@@ -0,0 +1,244 @@
+from typing import Any, Callable, Dict, List, Optional
+import re
+import time
+import logging
+import numpy as np
+
+from .analyzers.analyzer_factory import AnalyzerFactory
+
+logger = logging.getLogger(__name__)
+
+# Field order of the W-2 2D barcode record after the "W2" header, the layout
+# version and the tax year. Names match ``W2Analyzer.field_patterns``; Box 12
+# entries follow the fixed fields as code/amount pairs.
+W2_BARCODE_FIELDS = [
+    'employee_ssn',
+    'employer_ein',
+    'employer_name',
+    'employer_address',
+    'employee_name',
+    'employee_address',
+    'wages',
+    'federal_tax',
+    'social_security_wages',
+    'social_security_tax',
+    'medicare_wages',
+    'medicare_tax',
+    'social_security_tips',
+    'allocated_tips',
+    'dependent_care',
+    'nonqualified_plans',
+    'state',
+    'state_id',
+    'state_wages',
+    'state_tax',
+    'local',
+    'local_wages',
+    'local_tax'
+]
+
+AMOUNT_FIELDS = {
+    'wages', 'federal_tax', 'social_security_wages', 'social_security_tax',
+    'medicare_wages', 'medicare_tax', 'social_security_tips', 'allocated_tips',
+    'dependent_care', 'nonqualified_plans', 'state_wages', 'state_tax',
+    'local_wages', 'local_tax'
+}
+
+# Labels used when rendering barcode fields as text W2Analyzer can parse
+TEXT_LABELS = [
+    ('employer_ein', "EIN: "),
+    ('employer_name', "Employer's name "),
+    ('employer_address', "Employer's address "),
+    ('employee_ssn', "SSN: "),
+    ('employee_name', "Employee's name "),
+    ('employee_address', "Employee's address "),
+    ('wages', "Box 1 "),
+    ('federal_tax', "Box 2 "),
+    ('social_security_wages', "Box 3 "),
+    ('social_security_tax', "Box 4 "),
+    ('medicare_wages', "Box 5 "),
+    ('medicare_tax', "Box 6 "),
+    ('social_security_tips', "Box 7 "),
+    ('allocated_tips', "Box 8 "),
+    ('dependent_care', "Box 10 "),
+    ('nonqualified_plans', "Box 11 "),
+    ('state', "State: "),
+    ('state_id', "State ID number: "),
+    ('state_wages', "State wages "),
+    ('state_tax', "State income tax "),
+    ('local', "Local: "),
+    ('local_wages', "Local wages "),
+    ('local_tax', "Local income tax ")
+]
+
+AMOUNT_PATTERN = re.compile(r'^\d+(\.\d{1,2})?$')
+
+def _zxing_decoder() -> Optional[Callable[[np.ndarray], List[Dict[str, Any]]]]:
+    """PDF417 decoder backed by zxing-cpp, or None if it is not installed."""
+    try:
+        import zxingcpp
+    except ImportError:
+        return None
+
+    def decode(gray: np.ndarray) -> List[Dict[str, Any]]:
+        # Pages are already upright, so rotated and inverted retries only cost time
+        barcodes = zxingcpp.read_barcodes(
+            np.ascontiguousarray(gray),
+            formats=zxingcpp.BarcodeFormat.PDF417,
+            try_rotate=False,
+            try_invert=False
+        )
+        return [{'text': barcode.text, 'valid': barcode.valid} for barcode in barcodes]
+
+    return decode
+
+class W2BarcodeReader:
+    """
+    Decodes the PDF417 barcode printed on many employer-issued W-2s.
+
+    The barcode carries every box value, so a clean decode replaces OCR and
+    the regex extraction for that page. The payload is a delimited record:
+    ``W2``, the layout version and the tax year, then the values in
+    ``W2_BARCODE_FIELDS`` order, then Box 12 code/amount pairs. The delimiter
+    is whatever character follows the ``W2`` header. A decode is only
+    accepted if error correction succeeded and the SSN, EIN and amounts are
+    well formed; anything else falls back to OCR.
+    """
+    def __init__(self, decode_func: Optional[Callable[[np.ndarray], List[Dict[str, Any]]]] = None):
+        self.decode_func = decode_func or _zxing_decoder()
+        if self.decode_func is None:
+            logger.info("zxing-cpp not installed, W-2 barcode decoding disabled")
+        self.box12_codes = AnalyzerFactory.get_analyzer('w2').box12_codes
+        self.stats = {
+            'attempts': 0,
+            'decoded': 0,
+            'rejected': 0,
+            'total_time': 0.0
+        }
+
+    @property
+    def available(self) -> bool:
+        return self.decode_func is not None
+
+    def read(self, gray: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Locate and decode a W-2 barcode on a page.
+
+        Args:
+            gray: Upright grayscale page
+
+        Returns:
+            Dict with ``fields`` (as produced by ``W2Analyzer``), ``tax_year``,
+            ``text`` and ``decode_ms``, or None if no clean W-2 barcode was found
+        """
+        if self.decode_func is None:
+            return None
+
+        start_time = time.perf_counter()
+        self.stats['attempts'] += 1
+        result = None
+        try:
+            for barcode in self.decode_func(gray):
+                if not barcode['valid']:
+                    continue
+                result = self.parse_payload(barcode['text'])
+                if result is not None:
+                    break
+        except Exception as e:
+            logger.warning(f"Barcode decoding failed: {str(e)}")
+
+        elapsed = time.perf_counter() - start_time
+        self.stats['total_time'] += elapsed
+        if result is None:
+            return None
+        self.stats['decoded'] += 1
+        result['decode_ms'] = elapsed * 1000
+        return result
+
+    def parse_payload(self, payload: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse a W-2 barcode payload.
+
+        Args:
+            payload: Decoded barcode text
+
+        Returns:
+            Dict with ``fields``, ``tax_year`` and ``text``, or None if the
+            payload is not a well-formed W-2 record
+        """
+        if len(payload) < 3 or not payload.upper().startswith("W2"):
+            return None
+        values = [value.strip() for value in payload[3:].split(payload[2])]
+        if len(values) < 2 + len(W2_BARCODE_FIELDS) or not re.match(r'^\d{4}$', values[1]):
+            self.stats['rejected'] += 1
+            return None
+
+        fields: Dict[str, Any] = {'tax_year': values[1]}
+        for field, value in zip(W2_BARCODE_FIELDS, values[2:]):
+            if value:
+                fields[field] = value
+
+        pairs = [value for value in values[2 + len(W2_BARCODE_FIELDS):] if value]
+        if len(pairs) % 2:
+            self.stats['rejected'] += 1
+            return None
+        deferrals = [
+            {'code': code.upper(), 'amount': amount}
+            for code, amount in zip(pairs[::2], pairs[1::2])
+        ]
+
+        if not self._is_clean(fields, deferrals):
+            self.stats['rejected'] += 1
+            return None
+
+        if deferrals:
+            fields['deferrals'] = [
+                {
+                    'code': d['code'],
+                    'description': self.box12_codes.get(d['code'], 'Unknown'),
+                    'amount': float(d['amount'])
+                }
+                for d in deferrals
+            ]
+        tax_year = int(values[1])
+        return {
+            'fields': fields,
+            'tax_year': tax_year,
+            'text': fields_to_text(fields, tax_year)
+        }
+
+    def _is_clean(self, fields: Dict[str, Any], deferrals: List[Dict[str, str]]) -> bool:
+        if not re.match(r'^\d{3}-\d{2}-\d{4}$', fields.get('employee_ssn', '')):
+            return False
+        if not re.match(r'^\d{2}-\d{7}$', fields.get('employer_ein', '')):
+            return False
+        amounts = [fields[f] for f in AMOUNT_FIELDS if f in fields] + [d['amount'] for d in deferrals]
+        if 'wages' not in fields or not all(AMOUNT_PATTERN.match(a) for a in amounts):
+            return False
+        return all(re.match(r'^[A-Z]{1,2}$', d['code']) for d in deferrals)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get barcode decoding statistics."""
+        attempts = self.stats['attempts']
+        return {
+            **self.stats,
+            'available': self.available,
+            'decode_rate': self.stats['decoded'] / attempts if attempts else 0.0,
+            'avg_decode_ms': 1000.0 * self.stats['total_time'] / attempts if attempts else 0.0
+        }
+
+def fields_to_text(fields: Dict[str, Any], tax_year: Optional[int] = None) -> str:
+    """
+    Render W-2 fields as labelled text.
+
+    The text stands in for the OCR text of a barcode page: the document
+    classifier and ``W2Analyzer.analyze`` read it like any other page.
+    """
+    lines = ["Form W-2 Wage and Tax Statement" + (f" {tax_year}" if tax_year else "")]
+    for field, label in TEXT_LABELS:
+        if field in fields:
+            lines.append(f"{label}{fields[field]}")
+        if field == 'nonqualified_plans':
+            for deferral in fields.get('deferrals', []):
+                lines.append(f"Box 12 {deferral['code']} {deferral['amount']:.2f}")
+    return "\n".join(lines)
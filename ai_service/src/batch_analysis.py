@@ -0,0 +1,137 @@
+from typing import Any, Dict, List, Sequence, Tuple
+import math
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def _missing(dtype: np.dtype) -> Any:
+    """Value of a column for documents it does not apply to."""
+    if dtype == np.bool_:
+        return False
+    if dtype.kind in 'iuf':
+        return np.nan
+    return None
+
+def _column(values: List[Any]) -> np.ndarray:
+    """Array for a column of Python values: bool, float where all are numbers, object otherwise."""
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, (bool, np.bool_)) for v in present):
+        return np.array([bool(v) for v in values], dtype=bool)
+    if present and all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in present):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    column = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        # Item by item, so equal-length lists are not turned into a 2-D array
+        column[i] = value
+    return column
+
+def rows_to_columns(rows: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Columns from rows of values, e.g. ``flatten_analysis`` results."""
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    return {name: _column([row.get(name) for row in rows]) for name in names}
+
+def flatten_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One row of a ``BatchAnalysis`` from an analyzer's ``analyze`` result.
+
+    Used for analyzers without ``analyze_batch``: nested sections become
+    ``<section>.<key>`` columns, and the validation messages are kept as lists.
+    """
+    row = {'success': bool(analysis.get('success', False)), 'error': analysis.get('error')}
+    if 'form_type' in analysis:
+        row['form_type'] = analysis['form_type']
+    for section in ('data', 'validation', 'totals', 'insights'):
+        for key, value in (analysis.get(section) or {}).items():
+            if section == 'data' and key == 'form_type':
+                continue
+            row[f'{section}.{key}'] = value
+    return row
+
+class BatchAnalysis:
+    """
+    Analysis results of a batch of documents, as columns.
+
+    Every column is a NumPy array with one entry per document, in the order
+    the documents were given. Columns are named after the ``analyze`` result
+    of a single document (``data.wages``, ``totals.total_income``,
+    ``validation.is_valid``, ``insights.tax_bracket``); ``doc_type``,
+    ``success`` and ``error`` are always present. A column only some document
+    types have is NaN (numbers), False (flags) or None elsewhere.
+    """
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length")
+        self.columns = columns
+
+    @classmethod
+    def from_groups(cls, size: int, groups: Sequence[Tuple[np.ndarray, Dict[str, np.ndarray]]]) -> 'BatchAnalysis':
+        """
+        Merge the columns of groups of documents into one batch.
+
+        Args:
+            size: Number of documents in the batch
+            groups: (positions in the batch, columns) of each group
+
+        Returns:
+            Batch with the union of the groups' columns
+        """
+        columns: Dict[str, np.ndarray] = {}
+        for positions, group in groups:
+            for name, values in group.items():
+                kind = 'f' if values.dtype.kind in 'iuf' else 'b' if values.dtype.kind == 'b' else 'O'
+                if name not in columns:
+                    dtype = np.dtype({'f': np.float64, 'b': np.bool_, 'O': object}[kind])
+                    columns[name] = np.full(size, _missing(dtype), dtype=dtype)
+                elif columns[name].dtype.kind != kind and columns[name].dtype != object:
+                    # Groups disagree on the column's type
+                    columns[name] = columns[name].astype(object)
+                columns[name][positions] = values
+        return cls(columns)
+
+    @classmethod
+    def concat(cls, batches: Sequence['BatchAnalysis']) -> 'BatchAnalysis':
+        """Batches one after another, e.g. the chunks analyzed by worker processes."""
+        groups, start = [], 0
+        for batch in batches:
+            groups.append((np.arange(start, start + len(batch)), batch.columns))
+            start += len(batch)
+        return cls.from_groups(start, groups)
+
+    def __len__(self) -> int:
+        return len(self.columns['success']) if 'success' in self.columns else 0
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.columns)
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """Values of one document, leaving out missing (None or NaN) values."""
+        row = {}
+        for name, values in self.columns.items():
+            value = values[index]
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            row[name] = value.item() if isinstance(value, np.generic) else value
+        return row
+
+    def select(self, mask: np.ndarray) -> 'BatchAnalysis':
+        """Documents where ``mask`` (boolean or positions) selects them, e.g. ``batch['doc_type'] == 'w2'``."""
+        return BatchAnalysis({name: values[mask] for name, values in self.columns.items()})
+
+    def to_dict(self) -> Dict[str, List[Any]]:
+        """Columns as JSON-serializable lists, with None for NaN."""
+        result = {}
+        for name, values in self.columns.items():
+            if values.dtype.kind == 'f':
+                result[name] = [None if math.isnan(v) else v for v in values.tolist()]
+            else:
+                result[name] = values.tolist()
+        return result
@@ -0,0 +1,209 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+SUPPORTED_EXTENSIONS = ('.pdf',) + IMAGE_EXTENSIONS
+
+class BatchValidationError(ValueError):
+    """Raised when a batch upload is empty, too large or malformed."""
+
+class BatchTooLargeError(BatchValidationError):
+    """Raised when the files uploaded in a batch are too large to read."""
+
+class BatchProcessor:
+    """
+    Processes a batch of uploaded documents concurrently.
+
+    Documents are scheduled onto a shared thread pool (which feeds the OCR
+    worker pool) with a per-batch concurrency cap, and one NDJSON line is
+    produced per document as soon as that document finishes.
+
+    The uploads of a batch may total ``max_batch_bytes``, and the zip archives
+    among them may expand to ``max_archive_bytes`` between them.
+    """
+    def __init__(
+        self,
+        document_processor: Any,
+        max_concurrency: int = 4,
+        max_documents: int = 50,
+        max_archive_bytes: int = 200 * 1024 * 1024,
+        max_batch_bytes: int = 200 * 1024 * 1024,
+        max_workers: int = 8,
+        memory_decode_max_bytes: int = 10 * 1024 * 1024
+    ):
+        self.document_processor = document_processor
+        self.max_concurrency = max_concurrency
+        self.max_documents = max_documents
+        self.max_archive_bytes = max_archive_bytes
+        self.max_batch_bytes = max_batch_bytes
+        # Images up to this size are decoded from memory instead of a temp file
+        self.memory_decode_max_bytes = memory_decode_max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-worker")
+
+    def expand_uploads(self, uploads: List[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+        """
+        Expand zip archives and validate the documents in a batch.
+
+        Args:
+            uploads: List of (filename, content) pairs as uploaded
+
+        Returns:
+            List of (filename, content) pairs for supported documents
+
+        Raises:
+            BatchValidationError: If the batch is empty, too large or an archive is invalid
+        """
+        self.check_batch_size([len(content) for _, content in uploads])
+        documents = []
+        # Shared by all archives, so several of them cannot each expand to the limit
+        remaining = self.max_archive_bytes
+        for filename, content in uploads:
+            if filename.lower().endswith('.zip'):
+                extracted, remaining = self._read_archive(filename, content, remaining)
+                documents.extend(extracted)
+            elif filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                documents.append((filename, content))
+            else:
+                raise BatchValidationError(f"Unsupported file type: {filename}")
+
+            if len(documents) > self.max_documents:
+                raise BatchValidationError(
+                    f"Batch exceeds maximum of {self.max_documents} documents"
+                )
+
+        if not documents:
+            raise BatchValidationError("Batch contains no supported documents")
+        return documents
+
+    def check_batch_size(self, sizes: List[Optional[int]]) -> None:
+        """
+        Refuse a batch whose uploads total more than ``max_batch_bytes``, before they are read.
+
+        Args:
+            sizes: Size in bytes of each uploaded file (None if unknown)
+
+        Raises:
+            BatchTooLargeError: If the uploads are too large
+        """
+        if sum(size or 0 for size in sizes) > self.max_batch_bytes:
+            raise BatchTooLargeError(f"Batch exceeds maximum size of {self.max_batch_bytes} bytes")
+
+    def _read_archive(self, filename: str, content: bytes, remaining: int) -> Tuple[List[Tuple[str, bytes]], int]:
+        """Extract an archive's documents within ``remaining`` bytes; returns them and the bytes left."""
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(content))
+        except zipfile.BadZipFile:
+            raise BatchValidationError(f"Invalid zip archive: {filename}")
+
+        with archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith(SUPPORTED_EXTENSIONS)
+                and not os.path.basename(info.filename).startswith('.')
+            ]
+            if len(members) > self.max_documents:
+                raise BatchValidationError(
+                    f"Archive {filename} exceeds maximum of {self.max_documents} documents"
+                )
+            # Guard against zip bombs before decompressing anything
+            if sum(info.file_size for info in members) > remaining:
+                raise BatchValidationError(f"Archive {filename} is too large when extracted")
+
+            documents = []
+            for info in members:
+                # The declared sizes can be forged, so enforce the limit on the bytes actually read too
+                try:
+                    with archive.open(info) as member:
+                        data = member.read(remaining + 1)
+                except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError, OSError) as e:
+                    raise BatchValidationError(f"Invalid zip archive: {filename} ({str(e)})")
+                remaining -= len(data)
+                if remaining < 0:
+                    raise BatchValidationError(f"Archive {filename} is too large when extracted")
+                documents.append((os.path.basename(info.filename), data))
+            return documents, remaining
+
+    def _process_one(self, filename: str, content: bytes, doc_type: Optional[str]) -> Dict[str, Any]:
+        suffix = os.path.splitext(filename)[1].lower()
+        if suffix in IMAGE_EXTENSIONS and len(content) <= self.memory_decode_max_bytes:
+            return self.document_processor.process_bytes(content, doc_type)
+        fd, file_path = tempfile.mkstemp(prefix="batch_", suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            return self.document_processor.process_document(file_path, doc_type)
+        finally:
+            os.remove(file_path)
+
+    async def stream(
+        self,
+        documents: List[Tuple[str, bytes]],
+        doc_type: Optional[str],
+        max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Process documents concurrently and yield one NDJSON line per document as it completes.
+
+        A final summary line is emitted after all documents have finished.
+        """
+        concurrency = min(max_concurrency or self.max_concurrency, self.max_concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+        batch_start = time.time()
+
+        async def run(index: int, filename: str, content: bytes) -> Dict[str, Any]:
+            async with semaphore:
+                start_time = time.time()
+                try:
+                    result = await loop.run_in_executor(
+                        self._executor, self._process_one, filename, content, doc_type
+                    )
+                except Exception as e:
+                    logger.error(f"Error processing batch document {filename}: {str(e)}")
+                    result = {'success': False, 'error': str(e)}
+                return {
+                    'type': 'document',
+                    'index': index,
+                    'filename': filename,
+                    'processing_time': time.time() - start_time,
+                    **result
+                }
+
+        tasks = [
+            asyncio.ensure_future(run(index, filename, content))
+            for index, (filename, content) in enumerate(documents)
+        ]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                succeeded += 1 if line.get('success') else 0
+                yield json.dumps(line, default=str) + "\n"
+        finally:
+            # Stop scheduling remaining documents if the client went away
+            for task in tasks:
+                task.cancel()
+
+        yield json.dumps({
+            'type': 'summary',
+            'documents': len(documents),
+            'succeeded': succeeded,
+            'failed': len(documents) - succeeded,
+            'concurrency': concurrency,
+            'processing_time': time.time() - batch_start
+        }) + "\n"
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the batch worker threads."""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,515 @@
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+import hashlib
+import io
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+_BLOB_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+class BlobNotFoundError(KeyError):
+    """Raised for unknown or released blob hashes."""
+
+def _shard(blob_hash: str) -> str:
+    """Two levels of 256 directories, so no directory holds more than a few thousand blobs."""
+    return f"{blob_hash[:2]}/{blob_hash[2:4]}/{blob_hash}"
+
+class FilesystemBackend:
+    """Blobs as files in a sharded directory tree (``ab/cd/abcd...``)."""
+    def __init__(self, root_dir: str = "uploads/blobs"):
+        self.root_dir = root_dir
+        # Temp files are written inside the root so they can be renamed into place
+        self.temp_dir = os.path.join(root_dir, "tmp")
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def put_file(self, key: str, path: str, link: bool = False) -> None:
+        """
+        Move a finished file into place, or hard-link it when ``link`` is set.
+
+        Hard links store a file that must stay where it is (e.g. in an upload
+        workspace) without copying it; both names share the same data.
+        """
+        dest = self.local_path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if link:
+            try:
+                os.link(path, dest)
+                return
+            except FileExistsError:
+                return
+            except OSError:
+                # Different filesystem or no hard-link support
+                fd, tmp_path = tempfile.mkstemp(dir=self.temp_dir)
+                os.close(fd)
+                shutil.copyfile(path, tmp_path)
+                path = tmp_path
+        os.replace(path, dest)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.local_path(key), "rb")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        return os.path.join(self.root_dir, key)
+
+class S3Backend:
+    """
+    Blobs as objects in an S3-compatible bucket (AWS S3, LocalStack, MinIO).
+
+    Requires boto3. ``endpoint_url`` points the client at a non-AWS service,
+    e.g. ``http://localhost:4566`` for the LocalStack container of
+    ``direct-file/docker-compose.yaml``.
+    """
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "blobs/",
+        client: Any = None,
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None
+    ):
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise ImportError("The S3 blob store backend requires boto3 (pip install boto3)")
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region_name)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.temp_dir = None
+
+    def put_file(self, key: str, path: str, link: bool = False) -> None:
+        # upload_file streams from disk and switches to multipart uploads for large files
+        self.client.upload_file(path, self.bucket, self.prefix + key)
+        if not link:
+            os.remove(path)
+
+    def open(self, key: str) -> BinaryIO:
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body']
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+class BlobStore:
+    """
+    Content-addressed store of uploaded documents, keyed by SHA-256.
+
+    Documents are kept after processing so they can be reprocessed,
+    re-analyzed or exported by hash instead of being uploaded again. Bytes
+    are streamed in and out in ``chunk_size`` pieces and hashed while they
+    are written, so large scans are never held in memory. Identical content
+    is stored once: every ``put`` of an existing blob only adds a reference,
+    and the bytes are deleted when the last reference is dropped.
+
+    Each reference has an unguessable ID (``ref``) that its holder needs to
+    read or release the blob, an optional owner (e.g. ``job:<id>``) whose
+    references are dropped together by ``release_owner``, and an expiry
+    (``ttl`` seconds by default) after which ``cleanup_expired`` drops it,
+    so tax documents are not kept indefinitely. References live in a SQLite
+    index next to the bytes, which are held by a pluggable backend
+    (``FilesystemBackend`` or ``S3Backend``).
+    """
+    def __init__(
+        self,
+        backend: Any = None,
+        index_path: str = "data/blob_index.sqlite3",
+        chunk_size: int = 1024 * 1024,
+        ttl: Optional[float] = 86400.0,
+        cleanup_interval: float = 60.0
+    ):
+        self.backend = backend or FilesystemBackend()
+        self.index_path = index_path
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+        self._next_cleanup = 0.0
+        self._lock = threading.Lock()
+        # Hashes whose bytes are being written to the backend, by number of writers
+        self._writing: Dict[str, int] = {}
+        self.stats = {
+            'puts': 0,
+            'deduplicated': 0,
+            'bytes_written': 0,
+            'gets': 0,
+            'deleted': 0,
+            'expired': 0
+        }
+
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                refs INTEGER NOT NULL,
+                created REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS blob_refs (
+                ref TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                owner TEXT,
+                expires REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS blob_refs_hash ON blob_refs (hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS blob_refs_owner ON blob_refs (owner)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS blob_refs_expires ON blob_refs (expires)")
+        self._conn.commit()
+
+    def put(self, stream: BinaryIO, owner: Optional[str] = None, ttl: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Store the contents of a binary stream.
+
+        Args:
+            stream: File-like object read in ``chunk_size`` pieces
+            owner: Owner of the new reference, released with ``release_owner``
+            ttl: Seconds until the reference expires (default: the store's ``ttl``)
+
+        Returns:
+            Blob info: ``hash``, ``size``, ``refs`` and ``deduplicated``, and
+            the new reference's ``ref`` and ``expires`` (epoch seconds or None)
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(prefix="blob_", dir=self.backend.temp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter(lambda: stream.read(self.chunk_size), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            return self._add(digest.hexdigest(), size, tmp_path, False, owner, ttl)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put_bytes(self, data: bytes, owner: Optional[str] = None, ttl: Optional[float] = None) -> Dict[str, Any]:
+        """Store in-memory content (see ``put``)."""
+        return self.put(io.BytesIO(data), owner, ttl)
+
+    def put_file(
+        self,
+        path: str,
+        content_hash: Optional[str] = None,
+        owner: Optional[str] = None,
+        ttl: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Store a file that stays where it is, hard-linking it on the filesystem backend.
+
+        Args:
+            path: File to store
+            content_hash: SHA-256 of the file if already known
+            owner: Owner of the new reference, released with ``release_owner``
+            ttl: Seconds until the reference expires (default: the store's ``ttl``)
+
+        Returns:
+            Blob info (see ``put``)
+        """
+        if content_hash is None:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                    digest.update(chunk)
+            content_hash = digest.hexdigest()
+        return self._add(content_hash, os.path.getsize(path), path, True, owner, ttl)
+
+    def _add(
+        self,
+        blob_hash: str,
+        size: int,
+        path: str,
+        link: bool,
+        owner: Optional[str],
+        ttl: Optional[float]
+    ) -> Dict[str, Any]:
+        if time.time() >= self._next_cleanup:
+            self.cleanup_expired()
+        ttl = self.ttl if ttl is None else ttl
+        ref = uuid.uuid4().hex
+        expires = time.time() + ttl if ttl is not None else None
+
+        with self._lock:
+            self.stats['puts'] += 1
+            deduplicated = self._add_ref(blob_hash, ref, owner, expires)
+            if deduplicated:
+                info = self._info(blob_hash, True)
+            else:
+                self._writing[blob_hash] = self._writing.get(blob_hash, 0) + 1
+        if not deduplicated:
+            # Written without the lock, so a slow backend (an S3 upload) holds up no other put or release
+            written = False
+            try:
+                self.backend.put_file(_shard(blob_hash), path, link=link)
+                written = True
+            finally:
+                with self._lock:
+                    self._writing[blob_hash] -= 1
+                    if not self._writing[blob_hash]:
+                        del self._writing[blob_hash]
+                    if written:
+                        # A concurrent put of the same content may have been indexed meanwhile
+                        deduplicated = self._add_ref(blob_hash, ref, owner, expires)
+                        if not deduplicated:
+                            with self._conn:
+                                self._conn.execute(
+                                    "INSERT INTO blobs (hash, size, refs, created) VALUES (?, ?, 1, ?)",
+                                    (blob_hash, size, time.time())
+                                )
+                                self._conn.execute(
+                                    "INSERT INTO blob_refs (ref, hash, owner, expires) VALUES (?, ?, ?, ?)",
+                                    (ref, blob_hash, owner, expires)
+                                )
+                            self.stats['bytes_written'] += size
+                        info = self._info(blob_hash, deduplicated)
+        return {**info, 'ref': ref, 'expires': expires}
+
+    def _add_ref(self, blob_hash: str, ref: str, owner: Optional[str], expires: Optional[float]) -> bool:
+        """Add a reference to a stored blob; False if it is not stored. Caller holds the lock."""
+        with self._conn:
+            updated = self._conn.execute(
+                "UPDATE blobs SET refs = refs + 1 WHERE hash = ?", (blob_hash,)
+            ).rowcount
+            if updated:
+                self._conn.execute(
+                    "INSERT INTO blob_refs (ref, hash, owner, expires) VALUES (?, ?, ?, ?)",
+                    (ref, blob_hash, owner, expires)
+                )
+        if updated:
+            self.stats['deduplicated'] += 1
+        return bool(updated)
+
+    def _info(self, blob_hash: str, deduplicated: bool) -> Dict[str, Any]:
+        size, refs = self._conn.execute(
+            "SELECT size, refs FROM blobs WHERE hash = ?", (blob_hash,)
+        ).fetchone()
+        return {'hash': blob_hash, 'size': size, 'refs': refs, 'deduplicated': deduplicated}
+
+    def has_ref(self, blob_hash: str, ref: Optional[str]) -> bool:
+        """Whether ``ref`` is a live reference to the blob, i.e. its holder may read it."""
+        if not _BLOB_HASH.match(blob_hash or "") or not ref:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM blob_refs WHERE ref = ? AND hash = ? AND (expires IS NULL OR expires > ?)",
+                (ref, blob_hash, time.time())
+            ).fetchone()
+        return row is not None
+
+    def exists(self, blob_hash: str) -> bool:
+        """Whether a blob is stored."""
+        return self.info(blob_hash) is not None
+
+    def info(self, blob_hash: str) -> Optional[Dict[str, Any]]:
+        """Size and reference count of a blob, or None if it is not stored."""
+        if not _BLOB_HASH.match(blob_hash or ""):
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, refs, created FROM blobs WHERE hash = ?", (blob_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'hash': blob_hash, 'size': row[0], 'refs': row[1], 'created': row[2]}
+
+    def open(self, blob_hash: str) -> BinaryIO:
+        """Open a stored blob for streaming reads."""
+        if self.info(blob_hash) is None:
+            raise BlobNotFoundError(blob_hash)
+        self.stats['gets'] += 1
+        return self.backend.open(_shard(blob_hash))
+
+    def iter_chunks(self, blob_hash: str) -> Iterator[bytes]:
+        """Yield a blob's contents in ``chunk_size`` pieces."""
+        stream = self.open(blob_hash)
+        try:
+            for chunk in iter(lambda: stream.read(self.chunk_size), b""):
+                yield chunk
+        finally:
+            stream.close()
+
+    @contextmanager
+    def local_file(self, blob_hash: str) -> Iterator[str]:
+        """
+        Path of a blob on the local filesystem, for code that needs a file.
+
+        The filesystem backend yields the stored file itself (read-only use);
+        other backends download the blob to a temporary file that is removed
+        afterwards.
+        """
+        if self.info(blob_hash) is None:
+            raise BlobNotFoundError(blob_hash)
+        path = self.backend.local_path(_shard(blob_hash))
+        if path is not None:
+            yield path
+            return
+
+        fd, tmp_path = tempfile.mkstemp(prefix="blob_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in self.iter_chunks(blob_hash):
+                    f.write(chunk)
+            yield tmp_path
+        finally:
+            os.remove(tmp_path)
+
+    def release(self, blob_hash: str, ref: str) -> int:
+        """
+        Drop one reference to a blob, deleting it when none remain.
+
+        Args:
+            blob_hash: SHA-256 of the blob
+            ref: The reference to drop, as returned by ``put``
+
+        Returns:
+            Remaining reference count
+
+        Raises:
+            BlobNotFoundError: If ``ref`` is not a reference to the blob
+        """
+        if not _BLOB_HASH.match(blob_hash or ""):
+            raise BlobNotFoundError(blob_hash)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ref, hash FROM blob_refs WHERE ref = ? AND hash = ?", (ref, blob_hash)
+            ).fetchone()
+            if row is None:
+                raise BlobNotFoundError(blob_hash)
+            return self._drop([row]).get(blob_hash, 0)
+
+    def release_owner(self, owner: str) -> int:
+        """Drop every reference held by ``owner``; returns the number dropped."""
+        with self._lock:
+            rows = self._conn.execute("SELECT ref, hash FROM blob_refs WHERE owner = ?", (owner,)).fetchall()
+            self._drop(rows)
+        return len(rows)
+
+    def cleanup_expired(self) -> int:
+        """
+        Drop expired references, deleting blobs left without any.
+
+        Blobs indexed before references were tracked individually have none
+        and are deleted too. Runs from ``put`` at most every
+        ``cleanup_interval`` seconds.
+
+        Returns:
+            Number of references dropped
+        """
+        now = time.time()
+        self._next_cleanup = now + self.cleanup_interval
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ref, hash FROM blob_refs WHERE expires IS NOT NULL AND expires <= ?", (now,)
+            ).fetchall()
+            self._drop(rows)
+            orphans = [row[0] for row in self._conn.execute(
+                "SELECT hash FROM blobs WHERE NOT EXISTS (SELECT 1 FROM blob_refs WHERE blob_refs.hash = blobs.hash)"
+            )]
+            for blob_hash in orphans:
+                self._delete(blob_hash)
+            self.stats['expired'] += len(rows)
+        if rows or orphans:
+            logger.info(f"Dropped {len(rows)} expired blob references, {len(orphans)} unreferenced blobs")
+        return len(rows)
+
+    def _drop(self, rows: List[Tuple[str, str]]) -> Dict[str, int]:
+        """
+        Drop (ref, hash) references, deleting blobs left without any.
+        Caller holds the lock.
+
+        Returns:
+            Remaining reference count of each affected blob
+        """
+        counts: Dict[str, int] = {}
+        for _, blob_hash in rows:
+            counts[blob_hash] = counts.get(blob_hash, 0) + 1
+        remaining: Dict[str, int] = {}
+        for blob_hash, count in counts.items():
+            row = self._conn.execute("SELECT refs FROM blobs WHERE hash = ?", (blob_hash,)).fetchone()
+            remaining[blob_hash] = max(row[0] - count, 0) if row else 0
+        with self._conn:
+            self._conn.executemany("DELETE FROM blob_refs WHERE ref = ?", [(ref,) for ref, _ in rows])
+            for blob_hash, refs in remaining.items():
+                if refs > 0:
+                    self._conn.execute("UPDATE blobs SET refs = ? WHERE hash = ?", (refs, blob_hash))
+        for blob_hash, refs in remaining.items():
+            if refs == 0:
+                self._delete(blob_hash)
+        return remaining
+
+    def _delete(self, blob_hash: str) -> None:
+        """Delete a blob's index row and bytes. Caller holds the lock."""
+        with self._conn:
+            self._conn.execute("DELETE FROM blobs WHERE hash = ?", (blob_hash,))
+        # A put writing the same content keeps the bytes and indexes them again when done
+        if blob_hash not in self._writing:
+            self.backend.delete(_shard(blob_hash))
+        self.stats['deleted'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get blob store statistics."""
+        with self._lock:
+            blobs, size, refs = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refs), 0) FROM blobs"
+            ).fetchone()
+        return {
+            **self.stats,
+            'backend': type(self.backend).__name__,
+            'blobs': blobs,
+            'size_bytes': size,
+            'references': refs,
+            # Share of references served by an already stored blob
+            'dedup_ratio': 1.0 - blobs / float(refs) if refs else 0.0
+        }
+
+    def close(self) -> None:
+        """Close the index connection."""
+        with self._lock:
+            self._conn.close()
+
+# Shared store instance
+blob_store = None
+
+def get_blob_store() -> BlobStore:
+    """Get the shared blob store instance, creating it on first use."""
+    global blob_store
+    if blob_store is None:
+        if os.environ.get("BLOB_STORE_BACKEND", "fs") == "s3":
+            backend = S3Backend(
+                bucket=os.environ["BLOB_STORE_BUCKET"],
+                prefix=os.environ.get("BLOB_STORE_PREFIX", "blobs/"),
+                endpoint_url=os.environ.get("S3_ENDPOINT_URL"),
+                region_name=os.environ.get("AWS_REGION")
+            )
+        else:
+            upload_dir = os.environ.get("UPLOAD_DIR", "uploads")
+            backend = FilesystemBackend(os.environ.get("BLOB_STORE_DIR", os.path.join(upload_dir, "blobs")))
+        blob_store = BlobStore(
+            backend=backend,
+            index_path=os.environ.get("BLOB_INDEX_PATH", "data/blob_index.sqlite3"),
+            ttl=float(os.environ.get("BLOB_TTL", "86400"))
+        )
+    return blob_store
@@ -4,7 +4,7 @@ import hashlib
 import json
 from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from fastapi.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
 import gzip
 from collections import OrderedDict
 import asyncio
@@ -77,13 +77,12 @@ CACHE_CONFIGS = {
         compress=True,
         must_revalidate=True
     ),
-    "/process/status": CacheConfig(
-        ttl=60,  # 1 minute for processing status
-        vary_by=["Authorization"],
-        max_size=100,
-        compress=True,
-        stale_while_revalidate=30
-    ),
+    # Job status and queue metrics change while jobs run - no caching
+    "/process/status": CacheConfig(skip_cache=True),
+    "/process/queue": CacheConfig(skip_cache=True),
+    "/process/ocr-stats": CacheConfig(skip_cache=True),
+    "/uploads": CacheConfig(skip_cache=True),
+    "/blobs": CacheConfig(skip_cache=True),
 
     # Analysis endpoints
     "/analyze": CacheConfig(
@@ -320,6 +319,26 @@ CACHE_CONFIGS = {
     )
 }
 
+def get_cache_config(path: str) -> CacheConfig:
+    """
+    Get the cache configuration for a request path.
+
+    Falls back to the longest configured parent path so that parameterized
+    routes (e.g. /process/status/{job_id}) inherit their endpoint's rules.
+    """
+    config = CACHE_CONFIGS.get(path)
+    if config is not None:
+        return config
+    # Event streams (e.g. /process/{job_id}/events) are never cached
+    if path.endswith("/events"):
+        return CacheConfig(skip_cache=True)
+    parent = path.rstrip("/")
+    while "/" in parent:
+        parent = parent.rsplit("/", 1)[0]
+        if parent in CACHE_CONFIGS:
+            return CACHE_CONFIGS[parent]
+    return CacheConfig()
+
 class CacheItem:
     def __init__(self, value: Any, expiry: float, config: CacheConfig):
         self.value = value
@@ -419,7 +438,7 @@ class CacheMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next) -> Response:
         # Get cache config for the path
         path = request.url.path
-        config = CACHE_CONFIGS.get(path, CacheConfig())
+        config = get_cache_config(path)
 
         # Skip caching if configured
         if config.skip_cache or config.no_store:
@@ -453,6 +472,14 @@ class CacheMiddleware(BaseHTTPMiddleware):
         
         # Cache response if successful
         if response.status_code == 200:
+            # Responses from call_next are streamed, so the body is collected before caching it
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            response = Response(
+                content=body,
+                status_code=response.status_code,
+                headers=dict(response.headers),
+                media_type=response.media_type
+            )
             self._cache_response(response, cache_key, path, config)
             response.headers["X-Cache"] = "MISS"
         
@@ -722,22 +749,6 @@ WARMUP_CONFIGS = {
         "concurrent_requests": 1
     },
 
-    # Document processing status
-    "/process/status": {
-        "priority": 1,
-        "params": {"type": "all"},
-        "headers": {"Accept-Encoding": "gzip"},
-        "warmup_interval": 300,  # 5 minutes
-        "concurrent_requests": 2
-    },
-    "/process/queue": {
-        "priority": 1,
-        "params": {"limit": 10},
-        "headers": {"Accept-Encoding": "gzip"},
-        "warmup_interval": 300,  # 5 minutes
-        "concurrent_requests": 1
-    },
-
     # Analysis results
     "/analyze/summary": {
         "priority": 2,
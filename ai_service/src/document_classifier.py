@@ -0,0 +1,218 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+import re
+import time
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Form type -> (document type, form-number pattern, title pattern)
+FORM_SIGNATURES = {
+    'W-2': ('w2', r'\bW-?\s?2\b', r'wage\s+and\s+tax\s+statement'),
+    '1099-NEC': ('1099', r'\b1099-?\s?NEC\b', r'nonemployee\s+compensation'),
+    '1099-MISC': ('1099', r'\b1099-?\s?MISC\b', r'miscellaneous\s+(?:income|information)'),
+    '1099-INT': ('1099', r'\b1099-?\s?INT\b', r'interest\s+income'),
+    '1099-DIV': ('1099', r'\b1099-?\s?DIV\b', r'dividends\s+and\s+distributions'),
+    '1099-B': ('1099', r'\b1099-?\s?B\b', r'proceeds\s+from\s+broker'),
+    '1099-G': ('1099', r'\b1099-?\s?G\b', r'certain\s+government\s+payments'),
+    '1099-R': ('1099', r'\b1099-?\s?R\b', r'distributions\s+from\s+pensions'),
+    '1099-S': ('1099', r'\b1099-?\s?S\b', r'proceeds\s+from\s+real\s+estate'),
+    '1099-K': ('1099', r'\b1099-?\s?K\b', r'payment\s+card\s+and\s+third\s+party')
+}
+
+# Continuous-use forms print a revision date, annual forms the tax year
+REVISION_PATTERN = re.compile(r'\bRev\.?\s*(?:[A-Za-z]+\.?\s+)?((?:19|20)\d{2})\b', re.IGNORECASE)
+YEAR_PATTERN = re.compile(r'\b(20\d{2})\b')
+
+class ClassificationResult:
+    """Document type, form variant and form year detected for a page."""
+    def __init__(
+        self,
+        doc_type: str = "generic",
+        form_type: Optional[str] = None,
+        year: Optional[int] = None,
+        confidence: float = 0.0,
+        stage: str = "none",
+        latency_ms: float = 0.0
+    ):
+        self.doc_type = doc_type
+        self.form_type = form_type
+        self.year = year
+        self.confidence = confidence
+        self.stage = stage
+        self.latency_ms = latency_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'doc_type': self.doc_type,
+            'form_type': self.form_type,
+            'year': self.year,
+            'confidence': round(self.confidence, 3),
+            'stage': self.stage,
+            'latency_ms': round(self.latency_ms, 2)
+        }
+
+class DocumentClassifier:
+    """
+    Fast document-type classifier that runs before the full-page OCR pass.
+
+    The page is downscaled to a thumbnail and only its header band is OCR'd,
+    which is where IRS forms print the form number, title and year. The whole
+    thumbnail is OCR'd only if the header is inconclusive, and pages that
+    still match no signature are classified as ``generic``.
+    """
+    def __init__(
+        self,
+        ocr_func: Callable[[np.ndarray], str],
+        thumbnail_width: int = 1000,
+        header_fraction: float = 0.3,
+        min_score: int = 2
+    ):
+        self.ocr_func = ocr_func
+        self.thumbnail_width = thumbnail_width
+        self.header_fraction = header_fraction
+        self.min_score = min_score
+        self.signatures = {
+            form_type: (doc_type, re.compile(code, re.IGNORECASE), re.compile(title, re.IGNORECASE))
+            for form_type, (doc_type, code, title) in FORM_SIGNATURES.items()
+        }
+        self.stats = {
+            'pages': 0,
+            'header_only': 0,
+            'full_thumbnail': 0,
+            'unclassified': 0,
+            'total_time': 0.0
+        }
+
+    def classify(self, gray: np.ndarray) -> ClassificationResult:
+        """
+        Classify a grayscale, upright page.
+
+        Args:
+            gray: Grayscale page image
+
+        Returns:
+            ClassificationResult with the document type, form variant and year
+        """
+        start_time = time.time()
+        thumbnail = self._thumbnail(gray)
+        header = thumbnail[:max(1, int(thumbnail.shape[0] * self.header_fraction))]
+
+        header_text = self.ocr_func(header)
+        result = self.classify_text(header_text)
+        result.stage = "header"
+        if result.form_type is None:
+            result = self.classify_text(self.ocr_func(thumbnail))
+            result.stage = "thumbnail"
+            self.stats['full_thumbnail'] += 1
+        else:
+            self.stats['header_only'] += 1
+
+        if result.form_type is None:
+            result.stage = "none"
+            self.stats['unclassified'] += 1
+
+        elapsed = time.time() - start_time
+        result.latency_ms = elapsed * 1000
+        self.stats['pages'] += 1
+        self.stats['total_time'] += elapsed
+        return result
+
+    def classify_text(self, text: str) -> ClassificationResult:
+        """
+        Match OCR text against the known form signatures.
+
+        A form-number match scores 2 and a form-title match 1; the best form
+        must reach ``min_score``. Confidence is its share of all matches.
+        """
+        scores = {}
+        for form_type, (_, code, title) in self.signatures.items():
+            score = (2 if code.search(text) else 0) + (1 if title.search(text) else 0)
+            if score:
+                scores[form_type] = score
+
+        if not scores:
+            return ClassificationResult()
+        form_type = max(scores, key=scores.get)
+        if scores[form_type] < self.min_score:
+            return ClassificationResult()
+
+        return ClassificationResult(
+            doc_type=self.signatures[form_type][0],
+            form_type=form_type,
+            year=self._detect_year(text),
+            confidence=scores[form_type] / float(sum(scores.values()))
+        )
+
+    def _detect_year(self, text: str) -> Optional[int]:
+        revision = REVISION_PATTERN.search(text)
+        if revision:
+            return int(revision.group(1))
+        years = YEAR_PATTERN.findall(text)
+        if not years:
+            return None
+        return int(Counter(years).most_common(1)[0][0])
+
+    def _thumbnail(self, gray: np.ndarray) -> np.ndarray:
+        scale = self.thumbnail_width / float(gray.shape[1])
+        if scale >= 1.0:
+            return gray
+        return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    def evaluate(self, samples: Iterable[Tuple[np.ndarray, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Measure classification accuracy and latency on a labeled corpus.
+
+        Args:
+            samples: (grayscale page, label) pairs; labels hold ``form_type``
+                and optionally ``year``
+
+        Returns:
+            Dictionary with accuracy, latency percentiles and misclassifications
+        """
+        latencies: List[float] = []
+        form_correct = doc_correct = year_correct = year_total = header_only = 0
+        errors = []
+
+        for index, (gray, label) in enumerate(samples):
+            result = self.classify(gray)
+            latencies.append(result.latency_ms)
+            header_only += 1 if result.stage == "header" else 0
+
+            expected_form = label['form_type']
+            expected_doc = FORM_SIGNATURES.get(expected_form, ('generic',))[0]
+            form_correct += 1 if result.form_type == expected_form else 0
+            doc_correct += 1 if result.doc_type == expected_doc else 0
+            if label.get('year') is not None:
+                year_total += 1
+                year_correct += 1 if result.year == label['year'] else 0
+
+            if result.form_type != expected_form:
+                errors.append({
+                    'index': index,
+                    'expected': expected_form,
+                    'predicted': result.form_type,
+                    'stage': result.stage
+                })
+
+        total = len(latencies)
+        return {
+            'samples': total,
+            'form_accuracy': form_correct / total if total else 0.0,
+            'doc_type_accuracy': doc_correct / total if total else 0.0,
+            'year_accuracy': year_correct / year_total if year_total else None,
+            'header_only_rate': header_only / total if total else 0.0,
+            'p50_ms': float(np.percentile(latencies, 50)) if total else 0.0,
+            'p95_ms': float(np.percentile(latencies, 95)) if total else 0.0,
+            'errors': errors
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get classification statistics."""
+        pages = self.stats['pages']
+        return {
+            **self.stats,
+            'avg_time_ms': 1000.0 * self.stats['total_time'] / pages if pages else 0.0
+        }
@@ -1,69 +1,259 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
 import os
+import time
 import logging
 from pathlib import Path
-import pytesseract
-from pdf2image import convert_from_path
 import cv2
 import numpy as np
-from PIL import Image
+
+from .ocr_pool import OCREnginePool, get_ocr_pool
+from .orientation import OrientationDetector
+from .document_classifier import DocumentClassifier
+from .image_tiling import ImageTiler
+from .ocr_store import OCRStore
+from .phash_index import PageHashIndex, page_signature, text_similarity
+from .barcode_reader import W2BarcodeReader
+from .adaptive_ocr import AdaptiveOCR
+from .parsed_document import ParsedDocument, ParsedDocumentStore
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever preprocessing or OCR changes, so stored OCR results are discarded
+PIPELINE_VERSION = "2"
+
 class DocumentProcessor:
-    def __init__(self, temp_dir: str = "temp"):
+    def __init__(
+        self,
+        temp_dir: str = "temp",
+        ocr_pool: Optional[OCREnginePool] = None,
+        orientation_detector: Optional[OrientationDetector] = None,
+        document_classifier: Optional[DocumentClassifier] = None,
+        image_tiler: Optional[ImageTiler] = None,
+        ocr_store: Optional[OCRStore] = None,
+        page_index: Optional[PageHashIndex] = None,
+        near_duplicate_min_similarity: float = 0.7,
+        near_duplicate_check_width: int = 1275,
+        barcode_reader: Optional[W2BarcodeReader] = None,
+        adaptive_ocr: Optional[AdaptiveOCR] = None,
+        ocr_low_dpi: int = 150,
+        ocr_min_confidence: float = 70.0,
+        document_store: Optional[ParsedDocumentStore] = None
+    ):
         self.temp_dir = Path(temp_dir)
         self.temp_dir.mkdir(exist_ok=True)
+        self.ocr_pool = ocr_pool or get_ocr_pool()
+        # Tesseract OSD only runs when the cheap projection-profile detector is unsure
+        self.orientation_detector = orientation_detector or OrientationDetector(
+            osd_func=self.ocr_pool.detect_orientation
+        )
+        self.document_classifier = document_classifier or DocumentClassifier(
+            ocr_func=self.ocr_pool.image_to_string
+        )
+        self.image_tiler = image_tiler or ImageTiler()
+        # W-2 PDF417 barcodes replace OCR when they decode cleanly (needs zxing-cpp)
+        self.barcode_reader = barcode_reader or W2BarcodeReader()
+        # Low-DPI first pass; only low-confidence regions are re-read at full resolution
+        self.adaptive_ocr = adaptive_ocr or AdaptiveOCR(
+            ocr_func=self.ocr_pool.image_to_page,
+            preprocess_func=self._preprocess_image,
+            source_dpi=self.image_tiler.target_dpi,
+            low_dpi=ocr_low_dpi,
+            min_confidence=ocr_min_confidence
+        )
+        # Optional durable OCR store; without one every document is OCR'd
+        self.ocr_store = ocr_store
+        # Optional store of parsed documents, so /analyze can take a document_id
+        self.document_store = document_store
+        # Optional perceptual-hash index over stored pages for near-duplicate reuse
+        self.page_index = page_index if ocr_store is not None else None
+        self.near_duplicate_min_similarity = near_duplicate_min_similarity
+        self.near_duplicate_check_width = near_duplicate_check_width
+        if self.page_index is not None:
+            if len(self.page_index) == 0:
+                stored = self.ocr_store.page_signatures()
+                if stored:
+                    self.page_index.add_many([(p, d) for _, p, d in stored], [page_id for page_id, _, _ in stored])
+                    logger.info(f"Loaded {len(stored)} page signatures into the near-duplicate index")
+            # Pages evicted from the store leave the index too
+            self.ocr_store.add_eviction_listener(self.page_index.remove)
         
-    def process_document(self, file_path: str, doc_type: str) -> Dict[str, Any]:
+    def process_document(
+        self,
+        file_path: str,
+        doc_type: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        page_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        content_hash: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Process a tax document and extract relevant information.
         
         Args:
             file_path: Path to the document file
-            doc_type: Type of document (w2, 1099, etc.)
+            doc_type: Type of document (w2, 1099, etc.); classified from the
+                first page when omitted
+            progress_callback: Optional callable invoked as (pages_done, pages_total)
+                after each page is processed
+            page_callback: Optional callable invoked with each page's result
+                (text and extracted fields) as soon as that page is finished
+            content_hash: SHA-256 of the file if already known (e.g. hashed
+                while it was uploaded), to avoid reading it again
+            
+        Returns:
+            Dict containing extracted information
+        """
+        try:
+            # Reuse stored OCR for identical content before rasterizing anything
+            store_key = self._store_key(file_path, content_hash, doc_type)
+            ocr_pages = self.ocr_store.get(store_key) if store_key else None
+            
+            if ocr_pages is not None:
+                return self._from_store(ocr_pages, doc_type, progress_callback, page_callback)
+            
+            # Decode pages lazily, reduced to the resolution OCR needs
+            page_count, pages = self._load_pages(file_path)
+            return self.process_pages(
+                page_count, pages, doc_type, progress_callback, page_callback, store_key
+            )
+            
+        except Exception as e:
+            logger.error(f"Error processing document: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def process_bytes(
+        self,
+        data: bytes,
+        doc_type: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        page_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Process a JPEG/PNG image held in memory, without writing it to disk.
+        
+        Args:
+            data: Encoded image bytes
+            doc_type: Type of document; classified from the page when omitted
+            progress_callback: Optional callable invoked as (pages_done, pages_total)
+            page_callback: Optional callable invoked with the page's result
             
         Returns:
             Dict containing extracted information
         """
         try:
-            # Convert PDF to images if needed
-            if file_path.lower().endswith('.pdf'):
-                images = self._convert_pdf_to_images(file_path)
-            else:
-                images = [Image.open(file_path)]
+            store_key = None
+            if self.ocr_store is not None:
+                store_key = self.ocr_store.make_key(self.ocr_store.hash_bytes(data), self._ocr_params(doc_type))
+                ocr_pages = self.ocr_store.get(store_key)
+                if ocr_pages is not None:
+                    return self._from_store(ocr_pages, doc_type, progress_callback, page_callback)
+            
+            gray = self.image_tiler.decode_image(data)
+            return self.process_pages(1, iter([gray]), doc_type, progress_callback, page_callback, store_key)
             
-            # Process each page
+        except Exception as e:
+            logger.error(f"Error processing document: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def process_pages(
+        self,
+        page_count: int,
+        pages: Iterator[np.ndarray],
+        doc_type: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        page_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        store_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Process already-decoded pages of a document.
+        
+        Pages are consumed one at a time, so ``pages`` may block until the
+        next page is available (e.g. while it is still being uploaded).
+        
+        Args:
+            page_count: Number of pages ``pages`` will yield
+            pages: Iterator over grayscale pages within the pixel budget
+            doc_type: Type of document; classified from the first page when omitted
+            progress_callback: Optional callable invoked as (pages_done, pages_total)
+            page_callback: Optional callable invoked with each page's result
+            store_key: OCR store key to save the pages under, if any
+            
+        Returns:
+            Dict containing extracted information
+        """
+        try:
+            classification = None
+            page_timings = []
             results = []
-            for idx, image in enumerate(images):
-                # Preprocess image
-                processed_image = self._preprocess_image(image)
+            ocr_pages = []
+            signatures = []
+            for idx, page in enumerate(pages):
+                # Resolution the tiler reduced the page to, if the source recorded one
+                dpi = getattr(page, 'dpi', None)
+                page = np.asarray(page)
+                # Correct rotation and skew, then preprocess image
+                gray, orientation = self.orientation_detector.correct(page)
+                
+                timings = {}
+                signature = page_signature(gray) if self.page_index is not None else None
                 
-                # Extract text
-                text = self._extract_text(processed_image)
+                # A W-2 barcode carries every box value, so OCR is not needed
+                barcodes = self._reads_barcodes(doc_type)
+                ocr_page = self._read_barcode(gray, timings) if barcodes else None
+                
+                # Reuse the OCR of a previously seen near-identical page (rescans, resubmissions)
+                if ocr_page is None and signature:
+                    ocr_page = self._find_near_duplicate(gray, signature, barcodes)
+                
+                # Route on a cheap header classification before the full-page pass
+                if doc_type is None:
+                    if ocr_page is not None:
+                        classification = self.document_classifier.classify_text(ocr_page['text'])
+                        classification.stage = "barcode" if 'barcode' in ocr_page else "near_duplicate"
+                    else:
+                        classification = self.document_classifier.classify(gray)
+                    doc_type = classification.doc_type
+                
+                if ocr_page is None:
+                    ocr_start = time.perf_counter()
+                    
+                    # Extract text, word boxes and confidences
+                    ocr_page = self.adaptive_ocr.recognize(gray, dpi)
+                    timings['ocr_ms'] = (time.perf_counter() - ocr_start) * 1000
+                ocr_page['orientation'] = orientation.to_dict()
+                ocr_pages.append(ocr_page)
+                signatures.append(signature)
+                page_timings.append(timings)
                 
                 # Extract structured data based on document type
-                if doc_type.lower() == 'w2':
-                    data = self._extract_w2_data(text, processed_image)
-                elif doc_type.lower() == '1099':
-                    data = self._extract_1099_data(text, processed_image)
+                results.append(self._page_result(idx, ocr_page, doc_type))
+                if page_callback:
+                    page_callback(results[-1])
+                if progress_callback:
+                    progress_callback(idx + 1, page_count)
+            
+            if store_key:
+                if self.page_index is not None:
+                    page_ids = self.ocr_store.put(store_key, ocr_pages, signatures)
+                    for signature, page_id in zip(signatures, page_ids):
+                        self.page_index.add(signature, page_id)
                 else:
-                    data = self._extract_generic_data(text, processed_image)
-                
-                results.append({
-                    'page': idx + 1,
-                    'text': text,
-                    'data': data
-                })
+                    self.ocr_store.put(store_key, ocr_pages)
             
             # Clean up temporary files
             self._cleanup()
             
-            return {
-                'success': True,
-                'pages': len(results),
-                'results': results
-            }
+            response = self._response(doc_type, results, False, classification, ocr_pages)
+            # Per-page barcode/OCR latency, to see what the barcode fast path saves
+            response['timings'] = [
+                {name: round(ms, 2) for name, ms in timings.items()} for timings in page_timings
+            ]
+            return response
             
         except Exception as e:
             logger.error(f"Error processing document: {str(e)}")
@@ -72,34 +262,212 @@ class DocumentProcessor:
                 'error': str(e)
             }
     
-    def _convert_pdf_to_images(self, pdf_path: str) -> list:
-        """Convert PDF to list of PIL Images."""
-        return convert_from_path(pdf_path)
+    def _from_store(
+        self,
+        ocr_pages: List[Dict[str, Any]],
+        doc_type: Optional[str],
+        progress_callback: Optional[Callable[[int, int], None]],
+        page_callback: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> Dict[str, Any]:
+        """Build the response from stored OCR pages, re-running only field extraction."""
+        classification = None
+        if doc_type is None:
+            classification = self.document_classifier.classify_text(ocr_pages[0]['text'])
+            classification.stage = "store"
+            doc_type = classification.doc_type
+        results = []
+        for idx, ocr_page in enumerate(ocr_pages):
+            results.append(self._page_result(idx, ocr_page, doc_type))
+            if page_callback:
+                page_callback(results[-1])
+        if progress_callback:
+            progress_callback(len(ocr_pages), len(ocr_pages))
+        self._cleanup()
+        return self._response(doc_type, results, True, classification, ocr_pages)
     
-    def _preprocess_image(self, image: Image.Image) -> np.ndarray:
-        """Preprocess image for better OCR results."""
-        # Convert to numpy array
-        img_array = np.array(image)
+    def _response(
+        self,
+        doc_type: Optional[str],
+        results: List[Dict[str, Any]],
+        from_store: bool,
+        classification: Any,
+        ocr_pages: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Document-level response from the per-page results."""
+        response = {
+            'success': True,
+            'doc_type': doc_type,
+            'pages': len(results),
+            'from_store': from_store,
+            'confidence': float(np.mean([r['confidence'] for r in results])) if results else 0.0,
+            'results': results
+        }
+        if classification is not None:
+            response['classification'] = classification.to_dict()
+        if self.document_store is not None:
+            # Parsed once here and reused by /analyze and /process?analyze=true
+            response['document_id'] = self.document_store.put(
+                ParsedDocument.from_ocr_pages(ocr_pages, doc_type, response['confidence'])
+            )
+        return response
+    
+    def _page_result(self, idx: int, ocr_page: Dict[str, Any], doc_type: str) -> Dict[str, Any]:
+        """Build the result of one page from its OCR output."""
+        data = self._extract_data(doc_type, ocr_page['text'])
+        if 'barcode' in ocr_page:
+            data['extracted_data'] = ocr_page['barcode']['fields']
+            data['source'] = 'barcode'
+        result = {
+            'page': idx + 1,
+            'text': ocr_page['text'],
+            'data': data,
+            'confidence': ocr_page['confidence'],
+            'orientation': ocr_page['orientation']
+        }
+        if 'near_duplicate' in ocr_page:
+            result['near_duplicate'] = ocr_page['near_duplicate']
+        if 'reocr' in ocr_page:
+            result['reocr'] = ocr_page['reocr']
+        return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get OCR pipeline statistics (adaptive re-OCR, barcodes, near-duplicates, store)."""
+        return {
+            'adaptive_ocr': self.adaptive_ocr.get_stats(),
+            'barcode': self.barcode_reader.get_stats(),
+            'page_index': self.page_index.get_stats() if self.page_index is not None else None,
+            'ocr_store': self.ocr_store.get_stats() if self.ocr_store is not None else None
+        }
+    
+    def _read_barcode(self, gray: np.ndarray, timings: Dict[str, float]) -> Optional[Dict[str, Any]]:
+        """Decode a W-2 barcode into a page record standing in for OCR output, or None."""
+        if not self.barcode_reader.available:
+            return None
+        start_time = time.perf_counter()
+        barcode = self.barcode_reader.read(gray)
+        timings['barcode_ms'] = (time.perf_counter() - start_time) * 1000
+        if barcode is None:
+            return None
+        return {
+            'text': barcode['text'],
+            'words': {'text': [], 'conf': []},
+            'confidence': 1.0,
+            'barcode': {
+                'tax_year': barcode['tax_year'],
+                'fields': barcode['fields']
+            }
+        }
+    
+    def _find_near_duplicate(self, gray: np.ndarray, signature: Tuple[int, int], barcodes: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Look up a stored page that looks like this one and confirm it has the same content.
+        
+        Pages of the same form template hash alike even when the amounts differ,
+        so a hash match is only accepted if the numbers from a cheap low-resolution
+        OCR agree with the stored text.
+        
+        Args:
+            gray: Orientation-corrected grayscale page
+            signature: Perceptual signature of the page
+            barcodes: Whether a page read from a W-2 barcode may be reused
+            
+        Returns:
+            The stored page with ``near_duplicate`` metadata, or None
+        """
+        match = self.page_index.nearest(signature)
+        if match is None:
+            return None
+        page_id, distance = match
+        stored = self.ocr_store.get_page(page_id)
+        if stored is None:
+            # Removed from the store without the index being told (e.g. by another process)
+            self.page_index.remove([page_id])
+            return None
+        if 'barcode' in stored and not barcodes:
+            return None
+        
+        height, width = gray.shape[:2]
+        check = gray
+        if width > self.near_duplicate_check_width:
+            scale = self.near_duplicate_check_width / float(width)
+            check = cv2.resize(gray, (self.near_duplicate_check_width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        similarity = text_similarity(self.ocr_pool.image_to_string(check), stored['text'])
+        if similarity < self.near_duplicate_min_similarity:
+            logger.debug(f"Near-duplicate candidate {page_id} rejected (distance {distance}, similarity {similarity:.2f})")
+            return None
         
-        # Convert to grayscale
+        stored['near_duplicate'] = {
+            'page_id': page_id,
+            'distance': distance,
+            'similarity': round(similarity, 3)
+        }
+        return stored
+    
+    def _store_key(self, file_path: str, content_hash: Optional[str] = None, doc_type: Optional[str] = None) -> Optional[str]:
+        """Content-addressed OCR store key for a document, or None without a store."""
+        if self.ocr_store is None:
+            return None
+        return self.ocr_store.make_key(content_hash or self.ocr_store.hash_file(file_path), self._ocr_params(doc_type))
+    
+    def _reads_barcodes(self, doc_type: Optional[str]) -> bool:
+        """Whether pages of a document requested as ``doc_type`` are checked for a W-2 barcode."""
+        return doc_type in (None, 'w2') and self.barcode_reader.available
+    
+    def _ocr_params(self, doc_type: Optional[str] = None) -> Dict[str, Any]:
+        """Parameters that change OCR output for the same input document."""
+        config = getattr(self.ocr_pool, 'config', None)
+        return {
+            # Barcode pages replace OCR, so they are only reused where a barcode would be read
+            'barcodes': self._reads_barcodes(doc_type),
+            'lang': getattr(config, 'lang', None),
+            'psm': getattr(config, 'psm', None),
+            'oem': getattr(config, 'oem', None),
+            'max_page_pixels': self.image_tiler.max_page_pixels,
+            'target_dpi': self.image_tiler.target_dpi,
+            'low_dpi': self.adaptive_ocr.low_dpi,
+            'min_confidence': self.adaptive_ocr.min_confidence
+        }
+    
+    def _load_pages(self, file_path: str) -> Tuple[int, Iterator[np.ndarray]]:
+        """Return the page count and an iterator over grayscale pages within the pixel budget."""
+        if file_path.lower().endswith('.pdf') or self._is_pdf(file_path):
+            return self.image_tiler.pdf_pages(file_path)
+        return 1, iter([self.image_tiler.load_image(file_path)])
+    
+    def _is_pdf(self, file_path: str) -> bool:
+        """Detect PDFs by content, for files stored without an extension (e.g. blobs)."""
+        with open(file_path, 'rb') as f:
+            return f.read(5) == b'%PDF-'
+    
+    def _to_grayscale(self, image: Any) -> np.ndarray:
+        """Convert a PIL image or array to a grayscale numpy array."""
+        img_array = np.asarray(image)
         if len(img_array.shape) == 3:
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img_array
+            return cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        return img_array
+    
+    def _preprocess_image(self, image: Any) -> np.ndarray:
+        """Preprocess image for better OCR results."""
+        # Convert to grayscale numpy array
+        gray = self._to_grayscale(image)
             
         # Apply thresholding
         _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         
-        # Denoise
-        denoised = cv2.fastNlMeansDenoising(binary)
+        # Denoise in overlapping tiles to bound memory on large pages
+        denoised = self.image_tiler.apply(binary, cv2.fastNlMeansDenoising)
         
         return denoised
     
-    def _extract_text(self, image: np.ndarray) -> str:
-        """Extract text from image using OCR."""
-        return pytesseract.image_to_string(image)
+    def _extract_data(self, doc_type: str, text: str, image: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Extract structured data based on document type."""
+        if doc_type.lower() == 'w2':
+            return self._extract_w2_data(text, image)
+        if doc_type.lower() == '1099':
+            return self._extract_1099_data(text, image)
+        return self._extract_generic_data(text, image)
     
-    def _extract_w2_data(self, text: str, image: np.ndarray) -> Dict[str, Any]:
+    def _extract_w2_data(self, text: str, image: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """Extract data from W-2 form."""
         # TODO: Implement W-2 specific extraction logic
         return {
@@ -108,7 +476,7 @@ class DocumentProcessor:
             'extracted_data': {}
         }
     
-    def _extract_1099_data(self, text: str, image: np.ndarray) -> Dict[str, Any]:
+    def _extract_1099_data(self, text: str, image: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """Extract data from 1099 form."""
         # TODO: Implement 1099 specific extraction logic
         return {
@@ -117,7 +485,7 @@ class DocumentProcessor:
             'extracted_data': {}
         }
     
-    def _extract_generic_data(self, text: str, image: np.ndarray) -> Dict[str, Any]:
+    def _extract_generic_data(self, text: str, image: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """Extract data from generic tax document."""
         return {
             'type': 'generic',
@@ -0,0 +1,250 @@
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import io
+import math
+import logging
+import cv2
+import numpy as np
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+logger = logging.getLogger(__name__)
+
+# Tesseract gains nothing from more than ~300 DPI on printed forms
+OCR_DPI = 300
+
+# libjpeg DCT scaling factors available to cv2.imdecode, largest reduction first
+_REDUCED_GRAYSCALE = (
+    (8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+)
+
+class PageImage(np.ndarray):
+    """
+    Grayscale page that records its resolution as ``dpi`` (None when the
+    source does not say). Views and slices keep it; OpenCV results are
+    plain arrays.
+    """
+    def __new__(cls, array: np.ndarray, dpi: Optional[float] = None) -> 'PageImage':
+        page = np.asarray(array).view(cls)
+        page.dpi = dpi
+        return page
+
+    def __array_finalize__(self, obj: Any) -> None:
+        self.dpi = getattr(obj, 'dpi', None)
+
+class ImageTiler:
+    """
+    Bounded-memory page loading and tiled preprocessing for oversized scans.
+
+    Pages are decoded straight to grayscale and reduced to the resolution OCR
+    needs (``target_dpi``, capped by ``max_page_pixels``). JPEGs are decoded in
+    draft mode, letting libjpeg scale by 1/2, 1/4 or 1/8 during decoding, and
+    PDFs are rasterized one page at a time at a DPI that fits the budget.
+    Expensive filters run on overlapping tiles so their working memory is
+    bounded by the tile size rather than the page size. Pages are returned
+    as ``PageImage`` with the resolution they were reduced to, so OCR can
+    tell a 150 DPI scan from a 300 DPI one.
+    """
+    def __init__(
+        self,
+        max_page_pixels: int = 9_000_000,
+        target_dpi: int = OCR_DPI,
+        tile_size: int = 1024,
+        overlap: int = 16,
+        tile_min_pixels: int = 4_000_000
+    ):
+        self.max_page_pixels = max_page_pixels
+        self.target_dpi = target_dpi
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.tile_min_pixels = tile_min_pixels
+        self.stats = {
+            'pages': 0,
+            'draft_decodes': 0,
+            'memory_decodes': 0,
+            'downscaled': 0,
+            'tiled': 0,
+            'source_pixels': 0,
+            'output_pixels': 0
+        }
+
+    def load_image(self, file_path: str) -> np.ndarray:
+        """
+        Decode an image file to a grayscale array within the page budget.
+
+        Args:
+            file_path: Path to a JPEG/PNG image
+
+        Returns:
+            Grayscale page as a uint8 ``PageImage``
+        """
+        with Image.open(file_path) as image:
+            width, height = image.size
+            scale = self._target_scale(width, height, image.info.get('dpi'))
+            dpi = self._declared_dpi(image.info.get('dpi'))
+
+            if image.format == 'JPEG' and scale < 1.0:
+                # Only the DCT scale factor is chosen here; the result is at least the requested size
+                image.draft('L', self._scaled_size(width, height, scale))
+                if image.size != (width, height):
+                    self.stats['draft_decodes'] += 1
+
+            gray = np.asarray(image.convert('L'))
+
+        self.stats['source_pixels'] += width * height
+        return self._fit(gray, self._scaled_size(width, height, scale), dpi and dpi * scale)
+
+    def decode_image(self, data: bytes) -> np.ndarray:
+        """
+        Decode an in-memory JPEG/PNG straight to a grayscale array within the page budget.
+
+        The pixels are decoded by OpenCV directly from ``data`` (no temporary
+        file and no intermediate PIL image); only the header is parsed by PIL,
+        for the size and DPI. JPEGs use libjpeg's DCT scaling like the draft
+        mode of ``load_image``.
+
+        Args:
+            data: Encoded image bytes
+
+        Returns:
+            Grayscale page as a uint8 ``PageImage``
+        """
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            scale = self._target_scale(width, height, image.info.get('dpi'))
+            dpi = self._declared_dpi(image.info.get('dpi'))
+            is_jpeg = image.format == 'JPEG'
+
+        flags = cv2.IMREAD_GRAYSCALE
+        if is_jpeg and scale < 1.0:
+            target_width, target_height = self._scaled_size(width, height, scale)
+            for factor, reduced in _REDUCED_GRAYSCALE:
+                # Same rule as PIL's draft: the result is at least the requested size
+                if width // factor >= target_width and height // factor >= target_height:
+                    flags = reduced
+                    self.stats['draft_decodes'] += 1
+                    break
+
+        # EXIF rotation is left to the orientation detector, as with load_image
+        gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+        if gray is None:
+            # Formats OpenCV cannot read (e.g. some palette PNGs) go through PIL
+            with Image.open(io.BytesIO(data)) as image:
+                gray = np.asarray(image.convert('L'))
+        self.stats['memory_decodes'] += 1
+        self.stats['source_pixels'] += width * height
+        return self._fit(gray, self._scaled_size(width, height, scale), dpi and dpi * scale)
+
+    def pdf_pages(self, pdf_path: str) -> Tuple[int, Iterator[np.ndarray]]:
+        """
+        Rasterize a PDF lazily, one grayscale page at a time.
+
+        Returns:
+            Tuple of (page count, iterator over grayscale ``PageImage`` pages)
+        """
+        info = pdfinfo_from_path(pdf_path)
+        page_count = int(info.get('Pages', 1))
+        dpi = self._pdf_dpi(info.get('Page size', ''))
+
+        def pages() -> Iterator[np.ndarray]:
+            for number in range(1, page_count + 1):
+                rendered = convert_from_path(
+                    pdf_path, dpi=dpi, first_page=number, last_page=number, grayscale=True
+                )
+                for image in rendered:
+                    width, height = image.size
+                    self.stats['source_pixels'] += width * height
+                    scale = self._target_scale(width, height)
+                    yield self._fit(
+                        np.asarray(image.convert('L')),
+                        self._scaled_size(width, height, scale),
+                        dpi * scale
+                    )
+
+        return page_count, pages()
+
+    def fit_to_budget(self, gray: np.ndarray) -> np.ndarray:
+        """Downscale an already-decoded grayscale page to the pixel budget."""
+        height, width = gray.shape[:2]
+        self.stats['source_pixels'] += width * height
+        scale = self._target_scale(width, height)
+        dpi = getattr(gray, 'dpi', None)
+        return self._fit(gray, self._scaled_size(width, height, scale), dpi and dpi * scale)
+
+    def _target_scale(self, width: int, height: int, dpi: Optional[Tuple[float, float]] = None) -> float:
+        scale = min(1.0, math.sqrt(self.max_page_pixels / float(width * height)))
+        # Scans record their DPI; phone photos usually claim 72 and are left to the budget
+        if dpi and dpi[0] and dpi[0] > self.target_dpi:
+            scale = min(scale, self.target_dpi / float(dpi[0]))
+        return scale
+
+    @staticmethod
+    def _declared_dpi(dpi: Optional[Tuple[float, float]]) -> Optional[float]:
+        """Resolution recorded by a scanner; the 72 DPI cameras and screenshots claim says nothing."""
+        if dpi and dpi[0] and round(float(dpi[0])) > 72:
+            return float(dpi[0])
+        return None
+
+    def _scaled_size(self, width: int, height: int, scale: float) -> Tuple[int, int]:
+        # Round down so the result never exceeds the pixel budget
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def _pdf_dpi(self, page_size: str) -> int:
+        """Highest DPI up to ``target_dpi`` at which a page fits the pixel budget."""
+        try:
+            # pdfinfo reports e.g. "612 x 792 pts (letter)"
+            width_pts, _, height_pts = page_size.split()[:3]
+            area_in = (float(width_pts) / 72.0) * (float(height_pts) / 72.0)
+        except ValueError:
+            return self.target_dpi
+        return max(72, min(self.target_dpi, int(math.sqrt(self.max_page_pixels / area_in))))
+
+    def _fit(self, gray: np.ndarray, size: Tuple[int, int], dpi: Optional[float] = None) -> PageImage:
+        self.stats['pages'] += 1
+        height, width = gray.shape[:2]
+        if width > size[0] or height > size[1]:
+            gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+            self.stats['downscaled'] += 1
+        self.stats['output_pixels'] += gray.shape[0] * gray.shape[1]
+        return PageImage(gray, dpi)
+
+    def apply(self, image: np.ndarray, func: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """
+        Apply a neighbourhood filter in overlapping tiles.
+
+        Each tile is processed with ``overlap`` pixels of context on every side
+        and only its core is written back, so as long as the filter's radius is
+        within the overlap the output matches filtering the whole image.
+
+        Args:
+            image: 2D image array
+            func: Filter returning an array of the same shape as its input
+
+        Returns:
+            Filtered image
+        """
+        height, width = image.shape[:2]
+        if height * width < self.tile_min_pixels:
+            return func(image)
+
+        self.stats['tiled'] += 1
+        output = np.empty_like(image)
+        step = self.tile_size
+        for top in range(0, height, step):
+            for left in range(0, width, step):
+                bottom, right = min(top + step, height), min(left + step, width)
+                y0, x0 = max(top - self.overlap, 0), max(left - self.overlap, 0)
+                y1, x1 = min(bottom + self.overlap, height), min(right + self.overlap, width)
+
+                tile = func(np.ascontiguousarray(image[y0:y1, x0:x1]))
+                output[top:bottom, left:right] = tile[top - y0:bottom - y0, left - x0:right - x0]
+        return output
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get page loading and tiling statistics."""
+        source = self.stats['source_pixels']
+        return {
+            **self.stats,
+            'pixel_reduction': 1.0 - self.stats['output_pixels'] / float(source) if source else 0.0
+        }
@@ -0,0 +1,318 @@
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import asyncio
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(RuntimeError):
+    """Raised when the job queue is at its maximum depth."""
+
+class Job:
+    """A unit of background document processing work."""
+    def __init__(self, job_id: str, metadata: Optional[Dict[str, Any]] = None):
+        self.job_id = job_id
+        self.metadata = metadata or {}
+        self.status = "queued"
+        self.pages_done = 0
+        self.pages_total: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.completed_at: Optional[datetime] = None
+        # Per-page results, available while later pages are still processing
+        self.pages: List[Dict[str, Any]] = []
+        self._listeners: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._lock = threading.Lock()
+
+    def update_progress(self, pages_done: int, pages_total: int) -> None:
+        """Record page-level progress reported by the processing pipeline."""
+        with self._lock:
+            self.pages_done = pages_done
+            self.pages_total = pages_total
+        self.notify()
+
+    def add_page(self, page: Dict[str, Any]) -> None:
+        """Record a finished page's result reported by the processing pipeline."""
+        with self._lock:
+            self.pages.append(page)
+        self.notify()
+
+    def pages_since(self, index: int) -> List[Dict[str, Any]]:
+        """Page results finished after the first ``index`` pages."""
+        with self._lock:
+            return self.pages[index:]
+
+    def subscribe(self) -> asyncio.Event:
+        """
+        Get an event that is set whenever the job makes progress or finishes.
+
+        Must be called from the event loop that waits on the event; the
+        worker thread wakes it with ``call_soon_threadsafe``.
+        """
+        event = asyncio.Event()
+        with self._lock:
+            self._listeners.append((asyncio.get_running_loop(), event))
+        return event
+
+    def unsubscribe(self, event: asyncio.Event) -> None:
+        with self._lock:
+            self._listeners = [(loop, e) for loop, e in self._listeners if e is not event]
+
+    def notify(self) -> None:
+        """Wake up all subscribers."""
+        with self._lock:
+            listeners = list(self._listeners)
+        for loop, event in listeners:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The subscriber's event loop has been closed
+                pass
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the job for status responses."""
+        with self._lock:
+            percent = 100.0 if self.status == "completed" else (
+                round(100.0 * self.pages_done / self.pages_total, 1) if self.pages_total else 0.0
+            )
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "progress": {
+                    "pages_done": self.pages_done,
+                    "pages_total": self.pages_total,
+                    "percent": percent
+                },
+                "result": self.result,
+                "error": self.error,
+                "metadata": self.metadata,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "completed_at": self.completed_at
+            }
+
+class JobQueue:
+    """
+    Bounded background worker pool for document processing jobs.
+
+    At most ``max_workers`` jobs run at once; once ``max_queue_depth`` jobs are
+    queued or running, new submissions are rejected so callers can back off.
+    Finished jobs are kept for ``job_ttl`` seconds (and at most ``max_jobs``)
+    so clients can poll for results. Expired jobs are dropped on submission,
+    and on lookups and metrics at most every ``prune_interval`` seconds.
+    """
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queue_depth: int = 50,
+        job_ttl: int = 3600,
+        max_jobs: int = 1000,
+        prune_interval: float = 60.0
+    ):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.job_ttl = job_ttl
+        self.max_jobs = max_jobs
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._removal_listeners: List[Callable[[List[str]], None]] = []
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "total_wait_time": 0.0,
+            "total_run_time": 0.0
+        }
+
+    def submit(
+        self,
+        func: Callable[..., Dict[str, Any]],
+        *args: Any,
+        metadata: Optional[Dict[str, Any]] = None,
+        job_id: Optional[str] = None
+    ) -> Job:
+        """
+        Queue ``func(job, *args)`` for background execution.
+
+        Args:
+            func: Callable doing the work; receives the Job as first argument
+            *args: Extra positional arguments for ``func``
+            metadata: Optional metadata stored with the job
+            job_id: ID to give the job, if the caller recorded it beforehand (default: a new UUID)
+
+        Returns:
+            The queued Job
+
+        Raises:
+            QueueFullError: If the queue is at its maximum depth
+        """
+        with self._lock:
+            if self._pending >= self.max_queue_depth:
+                self.stats["rejected"] += 1
+                raise QueueFullError(
+                    f"Processing queue is full ({self.max_queue_depth} jobs pending)"
+                )
+            job = Job(job_id or str(uuid.uuid4()), metadata)
+            removed = self._prune(room=1)
+            self._jobs[job.job_id] = job
+            self._pending += 1
+            self.stats["submitted"] += 1
+
+        self._notify_removed(removed)
+        self._executor.submit(self._run, job, func, args)
+        return job
+
+    def _run(self, job: Job, func: Callable[..., Dict[str, Any]], args: tuple) -> None:
+        with self._lock:
+            self._running += 1
+        job.status = "processing"
+        job.started_at = datetime.now()
+        start_time = time.time()
+
+        status, result, error = "failed", None, None
+        try:
+            outcome = func(job, *args)
+            if outcome.get("success", True):
+                status, result = "completed", outcome
+            else:
+                error = outcome.get("error", "Processing failed")
+        except Exception as e:
+            logger.error(f"Error running job {job.job_id}: {str(e)}")
+            error = str(e)
+        finally:
+            # Finish the job and count it in one step, so nothing sees a finished job without completed_at
+            with self._lock:
+                job.result, job.error = result, error
+                job.completed_at = datetime.now()
+                job.status = status
+                self._running -= 1
+                self._pending -= 1
+                self.stats[status] += 1
+                self.stats["total_wait_time"] += (job.started_at - job.created_at).total_seconds()
+                self.stats["total_run_time"] += time.time() - start_time
+            job.notify()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID, or None if it is unknown or has expired."""
+        with self._lock:
+            removed = self._prune_if_due()
+            job = self._jobs.get(job_id)
+        self._notify_removed(removed)
+        return job
+
+    def add_removal_listener(self, listener: Callable[[List[str]], None]) -> None:
+        """Call ``listener`` with the IDs of finished jobs whenever they are dropped, e.g. to free what they own."""
+        with self._lock:
+            self._removal_listeners.append(listener)
+
+    def _notify_removed(self, job_ids: List[str]) -> None:
+        """Tell the listeners about dropped jobs. Called without the lock held."""
+        if not job_ids:
+            return
+        with self._lock:
+            listeners = list(self._removal_listeners)
+        for listener in listeners:
+            try:
+                listener(job_ids)
+            except Exception as e:
+                logger.warning(f"Job removal listener failed: {str(e)}")
+
+    def _prune_if_due(self) -> List[str]:
+        """Prune unless that was done in the last ``prune_interval`` seconds. Caller holds the lock."""
+        if time.time() < self._next_prune:
+            return []
+        return self._prune()
+
+    def _prune(self, room: int = 0) -> List[str]:
+        """
+        Drop expired finished jobs, and finished jobs over the retention limit
+        with ``room`` more to add; returns their IDs. Caller holds the lock.
+        """
+        self._next_prune = time.time() + self.prune_interval
+        now = datetime.now()
+        removed = []
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            finished = job.is_finished and job.completed_at is not None
+            expired = finished and (now - job.completed_at).total_seconds() > self.job_ttl
+            if expired or (len(self._jobs) + room > self.max_jobs and finished):
+                del self._jobs[job_id]
+                removed.append(job_id)
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth and throughput metrics."""
+        with self._lock:
+            removed = self._prune_if_due()
+            finished = self.stats["completed"] + self.stats["failed"]
+            stats = {
+                "queued": self._pending - self._running,
+                "running": self._running,
+                "max_workers": self.max_workers,
+                "max_queue_depth": self.max_queue_depth,
+                "utilization": self._pending / self.max_queue_depth if self.max_queue_depth else 0.0,
+                "submitted": self.stats["submitted"],
+                "completed": self.stats["completed"],
+                "failed": self.stats["failed"],
+                "rejected": self.stats["rejected"],
+                "avg_wait_time": self.stats["total_wait_time"] / finished if finished else 0.0,
+                "avg_run_time": self.stats["total_run_time"] / finished if finished else 0.0,
+                "tracked_jobs": len(self._jobs)
+            }
+        self._notify_removed(removed)
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and shut down the worker threads."""
+        self._executor.shutdown(wait=wait)
+
+async def job_events(job: Job, start: int = 0, keepalive: float = 15.0) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Follow a job as (event, data) pairs until it finishes.
+
+    Emits ``page`` for every finished page after the first ``start`` pages
+    (including pages finished before the call), ``keepalive`` with no data when nothing happened for
+    ``keepalive`` seconds, and finally ``complete`` with the document-level
+    result (without the per-page results already sent) or ``failed``.
+    """
+    event = job.subscribe()
+    sent = start
+    try:
+        while True:
+            # Read the status before the pages so no page finished before completion is missed
+            finished = job.is_finished
+            for page in job.pages_since(sent):
+                sent += 1
+                yield "page", {**page, "pages_total": job.pages_total}
+            if finished:
+                break
+            try:
+                await asyncio.wait_for(event.wait(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield "keepalive", None
+            event.clear()
+    finally:
+        job.unsubscribe(event)
+
+    if job.status == "completed":
+        summary = {key: value for key, value in (job.result or {}).items() if key != "results"}
+        yield "complete", {"job_id": job.job_id, **summary}
+    else:
+        yield "failed", {"job_id": job.job_id, "error": job.error}
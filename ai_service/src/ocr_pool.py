@@ -0,0 +1,467 @@
+from typing import Any, Callable, Dict, List, Optional
+import os
+import queue
+import threading
+import time
+import logging
+import multiprocessing
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class OCRWorkerError(RuntimeError):
+    """Raised when an OCR worker crashes, hangs or reports a failure."""
+
+class OCRPoolConfig:
+    """Configuration for the persistent OCR engine pool."""
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        lang: str = "eng",
+        psm: int = 3,
+        oem: int = 1,
+        tessdata_path: Optional[str] = None,
+        request_timeout: float = 60.0,
+        acquire_timeout: float = 120.0,
+        health_check_interval: float = 30.0,
+        ping_timeout: float = 5.0,
+        max_retries: int = 1
+    ):
+        self.size = size or max(1, min(os.cpu_count() or 1, 4))
+        self.lang = lang
+        self.psm = psm
+        self.oem = oem
+        self.tessdata_path = tessdata_path
+        self.request_timeout = request_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+        self.max_retries = max_retries
+
+class TesserocrEngine:
+    """OCR engine backed by a long-lived, initialized Tesseract API instance."""
+    def __init__(self, config: OCRPoolConfig):
+        from tesserocr import PyTessBaseAPI, PSM, OEM
+
+        kwargs = {"lang": config.lang, "psm": PSM(config.psm), "oem": OEM(config.oem)}
+        if config.tessdata_path:
+            kwargs["path"] = config.tessdata_path
+        # Language data is loaded once here and reused for every page
+        self.api = PyTessBaseAPI(**kwargs)
+
+    def _set_image(self, image: np.ndarray) -> None:
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        self.api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+
+    def image_to_string(self, image: np.ndarray) -> str:
+        self._set_image(image)
+        return self.api.GetUTF8Text()
+
+    def image_to_data(self, image: np.ndarray) -> Dict[str, List[Any]]:
+        self._set_image(image)
+        self.api.Recognize()
+        return self._word_data()
+
+    def image_to_page(self, image: np.ndarray) -> Dict[str, Any]:
+        # One recognition pass serves both the page text and the word boxes
+        self._set_image(image)
+        self.api.Recognize()
+        return {"text": self.api.GetUTF8Text(), "words": self._word_data()}
+
+    def _word_data(self) -> Dict[str, List[Any]]:
+        from tesserocr import RIL, iterate_level
+
+        data = {"text": [], "conf": [], "left": [], "top": [], "width": [], "height": []}
+        iterator = self.api.GetIterator()
+        if iterator is None:
+            return data
+        for word in iterate_level(iterator, RIL.WORD):
+            text = word.GetUTF8Text(RIL.WORD)
+            box = word.BoundingBox(RIL.WORD)
+            if not text or box is None:
+                continue
+            x1, y1, x2, y2 = box
+            data["text"].append(text)
+            data["conf"].append(float(word.Confidence(RIL.WORD)))
+            data["left"].append(x1)
+            data["top"].append(y1)
+            data["width"].append(x2 - x1)
+            data["height"].append(y2 - y1)
+        return data
+
+    def detect_orientation(self, image: np.ndarray) -> Dict[str, Any]:
+        self._set_image(image)
+        osd = self.api.DetectOrientationScript()
+        if not osd:
+            return {"rotate": 0, "confidence": 0.0}
+        return {"rotate": (360 - osd["orient_deg"]) % 360, "confidence": float(osd["orient_conf"])}
+
+    def close(self) -> None:
+        self.api.End()
+
+class PytesseractEngine:
+    """Fallback engine used when tesserocr is not installed (spawns tesseract per call)."""
+    def __init__(self, config: OCRPoolConfig):
+        import pytesseract
+
+        self.pytesseract = pytesseract
+        self.lang = config.lang
+        self.tess_config = f"--psm {config.psm} --oem {config.oem}"
+
+    def image_to_string(self, image: np.ndarray) -> str:
+        return self.pytesseract.image_to_string(image, lang=self.lang, config=self.tess_config)
+
+    def image_to_data(self, image: np.ndarray) -> Dict[str, List[Any]]:
+        return self._word_data(self._raw_data(image))
+
+    def image_to_page(self, image: np.ndarray) -> Dict[str, Any]:
+        # Rebuild the text from the word layout rather than spawning tesseract twice
+        raw = self._raw_data(image)
+        lines: Dict[Any, List[str]] = {}
+        for idx, text in enumerate(raw["text"]):
+            if text.strip():
+                key = (raw["block_num"][idx], raw["par_num"][idx], raw["line_num"][idx])
+                lines.setdefault(key, []).append(text)
+        return {
+            "text": "\n".join(" ".join(words) for words in lines.values()),
+            "words": self._word_data(raw)
+        }
+
+    def _raw_data(self, image: np.ndarray) -> Dict[str, List[Any]]:
+        return self.pytesseract.image_to_data(
+            image, lang=self.lang, config=self.tess_config,
+            output_type=self.pytesseract.Output.DICT
+        )
+
+    def _word_data(self, raw: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+        data = {"text": [], "conf": [], "left": [], "top": [], "width": [], "height": []}
+        for idx, text in enumerate(raw["text"]):
+            if not text.strip():
+                continue
+            for key in data:
+                data[key].append(float(raw[key][idx]) if key == "conf" else raw[key][idx])
+        return data
+
+    def detect_orientation(self, image: np.ndarray) -> Dict[str, Any]:
+        osd = self.pytesseract.image_to_osd(image, output_type=self.pytesseract.Output.DICT)
+        return {"rotate": int(osd["rotate"]), "confidence": float(osd["orientation_conf"])}
+
+    def close(self) -> None:
+        pass
+
+def default_engine_factory(config: OCRPoolConfig) -> Any:
+    """Create the best available OCR engine inside a worker process."""
+    try:
+        return TesserocrEngine(config)
+    except ImportError:
+        logger.warning("tesserocr not installed, falling back to pytesseract subprocess engine")
+        return PytesseractEngine(config)
+
+def _worker_main(conn, config: OCRPoolConfig, engine_factory: Callable[[OCRPoolConfig], Any]) -> None:
+    """Worker process loop: initialize the engine once, then serve requests until told to stop."""
+    engine = engine_factory(config)
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+
+            op = message[0]
+            if op == "stop":
+                break
+            if op == "ping":
+                conn.send(("ok", os.getpid()))
+                continue
+
+            # ("ocr", kind, shape, dtype) is followed by the raw pixel buffer
+            _, kind, shape, dtype = message
+            image = np.frombuffer(conn.recv_bytes(), dtype=np.dtype(dtype)).reshape(shape)
+            try:
+                if kind == "data":
+                    conn.send(("ok", engine.image_to_data(image)))
+                elif kind == "page":
+                    conn.send(("ok", engine.image_to_page(image)))
+                elif kind == "osd":
+                    conn.send(("ok", engine.detect_orientation(image)))
+                else:
+                    conn.send(("ok", engine.image_to_string(image)))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    finally:
+        engine.close()
+        conn.close()
+
+class _OCRWorker:
+    """Parent-side handle for a single OCR worker process."""
+    def __init__(self, worker_id: int, config: OCRPoolConfig, engine_factory: Callable[[OCRPoolConfig], Any]):
+        self.worker_id = worker_id
+        self.config = config
+        self.engine_factory = engine_factory
+        self.process = None
+        self.conn = None
+        self.tasks_completed = 0
+        self.started_at: Optional[float] = None
+
+    def start(self) -> None:
+        # Started (and restarted after a crash) while the server's threads may hold
+        # locks, which a forked child would inherit locked; a fresh interpreter does not
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, self.config, self.engine_factory),
+            name=f"ocr-worker-{self.worker_id}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.tasks_completed = 0
+        self.started_at = time.time()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        if self.process is None:
+            return
+        try:
+            if self.process.is_alive():
+                self.conn.send(("stop",))
+                self.process.join(timeout)
+        except (BrokenPipeError, EOFError, OSError):
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout)
+        self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def restart(self) -> None:
+        self.stop(timeout=0.1)
+        self.start()
+
+    def ping(self, timeout: float) -> bool:
+        try:
+            self.conn.send(("ping",))
+            if not self.conn.poll(timeout):
+                return False
+            status, _ = self.conn.recv()
+            return status == "ok"
+        except (BrokenPipeError, EOFError, OSError):
+            return False
+
+    def run(self, kind: str, image: np.ndarray, timeout: float) -> Any:
+        image = np.ascontiguousarray(image)
+        try:
+            self.conn.send(("ocr", kind, image.shape, image.dtype.str))
+            self.conn.send_bytes(memoryview(image).cast("B"))
+            if not self.conn.poll(timeout):
+                raise OCRWorkerError(f"OCR worker {self.worker_id} timed out after {timeout}s")
+            status, payload = self.conn.recv()
+        except (BrokenPipeError, EOFError, ConnectionResetError) as e:
+            raise OCRWorkerError(f"OCR worker {self.worker_id} crashed: {str(e)}")
+
+        if status != "ok":
+            raise ValueError(payload)
+        self.tasks_completed += 1
+        return payload
+
+class OCREnginePool:
+    """
+    Pool of long-lived OCR worker processes.
+
+    Each worker initializes its Tesseract engine (and language data) once and
+    receives page images as raw in-memory buffers, so neither process spawn nor
+    traineddata loading is paid per page. Crashed or hung workers are restarted
+    and the request is retried.
+    """
+    def __init__(
+        self,
+        config: Optional[OCRPoolConfig] = None,
+        engine_factory: Optional[Callable[[OCRPoolConfig], Any]] = None
+    ):
+        self.config = config or OCRPoolConfig()
+        self.engine_factory = engine_factory or default_engine_factory
+        self._workers = [
+            _OCRWorker(i, self.config, self.engine_factory)
+            for i in range(self.config.size)
+        ]
+        self._idle: "queue.Queue[_OCRWorker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._monitor: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.stats = {
+            "requests": 0,
+            "failures": 0,
+            "restarts": 0,
+            "total_time": 0.0
+        }
+
+    def start(self) -> None:
+        """Start all worker processes and the health monitor."""
+        with self._lock:
+            if self._started:
+                return
+            if self._closed:
+                raise RuntimeError("OCR pool has been closed")
+            for worker in self._workers:
+                worker.start()
+                self._idle.put(worker)
+            self._started = True
+
+            if self.config.health_check_interval > 0:
+                self._monitor = threading.Thread(
+                    target=self._monitor_loop, name="ocr-pool-monitor", daemon=True
+                )
+                self._monitor.start()
+        logger.info(f"Started OCR pool with {self.config.size} workers")
+
+    def close(self) -> None:
+        """Stop the health monitor and all worker processes."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._stop_event.set()
+            for worker in self._workers:
+                worker.stop()
+        logger.info("OCR pool closed")
+
+    def image_to_string(self, image: np.ndarray) -> str:
+        """Run OCR on an image and return the recognized text."""
+        return self._submit("text", image)
+
+    def image_to_data(self, image: np.ndarray) -> Dict[str, List[Any]]:
+        """Run OCR on an image and return word-level text, confidences and boxes."""
+        return self._submit("data", image)
+
+    def image_to_page(self, image: np.ndarray) -> Dict[str, Any]:
+        """
+        Run OCR once and return both the page text and the word-level data.
+
+        Returns:
+            Dict with ``text`` and ``words`` (as returned by ``image_to_data``)
+        """
+        return self._submit("page", image)
+
+    def detect_orientation(self, image: np.ndarray) -> Dict[str, Any]:
+        """
+        Run Tesseract orientation detection (OSD).
+
+        Returns:
+            Dict with ``rotate`` (clockwise degrees needed to make the page upright)
+            and ``confidence``
+        """
+        return self._submit("osd", image)
+
+    def _submit(self, kind: str, image: np.ndarray) -> Any:
+        if not self._started:
+            self.start()
+
+        try:
+            worker = self._idle.get(timeout=self.config.acquire_timeout)
+        except queue.Empty:
+            raise OCRWorkerError("Timed out waiting for an idle OCR worker")
+
+        start_time = time.time()
+        try:
+            for attempt in range(self.config.max_retries + 1):
+                if not worker.is_alive():
+                    self._restart_worker(worker)
+                try:
+                    return worker.run(kind, image, self.config.request_timeout)
+                except OCRWorkerError as e:
+                    logger.warning(f"{str(e)} (attempt {attempt + 1})")
+                    self._restart_worker(worker)
+                    if attempt == self.config.max_retries:
+                        self.stats["failures"] += 1
+                        raise
+        finally:
+            self.stats["requests"] += 1
+            self.stats["total_time"] += time.time() - start_time
+            self._idle.put(worker)
+
+    def _restart_worker(self, worker: _OCRWorker) -> None:
+        worker.restart()
+        self.stats["restarts"] += 1
+        logger.info(f"Restarted OCR worker {worker.worker_id}")
+
+    def health_check(self) -> Dict[str, Any]:
+        """
+        Check every idle worker and restart the ones that are dead or unresponsive.
+
+        Busy workers are reported by liveness only, so the check never blocks
+        behind a long-running page.
+        """
+        if self._closed:
+            return {"healthy": False, "started": self._started, "workers": []}
+        if not self._started:
+            # Workers are started lazily on the first OCR request
+            return {"healthy": True, "started": False, "workers": []}
+
+        checked = []
+        while True:
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+        workers = []
+        try:
+            for worker in checked:
+                healthy = worker.is_alive() and worker.ping(self.config.ping_timeout)
+                if not healthy:
+                    self._restart_worker(worker)
+                workers.append({"id": worker.worker_id, "state": "idle", "healthy": healthy})
+        finally:
+            for worker in checked:
+                self._idle.put(worker)
+
+        idle_ids = {w.worker_id for w in checked}
+        for worker in self._workers:
+            if worker.worker_id not in idle_ids:
+                workers.append({"id": worker.worker_id, "state": "busy", "healthy": worker.is_alive()})
+
+        return {
+            "healthy": all(w["healthy"] for w in workers),
+            "started": True,
+            "workers": sorted(workers, key=lambda w: w["id"])
+        }
+
+    def _monitor_loop(self) -> None:
+        while not self._stop_event.wait(self.config.health_check_interval):
+            try:
+                self.health_check()
+            except Exception as e:
+                logger.error(f"Error during OCR pool health check: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics."""
+        requests = self.stats["requests"]
+        return {
+            **self.stats,
+            "size": self.config.size,
+            "idle_workers": self._idle.qsize(),
+            "avg_time": self.stats["total_time"] / requests if requests else 0.0
+        }
+
+# Shared pool instance
+ocr_pool = None
+
+def get_ocr_pool() -> OCREnginePool:
+    """Get the shared OCR pool instance, creating it on first use."""
+    global ocr_pool
+    if ocr_pool is None:
+        size = os.environ.get("OCR_POOL_SIZE")
+        ocr_pool = OCREnginePool(OCRPoolConfig(
+            size=int(size) if size else None,
+            lang=os.environ.get("OCR_LANG", "eng")
+        ))
+    return ocr_pool
@@ -0,0 +1,316 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _to_signed(value: int) -> int:
+    """Map an unsigned 64-bit hash onto SQLite's signed INTEGER range."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+class OCRStore:
+    """
+    Durable, content-addressed store of per-page OCR results.
+
+    Entries are keyed by the SHA-256 of the document bytes combined with the
+    OCR parameters, so identical uploads are recognized regardless of file
+    name or request. Pages (text, word boxes and confidences) are stored as
+    zlib-compressed JSON in SQLite. The least recently used documents are
+    evicted once the store exceeds ``max_bytes``, and opening the store with
+    a different ``pipeline_version`` discards everything stored by the old
+    pipeline. Pages can also be stored with a perceptual signature so that
+    near-duplicate pages can be found (see ``phash_index``) and reused by id;
+    eviction listeners are told the ids of pages that are removed.
+    """
+    def __init__(
+        self,
+        path: str = "ocr_store.sqlite3",
+        pipeline_version: str = "1",
+        max_bytes: int = 512 * 1024 * 1024,
+        compression_level: int = 6
+    ):
+        self.path = path
+        self.pipeline_version = pipeline_version
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._eviction_listeners: List[Callable[[List[int]], None]] = []
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0
+        }
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS documents (
+                key TEXT PRIMARY KEY,
+                pages INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (key, page)
+            );
+            CREATE TABLE IF NOT EXISTS page_hashes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                phash INTEGER NOT NULL,
+                dhash INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS documents_accessed ON documents (accessed);
+            CREATE INDEX IF NOT EXISTS page_hashes_key ON page_hashes (key);
+        """)
+        self._check_version()
+
+    def _check_version(self) -> None:
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'pipeline_version'").fetchone()
+            if row is not None and row[0] == self.pipeline_version:
+                return
+            if row is not None:
+                logger.info(f"OCR pipeline changed ({row[0]} -> {self.pipeline_version}), clearing OCR store")
+            self._delete_all()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('pipeline_version', ?)",
+                (self.pipeline_version,)
+            )
+
+    @staticmethod
+    def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """SHA-256 of a file's contents, read in chunks."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        """SHA-256 of in-memory content; equal to ``hash_file`` of the same bytes."""
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def make_key(content_hash: str, params: Dict[str, Any]) -> str:
+        """
+        Build a store key from a content hash and the parameters that affect OCR output.
+
+        Args:
+            content_hash: SHA-256 of the document bytes
+            params: OCR/preprocessing parameters (language, page-size budget, ...)
+
+        Returns:
+            Hex digest identifying the OCR result
+        """
+        encoded = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(f"{content_hash}:{encoded}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the stored pages for a key.
+
+        Returns:
+            List of page dictionaries in page order, or None if not stored
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM pages WHERE key = ? ORDER BY page", (key,)
+            ).fetchall()
+            if not rows:
+                self.stats['misses'] += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE documents SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.stats['hits'] += 1
+
+        return [json.loads(zlib.decompress(row[0])) for row in rows]
+
+    def get_page(self, page_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a single stored page by the id returned from ``put``.
+
+        Returns:
+            The page dictionary, or None if its document has been evicted
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT p.data, h.key FROM page_hashes h JOIN pages p ON p.key = h.key AND p.page = h.page "
+                "WHERE h.id = ?", (page_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE documents SET accessed = ? WHERE key = ?", (time.time(), row[1]))
+        return json.loads(zlib.decompress(row[0]))
+
+    def add_eviction_listener(self, listener: Callable[[List[int]], None]) -> None:
+        """Call ``listener`` with the ids of stored pages whenever they are evicted, replaced or cleared."""
+        with self._lock:
+            self._eviction_listeners.append(listener)
+
+    def _notify_removed(self, page_ids: List[int]) -> None:
+        """Tell the listeners about removed pages. Called without the lock held."""
+        if not page_ids:
+            return
+        with self._lock:
+            listeners = list(self._eviction_listeners)
+        for listener in listeners:
+            try:
+                listener(page_ids)
+            except Exception as e:
+                logger.warning(f"OCR store eviction listener failed: {str(e)}")
+
+    def _page_ids(self, keys: Sequence[str]) -> List[int]:
+        """Ids of the pages with signatures stored under ``keys``. Caller holds the lock."""
+        ids: List[int] = []
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            ids.extend(row[0] for row in self._conn.execute(
+                f"SELECT id FROM page_hashes WHERE key IN ({','.join('?' * len(batch))})", batch
+            ))
+        return ids
+
+    def page_signatures(self) -> List[Tuple[int, int, int]]:
+        """All stored (page id, pHash, dHash) triples, for rebuilding a near-duplicate index."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, phash, dhash FROM page_hashes ORDER BY id").fetchall()
+        return [(page_id, _to_unsigned(p), _to_unsigned(d)) for page_id, p, d in rows]
+
+    def put(
+        self,
+        key: str,
+        pages: List[Dict[str, Any]],
+        signatures: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> List[int]:
+        """
+        Store the OCR results of a document, evicting old entries if over the size limit.
+
+        Args:
+            key: Key from ``make_key``
+            pages: One JSON-serializable dictionary per page
+            signatures: Optional (pHash, dHash) per page
+
+        Returns:
+            Page ids usable with ``get_page`` (empty without signatures)
+        """
+        blobs = [
+            zlib.compress(json.dumps(page, default=str).encode(), self.compression_level)
+            for page in pages
+        ]
+        size = sum(len(blob) for blob in blobs)
+        now = time.time()
+
+        with self._lock, self._conn:
+            # Pages stored before under the same key are replaced
+            removed = self._page_ids([key])
+            self._conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self._conn.executemany(
+                "INSERT INTO pages (key, page, data) VALUES (?, ?, ?)",
+                [(key, idx, blob) for idx, blob in enumerate(blobs)]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (key, pages, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, len(blobs), size, now, now)
+            )
+            self._conn.execute("DELETE FROM page_hashes WHERE key = ?", (key,))
+            page_ids = []
+            for idx, (phash, dhash) in enumerate(signatures or []):
+                cursor = self._conn.execute(
+                    "INSERT INTO page_hashes (key, page, phash, dhash) VALUES (?, ?, ?, ?)",
+                    (key, idx, _to_signed(phash), _to_signed(dhash))
+                )
+                page_ids.append(cursor.lastrowid)
+            self.stats['writes'] += 1
+            removed += self._evict()
+        self._notify_removed(removed)
+        return page_ids
+
+    def _evict(self) -> List[int]:
+        """Evict least recently used documents if over the size limit; returns the ids of their pages."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+
+        # Evict least recently used documents down to 90% of the limit
+        target = self.max_bytes * 0.9
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM documents ORDER BY accessed"):
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+
+        removed = self._page_ids([key for key, in evicted])
+        self._conn.executemany("DELETE FROM pages WHERE key = ?", evicted)
+        self._conn.executemany("DELETE FROM page_hashes WHERE key = ?", evicted)
+        self._conn.executemany("DELETE FROM documents WHERE key = ?", evicted)
+        self.stats['evictions'] += len(evicted)
+        return removed
+
+    def clear(self) -> None:
+        """Remove all stored results."""
+        with self._lock, self._conn:
+            removed = [row[0] for row in self._conn.execute("SELECT id FROM page_hashes")]
+            self._delete_all()
+        self._notify_removed(removed)
+
+    def _delete_all(self) -> None:
+        self._conn.execute("DELETE FROM pages")
+        self._conn.execute("DELETE FROM page_hashes")
+        self._conn.execute("DELETE FROM documents")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics."""
+        with self._lock:
+            documents, pages, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pages), 0), COALESCE(SUM(size), 0) FROM documents"
+            ).fetchone()
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'documents': documents,
+            'pages': pages,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'pipeline_version': self.pipeline_version
+        }
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+# Shared store instance
+ocr_store = None
+
+def get_ocr_store(pipeline_version: str = "1") -> OCRStore:
+    """Get the shared OCR store instance, creating it on first use."""
+    global ocr_store
+    if ocr_store is None:
+        ocr_store = OCRStore(
+            path=os.environ.get("OCR_STORE_PATH", "data/ocr_store.sqlite3"),
+            pipeline_version=pipeline_version,
+            max_bytes=int(os.environ.get("OCR_STORE_MAX_MB", "512")) * 1024 * 1024
+        )
+    return ocr_store
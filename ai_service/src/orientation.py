@@ -0,0 +1,277 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+import time
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class OrientationResult:
+    """
+    Detected page orientation.
+
+    ``rotation`` is the clockwise rotation (0/90/180/270 degrees) and ``skew``
+    the additional clockwise rotation in degrees needed to make text upright
+    and horizontal.
+    """
+    def __init__(self, rotation: int = 0, skew: float = 0.0, confidence: float = 1.0, method: str = "projection"):
+        self.rotation = rotation
+        self.skew = skew
+        self.confidence = confidence
+        self.method = method
+
+    @property
+    def needs_correction(self) -> bool:
+        return self.rotation != 0 or self.skew != 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rotation': self.rotation,
+            'skew': round(self.skew, 2),
+            'confidence': round(self.confidence, 3),
+            'method': self.method
+        }
+
+class OrientationDetector:
+    """
+    Cheap orientation and skew detection on a downscaled thumbnail.
+
+    Ink pixels of the thumbnail are projected onto candidate text-line
+    directions; horizontal text lines give the sharpest projection profile.
+    Comparing the best horizontal and vertical profiles tells upright from
+    sideways pages, and the position of each line's ink relative to its
+    band (ascenders vs. descenders) tells upright from upside-down.
+    Tesseract OSD is only consulted when these cues are inconclusive.
+    """
+    def __init__(
+        self,
+        thumbnail_size: int = 800,
+        max_skew: float = 10.0,
+        coarse_step: float = 1.0,
+        fine_step: float = 0.25,
+        min_skew: float = 0.3,
+        orientation_ratio: float = 3.0,
+        flip_threshold: float = 0.01,
+        min_ink_ratio: float = 0.002,
+        max_points: int = 40000,
+        osd_size: int = 1200,
+        osd_min_confidence: float = 2.0,
+        osd_func: Optional[Callable[[np.ndarray], Dict[str, Any]]] = None
+    ):
+        self.thumbnail_size = thumbnail_size
+        self.max_skew = max_skew
+        self.coarse_step = coarse_step
+        self.fine_step = fine_step
+        self.min_skew = min_skew
+        self.orientation_ratio = orientation_ratio
+        self.flip_threshold = flip_threshold
+        self.min_ink_ratio = min_ink_ratio
+        self.max_points = max_points
+        self.osd_size = osd_size
+        self.osd_min_confidence = osd_min_confidence
+        self.osd_func = osd_func
+        self.stats = {
+            'pages': 0,
+            'rotated': 0,
+            'deskewed': 0,
+            'osd_calls': 0,
+            'total_time': 0.0
+        }
+
+    def detect(self, gray: np.ndarray) -> OrientationResult:
+        """
+        Detect the orientation and skew of a grayscale page.
+
+        Args:
+            gray: Grayscale page image (dark text on light background)
+
+        Returns:
+            OrientationResult describing the correction to apply
+        """
+        start_time = time.time()
+        try:
+            return self._detect(gray)
+        finally:
+            self.stats['pages'] += 1
+            self.stats['total_time'] += time.time() - start_time
+
+    def _detect(self, gray: np.ndarray) -> OrientationResult:
+        points, shape = self._ink_points(gray)
+        if points is None:
+            return OrientationResult(method="blank")
+
+        height, width = shape
+        xs, ys = points
+        angles = np.deg2rad(np.arange(-self.max_skew, self.max_skew + 1e-9, self.coarse_step))
+
+        # Text lines along x (upright or upside down) vs. along y (sideways):
+        # line/gap alternation makes the across-lines profile far more contrasted
+        horizontal_angle = self._best_angle(xs, ys, angles)
+        vertical_angle = self._best_angle(ys, xs, angles)
+        horizontal_contrast = self._profile_contrast(xs, ys, horizontal_angle)
+        vertical_contrast = self._profile_contrast(ys, xs, vertical_angle)
+        ratio = horizontal_contrast / vertical_contrast if vertical_contrast else float('inf')
+
+        if ratio >= self.orientation_ratio:
+            skew_angle = horizontal_angle
+            candidates = (0, 180)
+        elif ratio <= 1.0 / self.orientation_ratio:
+            skew_angle = vertical_angle
+            candidates = (90, 270)
+        else:
+            return self._detect_with_osd(gray, OrientationResult(confidence=max(ratio, 1.0 / ratio) if ratio else 0.0))
+
+        # A line angle measured on the sideways page flips sign once the page is turned upright
+        if candidates[0] == 90:
+            skew_angle = -skew_angle
+
+        # Upright vs. flipped: measure in the frame of the first candidate
+        rx, ry = self._rotate_points(xs, ys, width, height, candidates[0])
+        asymmetry = self._line_asymmetry(rx, ry, skew_angle)
+        confidence = max(ratio, 1.0 / ratio)
+        rotation = candidates[0] if asymmetry >= 0 else candidates[1]
+        skew = float(np.rad2deg(skew_angle))
+        skew = 0.0 if abs(skew) < self.min_skew else skew
+
+        result = OrientationResult(rotation, skew, confidence)
+        if candidates[0] == 0:
+            # Most scans are upright: only a clear flip cue is worth confirming with OSD
+            if asymmetry >= -self.flip_threshold:
+                return OrientationResult(0, skew, confidence)
+            return self._detect_with_osd(gray, result)
+        if abs(asymmetry) < self.flip_threshold:
+            return self._detect_with_osd(gray, result)
+        return result
+
+    def _detect_with_osd(self, gray: np.ndarray, fallback: OrientationResult) -> OrientationResult:
+        if self.osd_func is None:
+            return fallback
+
+        self.stats['osd_calls'] += 1
+        try:
+            osd = self.osd_func(self._downscale(gray, self.osd_size))
+        except Exception as e:
+            logger.warning(f"Orientation detection (OSD) failed: {str(e)}")
+            return fallback
+
+        if osd.get('confidence', 0.0) < self.osd_min_confidence:
+            return fallback
+        return OrientationResult(int(osd.get('rotate', 0)) % 360, fallback.skew, osd['confidence'], "osd")
+
+    def correct(self, gray: np.ndarray) -> Tuple[np.ndarray, OrientationResult]:
+        """
+        Detect orientation and return the corrected page with the detection result.
+
+        Upright, unskewed pages are returned unchanged (no copy).
+        """
+        result = self.detect(gray)
+        if result.rotation:
+            gray = np.ascontiguousarray(np.rot90(gray, k=-(result.rotation // 90)))
+            self.stats['rotated'] += 1
+        if result.skew:
+            height, width = gray.shape[:2]
+            matrix = cv2.getRotationMatrix2D((width / 2.0, height / 2.0), -result.skew, 1.0)
+            gray = cv2.warpAffine(
+                gray, matrix, (width, height),
+                flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=255
+            )
+            self.stats['deskewed'] += 1
+        return gray, result
+
+    def _downscale(self, gray: np.ndarray, size: int) -> np.ndarray:
+        scale = size / float(max(gray.shape[:2]))
+        if scale >= 1.0:
+            return gray
+        return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    def _ink_points(self, gray: np.ndarray) -> Tuple[Optional[Tuple[np.ndarray, np.ndarray]], Tuple[int, int]]:
+        """Binarize a thumbnail and return (a sample of) the ink pixel coordinates."""
+        thumb = self._downscale(gray, self.thumbnail_size)
+        _, ink = cv2.threshold(thumb, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        ys, xs = np.nonzero(ink)
+        if len(xs) < self.min_ink_ratio * ink.size or len(xs) > 0.5 * ink.size:
+            # Blank page, or no text-like foreground to measure
+            return None, thumb.shape[:2]
+        if len(xs) > self.max_points:
+            # Random (not strided) sampling so the sample has no raster-order bias
+            keep = np.random.default_rng(0).choice(len(xs), self.max_points, replace=False)
+            xs, ys = xs[keep], ys[keep]
+        return (xs.astype(np.float32), ys.astype(np.float32)), thumb.shape[:2]
+
+    def _profile(self, xs: np.ndarray, ys: np.ndarray, angle: float) -> np.ndarray:
+        """Projection profile of the points across lines running at ``angle``."""
+        offsets = ys * np.cos(angle) + xs * np.sin(angle)
+        offsets -= offsets.min()
+        return np.bincount(offsets.astype(np.int32))
+
+    def _profile_score(self, xs: np.ndarray, ys: np.ndarray, angle: float) -> float:
+        """Sharpness (energy of the first difference) of the projection profile."""
+        gradient = np.diff(self._profile(xs, ys, angle))
+        return float(np.dot(gradient, gradient))
+
+    def _profile_contrast(self, xs: np.ndarray, ys: np.ndarray, angle: float) -> float:
+        """Squared coefficient of variation of the projection profile (independent of its length)."""
+        profile = self._profile(xs, ys, angle).astype(np.float64)
+        mean = profile.mean()
+        return float(profile.var() / (mean * mean)) if mean else 0.0
+
+    def _best_angle(self, xs: np.ndarray, ys: np.ndarray, angles: np.ndarray) -> float:
+        scores = [self._profile_score(xs, ys, angle) for angle in angles]
+        best = angles[int(np.argmax(scores))]
+
+        # Refine around the best coarse angle
+        coarse = np.deg2rad(self.coarse_step)
+        fine = np.arange(best - coarse, best + coarse + 1e-9, np.deg2rad(self.fine_step))
+        fine_scores = [self._profile_score(xs, ys, angle) for angle in fine]
+        return float(fine[int(np.argmax(fine_scores))])
+
+    def _rotate_points(self, xs: np.ndarray, ys: np.ndarray, width: int, height: int, rotation: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Coordinates of the points after rotating the image clockwise by ``rotation``."""
+        if rotation == 90:
+            return height - 1 - ys, xs
+        if rotation == 180:
+            return width - 1 - xs, height - 1 - ys
+        if rotation == 270:
+            return ys, width - 1 - xs
+        return xs, ys
+
+    def _line_asymmetry(self, xs: np.ndarray, ys: np.ndarray, angle: float) -> float:
+        """
+        Compare the ascender and descender zones of each text line, relative to line height.
+
+        Within a line's profile the sharpest rise marks the x-height line and the
+        sharpest drop the baseline. Upright Latin text has a taller, busier zone
+        above the x-height line than below the baseline, so the result is
+        positive for upright lines and negative for upside-down ones.
+        """
+        histogram = self._profile(xs, ys, angle).astype(np.float64)
+
+        in_line = histogram > 0.1 * histogram.max()
+        edges = np.diff(in_line.astype(np.int8), prepend=0, append=0)
+        starts = np.nonzero(edges == 1)[0]
+        ends = np.nonzero(edges == -1)[0]
+
+        asymmetries = []
+        weights = []
+        for start, end in zip(starts, ends):
+            if end - start < 4:
+                continue
+            line = histogram[max(start - 2, 0):end + 2]
+            gradient = np.diff(line)
+            above = int(np.argmax(gradient))
+            below = len(gradient) - 1 - int(np.argmin(gradient))
+            asymmetries.append((above - below) / float(end - start))
+            weights.append(line.sum())
+
+        if not asymmetries:
+            return 0.0
+        return float(np.average(asymmetries, weights=weights))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get detection statistics."""
+        pages = self.stats['pages']
+        return {
+            **self.stats,
+            'avg_time_ms': 1000.0 * self.stats['total_time'] / pages if pages else 0.0,
+            'osd_rate': self.stats['osd_calls'] / pages if pages else 0.0
+        }
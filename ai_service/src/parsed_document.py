@@ -0,0 +1,249 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from collections import OrderedDict
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# OCR renders apostrophes and dashes in several shapes; field patterns use the ASCII ones
+_PUNCTUATION = str.maketrans({
+    '‘': "'", '’': "'", '‛': "'", '′': "'",
+    '“': '"', '”': '"',
+    '‐': '-', '‑': '-', '‒': '-', '–': '-', '—': '-', '−': '-',
+})
+_TOKEN = re.compile(r'\S+')
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize OCR text for field extraction.
+
+    Applies NFKC (full-width digits, ligatures, non-breaking spaces), maps
+    typographic quotes and dashes to ASCII, collapses runs of spaces and
+    tabs, and strips whitespace at line ends. Line breaks are kept.
+    """
+    if not text.isascii():
+        # ASCII text is already NFKC and has no typographic punctuation
+        text = unicodedata.normalize('NFKC', text).translate(_PUNCTUATION)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    # str.split() splits on the same whitespace as \s, several times faster than a regex
+    return '\n'.join(' '.join(line.split()) for line in text.split('\n'))
+
+class ParsedDocument:
+    """
+    A document's OCR output parsed once, for every analyzer that reads it.
+
+    Holds the normalized text of all pages, its lowercased form, the OCR
+    word boxes of each page, and lazily built indexes: line start offsets,
+    page start offsets and token (whitespace-separated word) offsets, so a
+    character offset can be mapped to its page, line and token by binary
+    search. Field scans are memoized per scanner, so analyzing the same
+    document again does not rescan its text.
+    """
+    def __init__(
+        self,
+        pages: List[str],
+        words: Optional[List[Dict[str, List[Any]]]] = None,
+        doc_type: Optional[str] = None,
+        confidence: float = 0.0,
+        document_id: Optional[str] = None
+    ):
+        """
+        Args:
+            pages: OCR text of each page
+            words: OCR words of each page (``text``, ``conf`` and, where
+                available, ``left``/``top``/``width``/``height`` lists)
+            doc_type: Document type the pages were classified as
+            confidence: Mean OCR confidence (0-1)
+            document_id: Identifier assigned when the document is stored
+        """
+        normalized = [normalize_text(page) for page in pages]
+        # Pages are separated by a blank line so no field runs across a page break
+        self.text = '\n\n'.join(normalized)
+        self.lower = self.text.lower()
+        self.words = words or [{'text': [], 'conf': []} for _ in pages]
+        self.doc_type = doc_type
+        self.confidence = confidence
+        self.document_id = document_id
+        self.created = time.time()
+
+        starts, offset = [], 0
+        for page in normalized:
+            starts.append(offset)
+            offset += len(page) + 2
+        self.page_offsets = np.array(starts, dtype=np.int64)
+        self._line_offsets: Optional[np.ndarray] = None
+        self._tokens: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._scans: Dict[Any, Dict[str, List[Tuple[str, ...]]]] = {}
+
+    @classmethod
+    def from_ocr_pages(
+        cls,
+        ocr_pages: List[Dict[str, Any]],
+        doc_type: Optional[str] = None,
+        confidence: float = 0.0
+    ) -> 'ParsedDocument':
+        """Build a document from ``DocumentProcessor`` OCR page records (``text`` and ``words``)."""
+        return cls(
+            [page['text'] for page in ocr_pages],
+            [page.get('words') or {'text': [], 'conf': []} for page in ocr_pages],
+            doc_type=doc_type,
+            confidence=confidence
+        )
+
+    @classmethod
+    def of(cls, document: Union[str, 'ParsedDocument']) -> 'ParsedDocument':
+        """The document itself, or a single-page document parsed from raw text."""
+        if isinstance(document, ParsedDocument):
+            return document
+        return cls([document])
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_offsets)
+
+    @property
+    def line_offsets(self) -> np.ndarray:
+        """Start offset of every line in ``text``."""
+        if self._line_offsets is None:
+            breaks = np.frombuffer(self.text.encode('utf-32-le'), dtype=np.uint32) == ord('\n')
+            self._line_offsets = np.concatenate(([0], np.flatnonzero(breaks) + 1)).astype(np.int64)
+        return self._line_offsets
+
+    @property
+    def tokens(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Start and end offsets of every token in ``text``."""
+        if self._tokens is None:
+            spans = np.array([m.span() for m in _TOKEN.finditer(self.text)], dtype=np.int64).reshape(-1, 2)
+            self._tokens = (spans[:, 0], spans[:, 1])
+        return self._tokens
+
+    def page_texts(self) -> Iterator[str]:
+        """Normalized text of each page, sliced from ``text`` only as it is iterated."""
+        ends = list(self.page_offsets[1:] - 2) + [len(self.text)]
+        for start, end in zip(self.page_offsets.tolist(), ends):
+            yield self.text[start:int(end)]
+
+    def page_of(self, offset: int) -> int:
+        """Zero-based page containing a character offset."""
+        return int(np.searchsorted(self.page_offsets, offset, side='right')) - 1
+
+    def line_of(self, offset: int) -> int:
+        """Zero-based line containing a character offset."""
+        return int(np.searchsorted(self.line_offsets, offset, side='right')) - 1
+
+    def line(self, index: int) -> str:
+        """Text of a line, without its line break."""
+        offsets = self.line_offsets
+        end = offsets[index + 1] - 1 if index + 1 < len(offsets) else len(self.text)
+        return self.text[offsets[index]:end]
+
+    def token_at(self, offset: int) -> Optional[str]:
+        """The token covering a character offset, or None for whitespace."""
+        starts, ends = self.tokens
+        index = int(np.searchsorted(starts, offset, side='right')) - 1
+        if index < 0 or offset >= ends[index]:
+            return None
+        return self.text[starts[index]:ends[index]]
+
+    def scan(self, scanner: Any) -> Dict[str, List[Tuple[str, ...]]]:
+        """Fields found by a ``FieldScanner``, scanned once per scanner."""
+        found = self._scans.get(scanner)
+        if found is None:
+            found = scanner.scan(self.text, lowered=self.lower)
+            self._scans[scanner] = found
+        return found
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'document_id': self.document_id,
+            'doc_type': self.doc_type,
+            'pages': self.page_count,
+            'lines': len(self.line_offsets),
+            'characters': len(self.text),
+            'confidence': self.confidence
+        }
+
+def normalized_texts(documents: Sequence[Union[str, ParsedDocument]]) -> Tuple[List[str], List[str]]:
+    """
+    Normalized and lowercased text of each document, for batch analysis.
+
+    Raw texts are normalized like ``ParsedDocument`` pages, without building
+    the document indexes; parsed documents are used as they are.
+    """
+    normalized, lowered = [], []
+    for document in documents:
+        if isinstance(document, ParsedDocument):
+            normalized.append(document.text)
+            lowered.append(document.lower)
+        else:
+            text = normalize_text(document)
+            normalized.append(text)
+            lowered.append(text.lower())
+    return normalized, lowered
+
+class ParsedDocumentStore:
+    """
+    In-memory store of parsed documents by ``document_id``.
+
+    Keeps the most recently used ``max_documents`` for ``ttl`` seconds, so
+    ``/analyze`` can refer to a document processed shortly before instead of
+    receiving its text again. Documents that expire can be rebuilt cheaply by
+    processing the stored blob again, which is served from the OCR store.
+    """
+    def __init__(self, max_documents: int = 1000, ttl: float = 3600.0):
+        self.max_documents = max_documents
+        self.ttl = ttl
+        self._documents: 'OrderedDict[str, ParsedDocument]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'stored': 0, 'hits': 0, 'misses': 0, 'evicted': 0}
+
+    def put(self, document: ParsedDocument) -> str:
+        """Store a document, assigning its ``document_id``; returns the ID."""
+        document.document_id = document.document_id or str(uuid.uuid4())
+        with self._lock:
+            self._documents[document.document_id] = document
+            self._documents.move_to_end(document.document_id)
+            self.stats['stored'] += 1
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+                self.stats['evicted'] += 1
+        return document.document_id
+
+    def get(self, document_id: str) -> Optional[ParsedDocument]:
+        """A stored document, or None if unknown or expired."""
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is not None and time.time() - document.created > self.ttl:
+                del self._documents[document_id]
+                self.stats['evicted'] += 1
+                document = None
+            if document is None:
+                self.stats['misses'] += 1
+                return None
+            self._documents.move_to_end(document_id)
+            self.stats['hits'] += 1
+            return document
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'documents': len(self._documents)}
+
+# Shared store instance
+document_store = None
+
+def get_document_store() -> ParsedDocumentStore:
+    """Get the shared parsed-document store, creating it on first use."""
+    global document_store
+    if document_store is None:
+        document_store = ParsedDocumentStore(
+            max_documents=int(os.environ.get("PARSED_DOCUMENT_MAX", "1000")),
+            ttl=float(os.environ.get("PARSED_DOCUMENT_TTL", "3600"))
+        )
+    return document_store
@@ -0,0 +1,279 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import re
+import threading
+import time
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (pHash, dHash): two 64-bit perceptual hashes of a page, compared as one 128-bit signature
+Signature = Tuple[int, int]
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    """Number of set bits of each uint64 value."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values).astype(np.int32)
+    as_bytes = values.reshape(-1, 1).view(np.uint8)
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=1, dtype=np.int32)
+
+def _expand_ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenate ``arange(start, end)`` for every (start, end) pair without a Python loop."""
+    counts = ends - starts
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(counts.sum())
+
+def _pack_bits(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+def dhash(gray: np.ndarray, size: int = 8, tolerance: float = 1.0) -> int:
+    """Difference hash: sign of the horizontal gradient on a (size+1) x size thumbnail."""
+    small = cv2.resize(gray.astype(np.float32), (size + 1, size), interpolation=cv2.INTER_AREA)
+    # Blank paper has near-zero gradients whose sign is just scanner noise
+    return _pack_bits(small[:, 1:] - small[:, :-1] > tolerance)
+
+def phash(gray: np.ndarray, size: int = 8, scale: int = 4) -> int:
+    """DCT hash: low-frequency DCT coefficients of a small thumbnail compared to their median."""
+    small = cv2.resize(gray, (size * scale, size * scale), interpolation=cv2.INTER_AREA)
+    low = cv2.dct(small.astype(np.float32))[:size, :size]
+    # The DC term only reflects overall brightness
+    median = np.median(low.ravel()[1:])
+    return _pack_bits(low > median)
+
+def page_signature(gray: np.ndarray) -> Signature:
+    """Perceptual signature of a grayscale page."""
+    return phash(gray), dhash(gray)
+
+def hamming_distance(a: Signature, b: Signature) -> int:
+    return bin(a[0] ^ b[0]).count("1") + bin(a[1] ^ b[1]).count("1")
+
+def text_similarity(a: str, b: str) -> float:
+    """
+    Jaccard similarity of the numeric tokens (amounts, SSNs, EINs) of two texts.
+
+    Forms built on the same template look alike to a perceptual hash, so the
+    numbers are what tell two different W-2s apart. Falls back to words when
+    neither text contains numbers.
+    """
+    pattern = r'\d[\d,.\-]*\d|\d'
+    tokens_a = {t.replace(',', '') for t in re.findall(pattern, a)}
+    tokens_b = {t.replace(',', '') for t in re.findall(pattern, b)}
+    if not tokens_a and not tokens_b:
+        tokens_a, tokens_b = set(a.lower().split()), set(b.lower().split())
+    union = tokens_a | tokens_b
+    return len(tokens_a & tokens_b) / float(len(union)) if union else 1.0
+
+class PageHashIndex:
+    """
+    Multi-index hashing over 128-bit page signatures for Hamming-radius lookups.
+
+    The signature is split into ``m`` disjoint bit chunks. Two signatures
+    within ``max_distance`` bits differ by at most ``max_distance // m`` bits
+    in at least one chunk (pigeonhole), so a lookup probes every chunk value
+    within that small sub-radius and only verifies the entries found there.
+    ``m`` is chosen so the sub-radius stays at 2 or less, which keeps both
+    the number of probes and the number of candidates small.
+
+    Each chunk keeps a sorted array of its values, probed with a vectorized
+    binary search. New entries go to a fixed-size buffer that is scanned
+    linearly and merged into the sorted arrays (a linear-time insert, not a
+    re-sort) whenever it fills up. Removing entries filters the sorted
+    arrays, which keeps them sorted.
+    """
+    def __init__(self, max_distance: int = 10, buffer_size: int = 4096):
+        self.max_distance = max_distance
+        self.buffer_size = buffer_size
+        chunk_count = max(2, -(-(max_distance + 1) // 3))
+        self._chunks = self._chunk_layout(chunk_count)
+        self._sub_radius = max_distance // chunk_count
+        self._probe_masks = [self._masks(width, self._sub_radius) for _, _, width in self._chunks]
+        self._lock = threading.Lock()
+
+        self._hashes = np.empty((0, 2), dtype=np.uint64)
+        self._refs = np.empty(0, dtype=np.int64)
+        self._chunk_keys: List[np.ndarray] = [np.empty(0, dtype=np.uint64) for _ in self._chunks]
+        self._chunk_order: List[np.ndarray] = [np.empty(0, dtype=np.int64) for _ in self._chunks]
+        self._pending_hashes = np.empty((buffer_size, 2), dtype=np.uint64)
+        self._pending_refs = np.empty(buffer_size, dtype=np.int64)
+        self._pending_count = 0
+        self.stats = {
+            'queries': 0,
+            'candidates': 0,
+            'matches': 0,
+            'merges': 0,
+            'removed': 0,
+            'total_time': 0.0
+        }
+
+    @staticmethod
+    def _chunk_layout(count: int) -> List[Tuple[int, int, int]]:
+        """(word, shift, width) of each chunk; chunks never straddle the two 64-bit words."""
+        layout = []
+        for word, parts in enumerate((count - count // 2, count // 2)):
+            for idx in range(parts):
+                start, end = 64 * idx // parts, 64 * (idx + 1) // parts
+                layout.append((word, start, end - start))
+        return layout
+
+    @staticmethod
+    def _masks(width: int, radius: int) -> np.ndarray:
+        """All XOR masks of ``width`` bits with at most ``radius`` bits set."""
+        masks = [0]
+        frontier = [(0, -1)]
+        for _ in range(radius):
+            frontier = [(mask | (1 << bit), bit) for mask, last in frontier for bit in range(last + 1, width)]
+            masks.extend(mask for mask, _ in frontier)
+        return np.array(masks, dtype=np.uint64)
+
+    def _chunk_values(self, hashes: np.ndarray, chunk: Tuple[int, int, int]) -> np.ndarray:
+        word, shift, width = chunk
+        return (hashes[:, word] >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+
+    def __len__(self) -> int:
+        return len(self._refs) + self._pending_count
+
+    def add(self, signature: Signature, ref: int) -> None:
+        """
+        Index a page signature.
+
+        Args:
+            signature: (pHash, dHash) of the page
+            ref: Caller reference returned by lookups (e.g. a stored page id)
+        """
+        with self._lock:
+            self._pending_hashes[self._pending_count] = signature
+            self._pending_refs[self._pending_count] = ref
+            self._pending_count += 1
+            if self._pending_count == self.buffer_size:
+                self._merge(self._pending_hashes, self._pending_refs)
+                self._pending_count = 0
+
+    def add_many(self, signatures: Sequence[Signature], refs: Sequence[int]) -> None:
+        """Index many signatures at once (e.g. when loading from the OCR store)."""
+        with self._lock:
+            self._merge(
+                np.array(signatures, dtype=np.uint64).reshape(-1, 2),
+                np.array(refs, dtype=np.int64)
+            )
+
+    def _merge(self, hashes: np.ndarray, refs: np.ndarray) -> None:
+        base = len(self._refs)
+        self._hashes = np.concatenate([self._hashes, hashes])
+        self._refs = np.concatenate([self._refs, refs])
+
+        for idx, chunk in enumerate(self._chunks):
+            values = self._chunk_values(hashes, chunk)
+            order = np.argsort(values, kind="stable")
+            # Insert the sorted new values into the already sorted chunk array
+            positions = np.searchsorted(self._chunk_keys[idx], values[order], side="right")
+            self._chunk_keys[idx] = np.insert(self._chunk_keys[idx], positions, values[order])
+            self._chunk_order[idx] = np.insert(self._chunk_order[idx], positions, base + order)
+        self.stats['merges'] += 1
+
+    def remove(self, refs: Sequence[int]) -> int:
+        """
+        Drop every entry with one of ``refs`` (e.g. pages evicted from the OCR store).
+
+        Args:
+            refs: Caller references given to ``add``
+
+        Returns:
+            Number of entries removed
+        """
+        targets = np.asarray(list(refs), dtype=np.int64)
+        if not len(targets):
+            return 0
+        with self._lock:
+            removed = 0
+            pending = self._pending_refs[:self._pending_count]
+            keep = ~np.isin(pending, targets)
+            if not keep.all():
+                count = int(keep.sum())
+                self._pending_hashes[:count] = self._pending_hashes[:self._pending_count][keep]
+                self._pending_refs[:count] = pending[keep]
+                removed += self._pending_count - count
+                self._pending_count = count
+
+            keep = ~np.isin(self._refs, targets)
+            if not keep.all():
+                # Position of every kept entry once the removed ones are gone
+                position = np.cumsum(keep) - 1
+                self._hashes = self._hashes[keep]
+                self._refs = self._refs[keep]
+                for idx in range(len(self._chunks)):
+                    kept = keep[self._chunk_order[idx]]
+                    self._chunk_keys[idx] = self._chunk_keys[idx][kept]
+                    self._chunk_order[idx] = position[self._chunk_order[idx][kept]]
+                removed += int((~keep).sum())
+            self.stats['removed'] += removed
+        return removed
+
+    def query(self, signature: Signature, max_distance: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Find indexed pages within a Hamming distance of a signature.
+
+        Args:
+            signature: (pHash, dHash) of the query page
+            max_distance: Radius in bits; at most the index's ``max_distance``
+
+        Returns:
+            List of (ref, distance) pairs, closest first
+        """
+        radius = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        start_time = time.perf_counter()
+        query = np.array([signature], dtype=np.uint64)
+
+        with self._lock:
+            candidates = []
+            for idx, chunk in enumerate(self._chunks):
+                probes = self._chunk_values(query, chunk)[0] ^ self._probe_masks[idx]
+                keys = self._chunk_keys[idx]
+                lo = np.searchsorted(keys, probes, side="left")
+                hi = np.searchsorted(keys, probes, side="right")
+                hit = hi > lo
+                if hit.any():
+                    candidates.append(self._chunk_order[idx][_expand_ranges(lo[hit], hi[hit])])
+            # Duplicates (pages found through several chunks) are removed after filtering
+            indices = np.concatenate(candidates) if candidates else np.empty(0, dtype=np.int64)
+            hashes, refs = self._hashes[indices], self._refs[indices]
+
+            if self._pending_count:
+                # The unmerged buffer is small and scanned directly
+                hashes = np.concatenate([hashes, self._pending_hashes[:self._pending_count]])
+                refs = np.concatenate([refs, self._pending_refs[:self._pending_count]])
+
+        distances = _popcount(hashes[:, 0] ^ query[0, 0]) + _popcount(hashes[:, 1] ^ query[0, 1])
+        within = np.nonzero(distances <= radius)[0]
+        within = within[np.argsort(distances[within], kind="stable")]
+        matches = []
+        seen = set()
+        for i in within:
+            ref = int(refs[i])
+            if ref not in seen:
+                seen.add(ref)
+                matches.append((ref, int(distances[i])))
+
+        self.stats['queries'] += 1
+        self.stats['candidates'] += len(refs)
+        self.stats['matches'] += 1 if matches else 0
+        self.stats['total_time'] += time.perf_counter() - start_time
+        return matches
+
+    def nearest(self, signature: Signature, max_distance: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """Closest indexed page within the radius as (ref, distance), or None."""
+        matches = self.query(signature, max_distance)
+        return matches[0] if matches else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics."""
+        queries = self.stats['queries']
+        return {
+            **self.stats,
+            'entries': len(self),
+            'max_distance': self.max_distance,
+            'avg_candidates': self.stats['candidates'] / queries if queries else 0.0,
+            'avg_query_ms': 1000.0 * self.stats['total_time'] / queries if queries else 0.0
+        }
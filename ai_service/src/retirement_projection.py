@@ -0,0 +1,381 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+from .analyzers.w2_analyzer import W2Analyzer
+from .roth_optimizer import RMDTable
+from .tax_engine import TaxEngine, get_tax_engine
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (5, 25, 50, 75, 95)
+# Most of the Social Security benefit that is taxable income
+SOCIAL_SECURITY_TAXABLE = 0.85
+
+class RetirementProjector:
+    """
+    Monte Carlo projection of retirement savings, income and required minimum distributions.
+
+    Every path draws a lognormal return for each year from one seeded
+    generator, as a single (paths x years) array. Saving years follow in
+    closed form for all paths and years at once, from cumulative products
+    of the returns. In retirement, withdrawals depend on the balances, so
+    the years are a loop, but each year updates every path in one array
+    operation: the RMD comes out of the traditional account (IRS Uniform
+    Lifetime Table), the rest of the spending from the taxable, traditional
+    and Roth accounts in that order, and federal tax is charged on the
+    ordinary income (RMDs beyond the spending pay it before being
+    reinvested). The taxable account also loses ``tax_drag`` of its
+    balance every year to tax on dividends.
+
+    Amounts are in today's dollars: returns are net of inflation and every
+    year is taxed with the brackets of the plan's tax year. When a
+    projection would exceed ``time_budget_ms`` it uses fewer paths (at
+    least ``min_paths``); paths are a prefix of the same random stream, so
+    a smaller projection is the first paths of the full one. The time is
+    predicted from a fixed overhead and a cost per path-year, both fitted to
+    earlier projections. Results are cached by a fingerprint of the plan,
+    the seed, the tax parameters and the paths actually simulated.
+    """
+    def __init__(
+        self,
+        tax_engine: Optional[TaxEngine] = None,
+        rmd_table: Optional[RMDTable] = None,
+        paths: int = 10000,
+        min_paths: int = 500,
+        time_budget_ms: Optional[float] = 100.0,
+        percentiles: Sequence[float] = PERCENTILES,
+        cache_size: int = 256
+    ):
+        """
+        Args:
+            tax_engine: Tax engine to use (default: the shared engine)
+            rmd_table: RMD divisors and starting ages (default: the shipped table)
+            paths: Simulated paths
+            min_paths: Fewest paths used to stay within the time budget
+            time_budget_ms: Time allowed for one projection (None: no limit)
+            percentiles: Percentiles of the bands returned
+            cache_size: Projections kept, least recently used evicted first
+        """
+        self.tax_engine = tax_engine or get_tax_engine()
+        self.rmd_table = rmd_table or RMDTable()
+        self.paths = paths
+        self.min_paths = min(min_paths, paths)
+        self.time_budget_ms = time_budget_ms
+        self.percentiles = tuple(percentiles)
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coarsened': 0}
+        # Time of a projection: fixed overhead plus a cost per simulated path-year,
+        # updated after every projection (see ``_record_timing``)
+        self._overhead_seconds = 0.0
+        self._seconds_per_path_year = 1e-7
+
+    def project(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Simulate a retirement plan.
+
+        Args:
+            plan: ``age`` and optionally ``retirement_age`` (default 67),
+                ``end_age`` (default 95), the ``traditional_balance``,
+                ``roth_balance`` and ``taxable_balance``, yearly
+                ``traditional_contribution``, ``roth_contribution`` and
+                ``taxable_contribution`` until retirement (employer match
+                included) growing by ``contribution_growth``, the
+                ``expected_return`` (default 0.06) and ``volatility`` (default
+                0.15) of a year, ``inflation`` (default 0.025), the
+                ``annual_spending`` in retirement before tax (default:
+                ``withdrawal_rate``, 0.04, of each path's balance at
+                retirement), yearly ``social_security`` and ``pension`` from
+                retirement, ``tax_drag`` (default 0.003), ``tax_year``,
+                ``filing_status`` and ``seed``. Amounts are in today's dollars.
+
+        Returns:
+            Dict with the ``ages`` and ``tax_years`` of the horizon, percentile
+            bands (``p5``, ``p50``, ...) of the total balance at the end of each
+            year, of after-tax income and of RMDs, the balance at retirement,
+            the probability that spending is met to ``end_age``, the RMD
+            starting age, and the paths simulated
+
+        Raises:
+            ValueError: If the plan is invalid or its filing status has no parameters
+        """
+        plan = self._normalize(plan)
+        years = plan['end_age'] - plan['age']
+        paths = self._fit_paths(years)
+
+        # The full projection if there is one, else the one with the paths the budget allows
+        with self._lock:
+            for fingerprint in dict.fromkeys([self.fingerprint(plan), self.fingerprint(plan, paths)]):
+                cached = self._cache.get(fingerprint)
+                if cached is not None:
+                    self._cache.move_to_end(fingerprint)
+                    self.stats['hits'] += 1
+                    return {**copy.deepcopy(cached), 'cached': True}
+            self.stats['misses'] += 1
+
+        start = time.perf_counter()
+        if paths < self.paths:
+            self.stats['coarsened'] += 1
+        result = self._simulate(plan, paths)
+        elapsed = time.perf_counter() - start
+        self._record_timing(paths, years, elapsed)
+
+        fingerprint = self.fingerprint(plan, paths)
+        result['fingerprint'] = fingerprint
+        result['elapsed_ms'] = round(elapsed * 1000.0, 3)
+        with self._lock:
+            self._cache[fingerprint] = copy.deepcopy(result)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return {**result, 'cached': False}
+
+    def fingerprint(self, plan: Dict[str, Any], paths: Optional[int] = None) -> str:
+        """Cache key of a normalized plan, the tax parameters and the number of paths (default: ``paths``)."""
+        key = {
+            'plan': plan,
+            'tax_parameters': self.tax_engine.versions,
+            'rmd_table': self.rmd_table.version,
+            'paths': paths or self.paths,
+            'percentiles': self.percentiles
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def _fit_paths(self, years: int) -> int:
+        """Most paths a projection of ``years`` can simulate within the time budget, with a margin."""
+        if self.time_budget_ms is None:
+            return self.paths
+        seconds = 0.75 * self.time_budget_ms / 1000.0 - self._overhead_seconds
+        fit = int(seconds / (years * self._seconds_per_path_year))
+        return max(min(self.paths, fit), self.min_paths)
+
+    def _record_timing(self, paths: int, years: int, seconds: float) -> None:
+        """
+        Update the time model (seconds = overhead + paths x years x cost per
+        path-year) with a projection's runtime.
+
+        Both estimates move halfway towards what the runtime implies for
+        them: the cost per path-year by the share of the time the path-years
+        account for in a projection of this size (little for a one-year plan,
+        whose time is mostly overhead), the overhead by the rest.
+        """
+        work = paths * years
+        share = work / (work + 10.0 * self.paths)
+        per_path_year = max(seconds - self._overhead_seconds, 0.0) / work
+        overhead = max(seconds - self._seconds_per_path_year * work, 0.0)
+        self._seconds_per_path_year += 0.5 * share * (per_path_year - self._seconds_per_path_year)
+        self._overhead_seconds += 0.5 * (1.0 - share) * (overhead - self._overhead_seconds)
+
+    def _normalize(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Plan with every default filled in and amounts rounded to cents."""
+        age = plan.get('age')
+        if age is None:
+            raise ValueError("A plan needs an age")
+        age = int(age)
+        end_age = int(plan.get('end_age') or 95)
+        if not 0 < end_age - age <= 80:
+            raise ValueError("end_age must be after age, and at most 80 years later")
+        amounts = {}
+        for name in ('traditional_balance', 'roth_balance', 'taxable_balance', 'traditional_contribution',
+                     'roth_contribution', 'taxable_contribution', 'social_security', 'pension'):
+            amounts[name] = round(float(plan.get(name) or 0.0), 2)
+            if amounts[name] < 0:
+                raise ValueError(f"{name} must not be negative")
+        rates = {
+            'contribution_growth': float(plan.get('contribution_growth', 0.0)),
+            'expected_return': float(plan.get('expected_return', 0.06)),
+            'volatility': float(plan.get('volatility', 0.15)),
+            'inflation': float(plan.get('inflation', 0.025)),
+            'withdrawal_rate': float(plan.get('withdrawal_rate', 0.04)),
+            'tax_drag': float(plan.get('tax_drag', 0.003))
+        }
+        if rates['expected_return'] <= -1 or rates['volatility'] < 0 or rates['inflation'] <= -1 or not 0 <= rates['tax_drag'] < 1:
+            raise ValueError("Invalid return, volatility, inflation or tax drag")
+        spending = plan.get('annual_spending')
+        tax_year = int(plan.get('tax_year') or self.tax_engine.latest_year)
+        filing_status = plan.get('filing_status') or 'single'
+        self.tax_engine.schedule(self.tax_engine.nearest_year(tax_year), filing_status)
+        return {
+            'age': age,
+            'retirement_age': int(plan.get('retirement_age') or 67),
+            'end_age': end_age,
+            **amounts,
+            **rates,
+            'annual_spending': None if spending is None else round(float(spending), 2),
+            'tax_year': tax_year,
+            'filing_status': filing_status,
+            'seed': int(plan.get('seed') or 0)
+        }
+
+    def _returns(self, plan: Dict[str, Any], paths: int, years: int) -> np.ndarray:
+        """
+        Yearly growth factors net of inflation, (years x paths), with the
+        arithmetic mean return expected. Drawn path by path, so fewer paths
+        are a prefix of more.
+        """
+        mean = 1.0 + plan['expected_return']
+        sigma = np.sqrt(np.log1p((plan['volatility'] / mean) ** 2))
+        normal = np.random.default_rng(plan['seed']).standard_normal((paths, years))
+        growth = np.exp(np.log(mean) - sigma ** 2 / 2.0 + sigma * normal) / (1.0 + plan['inflation'])
+        # Years as rows: every year's update and percentile reads one contiguous row
+        return np.ascontiguousarray(growth.T)
+
+    @staticmethod
+    def _save(balance: float, contributions: np.ndarray, growth: np.ndarray) -> np.ndarray:
+        """
+        Balance at the end of every saving year, with contributions at the
+        start of each year: b[t] = (b[t-1] + c[t]) * g[t], i.e.
+        G[t] * (b + sum(c[k] / G[k-1] for k <= t)) with G the cumulative growth.
+        """
+        cumulative = np.cumprod(growth, axis=0)
+        before = np.vstack((np.ones((1, growth.shape[1])), cumulative[:-1]))
+        return cumulative * (balance + np.cumsum(contributions[:, None] / before, axis=0))
+
+    def _simulate(self, plan: Dict[str, Any], paths: int) -> Dict[str, Any]:
+        age, years = plan['age'], plan['end_age'] - plan['age']
+        saving = min(max(plan['retirement_age'] - age, 0), years)
+        growth = self._returns(plan, paths, years)
+        taxable_growth = growth * (1.0 - plan['tax_drag'])
+        schedule = self.tax_engine.schedule(self.tax_engine.nearest_year(plan['tax_year']), plan['filing_status'])
+        rmd_start_age = self.rmd_table.start_age(plan['tax_year'] - age)
+
+        balances = np.zeros((years, paths))
+        income = np.zeros((years, paths))
+        rmds = np.zeros((years, paths))
+        traditional = np.full(paths, plan['traditional_balance'])
+        roth = np.full(paths, plan['roth_balance'])
+        taxable = np.full(paths, plan['taxable_balance'])
+        if saving:
+            scale = (1.0 + plan['contribution_growth']) ** np.arange(saving)
+            accounts = []
+            for name, account_growth in (('traditional', growth), ('roth', growth), ('taxable', taxable_growth)):
+                accounts.append(self._save(plan[f'{name}_balance'], plan[f'{name}_contribution'] * scale, account_growth[:saving]))
+            balances[:saving] = accounts[0] + accounts[1] + accounts[2]
+            traditional, roth, taxable = (account[-1].copy() for account in accounts)
+        at_retirement = traditional + roth + taxable
+
+        spending = plan['annual_spending']
+        if spending is None:
+            spending = plan['withdrawal_rate'] * at_retirement
+        fixed = plan['social_security'] + plan['pension']
+        need = np.maximum(spending - fixed, 0.0) * np.ones(paths)
+        ordinary_fixed = plan['pension'] + SOCIAL_SECURITY_TAXABLE * plan['social_security']
+        failed_at = np.full(paths, -1)
+        for t in range(saving, years):
+            rmd = traditional / self.rmd_table.divisor(age + t) if age + t >= rmd_start_age else np.zeros(paths)
+            from_taxable = np.minimum(taxable, np.maximum(need - rmd, 0.0))
+            rest = np.maximum(need - rmd - from_taxable, 0.0)
+            from_traditional = np.minimum(traditional - rmd, rest)
+            from_roth = np.minimum(roth, rest - from_traditional)
+            short = rest - from_traditional - from_roth > 0.005
+            failed_at[short & (failed_at < 0)] = t
+            deduction = schedule.standard_deduction + (schedule.additional_standard_deduction if age + t >= 65 else 0.0)
+            tax = schedule.tax(ordinary_fixed + rmd + from_traditional - deduction)
+            # RMDs beyond the spending pay the tax first; the rest is reinvested in the taxable account
+            excess = np.maximum(rmd - need, 0.0)
+            reinvested = np.maximum(excess - tax, 0.0)
+            income[t] = fixed + rmd + from_taxable + from_traditional + from_roth - reinvested - tax
+            rmds[t] = rmd
+            traditional = (traditional - rmd - from_traditional) * growth[t]
+            roth = (roth - from_roth) * growth[t]
+            taxable = (taxable - from_taxable + reinvested) * taxable_growth[t]
+            balances[t] = traditional + roth + taxable
+
+        point = lambda values: {f'p{p:g}': round(float(x), 2) for p, x in zip(self.percentiles, np.percentile(values, self.percentiles))}
+        rmd_from = min(max(rmd_start_age - age, saving), years)
+        failed = failed_at >= 0
+        return {
+            'paths': paths,
+            'seed': plan['seed'],
+            'ages': list(range(age, plan['end_age'])),
+            'tax_years': list(range(plan['tax_year'], plan['tax_year'] + years)),
+            'retirement_age': plan['retirement_age'],
+            'end_age': plan['end_age'],
+            'success_probability': round(1.0 - float(failed.mean()), 4),
+            'depletion_age': int(np.median(failed_at[failed])) + age if failed.any() else None,
+            'balance_at_retirement': point(at_retirement),
+            'first_year_income': point(income[saving]) if saving < years else None,
+            'balance_bands': self._bands(balances),
+            'income_bands': self._bands(income, saving),
+            'rmd_start_age': rmd_start_age,
+            'rmd_bands': self._bands(rmds, rmd_from),
+            'lifetime_rmds': point(rmds.sum(axis=0))
+        }
+
+    def _bands(self, values: np.ndarray, first: int = 0) -> Dict[str, List[float]]:
+        """Percentiles of every year (row) of ``values``; the rows before ``first`` are all zero."""
+        bands = np.zeros((len(self.percentiles), len(values)))
+        if first < len(values):
+            bands[:, first:] = np.percentile(values[first:], self.percentiles, axis=1)
+        return {f'p{p:g}': [round(float(x), 2) for x in row] for p, row in zip(self.percentiles, bands)}
+
+    def retirement_fields(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """``retirement_income_projection`` and ``required_minimum_distributions`` of a ``RetirementCalculation``."""
+        schedule = [
+            {'age': age, 'tax_year': year, **{name: band[t] for name, band in result['rmd_bands'].items()}}
+            for t, (age, year) in enumerate(zip(result['ages'], result['tax_years'])) if age >= result['rmd_start_age']
+        ]
+        return {
+            'retirement_income_projection': {
+                key: result[key] for key in (
+                    'paths', 'seed', 'ages', 'retirement_age', 'end_age', 'success_probability', 'depletion_age',
+                    'balance_at_retirement', 'first_year_income', 'balance_bands', 'income_bands'
+                )
+            },
+            'required_minimum_distributions': {
+                'start_age': result['rmd_start_age'],
+                'first_year': schedule[0]['tax_year'] if schedule else None,
+                'first_rmd': schedule[0].get('p50') if schedule else None,
+                'lifetime_total': result['lifetime_rmds'],
+                'schedule': schedule
+            }
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'cached': len(self._cache)}
+
+def plan_from_w2(
+    data: Dict[str, Any],
+    age: int,
+    traditional_balance: float = 0.0,
+    tax_year: Optional[int] = None,
+    filing_status: str = 'single'
+) -> Dict[str, Any]:
+    """
+    Retirement plan of a W-2 analysis: its Box 12 pre-tax and Roth
+    deferrals continue every year until retirement, from ``age`` and a
+    current ``traditional_balance``, in the form's tax year (or the
+    closest year with tax parameters) unless ``tax_year`` is given.
+    """
+    entries = data.get('deferrals') or []
+    if tax_year is None:
+        tax_year = get_tax_engine().nearest_year(int(data['tax_year']) if data.get('tax_year') else None)
+    return {
+        'age': age,
+        'traditional_balance': traditional_balance,
+        'traditional_contribution': sum(d['amount'] for d in entries if d['code'] in W2Analyzer.RETIREMENT_CODES),
+        'roth_contribution': sum(d['amount'] for d in entries if d['code'] in W2Analyzer.ROTH_CODES),
+        'tax_year': tax_year,
+        'filing_status': filing_status
+    }
+
+# Shared projector instance
+retirement_projector = None
+
+def get_retirement_projector() -> RetirementProjector:
+    """Get the shared retirement projector."""
+    global retirement_projector
+    if retirement_projector is None:
+        retirement_projector = RetirementProjector(
+            paths=int(os.environ.get("RETIREMENT_PATHS", "10000")),
+            time_budget_ms=float(os.environ.get("RETIREMENT_TIME_BUDGET_MS", "100"))
+        )
+    return retirement_projector
@@ -0,0 +1,388 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+from .tax_engine import PARAMETERS_DIR, TaxEngine, TaxSchedule, get_tax_engine
+
+logger = logging.getLogger(__name__)
+
+# IRS Uniform Lifetime Table and RMD starting ages
+RMD_TABLE_PATH = os.path.join(PARAMETERS_DIR, 'rmd_uniform_lifetime.json')
+
+class RMDTable:
+    """Required minimum distribution divisors by age, and the age RMDs start at by birth year."""
+    def __init__(self, path: str = RMD_TABLE_PATH):
+        with open(path) as f:
+            table = json.load(f)
+        self.version = table['version']
+        self.start_ages = table['start_ages']
+        self.ages = np.array([age for age, _ in table['uniform_lifetime']], dtype=np.int64)
+        self.divisors = np.array([divisor for _, divisor in table['uniform_lifetime']], dtype=np.float64)
+
+    def start_age(self, birth_year: int) -> int:
+        """Age of the first RMD for an account owner born in ``birth_year``."""
+        for rule in self.start_ages:
+            if rule['born_before'] is None or birth_year < rule['born_before']:
+                return int(rule['age'])
+        return int(self.start_ages[-1]['age'])
+
+    def divisor(self, age: int) -> float:
+        """Divisor of the balance at the end of the previous year; ages past the table use its last row."""
+        index = min(max(int(np.searchsorted(self.ages, age)), 0), len(self.ages) - 1)
+        return float(self.divisors[index])
+
+class RothConversionOptimizer:
+    """
+    Multi-year Roth conversion schedules that minimize lifetime tax.
+
+    Each year the owner of a traditional IRA/401(k) takes any required minimum
+    distribution and may convert more to a Roth account; both are taxed as
+    ordinary income on top of the year's other income, and what is left grows
+    until the next year. Whatever remains at the end of the horizon is
+    inherited and withdrawn over ``heir_years`` at the heirs' income.
+
+    The schedule is a dynamic program over a grid of traditional balances:
+    every (balance, conversion) pair of a year is taxed in one array
+    operation, with the tax of the years after it interpolated from the
+    next year's values, so the whole horizon costs O(years x states^2)
+    instead of the exponential number of schedules a brute force would try.
+    The schedule itself follows those values forward from the actual
+    balance, so it is not limited to grid points. Runtime is
+    bounded by ``time_budget_ms``: when a grid would take longer, it is made
+    coarser. Results are cached by a fingerprint of the plan, of the tax
+    parameter versions and of the grid size actually used, so a result
+    coarsened under load is only reused where the budget allows that grid.
+    """
+    def __init__(
+        self,
+        tax_engine: Optional[TaxEngine] = None,
+        rmd_table: Optional[RMDTable] = None,
+        max_states: int = 250,
+        min_states: int = 25,
+        time_budget_ms: float = 500.0,
+        cache_size: int = 256
+    ):
+        """
+        Args:
+            tax_engine: Tax engine to use (default: the shared engine)
+            rmd_table: RMD divisors and starting ages (default: the shipped table)
+            max_states: Balance grid points of the dynamic program
+            min_states: Coarsest grid used to stay within the time budget
+            time_budget_ms: Time allowed for one optimization
+            cache_size: Optimizations kept, least recently used evicted first
+        """
+        self.tax_engine = tax_engine or get_tax_engine()
+        self.rmd_table = rmd_table or RMDTable()
+        self.max_states = max_states
+        self.min_states = min_states
+        self.time_budget_ms = time_budget_ms
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coarsened': 0}
+        # Time per (balance, conversion) pair, updated after every optimization
+        self._seconds_per_cell = 5e-8
+
+    def optimize(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Conversion schedule minimizing the present value of lifetime tax.
+
+        Args:
+            plan: ``traditional_balance`` and ``age`` (at the start of the first
+                year), and optionally ``years`` (horizon, default 30),
+                ``other_income`` (taxable income besides RMDs and conversions,
+                one amount for every year or a list per year), ``growth_rate``
+                (default 0.05), ``discount_rate`` (default: the growth rate),
+                ``tax_year`` (first year, default: the latest with parameters),
+                ``filing_status``, ``heir_income`` (default: the last year's
+                other income) and ``heir_years`` (default 10). Amounts are in
+                today's dollars; years past the last tax parameters use them.
+
+        Returns:
+            Dict with the yearly ``schedule`` (balance, RMD, conversion,
+            taxable income, tax and marginal rate), the present value of
+            ``lifetime_tax`` with and without conversions, the ``savings``, the
+            grid used and whether the result came from the cache
+
+        Raises:
+            ValueError: If the plan is invalid or its filing status has no parameters
+        """
+        plan = self._normalize(plan)
+        start = time.perf_counter()
+        budget = self.time_budget_ms / 1000.0
+        # Largest grid the budget allows at the time per cell measured so far, with a margin
+        fit = lambda seconds, seconds_per_cell: int(np.sqrt(0.75 * seconds / (plan['years'] * seconds_per_cell)))
+        states = max(min(self.max_states, fit(budget, self._seconds_per_cell)), self.min_states)
+
+        # The full grid's result if there is one, else that of the grid the budget allows
+        with self._lock:
+            for fingerprint in dict.fromkeys([self.fingerprint(plan), self.fingerprint(plan, states)]):
+                cached = self._cache.get(fingerprint)
+                if cached is not None:
+                    self._cache.move_to_end(fingerprint)
+                    self.stats['hits'] += 1
+                    return {**copy.deepcopy(cached), 'cached': True}
+            self.stats['misses'] += 1
+
+        if states < self.max_states:
+            self.stats['coarsened'] += 1
+        result, seconds_per_cell = self._solve(plan, states, start + budget)
+        while result is None:
+            # Slower than expected: coarsen the grid to what the remaining time allows
+            remaining = max(budget - (time.perf_counter() - start), 0.0)
+            states = max(min(fit(remaining, seconds_per_cell), states // 2), self.min_states)
+            self.stats['coarsened'] += 1
+            deadline = None if states == self.min_states else start + budget
+            result, seconds_per_cell = self._solve(plan, states, deadline)
+        self._seconds_per_cell = seconds_per_cell
+
+        fingerprint = self.fingerprint(plan, states)
+        result['fingerprint'] = fingerprint
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000.0, 3)
+        with self._lock:
+            self._cache[fingerprint] = copy.deepcopy(result)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return {**result, 'cached': False}
+
+    def fingerprint(self, plan: Dict[str, Any], states: Optional[int] = None) -> str:
+        """Cache key of a normalized plan, the tax parameters and the grid size (default: ``max_states``)."""
+        key = {
+            'plan': plan,
+            'tax_parameters': self.tax_engine.versions,
+            'rmd_table': self.rmd_table.version,
+            'states': states or self.max_states
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def _normalize(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Plan with every default filled in and amounts rounded to cents."""
+        balance = float(plan.get('traditional_balance') or 0.0)
+        age = plan.get('age')
+        years = int(plan.get('years') or 30)
+        if balance < 0 or age is None or years < 1:
+            raise ValueError("A plan needs a non-negative traditional_balance, an age and at least one year")
+        other = plan.get('other_income') or 0.0
+        other = [float(other)] * years if np.isscalar(other) else [float(x) for x in other]
+        if not other:
+            other = [0.0]
+        # A short income projection is extended with its last year
+        other = (other + [other[-1]] * years)[:years]
+        growth = float(plan.get('growth_rate', 0.05))
+        tax_year = int(plan.get('tax_year') or self.tax_engine.latest_year)
+        filing_status = plan.get('filing_status') or 'single'
+        self.tax_engine.schedule(self.tax_engine.nearest_year(tax_year), filing_status)
+        return {
+            'traditional_balance': round(balance, 2),
+            'age': int(age),
+            'years': years,
+            'other_income': [round(x, 2) for x in other],
+            'growth_rate': growth,
+            'discount_rate': float(plan.get('discount_rate', growth)),
+            'tax_year': tax_year,
+            'filing_status': filing_status,
+            'heir_income': round(float(plan.get('heir_income', other[-1])), 2),
+            'heir_years': int(plan.get('heir_years') or 10)
+        }
+
+    def _schedules(self, plan: Dict[str, Any]) -> List[Tuple[TaxSchedule, float]]:
+        """Tax schedule and deduction of each year of the plan."""
+        years = []
+        for t in range(plan['years']):
+            schedule = self.tax_engine.schedule(self.tax_engine.nearest_year(plan['tax_year'] + t), plan['filing_status'])
+            deduction = schedule.standard_deduction
+            if plan['age'] + t >= 65:
+                deduction += schedule.additional_standard_deduction
+            years.append((schedule, deduction))
+        return years
+
+    def _heir_tax(self, plan: Dict[str, Any], schedule: TaxSchedule, balances: np.ndarray) -> np.ndarray:
+        """Present value of the tax heirs pay withdrawing balances over ``heir_years``."""
+        income = plan['heir_income'] - schedule.standard_deduction
+        withdrawal = balances / plan['heir_years']
+        extra = schedule.tax(income + withdrawal) - schedule.tax(income)
+        return extra * plan['heir_years'] / (1.0 + plan['discount_rate']) ** plan['years']
+
+    def _rmd_ages(self, plan: Dict[str, Any]) -> Tuple[int, np.ndarray]:
+        """RMD starting age, and each year's RMD as a fraction of the starting balance (0 before RMDs)."""
+        start_age = self.rmd_table.start_age(plan['tax_year'] - plan['age'])
+        fractions = np.zeros(plan['years'])
+        for t in range(plan['years']):
+            if plan['age'] + t >= start_age:
+                fractions[t] = 1.0 / self.rmd_table.divisor(plan['age'] + t)
+        return start_age, fractions
+
+    def _solve(self, plan: Dict[str, Any], states: int, deadline: Optional[float]) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Run the dynamic program on a grid of ``states`` balances.
+
+        Returns:
+            The result, or None if it would not finish by ``deadline``; and the
+            time it took per (balance, conversion) pair
+        """
+        balance, years = plan['traditional_balance'], plan['years']
+        growth = 1.0 + plan['growth_rate']
+        schedules = self._schedules(plan)
+        rmd_start_age, rmd_fractions = self._rmd_ages(plan)
+
+        # Grid from 0 to the largest reachable balance
+        top = max(balance * max(growth, 1.0) ** years, 1.0)
+        grid = np.linspace(0.0, top, states)
+
+        # Backward induction: values[t][i] is the least tax from the start of year t at balance grid[i]
+        values = np.empty((years + 1, states))
+        values[years] = self._heir_tax(plan, schedules[-1][0], grid)
+        loop_start = time.perf_counter()
+        first_year = 0.0
+        for t in reversed(range(years)):
+            total, _ = self._year_costs(plan, schedules, rmd_fractions, grid, values[t + 1], t, grid)
+            values[t] = total.min(axis=1)
+            now = time.perf_counter()
+            if t == years - 1:
+                # The first year also warms up; project the runtime from the years after it
+                first_year = now - loop_start
+                loop_start = now
+            elif deadline is not None and t > 0:
+                per_year = (now - loop_start) / (years - 1 - t)
+                if now + per_year * t > deadline:
+                    return None, per_year / states ** 2
+
+        loop_time = time.perf_counter() - loop_start if years > 1 else first_year
+        seconds_per_cell = loop_time / (max(years - 1, 1) * states ** 2)
+
+        optimized = self._simulate(plan, schedules, rmd_fractions, grid=grid, values=values)
+        baseline = self._simulate(plan, schedules, rmd_fractions)
+        # The value function is approximate; never recommend a plan that is not better
+        if optimized['lifetime_tax'] >= baseline['lifetime_tax']:
+            optimized = baseline
+        return {
+            'states': states,
+            'step': round(float(grid[1] - grid[0]), 2),
+            'rmd_start_age': rmd_start_age,
+            'lifetime_tax': optimized['lifetime_tax'],
+            'baseline_lifetime_tax': baseline['lifetime_tax'],
+            'savings': round(baseline['lifetime_tax'] - optimized['lifetime_tax'], 2),
+            'total_conversions': round(sum(row['conversion'] for row in optimized['schedule']), 2),
+            'terminal_balance': optimized['terminal_balance'],
+            'baseline_terminal_balance': baseline['terminal_balance'],
+            'schedule': optimized['schedule']
+        }, seconds_per_cell
+
+    def _year_costs(
+        self,
+        plan: Dict[str, Any],
+        schedules: List[Tuple[TaxSchedule, float]],
+        rmd_fractions: np.ndarray,
+        grid: np.ndarray,
+        next_values: np.ndarray,
+        t: int,
+        balances: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tax of year ``t`` plus the least tax after it, for every balance and candidate conversion.
+
+        Candidates are the grid amounts, the amounts that fill each bracket to its
+        top, and converting everything, so neither converting nothing nor filling
+        a bracket is lost to the grid. The value of balances between grid points
+        is interpolated linearly.
+
+        Returns:
+            The (balances x candidates) costs and conversions
+        """
+        schedule, deduction = schedules[t]
+        growth, discount = 1.0 + plan['growth_rate'], 1.0 + plan['discount_rate']
+        rmd = balances * rmd_fractions[t]
+        available = (balances - rmd)[:, None]
+        income = plan['other_income'][t] + rmd[:, None] - deduction
+        conversion = np.concatenate((
+            np.broadcast_to(grid, (len(balances), len(grid))),
+            schedule.thresholds[None, 1:] - income,
+            available
+        ), axis=1)
+        conversion = np.clip(conversion, 0.0, available)
+        position = np.minimum((available - conversion) * growth / grid[-1] * (len(grid) - 1), len(grid) - 1)
+        lower = np.minimum(position.astype(np.int64), len(grid) - 2) if len(grid) > 1 else np.zeros(position.shape, dtype=np.int64)
+        weight = position - lower
+        later = next_values[lower] * (1.0 - weight) + next_values[np.minimum(lower + 1, len(grid) - 1)] * weight
+        total = schedule.tax(np.maximum(income + conversion, 0.0)) / discount ** t + later
+        return total, conversion
+
+    def _simulate(
+        self,
+        plan: Dict[str, Any],
+        schedules: List[Tuple[TaxSchedule, float]],
+        rmd_fractions: np.ndarray,
+        grid: Optional[np.ndarray] = None,
+        values: Optional[np.ndarray] = None
+    ) -> Dict[str, Any]:
+        """Convert the amount the dynamic program's values favor each year, or nothing without them."""
+        growth, discount = 1.0 + plan['growth_rate'], 1.0 + plan['discount_rate']
+        balance = plan['traditional_balance']
+        lifetime_tax = 0.0
+        rows = []
+        for t, (schedule, deduction) in enumerate(schedules):
+            rmd = float(balance * rmd_fractions[t])
+            conversion = 0.0
+            if values is not None:
+                total, conversions = self._year_costs(plan, schedules, rmd_fractions, grid, values[t + 1], t, np.array([balance]))
+                conversion = float(conversions[0, np.argmin(total[0])])
+            taxable = max(plan['other_income'][t] + rmd + conversion - deduction, 0.0)
+            tax = float(schedule.tax(taxable))
+            lifetime_tax += tax / discount ** t
+            rows.append({
+                'tax_year': plan['tax_year'] + t,
+                'age': plan['age'] + t,
+                'traditional_balance': round(balance, 2),
+                'rmd': round(rmd, 2),
+                'conversion': round(conversion, 2),
+                'other_income': plan['other_income'][t],
+                'taxable_income': round(taxable, 2),
+                'tax': round(tax, 2),
+                'marginal_rate': float(schedule.marginal_rate(taxable))
+            })
+            balance = (balance - rmd - conversion) * growth
+        lifetime_tax += float(self._heir_tax(plan, schedules[-1][0], np.array(balance)))
+        return {'lifetime_tax': round(lifetime_tax, 2), 'terminal_balance': round(balance, 2), 'schedule': rows}
+
+    def retirement_fields(self, result: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """``roth_conversion_opportunity`` and ``retirement_tax_planning`` of ``RetirementCalculation``."""
+        converting = [row for row in result['schedule'] if row['conversion'] > 0]
+        return {
+            'roth_conversion_opportunity': {
+                'recommended': result['savings'] > 0 and bool(converting),
+                'lifetime_tax_savings': result['savings'],
+                'total_conversions': result['total_conversions'],
+                'first_year_conversion': result['schedule'][0]['conversion'],
+                'conversion_years': [row['tax_year'] for row in converting]
+            },
+            'retirement_tax_planning': {
+                'lifetime_tax': result['lifetime_tax'],
+                'baseline_lifetime_tax': result['baseline_lifetime_tax'],
+                'rmd_start_age': result['rmd_start_age'],
+                'terminal_balance': result['terminal_balance'],
+                'conversion_schedule': result['schedule']
+            }
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'cached': len(self._cache)}
+
+# Shared optimizer instance
+roth_optimizer = None
+
+def get_roth_optimizer() -> RothConversionOptimizer:
+    """Get the shared Roth conversion optimizer."""
+    global roth_optimizer
+    if roth_optimizer is None:
+        roth_optimizer = RothConversionOptimizer(
+            max_states=int(os.environ.get("ROTH_MAX_STATES", "250")),
+            time_budget_ms=float(os.environ.get("ROTH_TIME_BUDGET_MS", "500"))
+        )
+    return roth_optimizer
@@ -1,20 +1,45 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence, Union
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import threading
 import logging
+import numpy as np
 from .analyzers.analyzer_factory import AnalyzerFactory
+from .analyzers.field_scanner import parse_amounts
+from .batch_analysis import BatchAnalysis, flatten_analysis, rows_to_columns
+from .parsed_document import ParsedDocument
+from .tax_engine import get_tax_engine
 
 logger = logging.getLogger(__name__)
 
+def _analyze_chunk(doc_types: List[str], texts: List[str]) -> BatchAnalysis:
+    """Analyze part of a batch in a worker process."""
+    return TaxAnalyzer(batch_workers=1).analyze_batch(doc_types, texts)
+
 class TaxAnalyzer:
-    def __init__(self):
+    def __init__(self, batch_workers: Optional[int] = None, parallel_min_documents: int = 2000):
+        """
+        Args:
+            batch_workers: Worker processes for large batches (default: CPU count)
+            parallel_min_documents: Batches with fewer documents are analyzed in this process
+        """
         self.analyzer_factory = AnalyzerFactory()
+        self.batch_workers = batch_workers or os.cpu_count() or 1
+        self.parallel_min_documents = parallel_min_documents
+        # Worker processes, started on the first large batch and reused for later ones
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
     
-    def analyze_document(self, doc_type: str, text: str, image: Any = None) -> Dict[str, Any]:
+    def analyze_document(self, doc_type: str, text: Union[str, ParsedDocument], image: Any = None) -> Dict[str, Any]:
         """
         Analyze a tax document using the appropriate analyzer.
         
         Args:
             doc_type: Type of document (e.g., 'w2', '1099')
-            text: OCR extracted text from document
+            text: OCR extracted text from document, or a ``ParsedDocument``
+                produced by ``DocumentProcessor`` (not parsed again)
             image: Optional image data for additional analysis
             
         Returns:
@@ -36,6 +61,157 @@ class TaxAnalyzer:
                 'error': str(e)
             }
     
+    def analyze_batch(self, doc_types: Sequence[str], texts: Sequence[Union[str, ParsedDocument]]) -> BatchAnalysis:
+        """
+        Analyze many tax documents at once, returning columns instead of one dict per document.
+        
+        Documents are grouped by type and each group is analyzed by its
+        analyzer's ``analyze_batch``, which extracts the fields of the whole
+        group and computes validation, totals and insights on arrays. Analyzers
+        without ``analyze_batch`` analyze their documents one by one. Batches of
+        at least ``parallel_min_documents`` are split across worker processes.
+        
+        Args:
+            doc_types: Type of each document (e.g., 'w2', '1099')
+            texts: OCR extracted text of each document, or ``ParsedDocument``s
+            
+        Returns:
+            ``BatchAnalysis`` with one entry per document, in the given order;
+            documents of unsupported types have ``success`` False and an ``error``
+            
+        Raises:
+            ValueError: If ``doc_types`` and ``texts`` differ in length
+        """
+        if len(doc_types) != len(texts):
+            raise ValueError(f"Got {len(doc_types)} document types for {len(texts)} documents")
+        if self.batch_workers > 1 and len(texts) >= self.parallel_min_documents:
+            return self._analyze_batch_parallel(doc_types, texts)
+
+        keys = np.empty(len(doc_types), dtype=object)
+        keys[:] = [doc_type.lower() for doc_type in doc_types]
+        groups = [(np.arange(len(texts)), {
+            'doc_type': keys,
+            'success': np.zeros(len(texts), dtype=bool),
+            'error': np.full(len(texts), None, dtype=object)
+        })]
+        for key in dict.fromkeys(keys):
+            positions = np.flatnonzero(keys == key)
+            group = [texts[i] for i in positions]
+            groups.append((positions, self._analyze_group(key, group)))
+        return BatchAnalysis.from_groups(len(texts), groups)
+    
+    def _analyze_group(self, doc_type: str, texts: List[Union[str, ParsedDocument]]) -> Dict[str, np.ndarray]:
+        """Columns for documents of one type."""
+        try:
+            analyzer = self.analyzer_factory.get_analyzer(doc_type)
+        except ValueError as e:
+            logger.error(f"Error getting analyzer: {str(e)}")
+            return rows_to_columns([{'success': False, 'error': str(e)}] * len(texts))
+        
+        if hasattr(analyzer, 'analyze_batch'):
+            try:
+                columns = analyzer.analyze_batch(texts)
+                columns['success'] = np.ones(len(texts), dtype=bool)
+                return columns
+            except Exception as e:
+                # Analyze one by one so only the documents that fail are marked failed
+                logger.error(f"Error analyzing {doc_type} batch, analyzing documents one by one: {str(e)}")
+        return rows_to_columns([flatten_analysis(self.analyze_document(doc_type, text)) for text in texts])
+    
+    def _analyze_batch_parallel(self, doc_types: Sequence[str], texts: Sequence[Union[str, ParsedDocument]]) -> BatchAnalysis:
+        """Analyze a large batch in chunks across worker processes."""
+        # Workers get plain text; normalizing a parsed document's text again leaves it unchanged
+        texts = [text.text if isinstance(text, ParsedDocument) else text for text in texts]
+        # Several chunks per worker, so one slow chunk does not leave the others idle
+        size = -(-len(texts) // (self.batch_workers * 4))
+        starts = range(0, len(texts), size)
+        executor = self._pool()
+        try:
+            chunks = executor.map(
+                _analyze_chunk,
+                [list(doc_types[start:start + size]) for start in starts],
+                [texts[start:start + size] for start in starts]
+            )
+            return BatchAnalysis.concat(list(chunks))
+        except BrokenProcessPool:
+            # A worker died; the next batch starts new ones
+            with self._executor_lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """
+        The worker pool, started on first use.
+
+        Workers are spawned rather than forked: the server runs threads (OCR,
+        job and upload workers) whose held locks a fork would copy into the
+        child, where nothing could release them. Spawning costs an interpreter
+        start per worker, paid once since the pool is kept.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.batch_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the batch worker processes, if any were started."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+    
+    def calculate_tax(
+        self,
+        doc_type: str,
+        analysis: Dict[str, Any],
+        tax_year: Optional[int] = None,
+        filing_status: str = 'single'
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Federal tax calculation for the income of an analyzed document.
+        
+        Args:
+            doc_type: Type of the analyzed document (e.g., 'w2', '1099')
+            analysis: Result of ``analyze_document``
+            tax_year: Tax year (default: the document's, or the closest year
+                with tax parameters)
+            filing_status: Filing status of the return
+            
+        Returns:
+            ``TaxEngine.calculation`` of the document's income, crediting its
+            federal withholding; None if the analysis failed
+            
+        Raises:
+            ValueError: If the tax year or filing status has no tax parameters
+        """
+        if not analysis.get('success'):
+            return None
+        data = analysis.get('data', {})
+        totals = analysis.get('totals', {})
+        analyzer = self.analyzer_factory.get_analyzer(doc_type)
+        federal_fields = getattr(analyzer, 'FEDERAL_INCOME_FIELDS', None)
+        if 'total_wages' in totals or federal_fields is None:
+            income = totals.get('total_wages', totals.get('total_income', 0.0))
+        else:
+            # Not ``total_income``, which also counts the state and local boxes repeating the same income
+            income = float(np.nansum(parse_amounts([data.get(field) for field in federal_fields])))
+        self_employment = None
+        if data.get('form_type') in getattr(analyzer, 'SELF_EMPLOYMENT_FORMS', ()):
+            self_employment = data.get('nonemployee_compensation')
+        withheld, self_employment_income = np.nan_to_num(
+            parse_amounts([data.get('federal_tax', data.get('federal_tax_withheld')), self_employment])
+        )
+        engine = get_tax_engine()
+        if tax_year is None:
+            tax_year = engine.nearest_year(int(data['tax_year']) if data.get('tax_year') else None)
+        return engine.calculation(
+            income, tax_year, filing_status,
+            withheld=float(withheld), self_employment_income=float(self_employment_income)
+        )
+    
     def combine_analyses(self, analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Combine multiple document analyses into a comprehensive tax analysis.
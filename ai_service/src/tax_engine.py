@@ -0,0 +1,338 @@
+from typing import Any, Dict, Iterable, List, Optional, Union
+import json
+import os
+import re
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FILING_STATUSES = (
+    'single',
+    'married_filing_jointly',
+    'married_filing_separately',
+    'head_of_household',
+    'qualifying_surviving_spouse'
+)
+
+# Tax parameter files shipped with the service, one per tax year
+PARAMETERS_DIR = os.path.join(os.path.dirname(__file__), 'tax_parameters')
+
+ArrayLike = Union[float, Iterable[float], np.ndarray]
+
+def _thresholds_and_rates(brackets: List[List[float]], name: str) -> tuple:
+    thresholds = np.array([lower for lower, _ in brackets], dtype=np.float64)
+    rates = np.array([rate for _, rate in brackets], dtype=np.float64)
+    if len(thresholds) == 0 or thresholds[0] != 0 or np.any(np.diff(thresholds) <= 0):
+        raise ValueError(f"{name}: brackets must start at 0 and increase")
+    if np.any((rates < 0) | (rates > 1)):
+        raise ValueError(f"{name}: rates must be between 0 and 1")
+    return thresholds, rates
+
+class TaxSchedule:
+    """
+    Tax parameters of one tax year and filing status, compiled to arrays.
+
+    Bracket lookups are a binary search (``np.searchsorted``) over the bracket
+    thresholds, and the tax owed at each threshold is precomputed, so the tax
+    on any income is one lookup, one multiply and one add, over whole arrays
+    of incomes at once.
+    """
+    def __init__(self, tax_year: int, filing_status: str, parameters: Dict[str, Any]):
+        """
+        Args:
+            tax_year: Tax year the parameters apply to
+            filing_status: One of ``FILING_STATUSES``
+            parameters: ``brackets`` and ``capital_gains_brackets`` as
+                [lower bound of taxable income, rate] pairs, ``standard_deduction``,
+                ``additional_standard_deduction`` and ``phase_outs``
+        """
+        name = f"{tax_year} {filing_status}"
+        self.tax_year = tax_year
+        self.filing_status = filing_status
+        self.thresholds, self.rates = _thresholds_and_rates(parameters['brackets'], name)
+        # Tax owed on income up to each threshold
+        self.base_tax = np.concatenate(([0.0], np.cumsum(np.diff(self.thresholds) * self.rates[:-1])))
+        self.capital_gains_thresholds, self.capital_gains_rates = _thresholds_and_rates(
+            parameters.get('capital_gains_brackets', [[0, 0.0]]), f"{name} capital gains"
+        )
+        self.standard_deduction = float(parameters['standard_deduction'])
+        self.additional_standard_deduction = float(parameters.get('additional_standard_deduction', 0.0))
+        self.phase_outs: Dict[str, Dict[str, float]] = parameters.get('phase_outs', {})
+
+    def bracket_index(self, taxable_income: ArrayLike) -> np.ndarray:
+        """Bracket of each taxable income; an income on a threshold is in the lower bracket."""
+        taxable = np.maximum(np.asarray(taxable_income, dtype=np.float64), 0.0)
+        return np.maximum(np.searchsorted(self.thresholds, taxable, side='left') - 1, 0)
+
+    def tax(self, taxable_income: ArrayLike) -> np.ndarray:
+        """Tax on each taxable income."""
+        taxable = np.maximum(np.asarray(taxable_income, dtype=np.float64), 0.0)
+        index = self.bracket_index(taxable)
+        return self.base_tax[index] + (taxable - self.thresholds[index]) * self.rates[index]
+
+    def marginal_rate(self, taxable_income: ArrayLike) -> np.ndarray:
+        """Rate on the next dollar of each taxable income."""
+        return self.rates[self.bracket_index(taxable_income)]
+
+    def capital_gains_tax(self, ordinary_income: ArrayLike, gains: ArrayLike) -> np.ndarray:
+        """Tax on long-term gains and qualified dividends stacked on top of ordinary taxable income."""
+        bottom = np.maximum(np.asarray(ordinary_income, dtype=np.float64), 0.0)
+        top = bottom + np.maximum(np.asarray(gains, dtype=np.float64), 0.0)
+        upper = np.append(self.capital_gains_thresholds[1:], np.inf)
+        tax = np.zeros(np.broadcast(bottom, top).shape)
+        for lower, limit, rate in zip(self.capital_gains_thresholds, upper, self.capital_gains_rates):
+            tax += np.maximum(np.minimum(top, limit) - np.maximum(bottom, lower), 0.0) * rate
+        return tax
+
+    def phase_out(self, name: str, magi: ArrayLike, benefit: ArrayLike = 1.0) -> np.ndarray:
+        """
+        What is left of a benefit after its income phase-out.
+
+        A phase-out with an ``end`` reduces the benefit linearly to zero between
+        ``start`` and ``end``; one with a ``rate`` reduces it by ``rate`` times the
+        income over ``start``, rounded up to a multiple of ``step``.
+
+        Raises:
+            ValueError: If the schedule has no phase-out of that name
+        """
+        rule = self.phase_outs.get(name)
+        if rule is None:
+            raise ValueError(f"No {name} phase-out for {self.tax_year} {self.filing_status}")
+        benefit = np.asarray(benefit, dtype=np.float64)
+        excess = np.maximum(np.asarray(magi, dtype=np.float64) - rule['start'], 0.0)
+        if 'end' in rule:
+            return benefit * np.clip(1.0 - excess / (rule['end'] - rule['start']), 0.0, 1.0)
+        step = rule.get('step')
+        if step:
+            excess = np.ceil(excess / step) * step
+        return np.maximum(benefit - excess * rule['rate'], 0.0)
+
+    def brackets(self, taxable_income: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        The brackets as ``TaxBracket`` dicts; with ``taxable_income``, only
+        the brackets that income reaches.
+        """
+        last = len(self.rates) - 1 if taxable_income is None else int(self.bracket_index(taxable_income))
+        brackets = []
+        for i in range(last + 1):
+            brackets.append({
+                'rate': float(self.rates[i]),
+                'min_income': float(self.thresholds[i]),
+                'max_income': float(self.thresholds[i + 1]) if i + 1 < len(self.thresholds) else None
+            })
+        return brackets
+
+class TaxEngine:
+    """
+    Federal income tax parameters for several tax years, loaded from data files.
+
+    Each tax year is one JSON file (``tax_parameters/<year>.json``) with a
+    ``version`` and its ``source``, the self-employment tax parameters, the
+    retirement and HSA contribution limits, and per filing status the ordinary
+    and capital gains brackets, standard deductions and phase-outs. All
+    schedules are compiled once when the engine is created; calculations take
+    arrays of incomes, and arrays of tax years and filing statuses, so a whole
+    batch of returns is computed with a few array operations per schedule used.
+    """
+    def __init__(self, parameters: Iterable[Dict[str, Any]]):
+        """
+        Args:
+            parameters: Contents of the tax parameter files, one per tax year
+
+        Raises:
+            ValueError: If a file is malformed or two files cover the same year
+        """
+        self.schedules: Dict[tuple, TaxSchedule] = {}
+        self.versions: Dict[int, str] = {}
+        self.self_employment: Dict[int, Dict[str, float]] = {}
+        self.contribution_limits: Dict[int, Dict[str, float]] = {}
+        for year_parameters in parameters:
+            tax_year = int(year_parameters['tax_year'])
+            if tax_year in self.versions:
+                raise ValueError(f"Tax parameters for {tax_year} given twice")
+            self.versions[tax_year] = str(year_parameters.get('version', tax_year))
+            if 'self_employment' in year_parameters:
+                self.self_employment[tax_year] = year_parameters['self_employment']
+            if 'contribution_limits' in year_parameters:
+                self.contribution_limits[tax_year] = year_parameters['contribution_limits']
+            for filing_status, status_parameters in year_parameters['filing_statuses'].items():
+                if filing_status not in FILING_STATUSES:
+                    raise ValueError(f"Unknown filing status in {tax_year} tax parameters: {filing_status}")
+                self.schedules[(tax_year, filing_status)] = TaxSchedule(tax_year, filing_status, status_parameters)
+        self.tax_years = sorted(self.versions)
+        if not self.tax_years:
+            raise ValueError("No tax parameters given")
+
+    @classmethod
+    def from_directory(cls, directory: str = PARAMETERS_DIR) -> 'TaxEngine':
+        """Load every ``<year>.json`` tax parameter file in a directory."""
+        parameters = []
+        for name in sorted(os.listdir(directory)):
+            if re.fullmatch(r'\d{4}\.json', name):
+                with open(os.path.join(directory, name)) as f:
+                    parameters.append(json.load(f))
+        engine = cls(parameters)
+        logger.info(f"Loaded tax parameters for {', '.join(f'{y} (v{v})' for y, v in engine.versions.items())}")
+        return engine
+
+    @property
+    def latest_year(self) -> int:
+        return self.tax_years[-1]
+
+    def nearest_year(self, tax_year: Optional[int] = None) -> int:
+        """The tax year with parameters closest to ``tax_year`` (the latest if None)."""
+        if tax_year is None:
+            return self.latest_year
+        return min(self.tax_years, key=lambda year: (abs(year - tax_year), -year))
+
+    def schedule(self, tax_year: int, filing_status: str = 'single') -> TaxSchedule:
+        """
+        Compiled parameters of one tax year and filing status.
+
+        Raises:
+            ValueError: If there are no parameters for that year or status
+        """
+        schedule = self.schedules.get((int(tax_year), filing_status))
+        if schedule is None:
+            raise ValueError(f"No tax parameters for {tax_year} {filing_status}")
+        return schedule
+
+    def compute(
+        self,
+        incomes: ArrayLike,
+        tax_year: Union[int, Iterable[int], np.ndarray],
+        filing_status: Union[str, Iterable[str], np.ndarray] = 'single',
+        deductions: Optional[ArrayLike] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Federal income tax on arrays of incomes.
+
+        Args:
+            incomes: Adjusted gross income of each return
+            tax_year: Tax year of each return, or one for all
+            filing_status: Filing status of each return, or one for all
+            deductions: Deduction of each return (default: its standard deduction)
+
+        Returns:
+            Arrays of ``taxable_income``, ``tax``, ``marginal_rate`` and
+            ``effective_rate`` (tax over income; 0 where income is not positive)
+
+        Raises:
+            ValueError: If a tax year or filing status has no parameters
+        """
+        incomes = np.asarray(incomes, dtype=np.float64)
+        years = np.asarray(tax_year)
+        statuses = np.asarray(filing_status)
+        shape = np.broadcast(incomes, years, statuses).shape
+        incomes, years, statuses = (np.broadcast_to(a, shape) for a in (incomes, years, statuses))
+        if deductions is not None:
+            deductions = np.broadcast_to(np.asarray(deductions, dtype=np.float64), shape)
+
+        result = {name: np.zeros(shape) for name in ('taxable_income', 'tax', 'marginal_rate')}
+        if years.ndim == 0 or (years.size and np.all(years == years.flat[0]) and np.all(statuses == statuses.flat[0])):
+            # One schedule for all returns
+            groups = [(self.schedule(years.flat[0], str(statuses.flat[0])), Ellipsis)] if incomes.size else []
+        else:
+            groups = []
+            for year, status in sorted(set(zip(years.ravel().tolist(), statuses.ravel().tolist()))):
+                groups.append((self.schedule(year, status), (years == year) & (statuses == status)))
+
+        for schedule, selected in groups:
+            deduction = schedule.standard_deduction if deductions is None else deductions[selected]
+            taxable = np.maximum(incomes[selected] - deduction, 0.0)
+            result['taxable_income'][selected] = taxable
+            result['tax'][selected] = schedule.tax(taxable)
+            result['marginal_rate'][selected] = schedule.marginal_rate(taxable)
+        positive = incomes > 0
+        result['effective_rate'] = np.divide(result['tax'], incomes, out=np.zeros(shape), where=positive)
+        return result
+
+    def self_employment_tax(self, net_earnings: ArrayLike, tax_year: Union[int, Iterable[int], np.ndarray]) -> np.ndarray:
+        """
+        Self-employment tax (social security up to the wage base, plus Medicare)
+        on arrays of net self-employment earnings.
+
+        Raises:
+            ValueError: If a tax year has no self-employment parameters
+        """
+        earnings = np.maximum(np.asarray(net_earnings, dtype=np.float64), 0.0)
+        years, inverse = np.unique(np.asarray(tax_year), return_inverse=True)
+        missing = [int(year) for year in years if int(year) not in self.self_employment]
+        if missing:
+            raise ValueError(f"No self-employment tax parameters for {missing[0]}")
+        # Parameters of each return's year
+        parameters = {
+            name: np.array([self.self_employment[int(year)][name] for year in years])[inverse].reshape(np.shape(tax_year))
+            for name in ('net_earnings_factor', 'social_security_rate', 'medicare_rate', 'social_security_wage_base')
+        }
+        base = earnings * parameters['net_earnings_factor']
+        return (
+            np.minimum(base, parameters['social_security_wage_base']) * parameters['social_security_rate']
+            + base * parameters['medicare_rate']
+        )
+
+    def calculation(
+        self,
+        income: float,
+        tax_year: Optional[int] = None,
+        filing_status: str = 'single',
+        withheld: float = 0.0,
+        deductions: Optional[Dict[str, float]] = None,
+        self_employment_income: float = 0.0
+    ) -> Dict[str, Any]:
+        """
+        Tax calculation of one return, shaped like the ``TaxCalculation`` response model.
+
+        Args:
+            income: Income before the deduction of half the self-employment tax
+            tax_year: Tax year (default: the latest with parameters)
+            filing_status: One of ``FILING_STATUSES``
+            withheld: Federal income tax already withheld
+            deductions: Itemized deductions by name; the standard deduction
+                is used when they total less
+            self_employment_income: Part of ``income`` from self-employment
+
+        Returns:
+            Dict with taxable income, total tax, marginal and effective rates,
+            the brackets the income reaches, deductions, self-employment tax,
+            and the estimated refund or payment due
+        """
+        schedule = self.schedule(tax_year or self.latest_year, filing_status)
+        itemized = deductions or {}
+        if sum(itemized.values()) > schedule.standard_deduction:
+            applied = dict(itemized)
+        else:
+            applied = {'standard_deduction': schedule.standard_deduction}
+        self_employment_tax = 0.0
+        if self_employment_income > 0:
+            self_employment_tax = round(float(self.self_employment_tax(self_employment_income, schedule.tax_year)), 2)
+        # Half the self-employment tax is deducted from income (the employer-equivalent part)
+        adjusted_gross_income = income - self_employment_tax / 2.0
+        computed = self.compute(adjusted_gross_income, schedule.tax_year, filing_status, sum(applied.values()))
+        total_tax = round(float(computed['tax']) + self_employment_tax, 2)
+        balance = round(withheld - total_tax, 2)
+        return {
+            'tax_year': schedule.tax_year,
+            'filing_status': filing_status,
+            'taxable_income': round(float(computed['taxable_income']), 2),
+            'effective_tax_rate': round(float(computed['effective_rate']), 4),
+            'marginal_tax_rate': float(computed['marginal_rate']),
+            'tax_brackets': schedule.brackets(float(computed['taxable_income'])),
+            'total_tax': total_tax,
+            'credits': {},
+            'deductions': applied,
+            'self_employment_tax': self_employment_tax if self_employment_income > 0 else None,
+            'estimated_refund': balance if balance > 0 else None,
+            'estimated_payment': -balance if balance < 0 else None
+        }
+
+# Shared engine instance
+tax_engine = None
+
+def get_tax_engine() -> TaxEngine:
+    """Get the shared tax engine, loading the tax parameters on first use."""
+    global tax_engine
+    if tax_engine is None:
+        tax_engine = TaxEngine.from_directory(os.environ.get("TAX_PARAMETERS_DIR", PARAMETERS_DIR))
+    return tax_engine
@@ -0,0 +1,500 @@
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Union
+from bisect import bisect_left, bisect_right
+import logging
+import os
+import numpy as np
+from .analyzers.brokerage_statement import CAPITAL_LOSS_LIMIT, TERMS, tax_efficiency_score
+from .tax_engine import TaxEngine, get_tax_engine
+
+logger = logging.getLogger(__name__)
+
+# Days before and after a sale at a loss in which buying the same security makes it a wash sale
+WASH_SALE_WINDOW_DAYS = 30
+
+# One row per part of a sale matched to one lot; ``buy`` and ``sell`` are trade indexes
+REALIZED_DTYPE = np.dtype([
+    ('security', np.int32),
+    ('quantity', np.float64),
+    ('date_acquired', 'datetime64[D]'),
+    ('date_sold', 'datetime64[D]'),
+    ('proceeds', np.float64),
+    ('cost_basis', np.float64),
+    ('wash_sale_disallowed', np.float64),
+    ('gain', np.float64),
+    ('term', np.int8),
+    ('buy', np.int64),
+    ('sell', np.int64),
+])
+# One row per share lot still held; ``date_acquired`` includes the holding period of washed shares
+OPEN_DTYPE = np.dtype([
+    ('security', np.int32),
+    ('quantity', np.float64),
+    ('date_acquired', 'datetime64[D]'),
+    ('date_bought', 'datetime64[D]'),
+    ('cost_basis', np.float64),
+    ('wash_sale_adjustment', np.float64),
+    ('buy', np.int64),
+])
+TRADE_FIELDS = ('security', 'date', 'side', 'quantity', 'price', 'fees')
+
+_EPSILON = 1e-9
+# Purchases are indexed by security * _KEY_SHIFT + day
+_KEY_SHIFT = 1 << 32
+
+def _terms(acquired: np.ndarray, sold: Union[np.ndarray, np.datetime64]) -> np.ndarray:
+    """``TERMS`` index of each lot: long term when sold after the first anniversary of its acquisition."""
+    months = acquired.astype('datetime64[M]')
+    anniversary = (months + 12).astype('datetime64[D]') + (acquired - months.astype('datetime64[D]'))
+    return np.where(sold > anniversary, 2, 1).astype(np.int8)
+
+def _columns(trades: Union[Mapping[str, Iterable], Iterable[Mapping[str, Any]]]) -> Dict[str, np.ndarray]:
+    """Validated trade columns from a mapping of columns or from trade dicts."""
+    if isinstance(trades, Mapping):
+        columns = {name: trades.get(name) for name in TRADE_FIELDS}
+    else:
+        trades = list(trades)
+        columns = {name: [trade.get(name) for trade in trades] for name in TRADE_FIELDS}
+    missing = [name for name in TRADE_FIELDS[:5] if columns[name] is None]
+    if missing:
+        raise ValueError(f"Trades need {', '.join(missing)}")
+    security = np.asarray(columns['security']).astype(str)
+    side = np.char.lower(np.asarray(columns['side']).astype(str))
+    try:
+        date = np.asarray(columns['date'], dtype='datetime64[D]')
+        quantity = np.asarray(columns['quantity'], dtype=np.float64)
+        price = np.asarray(columns['price'], dtype=np.float64)
+        fees = np.zeros(len(security)) if columns['fees'] is None else np.nan_to_num(np.asarray(columns['fees'], dtype=np.float64))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid trades: {e}")
+    if not len(security) == len(date) == len(side) == len(quantity) == len(price) == len(fees):
+        raise ValueError("Trade columns have different lengths")
+    if np.isnat(date).any():
+        raise ValueError("Every trade needs a date")
+    if not np.isin(side, ('buy', 'sell')).all():
+        raise ValueError("Trade side must be buy or sell")
+    if not (quantity > 0).all() or not (price >= 0).all() or not (fees >= 0).all():
+        raise ValueError("Trade quantities must be positive, and prices and fees not negative")
+    return {'security': security, 'date': date, 'buy': side == 'buy', 'quantity': quantity, 'price': price, 'fees': fees}
+
+def _next(skip: List[int], i: int) -> int:
+    """First purchase at or after ``i`` that may still be a replacement, halving the links on the way."""
+    while skip[i] != i:
+        skip[i] = skip[skip[i]]
+        i = skip[i]
+    return i
+
+def _replace(segments: List[list], shares: float, adjustment: float, acquired: int) -> None:
+    """Turn ``shares`` of a lot's not yet replacing segments into replacement shares, splitting one if needed."""
+    for i, segment in enumerate(segments):
+        if segment[4]:
+            continue
+        if segment[0] > shares + _EPSILON:
+            segment[0] -= shares
+            segments.insert(i, [shares, segment[1], segment[2] + adjustment, acquired, True])
+            return
+        segment[2] += adjustment
+        segment[3] = acquired
+        segment[4] = True
+        shares -= segment[0]
+        if shares <= _EPSILON:
+            return
+
+class _Rows:
+    """Rows appended as tuples and packed into structured array chunks of ``chunk_rows``."""
+    def __init__(self, dtype: np.dtype, chunk_rows: int = 65536):
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+        self._rows: List[tuple] = []
+        self._chunks: List[np.ndarray] = []
+
+    def append(self, row: tuple) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_rows:
+            self._pack()
+
+    def _pack(self) -> None:
+        if self._rows:
+            self._chunks.append(np.array(self._rows, dtype=self.dtype))
+            self._rows = []
+
+    def array(self) -> np.ndarray:
+        self._pack()
+        return np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=self.dtype)
+
+class TaxLotLedger:
+    """
+    Realized (``REALIZED_DTYPE``) and open (``OPEN_DTYPE``) lots of a trade
+    history, with security names stored once, and the purchases indexed by
+    security and date.
+    """
+    def __init__(
+        self,
+        securities: List[str],
+        realized: np.ndarray,
+        open_lots: np.ndarray,
+        buy_keys: np.ndarray,
+        last_date: Optional[np.datetime64],
+        unmatched_quantity: float
+    ):
+        self.securities = securities
+        self.realized = realized
+        self.open_lots = open_lots
+        self.buy_keys = buy_keys
+        self.last_date = last_date
+        self.unmatched_quantity = unmatched_quantity
+
+    @property
+    def totals(self) -> Dict[str, float]:
+        realized, open_lots = self.realized, self.open_lots
+        gains = np.bincount(realized['term'], weights=realized['gain'], minlength=len(TERMS))
+        return {
+            'realized_lots': int(len(realized)),
+            'open_lots': int(len(open_lots)),
+            'proceeds': round(float(realized['proceeds'].sum()), 2),
+            'cost_basis': round(float(realized['cost_basis'].sum()), 2),
+            'wash_sale_disallowed': round(float(realized['wash_sale_disallowed'].sum()), 2),
+            'gain': round(float(realized['gain'].sum()), 2),
+            'short_term_gain': round(float(gains[1]), 2),
+            'long_term_gain': round(float(gains[2]), 2),
+            'open_cost_basis': round(float(open_lots['cost_basis'].sum()), 2),
+            'deferred_loss': round(float(open_lots['wash_sale_adjustment'].sum()), 2)
+        }
+
+    def records(self, lots: np.ndarray) -> List[Dict[str, Any]]:
+        """Lots of ``realized`` or ``open_lots`` as dicts with security names, ISO dates and term names."""
+        records = []
+        for lot in lots.tolist():
+            record = {}
+            for name, value in zip(lots.dtype.names, lot):
+                if name == 'security':
+                    record[name] = self.securities[value]
+                elif name == 'term':
+                    record[name] = TERMS[value]
+                elif name.startswith('date'):
+                    record[name] = value.isoformat()
+                elif name in ('buy', 'sell'):
+                    record[name] = value
+                else:
+                    record[name] = round(value, 6) if name == 'quantity' else round(value, 2)
+            records.append(record)
+        return records
+
+class TaxLotEngine:
+    """
+    Tax lots, wash sales and loss harvesting candidates of a trade history.
+
+    Trades are sorted once by security and date and replayed a security at
+    a time: buys open lots and sells close them first-in first-out. A sale
+    at a loss is a wash sale to the extent the same security was bought
+    within ``window_days`` before or after it. The purchases in that window
+    are found by binary search in the security's sorted purchase dates, and
+    purchases with no shares left to be replacements are skipped through
+    path-compressed links, so n trades cost O(n log n) instead of comparing
+    every sale at a loss with every purchase.
+
+    The disallowed loss is added to the basis of the replacement shares,
+    and the holding period of the sold shares to theirs. Shares are a
+    replacement for one sale only, and the rest of the lot a sale came from
+    is not its replacement. Selling more shares than are held (short sales,
+    or history missing from the trades) is counted in ``unmatched_quantity``.
+    """
+    def __init__(
+        self,
+        window_days: int = WASH_SALE_WINDOW_DAYS,
+        max_lot_details: int = 500,
+        max_opportunities: int = 50,
+        tax_engine: Optional[TaxEngine] = None
+    ):
+        """
+        Args:
+            window_days: Days before and after a sale at a loss that make a purchase its replacement
+            max_lot_details: Open lots returned as ``tax_lot_details``
+            max_opportunities: Loss harvesting candidates returned
+            tax_engine: Tax parameters for the value of harvesting; the shared engine by default
+        """
+        self.window_days = window_days
+        self.max_lot_details = max_lot_details
+        self.max_opportunities = max_opportunities
+        self.tax_engine = tax_engine or get_tax_engine()
+
+    def process(self, trades: Union[Mapping[str, Iterable], Iterable[Mapping[str, Any]]]) -> TaxLotLedger:
+        """
+        Match the sales of a trade history to lots and apply the wash sale rule.
+
+        Args:
+            trades: Trade dicts, or a mapping of columns, with ``security``,
+                ``date``, ``side`` (buy or sell), ``quantity``, ``price`` per
+                share and optional ``fees``; trades of one day are applied
+                in the order given
+
+        Returns:
+            The ledger of realized and open lots
+
+        Raises:
+            ValueError: If a trade is missing a field or has an invalid value
+        """
+        columns = _columns(trades)
+        securities, security = np.unique(columns['security'], return_inverse=True)
+        days = columns['date'].astype(np.int64)
+        is_buy = columns['buy']
+        quantity = columns['quantity']
+        # Cost of a purchase including fees, proceeds of a sale net of them
+        amount = quantity * columns['price'] + np.where(is_buy, columns['fees'], -columns['fees'])
+        order = np.lexsort((np.arange(len(days)), days, security))
+        starts = np.flatnonzero(np.diff(security[order])) + 1
+
+        realized, opened = _Rows(REALIZED_DTYPE), _Rows(OPEN_DTYPE)
+        unmatched = 0.0
+        days_list, is_buy_list, quantity_list, amount_list = days.tolist(), is_buy.tolist(), quantity.tolist(), amount.tolist()
+        for trades_of_security in np.split(order, starts) if len(order) else []:
+            unmatched += self._replay(
+                int(security[trades_of_security[0]]), trades_of_security.tolist(),
+                days_list, is_buy_list, quantity_list, amount_list, realized, opened
+            )
+
+        realized_lots = realized.array()
+        realized_lots['gain'] = realized_lots['proceeds'] - realized_lots['cost_basis'] + realized_lots['wash_sale_disallowed']
+        realized_lots['term'] = _terms(realized_lots['date_acquired'], realized_lots['date_sold'])
+        open_lots = opened.array()
+        buy_keys = np.sort(security[is_buy].astype(np.int64) * _KEY_SHIFT + days[is_buy])
+        if unmatched > _EPSILON:
+            logger.warning(f"Sales of {unmatched:g} shares have no lot to close")
+        return TaxLotLedger(
+            [str(name) for name in securities], realized_lots, open_lots, buy_keys,
+            columns['date'].max() if len(days) else None, round(unmatched, 6)
+        )
+
+    def _replay(
+        self,
+        security: int,
+        trades: List[int],
+        days: List[int],
+        is_buy: List[bool],
+        quantity: List[float],
+        amount: List[float],
+        realized: _Rows,
+        opened: _Rows
+    ) -> float:
+        """
+        Replay the trades of one security in date order, appending its
+        realized and open lots; returns the quantity sold without a lot.
+
+        Every purchase is a lot of segments ``[shares, cost per share,
+        wash sale adjustment per share, acquisition day, replacement]``,
+        split when only some of its shares become replacements.
+        """
+        buys = [t for t in trades if is_buy[t]]
+        buy_days = [days[t] for t in buys]
+        lots = [[[quantity[t], amount[t] / quantity[t], 0.0, days[t], False]] for t in buys]
+        # Shares of each purchase that are not replacements yet, and links past purchases with none
+        eligible = [quantity[t] for t in buys]
+        skip = list(range(len(buys) + 1))
+        arrived = head = 0
+        unmatched = 0.0
+        for t in trades:
+            if is_buy[t]:
+                arrived += 1
+                continue
+            sale_day, per_share, remaining = days[t], amount[t] / quantity[t], quantity[t]
+            pieces = []
+            while remaining > _EPSILON and head < arrived:
+                segments = lots[head]
+                segment = segments[0]
+                shares = min(segment[0], remaining)
+                pieces.append((head, shares, segment[1] + segment[2], segment[3]))
+                if not segment[4]:
+                    eligible[head] -= shares
+                segment[0] -= shares
+                remaining -= shares
+                if segment[0] <= _EPSILON:
+                    segments.pop(0)
+                    if not segments:
+                        head += 1
+            unmatched += max(remaining, 0.0)
+            # Replacements are looked for once the whole sale is matched, so none of its shares are one
+            for lot, shares, basis, acquired in pieces:
+                loss = basis - per_share
+                replaced = 0.0
+                if loss > _EPSILON:
+                    holding = sale_day - acquired
+                    for j in self._replacements(buy_days, eligible, skip, lot, sale_day):
+                        taken = min(shares - replaced, eligible[j])
+                        _replace(lots[j], taken, loss, buy_days[j] - holding)
+                        eligible[j] -= taken
+                        replaced += taken
+                        if shares - replaced <= _EPSILON:
+                            break
+                realized.append((security, shares, acquired, sale_day, shares * per_share, shares * basis, replaced * loss, 0.0, 0, buys[lot], t))
+        for lot, segments in enumerate(lots):
+            for shares, cost, adjustment, acquired, _ in segments:
+                if shares > _EPSILON:
+                    opened.append((security, shares, acquired, buy_days[lot], shares * (cost + adjustment), shares * adjustment, buys[lot]))
+        return unmatched
+
+    def _replacements(self, buy_days: List[int], eligible: List[float], skip: List[int], lot: int, sale_day: int) -> Iterator[int]:
+        """Purchases in the wash sale window of a sale with shares left to be replacements, in date order."""
+        end = bisect_right(buy_days, sale_day + self.window_days)
+        j = _next(skip, bisect_left(buy_days, sale_day - self.window_days))
+        while j < end:
+            if eligible[j] <= _EPSILON:
+                # Shares only stop being eligible, so the purchase is never a candidate again
+                skip[j] = j + 1
+            elif j != lot:
+                yield j
+            j = _next(skip, j + 1)
+
+    def harvest(
+        self,
+        ledger: TaxLotLedger,
+        prices: Mapping[str, float],
+        as_of: Optional[Any] = None,
+        taxable_income: Optional[float] = None,
+        tax_year: Optional[int] = None,
+        filing_status: str = 'single'
+    ) -> List[Dict[str, Any]]:
+        """
+        Open lots worth selling at a loss, best first.
+
+        Lots are ranked by the tax the loss saves at the marginal short or
+        long-term rate of ``taxable_income`` (by the loss without it); lots
+        of a security bought in the ``window_days`` before ``as_of`` come
+        last, since selling them now would be a wash sale.
+
+        Args:
+            ledger: Processed trades
+            prices: Price per share by security; lots without one are skipped
+            as_of: Date of the sale; the last trade date by default
+            taxable_income: Ordinary taxable income for the marginal rates
+            tax_year: Tax year of the rates; the latest available by default
+            filing_status: Filing status of the rates
+
+        Raises:
+            ValueError: If there are no tax parameters for the filing status
+        """
+        lots = ledger.open_lots
+        if not len(lots):
+            return []
+        price = np.array([prices.get(name, np.nan) for name in ledger.securities], dtype=np.float64)[lots['security']]
+        value = lots['quantity'] * price
+        with np.errstate(invalid='ignore'):
+            candidates = np.flatnonzero(lots['cost_basis'] - value > 0.005)
+        if not len(candidates):
+            return []
+        lots, value = lots[candidates], value[candidates]
+        loss = lots['cost_basis'] - value
+        sale = np.datetime64(as_of if as_of is not None else ledger.last_date, 'D')
+        term = _terms(lots['date_acquired'], sale)
+
+        # Other purchases of the same security in the window before the sale
+        keys = lots['security'].astype(np.int64) * _KEY_SHIFT + sale.astype(np.int64)
+        recent = np.searchsorted(ledger.buy_keys, keys, side='right') - np.searchsorted(ledger.buy_keys, keys - self.window_days, side='left')
+        recent -= (lots['date_bought'] >= sale - self.window_days) & (lots['date_bought'] <= sale)
+        at_risk = recent > 0
+
+        savings = None
+        if taxable_income is not None:
+            schedule = self.tax_engine.schedule(self.tax_engine.nearest_year(tax_year), filing_status)
+            rates = np.array([0.0, float(schedule.marginal_rate(taxable_income)), float(schedule.capital_gains_tax(taxable_income, 1.0))])
+            savings = loss * rates[term]
+        order = np.lexsort((-(loss if savings is None else savings), at_risk))[:self.max_opportunities]
+
+        repurchase_after = str(sale + self.window_days + 1)
+        opportunities = []
+        for i in order.tolist():
+            opportunities.append({
+                'security': ledger.securities[lots['security'][i]],
+                'quantity': round(float(lots['quantity'][i]), 6),
+                'date_acquired': str(lots['date_acquired'][i]),
+                'term': TERMS[term[i]],
+                'cost_basis': round(float(lots['cost_basis'][i]), 2),
+                'market_value': round(float(value[i]), 2),
+                'unrealized_loss': round(float(loss[i]), 2),
+                'tax_savings': None if savings is None else round(float(savings[i]), 2),
+                'wash_sale_risk': bool(at_risk[i]),
+                'repurchase_after': repurchase_after
+            })
+        return opportunities
+
+    def wash_sale_analysis(self, ledger: TaxLotLedger) -> Dict[str, Any]:
+        """Wash sales of the history by security, the losses still deferred in open lots, and recommendations."""
+        realized = ledger.realized
+        washed = realized['wash_sale_disallowed'] > 0
+        counts = np.bincount(realized['security'][washed], minlength=len(ledger.securities))
+        disallowed = np.bincount(realized['security'], weights=realized['wash_sale_disallowed'], minlength=len(ledger.securities))
+        totals = ledger.totals
+        by_security = [
+            {'security': ledger.securities[i], 'wash_sales': int(counts[i]), 'disallowed_loss': round(float(disallowed[i]), 2)}
+            for i in np.argsort(-disallowed, kind='stable')[:10].tolist() if counts[i]
+        ]
+        recommendations = []
+        if totals['wash_sale_disallowed'] > 0:
+            recommendations.append(
+                f"Wait {self.window_days + 1} days after selling at a loss before buying the same security again, "
+                "including in other accounts and through dividend reinvestment"
+            )
+        if totals['deferred_loss'] > 0:
+            recommendations.append(
+                f"${totals['deferred_loss']:,.2f} of disallowed losses is in the basis of shares still held "
+                "and is recognized when they are sold"
+            )
+        return {
+            'wash_sales': int(washed.sum()),
+            'disallowed_loss': totals['wash_sale_disallowed'],
+            'deferred_in_open_lots': totals['deferred_loss'],
+            'by_security': by_security,
+            'unmatched_quantity': ledger.unmatched_quantity,
+            'recommendations': recommendations
+        }
+
+    def investment_fields(
+        self,
+        ledger: TaxLotLedger,
+        prices: Optional[Mapping[str, float]] = None,
+        as_of: Optional[Any] = None,
+        taxable_income: Optional[float] = None,
+        tax_year: Optional[int] = None,
+        filing_status: str = 'single',
+        ordinary_dividends: float = 0.0,
+        qualified_dividends: float = 0.0
+    ) -> Dict[str, Any]:
+        """
+        ``InvestmentCalculation`` fields of a processed trade history.
+
+        Open lots without a price count at their cost basis in the current
+        value and have no unrealized gain. Arguments after ``prices`` are
+        those of ``harvest``.
+        """
+        prices = prices or {}
+        totals = ledger.totals
+        lots = ledger.open_lots
+        price = np.array([prices.get(name, np.nan) for name in ledger.securities], dtype=np.float64)[lots['security']]
+        value = lots['quantity'] * price
+        priced = ~np.isnan(value)
+        unrealized = float((value[priced] - lots['cost_basis'][priced]).sum())
+        return {
+            'cost_basis': totals['open_cost_basis'],
+            'current_value': round(float(value[priced].sum() + lots['cost_basis'][~priced].sum()), 2),
+            'realized_gains': totals['gain'],
+            'unrealized_gains': round(unrealized, 2),
+            'qualified_dividends': qualified_dividends,
+            'ordinary_dividends': ordinary_dividends,
+            'tax_efficiency_score': tax_efficiency_score(totals, ordinary_dividends, qualified_dividends),
+            'wash_sale_adjustments': totals['wash_sale_disallowed'],
+            'tax_lot_details': ledger.records(lots[:self.max_lot_details]),
+            'tax_loss_carryforward': round(max(-totals['gain'] - CAPITAL_LOSS_LIMIT, 0.0), 2),
+            'wash_sale_analysis': self.wash_sale_analysis(ledger),
+            'tax_loss_harvesting_opportunities': self.harvest(ledger, prices, as_of, taxable_income, tax_year, filing_status)
+        }
+
+# Shared tax lot engine instance
+tax_lot_engine = None
+
+def get_tax_lot_engine() -> TaxLotEngine:
+    """Get the shared tax lot engine."""
+    global tax_lot_engine
+    if tax_lot_engine is None:
+        tax_lot_engine = TaxLotEngine(
+            max_lot_details=int(os.environ.get("TAX_LOT_MAX_DETAILS", "500")),
+            max_opportunities=int(os.environ.get("TAX_LOT_MAX_OPPORTUNITIES", "50"))
+        )
+    return tax_lot_engine
@@ -0,0 +1,401 @@
+from typing import Any, Dict, Iterator, List, Optional
+from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+DOCUMENT_EXTENSIONS = ('.pdf',) + IMAGE_EXTENSIONS
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+class UploadError(ValueError):
+    """Raised when an upload request is invalid (bad size, part or file type)."""
+
+class UploadNotFoundError(UploadError):
+    """Raised for unknown, expired or already processed uploads."""
+
+class OffsetMismatchError(UploadError):
+    """Raised when a chunk does not start at the part's current offset."""
+    def __init__(self, expected: int, received: int):
+        super().__init__(f"Chunk starts at offset {received}, expected {expected}")
+        self.expected = expected
+        self.received = received
+
+class ChecksumMismatchError(UploadError):
+    """Raised when a chunk's SHA-256 does not match the checksum sent with it."""
+
+class UploadManager:
+    """
+    Resumable chunked uploads stored in per-upload workspaces.
+
+    An upload is created with the size of each of its parts: one part for a
+    PDF or single image, or one part per page image for multi-page phone
+    scans. Chunks are appended at the part's current offset and verified
+    against their SHA-256 before they are written, so a client that lost its
+    connection asks for the offset and continues from there instead of
+    starting over.
+
+    Each workspace holds ``upload.json`` and one data file per part. Offsets
+    are the sizes of the data files, so uploads survive a restart; the
+    running SHA-256 of each part is kept in memory (and rebuilt from disk
+    after a restart) so the finished file never has to be read again to key
+    the OCR store.
+
+    Completed parts are announced to ``iter_parts`` immediately, which lets
+    OCR of the first pages run while later pages are still uploading.
+    """
+    def __init__(
+        self,
+        root_dir: str = "uploads/resumable",
+        max_upload_size: int = 100 * 1024 * 1024,
+        max_chunk_size: int = 8 * 1024 * 1024,
+        max_parts: int = 100,
+        expire_after: int = 24 * 3600
+    ):
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.max_upload_size = max_upload_size
+        self.max_chunk_size = max_chunk_size
+        self.max_parts = max_parts
+        self.expire_after = expire_after
+        self._hashes: Dict[str, Dict[int, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        # Signalled whenever a part completes or an upload is removed
+        self._changed = threading.Condition(self._lock)
+        self.stats = {
+            'created': 0,
+            'chunks': 0,
+            'bytes': 0,
+            'offset_mismatches': 0,
+            'checksum_failures': 0,
+            'finalized': 0,
+            'expired': 0
+        }
+
+    def create(self, filename: str, part_sizes: List[int], doc_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Create an upload workspace.
+
+        Args:
+            filename: Original file name; its extension applies to every part
+            part_sizes: Size in bytes of each part
+            doc_type: Document type to process the upload as
+
+        Returns:
+            Upload status (see ``status``)
+        """
+        suffix = os.path.splitext(filename)[1].lower()
+        if suffix not in DOCUMENT_EXTENSIONS:
+            raise UploadError("Invalid file type")
+        if not part_sizes or len(part_sizes) > self.max_parts:
+            raise UploadError(f"An upload must have between 1 and {self.max_parts} parts")
+        if len(part_sizes) > 1 and suffix not in IMAGE_EXTENSIONS:
+            raise UploadError("Multi-part uploads must consist of page images")
+        if any(size <= 0 for size in part_sizes) or sum(part_sizes) > self.max_upload_size:
+            raise UploadError(f"Upload size must be between 1 byte and {self.max_upload_size} bytes")
+
+        self.cleanup_expired()
+        upload_id = uuid.uuid4().hex
+        workspace = self.root_dir / upload_id
+        workspace.mkdir()
+        meta = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'doc_type': doc_type,
+            'suffix': suffix,
+            'part_sizes': list(part_sizes),
+            'status': 'uploading',
+            'job_id': None,
+            'created_at': time.time()
+        }
+        for part in range(len(part_sizes)):
+            self._part_path(upload_id, part, suffix).touch()
+        self._write_meta(meta)
+        with self._lock:
+            self._hashes[upload_id] = {part: hashlib.sha256() for part in range(len(part_sizes))}
+            self.stats['created'] += 1
+        logger.info(f"Created upload {upload_id} ({filename}, {len(part_sizes)} parts, {sum(part_sizes)} bytes)")
+        return self.status(upload_id)
+
+    def write_chunk(
+        self,
+        upload_id: str,
+        part: int,
+        offset: int,
+        data: bytes,
+        checksum: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Append a chunk to a part.
+
+        Args:
+            upload_id: Upload identifier
+            part: Zero-based part number
+            offset: Offset of the chunk within the part; must equal the part's current offset
+            data: Chunk bytes
+            checksum: Optional hex SHA-256 of ``data``
+
+        Returns:
+            Upload status, with ``part_completed`` set if this chunk finished the part
+        """
+        with self._upload_lock(upload_id):
+            meta = self._read_meta(upload_id)
+            if meta['status'] != 'uploading':
+                raise UploadError("Upload is already finalized")
+            if not 0 <= part < len(meta['part_sizes']):
+                raise UploadError(f"Part {part} does not exist")
+            if len(data) > self.max_chunk_size:
+                raise UploadError(f"Chunks may be at most {self.max_chunk_size} bytes")
+
+            path = self._part_path(upload_id, part, meta['suffix'])
+            current = path.stat().st_size
+            if offset != current:
+                self.stats['offset_mismatches'] += 1
+                raise OffsetMismatchError(current, offset)
+            size = meta['part_sizes'][part]
+            if current + len(data) > size:
+                raise UploadError(f"Chunk exceeds the declared part size of {size} bytes")
+            if checksum is not None and hashlib.sha256(data).hexdigest() != checksum.lower():
+                self.stats['checksum_failures'] += 1
+                raise ChecksumMismatchError("Chunk checksum does not match")
+
+            digest = self._part_hash(upload_id, part, path)
+            with open(path, 'ab') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            digest.update(data)
+            self.stats['chunks'] += 1
+            self.stats['bytes'] += len(data)
+
+            completed = len(data) > 0 and current + len(data) == size
+            if completed:
+                with self._changed:
+                    self._changed.notify_all()
+        status = self.status(upload_id)
+        status['part_completed'] = part if completed else None
+        return status
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        """Offsets of every part of an upload, for clients resuming after a dropped connection."""
+        meta = self._read_meta(upload_id)
+        parts = []
+        for part, size in enumerate(meta['part_sizes']):
+            path = self._part_path(upload_id, part, meta['suffix'])
+            offset = path.stat().st_size if path.exists() else 0
+            parts.append({'part': part, 'size': size, 'offset': offset, 'complete': offset == size})
+        return {
+            'upload_id': upload_id,
+            'filename': meta['filename'],
+            'doc_type': meta['doc_type'],
+            'status': meta['status'],
+            'size': sum(meta['part_sizes']),
+            'offset': sum(p['offset'] for p in parts),
+            'parts': parts,
+            'job_id': meta['job_id'],
+            'expires_at': datetime.fromtimestamp(meta['created_at'] + self.expire_after)
+        }
+
+    def finalize(self, upload_id: str, checksum: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Mark a fully received upload as ready for processing.
+
+        Finalizing again returns the same result, so clients can safely
+        retry when the response was lost.
+
+        Args:
+            upload_id: Upload identifier
+            checksum: Optional hex SHA-256 of the whole file (single-part uploads)
+
+        Returns:
+            Dict with ``paths`` (one per part), ``content_hash`` of a
+            single-part upload and the ``job_id`` already processing it, if any
+        """
+        with self._upload_lock(upload_id):
+            meta = self._read_meta(upload_id)
+            status = self.status(upload_id)
+            missing = [p['part'] for p in status['parts'] if not p['complete']]
+            if missing:
+                raise UploadError(f"Parts {missing} are incomplete")
+
+            paths = [str(self._part_path(upload_id, part, meta['suffix'])) for part in range(len(meta['part_sizes']))]
+            hashes = [self._part_hash(upload_id, part, Path(path)).hexdigest() for part, path in enumerate(paths)]
+            content_hash = hashes[0] if len(hashes) == 1 else None
+            if checksum is not None and (content_hash is None or checksum.lower() != content_hash):
+                self.stats['checksum_failures'] += 1
+                raise ChecksumMismatchError("Upload checksum does not match")
+
+            if meta['status'] == 'uploading':
+                meta['status'] = 'finalized'
+                self._write_meta(meta)
+                self.stats['finalized'] += 1
+        if meta.get('processed'):
+            # A pipelined job already read every part
+            self.remove(upload_id)
+        return {'paths': paths, 'content_hash': content_hash, 'job_id': meta['job_id']}
+
+    def set_job(self, upload_id: str, job_id: str) -> None:
+        """Record the processing job started for an upload."""
+        with self._upload_lock(upload_id):
+            meta = self._read_meta(upload_id)
+            meta['job_id'] = job_id
+            self._write_meta(meta)
+
+    def claim_job(self, upload_id: str, job_id: Optional[str], expected: Optional[str] = None) -> bool:
+        """
+        Record ``job_id`` as the upload's processing job only if its current
+        job is still ``expected``, so concurrent requests start one job.
+
+        Args:
+            upload_id: Upload identifier
+            job_id: Job to record, or None to give up a claim
+            expected: Job the caller saw (None: no job yet)
+
+        Returns:
+            True if the job was recorded, False if another request changed it first
+        """
+        with self._upload_lock(upload_id):
+            meta = self._read_meta(upload_id)
+            if meta['job_id'] != expected:
+                return False
+            meta['job_id'] = job_id
+            self._write_meta(meta)
+            return True
+
+    def release(self, upload_id: str) -> None:
+        """
+        Called when processing of an upload has finished: removes the
+        workspace, or marks it processed if the client has not finalized yet.
+        """
+        try:
+            with self._upload_lock(upload_id):
+                meta = self._read_meta(upload_id)
+                if meta['status'] != 'finalized':
+                    meta['processed'] = True
+                    self._write_meta(meta)
+                    return
+        except UploadNotFoundError:
+            return
+        self.remove(upload_id)
+
+    def iter_parts(self, upload_id: str, timeout: float = 600.0) -> Iterator[str]:
+        """
+        Yield the path of each part, in order, as soon as it has been fully received.
+
+        Args:
+            upload_id: Upload identifier
+            timeout: Seconds to wait for the next part before giving up
+
+        Raises:
+            UploadError: If the next part does not arrive within ``timeout``
+        """
+        meta = self._read_meta(upload_id)
+        for part, size in enumerate(meta['part_sizes']):
+            path = self._part_path(upload_id, part, meta['suffix'])
+            deadline = time.monotonic() + timeout
+            with self._changed:
+                while not (path.exists() and path.stat().st_size == size):
+                    remaining = deadline - time.monotonic()
+                    if not path.parent.exists():
+                        raise UploadNotFoundError("Upload was removed")
+                    if remaining <= 0:
+                        raise UploadError(f"Timed out waiting for part {part}")
+                    self._changed.wait(remaining)
+            yield str(path)
+
+    def remove(self, upload_id: str) -> None:
+        """Delete an upload's workspace."""
+        shutil.rmtree(self.root_dir / upload_id, ignore_errors=True)
+        with self._changed:
+            self._hashes.pop(upload_id, None)
+            self._locks.pop(upload_id, None)
+            self._changed.notify_all()
+
+    def cleanup_expired(self) -> int:
+        """Remove workspaces of uploads older than ``expire_after``; returns the number removed."""
+        cutoff = time.time() - self.expire_after
+        removed = 0
+        for workspace in self.root_dir.iterdir():
+            meta_path = workspace / "upload.json"
+            try:
+                created_at = json.loads(meta_path.read_text())['created_at']
+            except (OSError, ValueError, KeyError):
+                created_at = workspace.stat().st_mtime
+            if created_at < cutoff:
+                self.remove(workspace.name)
+                removed += 1
+        if removed:
+            self.stats['expired'] += removed
+            logger.info(f"Removed {removed} expired uploads")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get upload statistics."""
+        with self._lock:
+            active = len(self._hashes)
+        return {**self.stats, 'active_uploads': active}
+
+    def _upload_lock(self, upload_id: str) -> threading.Lock:
+        if not _UPLOAD_ID.match(upload_id or ""):
+            raise UploadNotFoundError("Upload not found")
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _part_path(self, upload_id: str, part: int, suffix: str) -> Path:
+        return self.root_dir / upload_id / f"part_{part:04d}{suffix}"
+
+    def _part_hash(self, upload_id: str, part: int, path: Path) -> Any:
+        """Running SHA-256 of a part, rebuilt from disk if the service restarted mid-upload."""
+        with self._lock:
+            digest = self._hashes.setdefault(upload_id, {}).get(part)
+        if digest is None:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            with self._lock:
+                self._hashes[upload_id][part] = digest
+        return digest
+
+    def _read_meta(self, upload_id: str) -> Dict[str, Any]:
+        if not _UPLOAD_ID.match(upload_id or ""):
+            raise UploadNotFoundError("Upload not found")
+        try:
+            meta = json.loads((self.root_dir / upload_id / "upload.json").read_text())
+        except (OSError, ValueError):
+            raise UploadNotFoundError("Upload not found")
+        if meta['created_at'] + self.expire_after < time.time():
+            raise UploadNotFoundError("Upload has expired")
+        return meta
+
+    def _write_meta(self, meta: Dict[str, Any]) -> None:
+        path = self.root_dir / meta['upload_id'] / "upload.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, path)
+
+# Shared upload manager instance
+upload_manager = None
+
+def get_upload_manager() -> UploadManager:
+    """Get the shared upload manager instance, creating it on first use."""
+    global upload_manager
+    if upload_manager is None:
+        upload_manager = UploadManager(
+            root_dir=os.environ.get("UPLOAD_WORKSPACE_DIR", "uploads/resumable"),
+            max_upload_size=int(os.environ.get("UPLOAD_MAX_MB", "100")) * 1024 * 1024,
+            max_chunk_size=int(os.environ.get("UPLOAD_MAX_CHUNK_MB", "8")) * 1024 * 1024,
+            expire_after=int(os.environ.get("UPLOAD_EXPIRY_HOURS", "24")) * 3600
+        )
+    return upload_manager
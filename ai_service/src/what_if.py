@@ -0,0 +1,283 @@
+from typing import Any, Dict, List, Optional
+import logging
+import math
+import os
+import time
+import numpy as np
+from .analyzers.w2_analyzer import W2Analyzer
+from .tax_engine import TaxEngine, get_tax_engine
+
+logger = logging.getLogger(__name__)
+
+class WhatIfEngine:
+    """
+    What-if sweeps of a household's federal income tax.
+
+    Every combination of candidate 401(k) deferral levels, HSA contribution
+    levels and the choice between the standard and itemized deductions is one
+    scenario. All scenarios are taxed in a single ``TaxEngine.compute`` call
+    over flat arrays, so a sweep of tens of thousands of scenarios takes about
+    a millisecond. Grids larger than ``max_scenarios`` are made coarser, which
+    bounds the time a sweep takes.
+    """
+    def __init__(self, tax_engine: Optional[TaxEngine] = None, step: float = 250.0, max_scenarios: int = 50000):
+        """
+        Args:
+            tax_engine: Tax engine to use (default: the shared engine)
+            step: Default spacing of candidate contribution levels, in dollars
+            max_scenarios: Largest grid evaluated; the step grows to stay below it
+        """
+        self.tax_engine = tax_engine or get_tax_engine()
+        self.step = step
+        self.max_scenarios = max_scenarios
+
+    def limits(self, tax_year: int, age: Optional[int] = None, hsa_coverage: Optional[str] = None) -> Dict[str, float]:
+        """
+        Elective deferral and HSA contribution limits for a tax year, with the
+        catch-up contributions the age allows.
+
+        Args:
+            tax_year: Tax year with contribution limits
+            age: Age at the end of the tax year, if known
+            hsa_coverage: 'self_only' or 'family' HDHP coverage; None for no HSA
+
+        Raises:
+            ValueError: If the tax year has no contribution limits
+        """
+        limits = self.tax_engine.contribution_limits.get(tax_year)
+        if limits is None:
+            raise ValueError(f"No contribution limits for {tax_year}")
+        deferral = limits['elective_deferral']
+        hsa = 0.0
+        if hsa_coverage is not None:
+            if hsa_coverage not in ('self_only', 'family'):
+                raise ValueError(f"Unknown HSA coverage: {hsa_coverage}")
+            hsa = limits[f'hsa_{hsa_coverage}']
+        if age is not None and age >= limits['elective_deferral_catch_up_age']:
+            deferral += limits['elective_deferral_catch_up']
+        if hsa and age is not None and age >= limits['hsa_catch_up_age']:
+            hsa += limits['hsa_catch_up']
+        return {'elective_deferral': float(deferral), 'hsa': float(hsa)}
+
+    def sweep(
+        self,
+        household: Dict[str, Any],
+        max_contributions: Optional[float] = None,
+        step: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Tax of every candidate adjustment, the savings curve and the optimum.
+
+        Args:
+            household: ``wages`` (W-2 Box 1, which already excludes the current
+                deferrals and payroll HSA contributions), and optionally
+                ``other_income``, ``deferrals`` and ``hsa_contributions``
+                (current amounts), ``itemized_deductions`` (total), ``age``,
+                ``hsa_coverage`` ('self_only' or 'family'), ``tax_year`` (default:
+                the latest with parameters) and ``filing_status``
+            max_contributions: Most the household can contribute in total to
+                the 401(k) and HSA (default: no limit beyond the legal ones)
+            step: Spacing of candidate contribution levels (default: ``self.step``)
+
+        Returns:
+            Dict with the ``baseline`` (current contributions), the ``optimum``
+            (largest savings within ``max_contributions``, with the smallest
+            contributions among ties), the ``savings_curve`` (best savings at
+            each total contribution) and the ``limits`` applied. Savings are
+            federal income tax saved relative to the baseline.
+
+        Raises:
+            ValueError: If the tax year or filing status has no parameters
+        """
+        start = time.perf_counter()
+        tax_year = household.get('tax_year') or self.tax_engine.latest_year
+        filing_status = household.get('filing_status') or 'single'
+        schedule = self.tax_engine.schedule(tax_year, filing_status)
+        limits = self.limits(tax_year, household.get('age'), household.get('hsa_coverage'))
+
+        current_deferrals = float(household.get('deferrals') or 0.0)
+        current_hsa = float(household.get('hsa_contributions') or 0.0)
+        # Contributions come out of pay, so at most all compensation can be contributed
+        compensation = float(household.get('wages') or 0.0) + current_deferrals + current_hsa
+        income = compensation + float(household.get('other_income') or 0.0)
+        itemized = float(household.get('itemized_deductions') or 0.0)
+        deferral_limit = min(limits['elective_deferral'], compensation)
+        hsa_limit = min(limits['hsa'], compensation)
+
+        # Candidate levels: every step up to each limit, and the limit itself
+        step = step or self.step
+        choices = np.array([schedule.standard_deduction] + ([itemized] if itemized > schedule.standard_deduction else []))
+        grid = lambda s: (deferral_limit // s + 2) * (hsa_limit // s + 2) * len(choices)
+        while grid(step) > self.max_scenarios and step <= max(deferral_limit, hsa_limit):
+            step = max(math.ceil(step * math.sqrt(grid(step) / self.max_scenarios)), step + 1)
+        deferrals = np.unique(np.append(np.arange(0.0, deferral_limit, step), deferral_limit))
+        hsa = np.unique(np.append(np.arange(0.0, hsa_limit, step), hsa_limit))
+
+        # One pass over every (deferral, HSA, deduction) scenario, plus the baseline with each deduction
+        shape = (len(deferrals), len(hsa), len(choices))
+        agi = np.broadcast_to(income - deferrals[:, None, None] - hsa[None, :, None], shape)
+        deductions = np.broadcast_to(choices, shape)
+        computed = self.tax_engine.compute(
+            np.concatenate((agi.ravel(), np.full(len(choices), income - current_deferrals - current_hsa))),
+            tax_year, filing_status,
+            np.concatenate((deductions.ravel(), choices))
+        )
+        scenarios = agi.size
+        tax = computed['tax'][:scenarios].reshape(shape)
+        taxable = computed['taxable_income'][:scenarios].reshape(shape)
+        marginal = computed['marginal_rate'][:scenarios].reshape(shape)
+
+        # Filers take the larger deduction
+        choice = np.argmin(tax, axis=2)
+        tax = np.take_along_axis(tax, choice[..., None], axis=2)[..., 0]
+        taxable = np.take_along_axis(taxable, choice[..., None], axis=2)[..., 0]
+        marginal = np.take_along_axis(marginal, choice[..., None], axis=2)[..., 0]
+        baseline_choice = int(np.argmin(computed['tax'][scenarios:]))
+        baseline_tax = float(computed['tax'][scenarios + baseline_choice])
+        savings = baseline_tax - tax
+
+        totals = deferrals[:, None] + hsa[None, :]
+        feasible = totals <= compensation
+        if max_contributions is not None:
+            feasible &= totals <= max_contributions + 1e-9
+        # Largest savings, then the smallest contributions reaching them
+        masked = np.where(feasible, np.round(savings, 2), -np.inf)
+        best = np.flatnonzero(masked.ravel() == masked.max())
+        i, j = np.unravel_index(best[np.argmin(totals.ravel()[best])], totals.shape)
+
+        # Savings curve: the best scenario at each total contribution
+        flat_totals = np.round(totals[feasible], 2)
+        flat_savings = savings[feasible]
+        order = np.lexsort((-flat_savings, flat_totals))
+        first = np.concatenate(([True], np.diff(flat_totals[order]) > 0))
+        points = np.flatnonzero(feasible.ravel())[order[first]]
+        rows, cols = np.unravel_index(points, totals.shape)
+        curve = {
+            'contributions': totals[rows, cols],
+            'deferrals': deferrals[rows],
+            'hsa_contributions': hsa[cols],
+            'tax': np.round(tax[rows, cols], 2),
+            'savings': np.round(savings[rows, cols], 2)
+        }
+        savings_curve = [dict(zip(curve, point)) for point in zip(*(values.tolist() for values in curve.values()))]
+
+        elapsed = (time.perf_counter() - start) * 1000.0
+        logger.debug(f"What-if sweep of {scenarios} scenarios took {elapsed:.2f}ms")
+        return {
+            'tax_year': schedule.tax_year,
+            'filing_status': filing_status,
+            'scenarios': scenarios,
+            'step': float(step),
+            'limits': limits,
+            'baseline': {
+                'deferrals': current_deferrals,
+                'hsa_contributions': current_hsa,
+                'itemize': bool(baseline_choice),
+                'taxable_income': round(float(computed['taxable_income'][scenarios + baseline_choice]), 2),
+                'tax': round(baseline_tax, 2)
+            },
+            'optimum': {
+                'deferrals': float(deferrals[i]),
+                'hsa_contributions': float(hsa[j]),
+                'itemize': bool(choice[i, j]),
+                'taxable_income': round(float(taxable[i, j]), 2),
+                'tax': round(float(tax[i, j]), 2),
+                'savings': round(float(savings[i, j]), 2),
+                'marginal_rate': float(marginal[i, j])
+            },
+            'savings_curve': savings_curve,
+            'elapsed_ms': round(elapsed, 3)
+        }
+
+    def strategies(self, sweep: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        ``TaxOptimizationStrategy`` dicts for the adjustments of a sweep's
+        optimum that save tax.
+        """
+        baseline, optimum, limits = sweep['baseline'], sweep['optimum'], sweep['limits']
+        if optimum['savings'] <= 0:
+            return []
+        year = sweep['tax_year']
+        impact = {
+            'tax_before': baseline['tax'],
+            'tax_after': optimum['tax'],
+            'taxable_income_after': optimum['taxable_income'],
+            'marginal_rate_after': optimum['marginal_rate'],
+            'itemize': optimum['itemize']
+        }
+        # Combined savings are split by each adjustment's share of the added contributions
+        added = {
+            'deferrals': max(optimum['deferrals'] - baseline['deferrals'], 0.0),
+            'hsa_contributions': max(optimum['hsa_contributions'] - baseline['hsa_contributions'], 0.0)
+        }
+        total_added = sum(added.values())
+        strategies = []
+        if added['deferrals'] > 0:
+            strategies.append({
+                'name': "Increase 401(k) Deferrals",
+                'description': f"Raise pre-tax elective deferrals from ${baseline['deferrals']:,.0f} to ${optimum['deferrals']:,.0f} for {year}",
+                'potential_savings': round(optimum['savings'] * added['deferrals'] / total_added, 2),
+                'implementation_steps': [
+                    "Update the contribution election with the plan administrator",
+                    "Spread the increase over the remaining pay periods",
+                    "Confirm the year-end total in Form W-2 Box 12"
+                ],
+                'risk_level': "Low",
+                'time_horizon': "Annual",
+                'documentation_required': ["Plan contribution election", "Form W-2"],
+                'eligibility_criteria': ["Employer plan allowing pre-tax elective deferrals"],
+                'limitations': [f"${limits['elective_deferral']:,.0f} elective deferral limit for {year}, including catch-up contributions"],
+                'tax_forms_affected': ["Form W-2", "Form 1040"],
+                'tax_year_applicability': [year],
+                'tax_impact_analysis': impact
+            })
+        if added['hsa_contributions'] > 0:
+            strategies.append({
+                'name': "Increase HSA Contributions",
+                'description': f"Raise HSA contributions from ${baseline['hsa_contributions']:,.0f} to ${optimum['hsa_contributions']:,.0f} for {year}",
+                'potential_savings': round(optimum['savings'] * added['hsa_contributions'] / total_added, 2),
+                'implementation_steps': [
+                    "Contribute through payroll or directly to the HSA",
+                    "Contribute by the filing deadline to count toward the tax year",
+                    "Report contributions on Form 8889"
+                ],
+                'risk_level': "Low",
+                'time_horizon': "Annual",
+                'documentation_required': ["HSA contribution statements (Form 5498-SA)", "Form W-2"],
+                'eligibility_criteria': ["Covered by a high-deductible health plan"],
+                'limitations': [f"${limits['hsa']:,.0f} HSA limit for {year}, including catch-up contributions"],
+                'tax_forms_affected': ["Form 8889", "Form 1040"],
+                'tax_year_applicability': [year],
+                'tax_impact_analysis': impact
+            })
+        return strategies
+
+def household_from_w2(data: Dict[str, Any], totals: Dict[str, float], tax_year: Optional[int] = None, filing_status: str = 'single') -> Dict[str, Any]:
+    """
+    What-if household of a W-2 analysis: its wages, and its Box 12 deferrals
+    and HSA contributions, in the form's tax year (or the closest year with
+    tax parameters) unless ``tax_year`` is given. HSA scenarios are only swept
+    when the W-2 shows HSA contributions, i.e. HDHP coverage (assumed self-only).
+    """
+    entries = data.get('deferrals') or []
+    hsa = sum(d['amount'] for d in entries if d['code'] in W2Analyzer.HSA_CODES)
+    if tax_year is None:
+        tax_year = get_tax_engine().nearest_year(int(data['tax_year']) if data.get('tax_year') else None)
+    return {
+        'wages': totals.get('total_wages', 0.0),
+        'deferrals': sum(d['amount'] for d in entries if d['code'] in W2Analyzer.RETIREMENT_CODES),
+        'hsa_contributions': hsa,
+        'hsa_coverage': 'self_only' if hsa else None,
+        'tax_year': tax_year,
+        'filing_status': filing_status
+    }
+
+# Shared engine instance
+what_if_engine = None
+
+def get_what_if_engine() -> WhatIfEngine:
+    """Get the shared what-if engine."""
+    global what_if_engine
+    if what_if_engine is None:
+        what_if_engine = WhatIfEngine(max_scenarios=int(os.environ.get("WHAT_IF_MAX_SCENARIOS", "50000")))
+    return what_if_engine
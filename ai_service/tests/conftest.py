@@ -60,4 +60,52 @@ def mock_env_vars(monkeypatch):
     """Set up mock environment variables for testing."""
     monkeypatch.setenv("API_KEY", "test_api_key")
     monkeypatch.setenv("DEBUG", "true")
-    monkeypatch.setenv("LOG_LEVEL", "DEBUG") 
\ No newline at end of file
+    monkeypatch.setenv("LOG_LEVEL", "DEBUG") 
+class FakeOCR:
+    """OCR function returning ``first`` for the first image and ``rest`` for later ones, recording their shapes."""
+    def __init__(self, first, rest=""):
+        self.first = first
+        self.rest = rest
+        self.shapes = []
+
+    def __call__(self, image):
+        self.shapes.append(image.shape)
+        return self.first if len(self.shapes) == 1 else self.rest
+
+class FakeOCRPool:
+    """
+    Stand-in for OCRWorkerPool: ``image_to_page`` returns ``text`` and
+    ``words``, and ``image_to_string`` (header, near-duplicate and barcode
+    checks) returns ``check_text``, by default the same text. Calls are
+    counted and image shapes recorded.
+    """
+    def __init__(self, text="Form W-2 Wage and Tax Statement 2023", words=None, check_text=None):
+        self.text = text
+        self.words = words if words is not None else {'text': [], 'conf': []}
+        self.check_text = text if check_text is None else check_text
+        self.shapes = []
+        self.string_calls = 0
+        self.page_calls = 0
+
+    def image_to_string(self, image):
+        self.string_calls += 1
+        self.shapes.append(image.shape)
+        return self.check_text
+
+    def image_to_page(self, image):
+        self.page_calls += 1
+        self.shapes.append(image.shape)
+        return {'text': self.text, 'words': self.words}
+
+    def detect_orientation(self, image):
+        return {'rotate': 0, 'confidence': 0.0}
+
+@pytest.fixture
+def fake_ocr():
+    """Factory of FakeOCR functions."""
+    return FakeOCR
+
+@pytest.fixture
+def fake_ocr_pool():
+    """Factory of FakeOCRPool instances."""
+    return FakeOCRPool
@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+from PIL import Image
+from ..src.adaptive_ocr import AdaptiveOCR
+from ..src.document_processor import DocumentProcessor
+
+def words(*entries):
+    """Word data from (text, conf, left, top, width, height) tuples."""
+    keys = ['text', 'conf', 'left', 'top', 'width', 'height']
+    return {key: [entry[i] for entry in entries] for i, key in enumerate(keys)}
+
+def crop(text, conf=93.0):
+    """OCR of a full-resolution crop holding one word."""
+    return {'text': text, 'words': words((text, conf, 20, 10, 300, 40))}
+
+PAGE = {
+    'text': "Form W-2 Wage and Tax Statement\nBox 1 5O,OOO.0O\nBox 2 8,000.00",
+    'words': words(
+        ("Form", 95.0, 50, 20, 40, 12), ("W-2", 94.0, 95, 20, 30, 12),
+        ("Wage", 93.0, 130, 20, 40, 12), ("and", 96.0, 175, 20, 25, 12),
+        ("Tax", 95.0, 205, 20, 25, 12), ("Statement", 91.0, 235, 20, 80, 12),
+        ("Box", 90.0, 50, 60, 30, 12), ("1", 88.0, 85, 60, 8, 12),
+        ("5O,OOO.0O", 41.0, 100, 60, 80, 12),
+        ("Box", 92.0, 50, 100, 30, 12), ("2", 90.0, 85, 100, 8, 12),
+        ("8,000.00", 89.0, 100, 100, 70, 12),
+    )
+}
+
+def make_ocr(ocr):
+    return AdaptiveOCR(ocr_func=ocr, preprocess_func=lambda image: image, source_dpi=300, low_dpi=150)
+
+def test_low_confidence_region_is_reread_at_full_resolution(fake_ocr):
+    ocr = fake_ocr(PAGE, crop("50,000.00"))
+    adaptive = make_ocr(ocr)
+    result = adaptive.recognize(np.full((1100, 850), 255, dtype=np.uint8))
+
+    # Page pass at half resolution, then a single full-resolution crop
+    assert ocr.shapes[0] == (550, 425)
+    assert len(ocr.shapes) == 2
+    crop_height, crop_width = ocr.shapes[1]
+    assert crop_width < 850 and crop_height < 100
+
+    assert result['text'] == "Form W-2 Wage and Tax Statement\nBox 1 50,000.00\nBox 2 8,000.00"
+    assert result['reocr'] == {'regions': 1, 'improved': 1}
+    idx = result['words']['text'].index("50,000.00")
+    assert result['words']['conf'][idx] == 93.0
+    # Boxes of both passes are in full-resolution page coordinates
+    assert result['words']['left'][0] == 100
+    assert result['words']['top'][idx] > 100
+    assert result['confidence'] == pytest.approx(np.mean(result['words']['conf']) / 100.0)
+
+    stats = adaptive.get_stats()
+    assert stats['reocr_rate'] == 1.0
+    assert stats['improved_regions'] == 1
+    assert stats['low_confidence_words'] == 1
+
+def test_worse_reocr_keeps_first_pass(fake_ocr):
+    ocr = fake_ocr(PAGE, crop("SO,OOO", conf=30.0))
+    result = make_ocr(ocr).recognize(np.full((1100, 850), 255, dtype=np.uint8))
+    assert "5O,OOO.0O" in result['text']
+    assert result['reocr'] == {'regions': 1, 'improved': 0}
+
+def test_confident_pages_are_not_reread(fake_ocr):
+    confident = {'text': "Box 2 8,000.00", 'words': words(("Box", 92.0, 50, 100, 30, 12), ("8,000.00", 89.0, 100, 100, 70, 12))}
+    ocr = fake_ocr(confident)
+    adaptive = make_ocr(ocr)
+    adaptive.recognize(np.full((1100, 850), 255, dtype=np.uint8))
+    assert len(ocr.shapes) == 1
+    assert adaptive.get_stats()['reocr_rate'] == 0.0
+
+def test_adjacent_low_confidence_words_form_one_region(fake_ocr):
+    adaptive = make_ocr(fake_ocr(PAGE))
+    regions = adaptive._low_confidence_regions(words(
+        ("$", 30.0, 100, 60, 10, 24), ("52,OOO", 40.0, 120, 60, 80, 24), ("State", 50.0, 100, 300, 50, 24)
+    ))
+    assert sorted(regions) == [(100, 60, 200, 84), (100, 300, 150, 324)]
+
+def test_reread_replaces_its_own_words_not_an_equal_amount_elsewhere(fake_ocr):
+    page = {
+        'text': "Box 1 8,000.00\nBox 2 8,000.00",
+        'words': words(
+            ("Box", 92.0, 50, 20, 30, 12), ("1", 90.0, 85, 20, 8, 12), ("8,000.00", 91.0, 100, 20, 70, 12),
+            ("Box", 92.0, 50, 60, 30, 12), ("2", 90.0, 85, 60, 8, 12), ("8,000.00", 35.0, 100, 60, 70, 12),
+        )
+    }
+    result = make_ocr(fake_ocr(page, crop("8,600.00"))).recognize(np.full((1100, 850), 255, dtype=np.uint8))
+    assert result['text'] == "Box 1 8,000.00\nBox 2 8,600.00"
+    assert result['words']['text'] == ["Box", "1", "8,000.00", "Box", "2", "8,600.00"]
+
+def test_text_is_rebuilt_from_boxes_when_it_does_not_match_the_words(fake_ocr):
+    page = {**PAGE, 'text': "unrelated"}
+    result = make_ocr(fake_ocr(page, crop("50,000.00"))).recognize(np.full((1100, 850), 255, dtype=np.uint8))
+    assert result['text'] == "Form W-2 Wage and Tax Statement\nBox 1 50,000.00\nBox 2 8,000.00"
+
+def test_first_pass_uses_the_page_resolution(fake_ocr):
+    # A 150 DPI scan is already at the low resolution: one pass, nothing re-read
+    ocr = fake_ocr(PAGE, crop("50,000.00"))
+    result = make_ocr(ocr).recognize(np.full((550, 425), 255, dtype=np.uint8), dpi=150)
+    assert ocr.shapes == [(550, 425)]
+    assert result['reocr'] == {'regions': 0, 'improved': 0}
+
+    ocr = fake_ocr(PAGE, crop("50,000.00"))
+    make_ocr(ocr).recognize(np.full((2200, 1700), 255, dtype=np.uint8), dpi=600)
+    assert ocr.shapes[0] == (550, 425)
+
+def w2_pool(fake_ocr_pool):
+    return fake_ocr_pool(
+        "Form W-2 2023", words(("Form", 96.0, 10, 10, 40, 12), ("W-2", 84.0, 60, 10, 30, 12)),
+        check_text="Form W-2 Wage and Tax Statement 2023"
+    )
+
+def test_process_document_reports_confidence(tmp_path, fake_ocr_pool):
+    path = tmp_path / "scan.png"
+    Image.new("L", (850, 1100), 255).save(path)
+
+    processor = DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=w2_pool(fake_ocr_pool))
+    result = processor.process_document(str(path), 'w2')
+
+    assert result['confidence'] == pytest.approx(0.9)
+    assert result['results'][0]['reocr'] == {'regions': 0, 'improved': 0}
+    assert processor.get_stats()['adaptive_ocr']['pages'] == 1
+
+def test_process_document_passes_the_scan_resolution(tmp_path, fake_ocr_pool):
+    path = tmp_path / "scan.png"
+    Image.new("L", (1275, 1650), 255).save(path, dpi=(150, 150))
+    pool = w2_pool(fake_ocr_pool)
+    processor = DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=pool)
+    processor.process_document(str(path), 'w2')
+    # Read once at its own 150 DPI, not halved again
+    assert len(pool.shapes) == 1
+    height, width = pool.shapes[0]
+    assert height > 1600 and width > 1250
+
+def test_page_callback_receives_each_page(tmp_path, fake_ocr_pool):
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(b"%PDF-1.4")
+
+    processor = DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=w2_pool(fake_ocr_pool))
+    pages = [np.full((1100, 850), 255, dtype=np.uint8) for _ in range(2)]
+    processor._load_pages = lambda file_path: (len(pages), iter(pages))
+    seen = []
+    result = processor.process_document(str(path), 'w2', page_callback=seen.append)
+    assert [page['page'] for page in seen] == [1, 2]
+    assert seen == result['results']
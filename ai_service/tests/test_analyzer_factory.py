@@ -0,0 +1,104 @@
+import sys
+import threading
+import pytest
+from ..src.analyzers import analyzer_factory
+from ..src.analyzers.analyzer_factory import AnalyzerFactory
+from ..src.analyzers.w2_analyzer import W2Analyzer
+
+PLUGIN = '''
+class Form1099RAnalyzer:
+    instances = 0
+
+    def __init__(self):
+        Form1099RAnalyzer.instances += 1
+
+    def analyze(self, text, image=None):
+        return {'success': True, 'form_type': '1099-R'}
+'''
+
+class FakeEntryPoint:
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+@pytest.fixture(autouse=True)
+def registry():
+    saved = (dict(AnalyzerFactory._analyzers), dict(AnalyzerFactory._by_type),
+             dict(AnalyzerFactory._instances), AnalyzerFactory._entry_points_loaded)
+    yield
+    AnalyzerFactory._analyzers, AnalyzerFactory._by_type, AnalyzerFactory._instances, \
+        AnalyzerFactory._entry_points_loaded = saved
+
+@pytest.fixture
+def plugin_module(tmp_path, monkeypatch):
+    (tmp_path / "acme_1099r.py").write_text(PLUGIN)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield "acme_1099r"
+    sys.modules.pop("acme_1099r", None)
+
+def test_analyzers_are_shared_instances():
+    analyzer = AnalyzerFactory.get_analyzer('w2')
+    assert isinstance(analyzer, W2Analyzer)
+    assert AnalyzerFactory.get_analyzer('W2') is analyzer
+    assert AnalyzerFactory().get_analyzer('w2') is analyzer
+
+    # Aliases of the same class share one instance
+    AnalyzerFactory.register_analyzer('w-2', W2Analyzer)
+    assert AnalyzerFactory.get_analyzer('w-2') is analyzer
+
+    with pytest.raises(TypeError):
+        analyzer.box12_codes['ZZ'] = 'Made up'
+
+def test_references_are_imported_on_first_use(plugin_module):
+    AnalyzerFactory.register_analyzer('1099-r', f"{plugin_module}:Form1099RAnalyzer")
+    assert '1099-r' in AnalyzerFactory.get_supported_types()
+    assert plugin_module not in sys.modules
+
+    analyzer = AnalyzerFactory.get_analyzer('1099-r')
+    assert plugin_module in sys.modules
+    assert analyzer.analyze("")['form_type'] == '1099-R'
+    assert AnalyzerFactory.get_analyzer('1099-r') is analyzer
+
+    # Registering a type again replaces its analyzer
+    AnalyzerFactory.register_analyzer('1099-r', W2Analyzer)
+    assert isinstance(AnalyzerFactory.get_analyzer('1099-r'), W2Analyzer)
+
+def test_entry_points_are_discovered(plugin_module, monkeypatch):
+    discovered = [
+        FakeEntryPoint('1099-R', f"{plugin_module}:Form1099RAnalyzer"),
+        FakeEntryPoint('w2', f"{plugin_module}:Form1099RAnalyzer"),
+        FakeEntryPoint('broken', "not a reference"),
+    ]
+    monkeypatch.setattr("importlib.metadata.entry_points", lambda group: discovered if group == analyzer_factory.ENTRY_POINT_GROUP else [])
+    AnalyzerFactory._entry_points_loaded = False
+
+    supported = AnalyzerFactory.get_supported_types()
+    assert '1099-r' in supported and 'broken' not in supported
+    assert plugin_module not in sys.modules
+    assert AnalyzerFactory.get_analyzer('1099-R').analyze("")['form_type'] == '1099-R'
+    # Built-in analyzers are not replaced by entry points
+    assert isinstance(AnalyzerFactory.get_analyzer('w2'), W2Analyzer)
+
+@pytest.mark.parametrize("analyzer_class", ["not_a_class", "module:", W2Analyzer()])
+def test_rejects_invalid_analyzers(analyzer_class):
+    with pytest.raises(TypeError):
+        AnalyzerFactory.register_analyzer('test', analyzer_class)
+    with pytest.raises(ValueError):
+        AnalyzerFactory.get_analyzer('test')
+
+def test_concurrent_first_use_creates_one_instance(plugin_module):
+    AnalyzerFactory.register_analyzer('1099-r', f"{plugin_module}:Form1099RAnalyzer")
+    barrier = threading.Barrier(8)
+    analyzers = []
+
+    def worker():
+        barrier.wait()
+        analyzers.append(AnalyzerFactory.get_analyzer('1099-r'))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(a) for a in analyzers}) == 1
+    assert sys.modules[plugin_module].Form1099RAnalyzer.instances == 1
@@ -1,7 +1,19 @@
+import hashlib
+import io
+import json
+import time
+import zipfile
 import pytest
 from fastapi.testclient import TestClient
 from pathlib import Path
+from PIL import Image
+from ..src import app as app_module
 from ..src.app import app
+from ..src.batch_processor import BatchProcessor
+from ..src.blob_store import BlobStore, FilesystemBackend
+from ..src.document_processor import DocumentProcessor
+from ..src.job_queue import JobQueue
+from ..src.upload_manager import UploadManager
 
 client = TestClient(app)
 
@@ -168,4 +180,131 @@ def test_process_multiple_documents(sample_w2_file, sample_1099_file):
     
     form1099_data = form1099_analysis["data"]
     assert form1099_data["payer_name"] == "XYZ Consulting"
-    assert form1099_data["nonemployee_compensation"] == "25,000.00" 
\ No newline at end of file
+    assert form1099_data["nonemployee_compensation"] == "25,000.00" 
+def png_bytes():
+    buf = io.BytesIO()
+    Image.new("L", (850, 1100), 255).save(buf, format="PNG")
+    return buf.getvalue()
+
+@pytest.fixture
+def service(tmp_path, monkeypatch, fake_ocr_pool):
+    """The app's stores, queue and processors, on temporary directories and a fake OCR pool."""
+    processor = DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=fake_ocr_pool())
+    blob_store = BlobStore(FilesystemBackend(str(tmp_path / "blobs")), index_path=str(tmp_path / "blobs.sqlite3"))
+    job_queue = JobQueue(max_workers=1, max_queue_depth=5)
+    job_queue.add_removal_listener(app_module._release_job_blobs)
+    monkeypatch.setattr(app_module, "document_processor", processor)
+    monkeypatch.setattr(app_module, "blob_store", blob_store)
+    monkeypatch.setattr(app_module, "job_queue", job_queue)
+    monkeypatch.setattr(app_module, "batch_processor", BatchProcessor(processor))
+    monkeypatch.setattr(app_module, "upload_manager", UploadManager(root_dir=str(tmp_path / "uploads")))
+    yield app_module
+    job_queue.shutdown()
+    blob_store.close()
+
+def wait_for_job(job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(f"/process/status/{job_id}").json()
+        if status["status"] in ("completed", "failed") or time.monotonic() > deadline:
+            return status
+        time.sleep(0.02)
+
+def test_async_job_round_trip(service):
+    response = client.post("/process?async=true&doc_type=w2", files={"file": ("w2.png", png_bytes(), "image/png")})
+    assert response.status_code == 202
+    submitted = response.json()
+    assert submitted["status_url"] == f"/process/status/{submitted['job_id']}"
+    assert submitted["blob_hash"] == hashlib.sha256(png_bytes()).hexdigest()
+
+    status = wait_for_job(submitted["job_id"])
+    assert status["status"] == "completed"
+    assert status["metadata"]["filename"] == "w2.png"
+    assert status["progress"]["percent"] == 100.0
+    assert client.get("/process/queue").json()["completed"] == 1
+
+    missing = client.get("/process/status/missing")
+    assert missing.status_code == 404
+    assert missing.json()["detail"]["code"] == "JOB_NOT_FOUND"
+
+def test_page_result_streams(service):
+    response = client.post("/process?stream=true&doc_type=w2", files={"file": ("w2.png", png_bytes(), "image/png")})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["type"] for line in lines] == ["page", "complete"]
+    assert lines[0]["page"] == 1
+    assert lines[1]["success"] is True
+
+    # The finished job's events are replayed as Server-Sent Events
+    events = client.get(f"/process/{lines[1]['job_id']}/events")
+    assert events.headers["content-type"].startswith("text/event-stream")
+    assert "id: 1\nevent: page\n" in events.text
+    assert "event: complete\n" in events.text
+    # Reconnecting after the last page only gets the completion
+    resumed = client.get(f"/process/{lines[1]['job_id']}/events", headers={"Last-Event-ID": "1"})
+    assert "event: page" not in resumed.text and "event: complete" in resumed.text
+
+def test_batch(service):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("client/w2.png", png_bytes())
+    response = client.post(
+        "/process/batch?doc_type=w2",
+        files=[("files", ("scan.png", png_bytes(), "image/png")), ("files", ("client.zip", archive.getvalue(), "application/zip"))]
+    )
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["filename"] for line in lines[:-1]) == ["scan.png", "w2.png"]
+    assert lines[-1]["type"] == "summary"
+    assert lines[-1]["succeeded"] == 2
+
+    empty = client.post("/process/batch", files=[("files", ("notes.txt", b"notes", "text/plain"))])
+    assert empty.status_code == 400
+    assert empty.json()["detail"]["code"] == "INVALID_BATCH"
+
+    service.batch_processor.max_batch_bytes = len(png_bytes())
+    too_large = client.post("/process/batch", files=[("files", (f"{i}.png", png_bytes(), "image/png")) for i in range(2)])
+    assert too_large.status_code == 413
+    assert too_large.json()["detail"]["code"] == "BATCH_TOO_LARGE"
+
+def test_resumable_upload(service):
+    content = png_bytes()
+    created = client.post("/uploads", json={"filename": "w2.png", "size": len(content), "doc_type": "w2"})
+    assert created.status_code == 201
+    upload_id = created.json()["upload_id"]
+
+    half = len(content) // 2
+    client.patch(f"/uploads/{upload_id}", content=content[:half], headers={"Upload-Offset": "0"})
+    # A chunk sent from the wrong offset is refused with the offset to resume from
+    retry = client.patch(f"/uploads/{upload_id}", content=content[half:], headers={"Upload-Offset": "0"})
+    assert retry.status_code == 409
+    assert retry.headers["Upload-Offset"] == str(half)
+    assert client.get(f"/uploads/{upload_id}").json()["offset"] == half
+    client.patch(f"/uploads/{upload_id}", content=content[half:], headers={"Upload-Offset": str(half)})
+
+    response = client.post(f"/uploads/{upload_id}/finalize", params={"checksum": hashlib.sha256(content).hexdigest()})
+    assert response.status_code == 202
+    submitted = response.json()
+    assert wait_for_job(submitted["job_id"])["status"] == "completed"
+    assert submitted["blob_hash"] == hashlib.sha256(content).hexdigest()
+
+def test_blobs(service):
+    content = png_bytes()
+    stored = client.post("/blobs", files={"file": ("w2.png", content, "image/png")})
+    assert stored.status_code == 201
+    blob = stored.json()
+    assert blob["hash"] == hashlib.sha256(content).hexdigest()
+
+    downloaded = client.get(f"/blobs/{blob['hash']}", headers={"Blob-Ref": blob["ref"]})
+    assert downloaded.content == content
+    assert downloaded.headers["ETag"] == f'"{blob["hash"]}"'
+    # The hash alone does not give access
+    assert client.get(f"/blobs/{blob['hash']}", headers={"Blob-Ref": "guessed"}).status_code == 404
+
+    processed = client.post("/process", params={"blob_hash": blob["hash"], "blob_ref": blob["ref"], "doc_type": "w2"})
+    assert processed.status_code == 200
+    assert processed.json()["blob_hash"] == blob["hash"]
+
+    released = client.delete(f"/blobs/{blob['hash']}", headers={"Blob-Ref": blob["ref"]})
+    assert released.json() == {"hash": blob["hash"], "refs": 0, "deleted": True}
+    assert client.get(f"/blobs/{blob['hash']}", headers={"Blob-Ref": blob["ref"]}).status_code == 404
@@ -0,0 +1,139 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+from ..src.barcode_reader import W2BarcodeReader, W2_BARCODE_FIELDS, fields_to_text
+from ..src.analyzers.w2_analyzer import W2Analyzer
+from ..src.document_processor import DocumentProcessor
+from ..src.ocr_store import OCRStore
+
+FIELDS = {
+    'employee_ssn': '123-45-6789',
+    'employer_ein': '12-3456789',
+    'employer_name': 'ACME Corporation',
+    'employee_name': 'Jane Doe',
+    'wages': '52000.00',
+    'federal_tax': '6100.50',
+    'social_security_wages': '52000.00',
+    'social_security_tax': '3224.00',
+    'medicare_wages': '52000.00',
+    'medicare_tax': '754.00',
+    'state': 'CA',
+    'state_wages': '52000.00',
+    'state_tax': '2100.00'
+}
+
+def make_payload(fields=FIELDS, deferrals=(('D', '4500.00'),), year="2023", delimiter="|"):
+    values = ["W2", "1", year] + [fields.get(name, "") for name in W2_BARCODE_FIELDS]
+    for code, amount in deferrals:
+        values += [code, amount]
+    return delimiter.join(values)
+
+def test_payload_maps_to_analyzer_fields():
+    reader = W2BarcodeReader(decode_func=lambda gray: [])
+    result = reader.parse_payload(make_payload())
+
+    assert result['tax_year'] == 2023
+    assert result['fields']['wages'] == '52000.00'
+    assert 'employer_address' not in result['fields']
+    assert result['fields']['deferrals'] == [{
+        'code': 'D',
+        'description': 'Elective deferrals under a section 401(k) plan',
+        'amount': 4500.0
+    }]
+
+    # The rendered text parses back to the same fields through the OCR path
+    analyzer = W2Analyzer()
+    from_text = analyzer.analyze(result['text'])
+    from_fields = analyzer.analyze_fields(result['fields'])
+    assert from_text['data'] == from_fields['data']
+    assert from_fields['validation']['is_valid'] is True
+    assert from_fields['totals']['total_deferrals'] == 4500.0
+
+def test_payload_delimiter_follows_header():
+    reader = W2BarcodeReader(decode_func=lambda gray: [])
+    assert reader.parse_payload(make_payload(delimiter="\n"))['fields']['employee_name'] == 'Jane Doe'
+
+@pytest.mark.parametrize("payload", [
+    make_payload(fields={**FIELDS, 'employee_ssn': '123-45-678'}),
+    make_payload(fields={**FIELDS, 'wages': '52,OOO.00'}),
+    make_payload() + "|W",
+    make_payload(year="23"),
+    "W2|1|2023|123-45-6789",
+])
+def test_malformed_payloads_are_rejected(payload):
+    reader = W2BarcodeReader(decode_func=lambda gray: [])
+    assert reader.parse_payload(payload) is None
+    assert reader.stats['rejected'] == 1
+
+def test_unrelated_barcodes_are_ignored():
+    reader = W2BarcodeReader(decode_func=lambda gray: [{'text': "INVOICE 42", 'valid': True}])
+    assert reader.read(np.zeros((10, 10), dtype=np.uint8)) is None
+    corrupt = W2BarcodeReader(decode_func=lambda gray: [{'text': make_payload(), 'valid': False}])
+    assert corrupt.read(np.zeros((10, 10), dtype=np.uint8)) is None
+
+def barcode_page():
+    zxingcpp = pytest.importorskip("zxingcpp")
+    barcode = zxingcpp.create_barcode(make_payload(), zxingcpp.BarcodeFormat.PDF417)
+    symbol = np.array(zxingcpp.write_barcode_to_image(barcode, scale=3))
+    page = np.full((1650, 1275), 255, dtype=np.uint8)
+    for row, line in enumerate(["Form W-2 Wage and Tax Statement 2023", "a Employee's social security number"] * 6):
+        cv2.putText(page, line, (100, 120 + row * 80), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2)
+    page[1200:1200 + symbol.shape[0], 100:100 + symbol.shape[1]] = symbol
+    return page
+
+def test_decodes_pdf417_on_page():
+    reader = W2BarcodeReader()
+    result = reader.read(barcode_page())
+    assert result['fields']['employer_ein'] == '12-3456789'
+    assert result['decode_ms'] > 0
+    assert reader.get_stats()['decode_rate'] == 1.0
+
+def test_processor_skips_ocr_when_barcode_decodes(tmp_path, fake_ocr_pool):
+    path = tmp_path / "w2.png"
+    Image.fromarray(barcode_page()).save(path)
+
+    pool = fake_ocr_pool()
+    processor = DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=pool)
+    result = processor.process_document(str(path))
+
+    assert result['success'] is True
+    assert pool.string_calls + pool.page_calls == 0
+    assert result['doc_type'] == 'w2'
+    assert result['classification']['stage'] == 'barcode'
+    assert result['classification']['year'] == 2023
+    data = result['results'][0]['data']
+    assert data['source'] == 'barcode'
+    assert data['extracted_data']['federal_tax'] == '6100.50'
+    assert 'ocr_ms' not in result['timings'][0]
+    assert result['timings'][0]['barcode_ms'] > 0
+
+    # Without a barcode the page is OCR'd as before
+    blank = tmp_path / "blank.png"
+    Image.new("L", (1275, 1650), 255).save(blank)
+    result = processor.process_document(str(blank), 'w2')
+    assert pool.string_calls + pool.page_calls == 1
+    assert 'source' not in result['results'][0]['data']
+    assert 'ocr_ms' in result['timings'][0]
+
+def test_stored_barcode_pages_are_not_reused_without_barcode_reading(tmp_path, fake_ocr_pool):
+    path = tmp_path / "w2.png"
+    Image.fromarray(barcode_page()).save(path)
+
+    pool = fake_ocr_pool("Form 1099-NEC 2023")
+    processor = DocumentProcessor(
+        temp_dir=str(tmp_path / "temp"), ocr_pool=pool,
+        ocr_store=OCRStore(str(tmp_path / "ocr.sqlite3"))
+    )
+    assert processor.process_document(str(path))['results'][0]['data']['source'] == 'barcode'
+    assert processor.process_document(str(path), 'w2')['results'][0]['data']['source'] == 'barcode'
+    assert pool.page_calls == 0
+
+    # Barcodes are not read for 1099s, so the page is OCR'd rather than served from the stored barcode
+    result = processor.process_document(str(path), '1099')
+    assert pool.page_calls == 1
+    assert 'source' not in result['results'][0]['data']
+
+def test_fields_to_text_orders_box_12_after_box_11():
+    text = fields_to_text({'wages': '1.00', 'nonqualified_plans': '2.00', 'deferrals': [{'code': 'W', 'amount': 3.0}]})
+    assert text.splitlines()[1:] == ["Box 1 1.00", "Box 11 2.00", "Box 12 W 3.00"]
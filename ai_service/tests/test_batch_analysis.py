@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+from ..src.analyzers.analyzer_factory import AnalyzerFactory
+from ..src.batch_analysis import BatchAnalysis
+from ..src.parsed_document import ParsedDocument
+from ..src.tax_analyzer import TaxAnalyzer
+
+W2_TEXT = """Form W-2 Wage and Tax Statement 2023
+Employer's name ACME Corp
+EIN: 12-3456789
+SSN: 123-45-6789
+Box 1 $50,000.00
+Box 2 $8,000.00
+Box 3 $52,000.00
+Box 12a D $5,000.00
+"""
+W2_NO_BOX12 = "Form W-2\nEIN: 98-7654321\nBox 1 $11,000.50\nBox 2 $1,000.00\n"
+NEC_TEXT = """Form 1099-NEC
+Payer's name Initech
+Payer's TIN 98-7654321
+Recipient's TIN 123-45-6789
+Box 1 $10,000.00
+Box 4 $4,000.00
+State: TX
+State income $10,000.00
+"""
+INT_TEXT = "Form 1099-INT\nPayer's TIN 98-7654321\n"
+
+class LetterAnalyzer:
+    def analyze(self, text, image=None):
+        return {
+            'success': True,
+            'data': {'words': len(text.split())},
+            'validation': {'is_valid': True, 'errors': [], 'warnings': []},
+            'totals': {'total_income': 1.5},
+            'insights': {}
+        }
+
+@pytest.fixture
+def registry():
+    saved = (dict(AnalyzerFactory._analyzers), dict(AnalyzerFactory._by_type))
+    yield
+    AnalyzerFactory._analyzers, AnalyzerFactory._by_type = saved
+
+def test_batch_matches_single_documents():
+    doc_types = ['w2', '1099', 'W2', '1099', 'w2', '1040']
+    texts = [W2_TEXT, NEC_TEXT, W2_NO_BOX12, INT_TEXT, ParsedDocument([W2_TEXT]), "Form 1040"]
+    analyzer = TaxAnalyzer(batch_workers=1)
+    batch = analyzer.analyze_batch(doc_types, texts)
+
+    assert len(batch) == 6
+    assert list(batch['doc_type']) == ['w2', '1099', 'w2', '1099', 'w2', '1040']
+    assert list(batch['success']) == [True] * 5 + [False]
+    assert batch['error'][5] == 'Unsupported document type: 1040'
+
+    for i, (doc_type, text) in enumerate(zip(doc_types[:5], texts[:5])):
+        single = analyzer.analyze_document(doc_type, text)
+        row = batch.row(i)
+        for field, value in single['data'].items():
+            assert row['form_type' if field == 'form_type' else f'data.{field}'] == value
+        for name, value in single['totals'].items():
+            assert row[f'totals.{name}'] == pytest.approx(value)
+        assert row['validation.is_valid'] == single['validation']['is_valid']
+
+    # W-2: Box 12 and bracket insights; brackets apply to wages less the standard deduction
+    assert list(batch['insights.tax_bracket'][[0, 2]]) == ['12%', '10%']
+    assert batch['data.tax_year'][0] == '2023' and batch['data.tax_year'][2] is None
+    assert list(batch['insights.recommend_hsa'][[0, 2]]) == [True, False]
+    assert not batch['insights.recommend_retirement'][0]
+    assert batch['validation.social_security_wages_exceed_wages'][0]
+    assert batch['validation.missing_employee_ssn'][2] and not batch['validation.is_valid'][2]
+    # 1099: withholding above the top rate, state tax and self-employment tax
+    assert batch['validation.federal_tax_withheld_unusually_high'][1]
+    assert batch['insights.state_tax'][1]
+    assert batch['insights.self_employment_tax'][1] == pytest.approx(10000 * 0.9235 * 0.153)
+    assert batch['form_type'][3] == '1099-INT'
+    assert batch['validation.missing_recipient_tin'][3]
+    assert not batch['validation.missing_nonemployee_compensation'][3]
+    # Columns of other document types are missing, not zero
+    assert np.isnan(batch['totals.total_wages'][1]) and batch['data.payer_tin'][0] is None
+
+def test_analyzers_without_batch_support(registry):
+    AnalyzerFactory.register_analyzer('letter', LetterAnalyzer)
+    batch = TaxAnalyzer(batch_workers=1).analyze_batch(['letter', 'w2', 'letter'], ["a b c", W2_TEXT, "d"])
+    assert list(batch['data.words'][[0, 2]]) == [3.0, 1.0]
+    assert list(batch['totals.total_income']) == [1.5, pytest.approx(np.nan, nan_ok=True), 1.5]
+    assert batch['validation.errors'][0] == []
+    assert batch.row(1)['data.wages'] == '50,000.00'
+
+def test_worker_processes_give_the_same_columns():
+    doc_types = ['w2', '1099', 'w2', '1040'] * 5
+    texts = [W2_TEXT, NEC_TEXT, ParsedDocument([W2_NO_BOX12]), ""] * 5
+    serial = TaxAnalyzer(batch_workers=1).analyze_batch(doc_types, texts)
+    analyzer = TaxAnalyzer(batch_workers=2, parallel_min_documents=10)
+    parallel = analyzer.analyze_batch(doc_types, texts)
+    # Workers are spawned, not forked from a process running threads, and kept for the next batch
+    pool = analyzer._executor
+    assert pool._mp_context.get_start_method() == 'spawn'
+    assert len(analyzer.analyze_batch(doc_types, texts)) == len(texts)
+    assert analyzer._executor is pool
+    analyzer.shutdown()
+    assert analyzer._executor is None
+    assert parallel.column_names == serial.column_names
+    for name in serial.column_names:
+        assert parallel[name].dtype == serial[name].dtype
+        if serial[name].dtype.kind == 'f':
+            np.testing.assert_array_equal(parallel[name], serial[name])
+        else:
+            assert list(parallel[name]) == list(serial[name])
+
+def test_columns_of_groups_are_merged():
+    batch = BatchAnalysis.from_groups(3, [
+        (np.array([0, 2]), {'success': np.array([True, True]), 'amount': np.array([1, 2]), 'flag': np.array([True, True])}),
+        (np.array([1]), {'success': np.array([False]), 'name': np.array(['x'], dtype=object)}),
+    ])
+    assert batch['amount'].dtype == np.float64 and np.isnan(batch['amount'][1])
+    assert list(batch['flag']) == [True, False, True]
+    assert list(batch['name']) == [None, 'x', None]
+    assert batch.to_dict()['amount'] == [1.0, None, 2.0]
+    assert len(batch.select(batch['success'])) == 2
+    assert len(BatchAnalysis.concat([batch, batch])) == 6
+
+def test_rejects_mismatched_lengths():
+    with pytest.raises(ValueError):
+        TaxAnalyzer().analyze_batch(['w2'], [])
@@ -0,0 +1,134 @@
+import asyncio
+import io
+import json
+import threading
+import time
+import zipfile
+import pytest
+from ..src.batch_processor import BatchProcessor, BatchTooLargeError, BatchValidationError
+
+class FakeDocumentProcessor:
+    """Records concurrency; documents named slow_* take longer to process."""
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def process_document(self, file_path, doc_type):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            with open(file_path, "rb") as f:
+                content = f.read()
+            time.sleep(0.2 if content.startswith(b"slow") else 0.01)
+            if content == b"broken":
+                return {'success': False, 'error': 'Unreadable document'}
+            return {'success': True, 'pages': 1, 'results': [{'page': 1, 'text': content.decode()}]}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def process_bytes(self, content, doc_type):
+        self.decoded_in_memory = getattr(self, 'decoded_in_memory', 0) + 1
+        return {'success': True, 'pages': 1, 'results': [{'page': 1, 'text': ''}]}
+
+def collect(processor, documents, **kwargs):
+    async def run():
+        return [json.loads(line) async for line in processor.stream(documents, "w2", **kwargs)]
+    return asyncio.run(run())
+
+def make_zip(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        for name, content in entries.items():
+            archive.writestr(name, content)
+    return buf.getvalue()
+
+def test_expand_uploads_with_archive():
+    processor = BatchProcessor(FakeDocumentProcessor())
+    archive = make_zip({
+        "client/w2.pdf": b"w2",
+        "client/1099.png": b"1099",
+        "client/notes.txt": b"ignored",
+        "client/.hidden.pdf": b"ignored"
+    })
+    documents = processor.expand_uploads([("folder.zip", archive), ("extra.jpg", b"jpg")])
+    assert sorted(name for name, _ in documents) == ["1099.png", "extra.jpg", "w2.pdf"]
+
+def test_expand_uploads_validation():
+    processor = BatchProcessor(FakeDocumentProcessor(), max_documents=2)
+    with pytest.raises(BatchValidationError):
+        processor.expand_uploads([("notes.txt", b"text")])
+    with pytest.raises(BatchValidationError):
+        processor.expand_uploads([("bad.zip", b"not a zip")])
+    with pytest.raises(BatchValidationError):
+        processor.expand_uploads([("a.pdf", b"1"), ("b.pdf", b"2"), ("c.pdf", b"3")])
+    with pytest.raises(BatchValidationError):
+        processor.expand_uploads([("empty.zip", make_zip({}))])
+
+def test_archive_limit_is_enforced_on_bytes_read():
+    processor = BatchProcessor(FakeDocumentProcessor(), max_archive_bytes=1000)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("bomb.pdf", b"\0" * 50000)
+    forged = bytearray(buf.getvalue())
+    # Declare 10 bytes in the central directory instead of 50,000
+    central = forged.index(b"PK\x01\x02")
+    forged[central + 24:central + 28] = (10).to_bytes(4, "little")
+    with pytest.raises(BatchValidationError):
+        processor.expand_uploads([("bomb.zip", bytes(forged))])
+
+    # Honest members over the limit are rejected before decompressing
+    with pytest.raises(BatchValidationError):
+        processor.expand_uploads([("big.zip", make_zip({"a.pdf": b"1" * 600, "b.pdf": b"2" * 600}))])
+    assert len(processor.expand_uploads([("ok.zip", make_zip({"a.pdf": b"1" * 600}))])) == 1
+
+    # The limit covers all archives in the batch, not each one
+    with pytest.raises(BatchValidationError):
+        processor.expand_uploads([("a.zip", make_zip({"a.pdf": b"1" * 600})), ("b.zip", make_zip({"b.pdf": b"2" * 600}))])
+
+def test_batch_size_limit():
+    processor = BatchProcessor(FakeDocumentProcessor(), max_batch_bytes=1000)
+    processor.check_batch_size([600, None])
+    with pytest.raises(BatchTooLargeError):
+        processor.check_batch_size([600, 600])
+    with pytest.raises(BatchTooLargeError):
+        processor.expand_uploads([("a.pdf", b"1" * 600), ("b.pdf", b"2" * 600)])
+
+def test_stream_yields_in_completion_order():
+    fake = FakeDocumentProcessor()
+    processor = BatchProcessor(fake, max_concurrency=2)
+    documents = [("slow.pdf", b"slow"), ("fast.pdf", b"fast"), ("broken.pdf", b"broken")]
+
+    lines = collect(processor, documents)
+    results = [line for line in lines if line["type"] == "document"]
+    assert results[-1]["filename"] == "slow.pdf"
+    assert {r["filename"]: r["success"] for r in results} == {
+        "slow.pdf": True, "fast.pdf": True, "broken.pdf": False
+    }
+
+    summary = lines[-1]
+    assert summary["type"] == "summary"
+    assert summary["documents"] == 3
+    assert summary["succeeded"] == 2
+    assert summary["failed"] == 1
+    processor.shutdown()
+
+def test_stream_respects_concurrency_cap():
+    fake = FakeDocumentProcessor()
+    processor = BatchProcessor(fake, max_concurrency=3)
+    documents = [(f"doc{i}.pdf", b"slow") for i in range(6)]
+
+    lines = collect(processor, documents, max_concurrency=10)
+    assert lines[-1]["concurrency"] == 3
+    assert fake.max_active <= 3
+    processor.shutdown()
+
+def test_small_images_are_decoded_in_memory():
+    fake = FakeDocumentProcessor()
+    processor = BatchProcessor(fake, memory_decode_max_bytes=8)
+    lines = collect(processor, [("small.png", b"tiny"), ("large.jpg", b"large image"), ("form.pdf", b"pdf")])
+    assert fake.decoded_in_memory == 1
+    assert lines[-1]["succeeded"] == 3
+    processor.shutdown()
@@ -0,0 +1,208 @@
+import hashlib
+import io
+import os
+import threading
+import uuid
+import pytest
+from PIL import Image
+from ..src.blob_store import BlobStore, BlobNotFoundError, FilesystemBackend, S3Backend
+from ..src.document_processor import DocumentProcessor
+
+DATA = bytes(range(256)) * 40
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+@pytest.fixture
+def store(tmp_path):
+    store = BlobStore(FilesystemBackend(str(tmp_path / "blobs")), str(tmp_path / "index.sqlite3"), chunk_size=1000)
+    yield store
+    store.close()
+
+class FakeS3Client:
+    """The subset of the boto3 S3 client used by S3Backend."""
+    def __init__(self):
+        self.objects = {}
+
+    def upload_file(self, path, bucket, key):
+        with open(path, "rb") as f:
+            self.objects[(bucket, key)] = f.read()
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+def test_identical_content_is_stored_once(store, tmp_path):
+    first = store.put(io.BytesIO(DATA))
+    assert {k: first[k] for k in ('hash', 'size', 'refs', 'deduplicated')} == {
+        'hash': sha256(DATA), 'size': len(DATA), 'refs': 1, 'deduplicated': False
+    }
+    path = tmp_path / "blobs" / first['hash'][:2] / first['hash'][2:4] / first['hash']
+    assert path.read_bytes() == DATA
+
+    second = store.put_bytes(DATA)
+    assert second['deduplicated'] and second['refs'] == 2
+    assert store.get_stats()['blobs'] == 1
+    assert store.get_stats()['dedup_ratio'] == 0.5
+    # Temp files of deduplicated puts are removed
+    assert os.listdir(store.backend.temp_dir) == []
+
+    assert b"".join(store.iter_chunks(first['hash'])) == DATA
+    assert store.release(first['hash'], first['ref']) == 1
+    assert path.exists()
+    # Each reference is released once
+    with pytest.raises(BlobNotFoundError):
+        store.release(first['hash'], first['ref'])
+    assert store.release(first['hash'], second['ref']) == 0
+    assert not path.exists()
+    assert store.info(first['hash']) is None
+    with pytest.raises(BlobNotFoundError):
+        store.open(first['hash'])
+
+@pytest.mark.parametrize("blob_hash", ["0" * 64, "../../etc/passwd", ""])
+def test_unknown_hashes_are_rejected(store, blob_hash):
+    assert not store.exists(blob_hash)
+    with pytest.raises(BlobNotFoundError):
+        store.release(blob_hash, "0" * 32)
+    with pytest.raises(BlobNotFoundError):
+        with store.local_file(blob_hash):
+            pass
+
+def test_upload_files_are_hard_linked(store, tmp_path):
+    upload = tmp_path / "upload.pdf"
+    upload.write_bytes(DATA)
+    blob = store.put_file(str(upload), sha256(DATA))
+    # The upload workspace can be removed; the blob keeps the bytes without a copy
+    assert os.stat(upload).st_nlink == 2
+    upload.unlink()
+    with store.local_file(blob['hash']) as path:
+        assert open(path, "rb").read() == DATA
+
+def test_reference_counts_survive_restart(store, tmp_path):
+    blob_hash = store.put_bytes(DATA)['hash']
+    store.put_bytes(DATA)
+    store.close()
+    reopened = BlobStore(FilesystemBackend(str(tmp_path / "blobs")), str(tmp_path / "index.sqlite3"))
+    assert reopened.info(blob_hash)['refs'] == 2
+    reopened.close()
+
+def test_references_belong_to_their_holders_and_expire(store, tmp_path):
+    kept = store.put_bytes(DATA)
+    owned = store.put_bytes(DATA, owner="job:1")
+    other = store.put_bytes(b"other document", ttl=0)
+    assert store.has_ref(kept['hash'], kept['ref'])
+    # A reference only reads the blob it was issued for
+    assert not store.has_ref(kept['hash'], other['ref'])
+    assert not store.has_ref(kept['hash'], None)
+    with pytest.raises(BlobNotFoundError):
+        store.release(kept['hash'], other['ref'])
+
+    assert store.release_owner("job:1") == 1
+    assert not store.has_ref(owned['hash'], owned['ref'])
+    assert store.info(kept['hash'])['refs'] == 1
+
+    # Expired references no longer read the blob, and the sweep deletes it
+    assert not store.has_ref(other['hash'], other['ref'])
+    assert store.cleanup_expired() == 1
+    assert not store.exists(other['hash'])
+    assert store.exists(kept['hash'])
+
+def test_blobs_indexed_without_references_are_swept(store):
+    blob_hash = store.put_bytes(DATA)['hash']
+    with store._conn:
+        store._conn.execute("DELETE FROM blob_refs")
+    store.cleanup_expired()
+    assert not store.exists(blob_hash)
+    assert os.listdir(os.path.join(store.backend.root_dir, blob_hash[:2], blob_hash[2:4])) == []
+
+class SlowBackend(FilesystemBackend):
+    """Holds the first file written until ``release`` is set."""
+    def __init__(self, root_dir):
+        super().__init__(root_dir)
+        self.started, self.release = threading.Event(), threading.Event()
+
+    def put_file(self, key, path, link=False):
+        if not self.started.is_set():
+            self.started.set()
+            self.release.wait(5)
+        super().put_file(key, path, link)
+
+def test_slow_writes_hold_up_no_other_put_or_release(tmp_path):
+    backend = SlowBackend(str(tmp_path / "blobs"))
+    store = BlobStore(backend, str(tmp_path / "index.sqlite3"))
+    slow = {}
+    writer = threading.Thread(target=lambda: slow.update(store.put_bytes(DATA)))
+    writer.start()
+    assert backend.started.wait(5)
+
+    # Stored, read and released while the first write is still in progress
+    blob = store.put_bytes(DATA)
+    assert not blob['deduplicated']
+    assert b"".join(store.iter_chunks(blob['hash'])) == DATA
+    assert store.release(blob['hash'], blob['ref']) == 0
+
+    # The slow put indexes the blob when done, and its bytes were not deleted
+    backend.release.set()
+    writer.join(5)
+    assert store.info(slow['hash'])['refs'] == 1
+    assert b"".join(store.iter_chunks(slow['hash'])) == DATA
+    store.close()
+
+def test_s3_backend_streams_through_temp_files(tmp_path):
+    client = FakeS3Client()
+    store = BlobStore(S3Backend("documents", client=client), str(tmp_path / "index.sqlite3"))
+    first = store.put(io.BytesIO(DATA))
+    blob_hash = first['hash']
+    assert client.objects[("documents", f"blobs/{blob_hash[:2]}/{blob_hash[2:4]}/{blob_hash}")] == DATA
+
+    with store.local_file(blob_hash) as path:
+        assert open(path, "rb").read() == DATA
+    assert not os.path.exists(path)
+
+    second = store.put_bytes(DATA)
+    store.release(blob_hash, first['ref'])
+    assert len(client.objects) == 1
+    store.release(blob_hash, second['ref'])
+    assert client.objects == {}
+    store.close()
+
+@pytest.mark.skipif(
+    not os.environ.get("BLOB_STORE_S3_TEST_ENDPOINT"),
+    reason="set BLOB_STORE_S3_TEST_ENDPOINT (e.g. http://localhost:4566 for the direct-file LocalStack container)"
+)
+def test_s3_backend_against_localstack(tmp_path):
+    boto3 = pytest.importorskip("boto3")
+    client = boto3.client(
+        "s3", endpoint_url=os.environ["BLOB_STORE_S3_TEST_ENDPOINT"], region_name="us-west-2",
+        aws_access_key_id="test", aws_secret_access_key="test"
+    )
+    bucket = f"blob-store-test-{uuid.uuid4().hex[:8]}"
+    client.create_bucket(Bucket=bucket, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+    store = BlobStore(S3Backend(bucket, client=client), str(tmp_path / "index.sqlite3"))
+    try:
+        blob = store.put(io.BytesIO(DATA))
+        blob_hash = blob['hash']
+        assert b"".join(store.iter_chunks(blob_hash)) == DATA
+        assert store.release(blob_hash, blob['ref']) == 0
+        assert client.list_objects_v2(Bucket=bucket)['KeyCount'] == 0
+    finally:
+        store.close()
+        client.delete_bucket(Bucket=bucket)
+
+def test_stored_documents_are_processed_by_hash(store, tmp_path, fake_ocr_pool):
+    processor = DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=fake_ocr_pool())
+    buf = io.BytesIO()
+    Image.new('L', (850, 1100), 255).save(buf, format='PNG')
+    image_hash = store.put_bytes(buf.getvalue())['hash']
+    pdf_hash = store.put_bytes(b"%PDF-1.7\n")['hash']
+
+    # Blobs have no file extension; PDFs are recognized by their header
+    with store.local_file(pdf_hash) as path:
+        assert processor._is_pdf(path)
+    with store.local_file(image_hash) as path:
+        assert not processor._is_pdf(path)
+        result = processor.process_document(path, 'w2', content_hash=image_hash)
+    assert result['success'] is True
+    assert result['results'][0]['text'] == "Form W-2 Wage and Tax Statement 2023"
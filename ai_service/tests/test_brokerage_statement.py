@@ -0,0 +1,130 @@
+import tracemalloc
+import pytest
+from ..src.analyzers.brokerage_statement import BrokerageStatementParser, investment_fields
+from ..src.analyzers.form1099_analyzer import Form1099Analyzer
+from ..src.parsed_document import ParsedDocument
+
+DIVIDENDS_PAGE = """2024 Composite Form 1099 Brokerage Statement
+Payer's name Example Brokerage LLC
+Payer's TIN 12-3456789
+Recipient's TIN 123-45-6789
+2024 Form 1099-DIV Dividends and Distributions
+1a- Total ordinary dividends $1,200.00
+1b- Qualified dividends $900.00
+"""
+SHORT_TERM_PAGE = """2024 Form 1099-B Proceeds From Broker and Barter Exchange Transactions
+SHORT-TERM TRANSACTIONS FOR COVERED TAX LOTS [Ordinary gains or losses are identified in the Additional information column]
+1a- Description of property/CUSIP/Symbol
+1c- Date sold Quantity 1d- Proceeds 1b- Date acquired 1e- Cost or other basis 1f- Accrued mkt disc 1g- Wash sale loss disallowed Gain or loss(-)
+APPLE INC. COMMON STOCK / CUSIP: 037833100 / Symbol: AAPL
+03/15/24 10.000 1,725.50 01/10/24 1,300.00 ... 0.00 425.50
+06/03/24 5.000 900.00 02/01/24 1,000.00 ... 100.00 W 0.00
+Security total: 2,625.50 2,300.00 0.00 100.00 425.50
+TESLA INC 88160R101 07/01/24 2.000 400.00 03/01/24 500.00 ... ... (100.00)
+"""
+LONG_TERM_PAGE = """LONG-TERM TRANSACTIONS FOR NONCOVERED TAX LOTS
+VANGUARD 500 INDEX ADMIRAL / CUSIP: 922908710
+08/09/24 3.250 1,500.00 VARIOUS 1,000.00 ... ... 500.00
+US TREASURY 2.5% 05/15/24 CUSIP 912828ZZ1 10.000 01/05/20 05/15/24 10,000.00 9,800.00 200.00
+"""
+
+def _rows(count):
+    """Transaction rows of 50 securities, 20 lots at a time, 40 rows per page."""
+    pages, lines = [], ["2024 Form 1099-B", "LONG-TERM TRANSACTIONS FOR COVERED TAX LOTS"]
+    for i in range(count):
+        if i % 20 == 0:
+            lines.append(f"SECURITY {i // 20 % 50} / CUSIP: {i // 20 % 50:08d}1")
+        lines.append(f"12/0{1 + i % 9}/24 1.000 1,100.00 01/0{1 + i % 9}/20 1,000.00 ... 0.00 100.00")
+        if len(lines) >= 40:
+            pages.append('\n'.join(lines))
+            lines = []
+    return pages + ['\n'.join(lines)]
+
+def test_composite_statement():
+    analyzer = Form1099Analyzer()
+    result = analyzer.analyze(ParsedDocument([DIVIDENDS_PAGE, SHORT_TERM_PAGE, LONG_TERM_PAGE]))
+    assert result['success']
+    assert result['data']['ordinary_dividends'] == '1,200.00'
+    assert result['totals']['total_proceeds'] == 14525.5
+    assert result['totals']['short_term_gain'] == 325.5
+    assert result['totals']['long_term_gain'] == 700.0
+    assert result['totals']['total_wash_sale_disallowed'] == 100.0
+    assert result['validation']['warnings'] == []
+    assert any(i['type'] == 'wash_sales' for i in result['insights']['tax_implications'])
+
+    transactions = result['transactions']
+    assert (transactions['lots'], transactions['pages'], transactions['securities']) == (5, 3, 4)
+    assert transactions['by_category']['short_term_covered']['lots'] == 3
+    assert transactions['by_category']['long_term_noncovered']['cost_basis'] == 10800.0
+    lots = transactions['lot_details']
+    assert lots[1]['wash_sale_disallowed'] == 100.0 and lots[1]['gain'] == 0.0
+    assert lots[2]['description'] == 'TESLA INC' and lots[2]['gain'] == -100.0
+    assert lots[3]['date_acquired'] == 'VARIOUS' and lots[3]['cusip'] == '922908710'
+    # A date in a bond's description; the quantity printed before the dates
+    assert lots[4]['description'] == 'US TREASURY 2.5% 05/15/24'
+    assert (lots[4]['quantity'], lots[4]['date_acquired'], lots[4]['page']) == (10.0, '2020-01-05', 3)
+
+    investment = result['investment_calculations']
+    assert investment['realized_gains'] == 1025.5
+    assert investment['qualified_dividends'] == 900.0
+    assert investment['tax_efficiency_score'] == pytest.approx((700.0 + 900.0) / (325.5 + 700.0 + 1200.0), abs=1e-4)
+
+def test_batch_columns_match_single_documents():
+    analyzer = Form1099Analyzer()
+    texts = [DIVIDENDS_PAGE + SHORT_TERM_PAGE + LONG_TERM_PAGE, "Form 1099-INT\nPayer's TIN 98-7654321\n"]
+    columns = analyzer.analyze_batch(texts)
+    single = analyzer.analyze(texts[0])
+    for name in analyzer.TRANSACTION_TOTALS:
+        assert columns[f'totals.{name}'][0] == pytest.approx(single['totals'][name])
+    assert columns['insights.wash_sales'].tolist() == [True, False]
+    assert not columns['validation.unreconciled_transactions'].any()
+
+def test_rows_without_headings():
+    statement = BrokerageStatementParser().stream()
+    statement.feed("""ACME CORP 100.000 02/29/20 03/01/21 5,000.00 4,000.00 1,000.00
+ACME CORP 100.000 02/29/20 03/02/21 5,000.00 4,000.00 1,000.00
+ACME CORP 01/02/23 01/03/24 5,000.00 4,000.00 50.00 1,050.00
+ACME CORP 01/02/23 01/03/24 5,000.00 4,000.00 999.00
+ACME CORP 01/03/24 some unreadable 5,000.00 4,000.00
+""")
+    statement.close()
+    summary = statement.summary()
+    assert [lot['term'] for lot in summary['lot_details']] == ['short_term', 'long_term', 'long_term', 'long_term']
+    assert summary['lot_details'][2]['wash_sale_disallowed'] == 50.0
+    assert summary['lot_details'][2]['quantity'] is None
+    assert summary['unreconciled_lots'] == 1
+    assert summary['unparsed_rows'] == 1
+
+def test_chunks_and_totals_do_not_depend_on_the_chunk_size():
+    pages = _rows(1000)
+    summaries = []
+    for chunk_rows in (64, 4096):
+        parser = BrokerageStatementParser(chunk_rows=chunk_rows, keep_lots=10)
+        statement = parser.stream()
+        chunks = list(parser.iter_lots(pages, statement))
+        assert sum(len(chunk) for chunk in chunks) == 1000
+        assert max(len(chunk) for chunk in chunks) <= chunk_rows
+        summaries.append(statement.summary())
+    assert summaries[0]['totals'] == summaries[1]['totals']
+    assert summaries[0]['totals']['long_term_gain'] == 100000.0
+    assert summaries[0]['securities'] == 50
+    assert len(summaries[0]['lot_details']) == 10
+
+def test_memory_does_not_grow_with_the_statement():
+    parser = BrokerageStatementParser(chunk_rows=256)
+    peaks = []
+    for lots in (1000, 10000):
+        pages = iter(_rows(lots))
+        tracemalloc.start()
+        for _ in parser.iter_lots(pages):
+            pass
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    assert peaks[1] < peaks[0] * 2
+
+def test_investment_fields_carry_losses_forward():
+    statement = BrokerageStatementParser().parse(["SHORT-TERM COVERED\nXYZ 01/02/24 03/04/24 1,000.00 6,000.00 (5,000.00)"])
+    fields = investment_fields(statement.summary())
+    assert fields['realized_gains'] == -5000.0
+    assert fields['tax_loss_carryforward'] == 2000.0
+    assert fields['tax_efficiency_score'] == 1.0
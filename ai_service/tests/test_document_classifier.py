@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from PIL import Image
+from ..src.document_classifier import DocumentClassifier
+from ..src.document_processor import DocumentProcessor
+
+W2_HEADER = "Form W-2 Wage and Tax Statement 2023\nDepartment of the Treasury"
+NEC_HEADER = "Form 1099-NEC (Rev. January 2024)\nNonemployee Compensation\nFor calendar year 2024"
+
+def page(height=3300, width=2550):
+    return np.full((height, width), 255, dtype=np.uint8)
+
+@pytest.mark.parametrize("text,form_type,doc_type,year", [
+    (W2_HEADER, "W-2", "w2", 2023),
+    (NEC_HEADER, "1099-NEC", "1099", 2024),
+    ("Form 1099-DIV 2023 Dividends and Distributions", "1099-DIV", "1099", 2023),
+    ("Form 1099-B Proceeds From Broker and Barter Exchange Transactions 2024", "1099-B", "1099", 2024),
+    ("1099 INT Interest Income", "1099-INT", "1099", None),
+])
+def test_classify_text(text, form_type, doc_type, year, fake_ocr):
+    result = DocumentClassifier(ocr_func=fake_ocr("")).classify_text(text)
+    assert result.form_type == form_type
+    assert result.doc_type == doc_type
+    assert result.year == year
+
+def test_title_alone_is_not_enough(fake_ocr):
+    result = DocumentClassifier(ocr_func=fake_ocr("")).classify_text("Interest income from savings")
+    assert result.form_type is None
+    assert result.doc_type == "generic"
+
+def test_header_match_skips_full_thumbnail(fake_ocr):
+    ocr = fake_ocr(W2_HEADER)
+    classifier = DocumentClassifier(ocr_func=ocr)
+    result = classifier.classify(page())
+
+    assert result.stage == "header"
+    assert result.form_type == "W-2"
+    assert len(ocr.shapes) == 1
+    height, width = ocr.shapes[0]
+    assert width == classifier.thumbnail_width
+    assert height <= 0.3 * 3300 * classifier.thumbnail_width / 2550 + 1
+    assert classifier.get_stats()['header_only'] == 1
+
+def test_inconclusive_header_falls_back_to_thumbnail(fake_ocr):
+    ocr = fake_ocr("Copy B To Be Filed With Employee's Tax Return", "Form 1099-R 2023")
+    classifier = DocumentClassifier(ocr_func=ocr)
+    result = classifier.classify(page())
+    assert result.stage == "thumbnail"
+    assert result.form_type == "1099-R"
+    assert len(ocr.shapes) == 2
+
+    unknown = DocumentClassifier(ocr_func=fake_ocr("Receipt", "Thank you for your purchase"))
+    result = unknown.classify(page())
+    assert result.stage == "none"
+    assert result.doc_type == "generic"
+    assert unknown.get_stats()['unclassified'] == 1
+
+def test_evaluate_reports_accuracy_and_latency():
+    texts = iter([W2_HEADER, NEC_HEADER, "Form W-2 2022"])
+    classifier = DocumentClassifier(ocr_func=lambda image: next(texts))
+    report = classifier.evaluate([
+        (page(), {'form_type': 'W-2', 'year': 2023}),
+        (page(), {'form_type': '1099-NEC', 'year': 2024}),
+        (page(), {'form_type': '1099-MISC', 'year': 2022}),
+    ])
+    assert report['samples'] == 3
+    assert report['form_accuracy'] == pytest.approx(2 / 3)
+    assert report['doc_type_accuracy'] == pytest.approx(2 / 3)
+    assert report['year_accuracy'] == 1.0
+    assert report['errors'] == [{'index': 2, 'expected': '1099-MISC', 'predicted': 'W-2', 'stage': 'header'}]
+    assert report['p95_ms'] >= report['p50_ms'] >= 0.0
+
+def test_process_document_classifies_when_doc_type_omitted(tmp_path, fake_ocr_pool):
+    image_path = tmp_path / "scan.png"
+    Image.fromarray(page(1100, 850)).save(image_path)
+
+    pool = fake_ocr_pool(NEC_HEADER)
+    processor = DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=pool)
+    result = processor.process_document(str(image_path))
+
+    assert result['success'] is True
+    assert result['doc_type'] == '1099'
+    assert result['classification']['form_type'] == '1099-NEC'
+    assert result['classification']['year'] == 2024
+    assert result['results'][0]['data']['type'] == '1099'
+    # One header OCR plus the full-page pass
+    assert (pool.string_calls, pool.page_calls) == (1, 1)
+
+    explicit = processor.process_document(str(image_path), 'w2')
+    assert 'classification' not in explicit
+    assert explicit['results'][0]['data']['type'] == 'w2'
@@ -0,0 +1,78 @@
+import pytest
+from ..src.analyzers.field_scanner import FieldScanner, _literal_prefix
+from ..src.analyzers.w2_analyzer import W2Analyzer
+from ..src.analyzers.form1099_analyzer import Form1099Analyzer
+
+W2_TEXT = """
+Form W-2 Wage and Tax Statement 2023
+Box 12a D $5,000.00
+Box 12b dd $8,250.00
+Box 12c W 1,200.00
+Employer's name ACME Corporation EIN: 12-3456789
+SSN: 123-45-6789
+Box 1 $50,000.00
+Box 2 $8,000.00
+Box 10 $2,500.00
+Box 1 $99.00
+State: CA
+"""
+
+@pytest.mark.parametrize("pattern, prefix", [
+    (r'Box 12\s*([A-Z])', 'Box 12'),
+    (r'Employer\'s name\s*([^\n]+)', "Employer's name"),
+    (r'EIN:\s*(\d{2}-\d{7})', 'EIN:'),
+    (r'Boxes?\s*(\d+)', 'Boxe'),
+    (r'(\d+)', ''),
+])
+def test_literal_prefix(pattern, prefix):
+    assert _literal_prefix(pattern) == prefix
+
+def test_w2_fields_in_one_pass():
+    data = W2Analyzer()._extract_fields(W2_TEXT)
+
+    # Box 12 is not read as Box 1, and every Box 12 entry is kept
+    assert data['wages'] == '50,000.00'
+    assert [(d['code'], d['amount']) for d in data['deferrals']] == [('D', 5000.0), ('DD', 8250.0), ('W', 1200.0)]
+    assert data['deferrals'][1]['description'] == 'Cost of employer-sponsored health coverage'
+    assert data['dependent_care'] == '2,500.00'
+    # A label on the same line as a free-text value is still found
+    assert data['employer_name'] == 'ACME Corporation EIN: 12-3456789'
+    assert data['employer_ein'] == '12-3456789'
+    assert data['state'] == 'CA'
+    assert list(data) == [f for f in W2Analyzer().field_patterns if f in data]
+
+def test_1099_box_16_is_not_read_as_box_1():
+    data = Form1099Analyzer()._extract_fields("Box 16 $1,250.00\nBox 1 $25,000.00\nBox 4 $3,750.00\n")
+    assert data == {
+        'nonemployee_compensation': '25,000.00',
+        'federal_tax_withheld': '3,750.00',
+        'state_tax_withheld': '1,250.00'
+    }
+
+def test_run_together_labels_fall_back_to_the_shorter_label():
+    # OCR ran "Box 1" into its amount; without another Box 1 it is read as before
+    data = W2Analyzer()._extract_fields("Box 112,000.00\nBox 2 1,500.00\n")
+    assert (data['wages'], data['nonqualified_plans'], data['federal_tax']) == ('12,000.00', '2,000.00', '1,500.00')
+    data = Form1099Analyzer()._extract_fields("Box 161,250.00\n")
+    assert (data['nonemployee_compensation'], data['state_tax_withheld']) == ('61,250.00', '1,250.00')
+
+    # A later match of the field's own label still wins
+    data = W2Analyzer()._extract_fields("Box 112,000.00\nBox 1 $50,000.00\n")
+    assert data['wages'] == '50,000.00'
+
+def test_matches_per_pattern_search_on_non_ascii_text():
+    scanner = FieldScanner({'wages': r'Box 1\s*\$?([\d,]+)', 'name': r'Name:\s*([^\n]+)'})
+    found = scanner.scan("NAME: José Müller\nbox 1 $1,000\nBOX 1 $2,000\n")
+    assert found == {'name': [('José Müller',)], 'wages': [('1,000',)]}
+
+def test_each_field_keeps_its_first_match():
+    scanner = FieldScanner({'a': r'A=(\d)', 'b': r'B=(\d)'})
+    assert scanner.scan("B=1 A=2 " + "A=3 B=4 " * 1000) == {'a': [('2',)], 'b': [('1',)]}
+
+@pytest.mark.parametrize("patterns", [
+    {'amount': r'(\d+)\s*USD'},
+    {'label': r'Total'},
+])
+def test_rejects_unsupported_patterns(patterns):
+    with pytest.raises(ValueError):
+        FieldScanner(patterns)
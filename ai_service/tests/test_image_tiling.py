@@ -0,0 +1,138 @@
+import io
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+from ..src.image_tiling import ImageTiler
+from ..src.document_processor import DocumentProcessor
+
+def noisy_page(height, width, seed=0):
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width), 230, dtype=np.int16)
+    page[::40, :] = 20
+    page += rng.integers(-25, 25, size=page.shape, dtype=np.int16)
+    return np.clip(page, 0, 255).astype(np.uint8)
+
+def test_tiled_denoise_matches_full_image():
+    image = noisy_page(700, 900)
+    tiler = ImageTiler(tile_size=256, overlap=16, tile_min_pixels=0)
+
+    tiled = tiler.apply(image, cv2.fastNlMeansDenoising)
+    assert np.array_equal(tiled, cv2.fastNlMeansDenoising(image))
+    assert tiler.get_stats()['tiled'] == 1
+
+def test_small_images_are_not_tiled():
+    calls = []
+    tiler = ImageTiler(tile_size=256)
+    image = noisy_page(300, 200)
+    result = tiler.apply(image, lambda tile: calls.append(tile.shape) or tile)
+    assert result is image
+    assert calls == [(300, 200)]
+
+def test_jpeg_uses_draft_decoding(tmp_path):
+    path = tmp_path / "photo.jpg"
+    Image.new("RGB", (4000, 3000), (240, 240, 240)).save(path, quality=90)
+
+    tiler = ImageTiler(max_page_pixels=1_000_000)
+    gray = tiler.load_image(str(path))
+    assert gray.ndim == 2
+    assert gray.shape[0] * gray.shape[1] <= 1_000_000
+    assert gray.shape[1] / gray.shape[0] == pytest.approx(4 / 3, rel=0.01)
+
+    stats = tiler.get_stats()
+    assert stats['draft_decodes'] == 1
+    assert stats['pixel_reduction'] > 0.9
+
+def test_scan_dpi_reduced_to_ocr_resolution(tmp_path):
+    path = tmp_path / "scan.png"
+    Image.new("L", (1200, 1600), 255).save(path, dpi=(600, 600))
+
+    gray = ImageTiler().load_image(str(path))
+    assert gray.shape == (800, 600)
+
+def test_pages_record_their_resolution(tmp_path):
+    tiler = ImageTiler()
+    for dpi, expected in (((150, 150), 150.0), ((600, 600), 300.0), ((72, 72), None), (None, None)):
+        path = tmp_path / "scan.png"
+        options = {'dpi': dpi} if dpi else {}
+        Image.new("L", (1700, 2200), 255).save(path, **options)
+        # PNG stores pixels per meter
+        assert tiler.load_image(str(path)).dpi == (expected and pytest.approx(expected, abs=0.1))
+        assert tiler.decode_image(path.read_bytes()).dpi == (expected and pytest.approx(expected, abs=0.1))
+
+def test_pages_within_budget_are_untouched(tmp_path):
+    path = tmp_path / "page.png"
+    Image.new("L", (850, 1100), 255).save(path, dpi=(72, 72))
+
+    tiler = ImageTiler()
+    assert tiler.load_image(str(path)).shape == (1100, 850)
+    assert tiler.get_stats()['downscaled'] == 0
+
+def test_pdf_dpi_fits_budget():
+    tiler = ImageTiler(max_page_pixels=9_000_000)
+    assert tiler._pdf_dpi("612 x 792 pts (letter)") == 300
+    # A 24x36in poster is rendered at a lower DPI instead of at ~78MP
+    assert tiler._pdf_dpi("1728 x 2592 pts") == 102
+    assert tiler._pdf_dpi("") == 300
+
+def test_process_document_bounds_page_size(tmp_path, fake_ocr_pool):
+    path = tmp_path / "photo.jpg"
+    Image.new("RGB", (3000, 4000), (255, 255, 255)).save(path)
+
+    pool = fake_ocr_pool()
+    processor = DocumentProcessor(
+        temp_dir=str(tmp_path / "temp"),
+        ocr_pool=pool,
+        image_tiler=ImageTiler(max_page_pixels=2_000_000)
+    )
+    result = processor.process_document(str(path), 'w2')
+
+    assert result['success'] is True
+    height, width = pool.shapes[-1]
+    assert height * width <= 2_000_000
+
+def encoded(image, fmt, **options):
+    buf = io.BytesIO()
+    image.save(buf, format=fmt, **options)
+    return buf.getvalue()
+
+@pytest.mark.parametrize("fmt, size, dpi", [
+    ("JPEG", (4000, 3000), (72, 72)),
+    ("JPEG", (2550, 3300), (300, 300)),
+    ("PNG", (1200, 1600), (600, 600)),
+])
+def test_memory_decode_matches_file_decode(tmp_path, fmt, size, dpi):
+    page = Image.fromarray(noisy_page(size[1], size[0]))
+    data = encoded(page, fmt, dpi=dpi)
+    path = tmp_path / ("page.jpg" if fmt == "JPEG" else "page.png")
+    path.write_bytes(data)
+
+    tiler = ImageTiler(max_page_pixels=2_000_000)
+    from_file = tiler.load_image(str(path))
+    from_memory = tiler.decode_image(data)
+    assert from_memory.shape == from_file.shape
+    assert np.mean(np.abs(from_memory.astype(np.int16) - from_file)) < 1.0
+    assert tiler.get_stats()['memory_decodes'] == 1
+
+def test_memory_decode_uses_dct_scaling():
+    tiler = ImageTiler(max_page_pixels=1_000_000)
+    gray = tiler.decode_image(encoded(Image.new("RGB", (4000, 3000), (240, 240, 240)), "JPEG"))
+    assert gray.shape[0] * gray.shape[1] <= 1_000_000
+    assert tiler.get_stats()['draft_decodes'] == 1
+
+def test_memory_decode_falls_back_to_pil():
+    # OpenCV cannot decode GIF
+    gray = ImageTiler().decode_image(encoded(Image.new("P", (120, 80), 3), "GIF"))
+    assert gray.shape == (80, 120)
+
+def test_process_bytes_skips_temp_files(tmp_path, fake_ocr_pool):
+    pool = fake_ocr_pool()
+    processor = DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=pool)
+    data = encoded(Image.new("L", (850, 1100), 255), "PNG")
+    result = processor.process_bytes(data, 'w2')
+
+    assert result['success'] is True
+    assert result['pages'] == 1
+    assert pool.shapes
+    assert list((tmp_path / "temp").iterdir()) == []
+    assert processor.image_tiler.get_stats()['memory_decodes'] == 1
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+from datetime import timedelta
+import pytest
+from ..src.job_queue import JobQueue, QueueFullError, job_events
+
+def wait_for(job, timeout=5.0):
+    """Follow the job's events until it finishes."""
+    async def follow():
+        async for _ in job_events(job, keepalive=timeout):
+            pass
+    asyncio.run(asyncio.wait_for(follow(), timeout))
+    return job
+
+def test_job_completes_with_progress():
+    queue = JobQueue(max_workers=1, max_queue_depth=5)
+
+    def work(job, pages):
+        for page in range(1, pages + 1):
+            job.update_progress(page, pages)
+        return {"success": True, "pages": pages}
+
+    job = wait_for(queue.submit(work, 3, metadata={"doc_type": "w2"}))
+    status = job.to_dict()
+    assert status["status"] == "completed"
+    assert status["result"] == {"success": True, "pages": 3}
+    assert status["progress"] == {"pages_done": 3, "pages_total": 3, "percent": 100.0}
+    assert status["metadata"] == {"doc_type": "w2"}
+    assert queue.get(job.job_id) is job
+    # An ID recorded elsewhere before submitting is kept
+    assert wait_for(queue.submit(work, 1, job_id="upload-job")).job_id == "upload-job"
+    queue.shutdown()
+
+def test_failed_jobs_report_errors():
+    queue = JobQueue(max_workers=1, max_queue_depth=5)
+
+    def unsuccessful(job):
+        return {"success": False, "error": "Unreadable PDF"}
+
+    def raises(job):
+        raise RuntimeError("OCR engine error")
+
+    first = wait_for(queue.submit(unsuccessful))
+    second = wait_for(queue.submit(raises))
+    assert first.status == "failed" and first.error == "Unreadable PDF"
+    assert second.status == "failed" and second.error == "OCR engine error"
+    assert queue.get_stats()["failed"] == 2
+    queue.shutdown()
+
+def test_queue_depth_backpressure():
+    queue = JobQueue(max_workers=1, max_queue_depth=2)
+    release = threading.Event()
+
+    def blocked(job):
+        release.wait(5)
+        return {"success": True}
+
+    jobs = [queue.submit(blocked), queue.submit(blocked)]
+    with pytest.raises(QueueFullError):
+        queue.submit(blocked)
+
+    stats = queue.get_stats()
+    assert stats["queued"] + stats["running"] == 2
+    assert stats["rejected"] == 1
+
+    release.set()
+    for job in jobs:
+        assert wait_for(job).status == "completed"
+
+    # Capacity is released once jobs finish
+    assert wait_for(queue.submit(blocked)).status == "completed"
+    queue.shutdown()
+
+def test_pruning_skips_jobs_still_finishing():
+    queue = JobQueue(max_workers=1, max_queue_depth=5, job_ttl=0, max_jobs=1)
+    job = wait_for(queue.submit(lambda job: {"success": True}))
+    # A job seen between its status and completion time being set is kept until it has both
+    job.completed_at = None
+    queue.submit(lambda job: {"success": True})
+    assert queue.get(job.job_id) is job
+    queue.shutdown()
+
+def test_unknown_job():
+    queue = JobQueue()
+    assert queue.get("missing") is None
+    queue.shutdown()
+
+def collect_events(job, start=0, keepalive=15.0, on_event=None):
+    async def collect():
+        events = []
+        async for event, data in job_events(job, start=start, keepalive=keepalive):
+            events.append((event, data))
+            if on_event:
+                on_event(event)
+        return events
+    return asyncio.run(collect())
+
+def test_page_results_stream_while_job_runs():
+    queue = JobQueue(max_workers=1, max_queue_depth=5)
+    release = threading.Event()
+
+    def work(job):
+        job.add_page({"page": 1, "text": "Box 1 50,000.00"})
+        job.update_progress(1, 2)
+        release.wait(5)
+        job.add_page({"page": 2, "text": "Box 2 8,000.00"})
+        job.update_progress(2, 2)
+        return {"success": True, "doc_type": "w2", "pages": 2, "results": ["..."]}
+
+    job = queue.submit(work)
+    running_at_first_page = []
+
+    def on_event(event):
+        # The job only finishes once the first page has been received
+        if event == "page" and not release.is_set():
+            running_at_first_page.append(not job.is_finished)
+            release.set()
+
+    events = collect_events(job, on_event=on_event)
+
+    assert [event for event, _ in events] == ["page", "page", "complete"]
+    assert running_at_first_page == [True]
+    assert events[0][1] == {"page": 1, "text": "Box 1 50,000.00", "pages_total": 2}
+    assert events[2][1] == {"job_id": job.job_id, "success": True, "doc_type": "w2", "pages": 2}
+
+    # Reconnecting after the first page only replays the rest
+    assert [data.get("page") for event, data in collect_events(job, start=1)] == [2, None]
+    queue.shutdown()
+
+def test_event_stream_reports_failures_and_keepalives():
+    queue = JobQueue(max_workers=1, max_queue_depth=5)
+    keepalive_seen = threading.Event()
+
+    def slow_failure(job):
+        # Runs until the stream has sent a keepalive
+        keepalive_seen.wait(5)
+        raise RuntimeError("OCR engine error")
+
+    job = queue.submit(slow_failure)
+    events = collect_events(job, keepalive=0.01, on_event=lambda event: event == "keepalive" and keepalive_seen.set())
+    assert "keepalive" in [event for event, _ in events]
+    assert events[-1] == ("failed", {"job_id": job.job_id, "error": "OCR engine error"})
+    queue.shutdown()
+
+def test_removal_listeners_hear_of_dropped_jobs():
+    queue = JobQueue(max_workers=1, max_queue_depth=5, max_jobs=1)
+    removed = []
+    queue.add_removal_listener(removed.extend)
+
+    first = wait_for(queue.submit(lambda job: {"success": True}))
+    second = wait_for(queue.submit(lambda job: {"success": True}))
+    assert removed == [first.job_id]
+    assert queue.get(second.job_id) is second
+    queue.shutdown()
+
+def test_expired_jobs_are_dropped_without_new_submissions():
+    queue = JobQueue(max_workers=1, max_queue_depth=5, job_ttl=0, prune_interval=0)
+    removed = []
+    queue.add_removal_listener(removed.extend)
+
+    job = wait_for(queue.submit(lambda job: {"success": True}))
+    job.completed_at -= timedelta(seconds=1)
+    # Polling the queue releases what expired jobs own, even if nothing else is submitted
+    assert queue.get_stats()["tracked_jobs"] == 0
+    assert removed == [job.job_id]
+    assert queue.get(job.job_id) is None
+    queue.shutdown()
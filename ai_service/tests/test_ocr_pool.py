@@ -0,0 +1,81 @@
+import os
+import pytest
+import numpy as np
+from ..src.ocr_pool import OCREnginePool, OCRPoolConfig, OCRWorkerError
+
+class FakeEngine:
+    """Engine stub that reports the image it received; a 255 top-left pixel crashes the worker."""
+    def __init__(self, config):
+        self.pid = os.getpid()
+
+    def image_to_string(self, image):
+        if image[0, 0] == 255:
+            os._exit(1)
+        return f"{self.pid}:{image.shape[1]}x{image.shape[0]}:{int(image.sum())}"
+
+    def image_to_data(self, image):
+        return {"text": ["Box", "1"], "conf": [96.0, 42.0], "left": [0, 10], "top": [0, 0], "width": [8, 4], "height": [6, 6]}
+
+    def image_to_page(self, image):
+        return {"text": "Box 1", "words": self.image_to_data(image)}
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def pool():
+    pool = OCREnginePool(
+        OCRPoolConfig(size=2, request_timeout=5.0, health_check_interval=0),
+        engine_factory=FakeEngine
+    )
+    yield pool
+    pool.close()
+
+def test_pool_reuses_worker_engines(pool):
+    image = np.ones((20, 30), dtype=np.uint8)
+    pids = set()
+    for _ in range(6):
+        pid, size, total = pool.image_to_string(image).split(":")
+        assert size == "30x20"
+        assert total == "600"
+        pids.add(pid)
+
+    # Engines are initialized once per worker process, not per page
+    assert len(pids) <= 2
+    assert pool.get_stats()["requests"] == 6
+    assert pool.get_stats()["restarts"] == 0
+
+def test_pool_image_to_data(pool):
+    data = pool.image_to_data(np.zeros((10, 10), dtype=np.uint8))
+    assert data["text"] == ["Box", "1"]
+    assert data["conf"] == [96.0, 42.0]
+
+    page = pool.image_to_page(np.zeros((10, 10), dtype=np.uint8))
+    assert page["text"] == "Box 1"
+    assert page["words"]["text"] == ["Box", "1"]
+
+def test_pool_restarts_crashed_worker(pool):
+    crash = np.zeros((10, 10), dtype=np.uint8)
+    crash[0, 0] = 255
+    with pytest.raises(OCRWorkerError):
+        pool.image_to_string(crash)
+    assert pool.get_stats()["restarts"] >= 1
+
+    # The pool keeps serving after the crash
+    result = pool.image_to_string(np.ones((10, 10), dtype=np.uint8))
+    assert result.endswith(":10x10:100")
+
+def test_pool_health_check(pool):
+    assert pool.health_check()["started"] is False
+
+    pool.start()
+    health = pool.health_check()
+    assert health["healthy"] is True
+    assert len(health["workers"]) == 2
+
+    # A killed worker is detected and replaced
+    pool._workers[0].process.kill()
+    pool._workers[0].process.join()
+    pool.health_check()
+    assert pool.health_check()["healthy"] is True
+    assert pool.get_stats()["restarts"] == 1
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+from PIL import Image
+from ..src.ocr_store import OCRStore
+from ..src.document_processor import DocumentProcessor
+from ..src.phash_index import PageHashIndex
+
+def make_page(text):
+    words = text.split()
+    return {
+        'text': text,
+        'words': {'text': words, 'conf': [90.0] * len(words), 'left': list(range(len(words)))},
+        'confidence': 0.9,
+        'orientation': {'rotation': 0, 'skew': 0.0}
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    store = OCRStore(str(tmp_path / "ocr.sqlite3"))
+    yield store
+    store.close()
+
+def test_put_and_get_round_trip(store):
+    key = OCRStore.make_key("abc", {'lang': 'eng'})
+    pages = [make_page("Form W-2 Box 1 50,000.00"), make_page("Instructions")]
+
+    assert store.get(key) is None
+    store.put(key, pages)
+    assert store.get(key) == pages
+
+    stats = store.get_stats()
+    assert stats['documents'] == 1
+    assert stats['pages'] == 2
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    # Word data is stored compressed
+    assert 0 < stats['size_bytes']
+
+def test_key_depends_on_content_and_params():
+    key = OCRStore.make_key("abc", {'lang': 'eng', 'psm': 3})
+    assert key == OCRStore.make_key("abc", {'psm': 3, 'lang': 'eng'})
+    assert key != OCRStore.make_key("abd", {'lang': 'eng', 'psm': 3})
+    assert key != OCRStore.make_key("abc", {'lang': 'deu', 'psm': 3})
+
+def test_pipeline_version_change_clears_store(tmp_path):
+    path = str(tmp_path / "ocr.sqlite3")
+    store = OCRStore(path, pipeline_version="1")
+    store.put("key", [make_page("text")])
+    store.close()
+
+    reopened = OCRStore(path, pipeline_version="1")
+    assert reopened.get("key") is not None
+    reopened.close()
+
+    bumped = OCRStore(path, pipeline_version="2")
+    assert bumped.get("key") is None
+    assert bumped.get_stats()['documents'] == 0
+    bumped.close()
+
+def test_evicts_least_recently_used(tmp_path):
+    rng = np.random.default_rng(0)
+    # Random words compress poorly, so each document is a few KB
+    pages = {name: [make_page(" ".join(rng.choice(list("abcdefghij"), 600)))] for name in "abc"}
+    store = OCRStore(str(tmp_path / "ocr.sqlite3"), max_bytes=6000)
+
+    store.put("a", pages["a"])
+    store.put("b", pages["b"])
+    store.get("a")
+    store.put("c", pages["c"])
+
+    assert store.get_stats()['evictions'] >= 1
+    assert store.get("b") is None
+    assert store.get("c") is not None
+    assert store.get_stats()['size_bytes'] <= 6000
+    store.close()
+
+def test_evicted_pages_leave_the_near_duplicate_index(tmp_path, fake_ocr_pool):
+    rng = np.random.default_rng(0)
+    store = OCRStore(str(tmp_path / "ocr.sqlite3"), max_bytes=6000)
+    index = PageHashIndex()
+    DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=fake_ocr_pool(), ocr_store=store, page_index=index)
+    signatures = {name: (int(rng.integers(2 ** 62)), int(rng.integers(2 ** 62))) for name in "abc"}
+    page_ids = {}
+    for name in "abc":
+        page = make_page(" ".join(rng.choice(list("abcdefghij"), 600)))
+        page_ids[name], = store.put(name, [page], [signatures[name]])
+        index.add(signatures[name], page_ids[name])
+
+    # "a" was evicted to make room for "c"
+    assert store.get("a") is None
+    assert index.nearest(signatures["a"]) is None
+    assert index.nearest(signatures["c"]) == (page_ids["c"], 0)
+    assert len(index) == len(store.page_signatures())
+
+    # Replacing a document's pages and clearing the store remove their entries too
+    new_id, = store.put("c", [make_page("Box 1 50,000.00")], [signatures["c"]])
+    index.add(signatures["c"], new_id)
+    assert index.nearest(signatures["c"]) == (new_id, 0)
+    store.clear()
+    assert len(index) == 0
+    store.close()
+
+def test_processor_skips_ocr_for_stored_content(tmp_path, store, fake_ocr_pool):
+    first = tmp_path / "upload.png"
+    Image.new("L", (850, 1100), 255).save(first)
+    renamed = tmp_path / "same_content.png"
+    renamed.write_bytes(first.read_bytes())
+
+    pool = fake_ocr_pool(
+        "Form W-2 Wage and Tax Statement 2023 Box 1 $50,000.00", {'text': ['Form'], 'conf': [88.0]},
+        check_text="Form W-2 Wage and Tax Statement 2023"
+    )
+    processor = DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=pool, ocr_store=store)
+
+    result = processor.process_document(str(first))
+    assert result['from_store'] is False
+    assert result['results'][0]['confidence'] == pytest.approx(0.88)
+    assert pool.page_calls == 1
+
+    again = processor.process_document(str(renamed))
+    assert again['from_store'] is True
+    assert pool.page_calls == 1
+    assert again['results'] == result['results']
+    assert again['classification']['form_type'] == 'W-2'
+    assert again['classification']['stage'] == 'store'
@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+from ..src.orientation import OrientationDetector
+
+WORDS = "The quick brown fox jumps over the lazy dog while typing lines of regular text here".split()
+
+@pytest.fixture(scope="module")
+def text_page():
+    """Render an upright page of mixed-case text."""
+    image = Image.new('L', (1275, 1650), 255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=28)
+    for row in range(30):
+        draw.text((80, 80 + row * 50), " ".join(WORDS[row % 5:row % 5 + 10]), fill=0, font=font)
+    return np.array(image)
+
+def distort(page, rotation, skew):
+    """Rotate counter-clockwise by ``rotation`` and ``skew`` degrees (so the fix is clockwise)."""
+    page = np.ascontiguousarray(np.rot90(page, k=rotation // 90))
+    if skew:
+        height, width = page.shape
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+        page = cv2.warpAffine(page, matrix, (width, height), borderValue=255)
+    return page
+
+@pytest.mark.parametrize("rotation", [0, 90, 180, 270])
+@pytest.mark.parametrize("skew", [0, 3, -5])
+def test_detects_rotation_and_skew(text_page, rotation, skew):
+    detector = OrientationDetector()
+    result = detector.detect(distort(text_page, rotation, skew))
+    assert result.rotation == rotation
+    assert result.skew == pytest.approx(skew, abs=0.5)
+
+def test_correct_restores_upright_page(text_page):
+    detector = OrientationDetector()
+    corrected, result = detector.correct(distort(text_page, 90, 4))
+    assert result.needs_correction
+    assert corrected.shape == text_page.shape
+
+    check = detector.detect(corrected)
+    assert check.rotation == 0
+    assert check.skew == pytest.approx(0, abs=0.5)
+
+def test_upright_and_blank_pages_skip_osd(text_page):
+    calls = []
+    detector = OrientationDetector(osd_func=lambda image: calls.append(image) or {'rotate': 0, 'confidence': 10.0})
+
+    corrected, result = detector.correct(text_page)
+    assert corrected is text_page
+    assert result.method == "projection"
+
+    blank = np.full((800, 600), 255, dtype=np.uint8)
+    assert detector.detect(blank).method == "blank"
+    assert calls == []
+    assert detector.get_stats()['osd_rate'] == 0.0
+
+def test_osd_resolves_uncertain_pages(text_page):
+    calls = []
+
+    def osd(image):
+        calls.append(image.shape)
+        return {'rotate': 180, 'confidence': 12.0}
+
+    # Upside-down pages are rare, so a flip cue is confirmed with OSD
+    detector = OrientationDetector(osd_func=osd)
+    result = detector.detect(distort(text_page, 180, 0))
+    assert result.rotation == 180
+    assert result.method == "osd"
+    assert len(calls) == 1
+    assert max(calls[0]) <= detector.osd_size
+
+def test_low_confidence_osd_keeps_projection_result(text_page):
+    detector = OrientationDetector(osd_func=lambda image: {'rotate': 90, 'confidence': 0.5})
+    result = detector.detect(distort(text_page, 180, 0))
+    assert result.rotation == 180
+    assert result.method == "projection"
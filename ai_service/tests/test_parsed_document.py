@@ -0,0 +1,86 @@
+import time
+import numpy as np
+from ..src.parsed_document import ParsedDocument, ParsedDocumentStore, normalize_text
+from ..src.analyzers.w2_analyzer import W2Analyzer
+from ..src.analyzers.form1099_analyzer import Form1099Analyzer
+from ..src.document_processor import DocumentProcessor
+
+W2_PAGE = "Form W-2 2023\nEmployer’s name  ACME Corp \nEIN: １２-3456789\nBox 1 $50,000.00\nBox 12a D $5,000.00"
+
+W2_WORDS = {'text': ['Box', '1'], 'conf': [91.0, 88.0], 'left': [10, 60], 'top': [5, 5], 'width': [40, 10], 'height': [12, 12]}
+
+class CountingScanner:
+    def __init__(self):
+        self.calls = 0
+
+    def scan(self, text, lowered=None):
+        self.calls += 1
+        return {}
+
+def test_normalize_text():
+    assert normalize_text("Employer’s  name\t ACME Corp  \r\nEIN: １２-3456789") == \
+        "Employer's name ACME Corp\nEIN: 12-3456789"
+    # All whitespace but line breaks is collapsed, in ASCII text as well
+    assert normalize_text(" Box 1\x0b\x0c $10 \r\n\x1c\rSSN:\t1 ") == "Box 1 $10\n\nSSN: 1"
+    assert normalize_text("Box 1 $10\n") == "Box 1 $10\n"
+
+def test_offsets_map_to_pages_lines_and_tokens():
+    document = ParsedDocument(["Form W-2\nBox 1  $10", "Page two"])
+    assert document.text == "Form W-2\nBox 1 $10\n\nPage two"
+    assert document.page_count == 2
+
+    offset = document.text.index("$10")
+    assert document.page_of(offset) == 0
+    assert document.line_of(offset) == 1
+    assert document.line(1) == "Box 1 $10"
+    assert document.token_at(offset + 1) == "$10"
+    assert document.token_at(document.text.index(" $10")) is None
+
+    offset = document.text.index("two")
+    assert document.page_of(offset) == 1
+    assert document.line(document.line_of(offset)) == "Page two"
+    starts, ends = document.tokens
+    assert [document.text[s:e] for s, e in zip(starts, ends)] == ["Form", "W-2", "Box", "1", "$10", "Page", "two"]
+    np.testing.assert_array_equal(document.line_offsets, [0, 9, 19, 20])
+
+def test_analyzers_reuse_the_parsed_document():
+    document = ParsedDocument([W2_PAGE], doc_type='w2')
+    analysis = W2Analyzer().analyze(document)
+    assert analysis['data']['employer_name'] == 'ACME Corp'
+    assert analysis['data']['employer_ein'] == '12-3456789'
+    assert analysis['data']['deferrals'][0]['code'] == 'D'
+    # Raw text is parsed the same way
+    assert W2Analyzer().analyze(W2_PAGE)['data'] == analysis['data']
+
+    scanner = CountingScanner()
+    document.scan(scanner)
+    document.scan(scanner)
+    assert scanner.calls == 1
+
+    form = ParsedDocument(["Form 1099-NEC\nPayer’s TIN 98-7654321\nBox 1 $1,000.00"])
+    assert Form1099Analyzer().analyze(form)['data']['payer_tin'] == '98-7654321'
+
+def test_store_evicts_least_recently_used_and_expired_documents():
+    store = ParsedDocumentStore(max_documents=2, ttl=3600)
+    first = store.put(ParsedDocument(["one"]))
+    second = store.put(ParsedDocument(["two"]))
+    assert store.get(first).text == "one"
+    store.put(ParsedDocument(["three"]))
+    assert store.get(second) is None
+    assert store.get(first) is not None
+
+    store.ttl = 0
+    time.sleep(0.01)
+    assert store.get(first) is None
+    assert store.get_stats()['evicted'] == 2
+
+def test_processor_stores_the_parsed_document(tmp_path, fake_ocr_pool):
+    store = ParsedDocumentStore()
+    processor = DocumentProcessor(temp_dir=str(tmp_path / "temp"), ocr_pool=fake_ocr_pool(W2_PAGE, W2_WORDS, check_text="Form W-2 Wage and Tax Statement 2023"), document_store=store)
+    result = processor.process_pages(1, iter([np.full((1100, 850), 255, dtype=np.uint8)]), 'w2')
+
+    document = store.get(result['document_id'])
+    assert document.doc_type == 'w2'
+    assert document.text == normalize_text(W2_PAGE)
+    assert document.words[0]['text'] == ['Box', '1']
+    assert document.confidence == result['confidence']
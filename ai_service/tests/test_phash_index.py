@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+from ..src.phash_index import PageHashIndex, page_signature, hamming_distance, text_similarity
+from ..src.ocr_store import OCRStore
+from ..src.document_processor import DocumentProcessor
+
+def form_page(amount, seed=0):
+    rng = np.random.default_rng(seed)
+    page = np.full((1100, 850), 255, dtype=np.uint8)
+    for row in range(12):
+        cv2.rectangle(page, (60, 80 + row * 80), (790, 140 + row * 80), 0, 2)
+    cv2.putText(page, f"Box 1 {amount}", (80, 120), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+    page[rng.random(page.shape) < 0.01] = 0
+    return page
+
+def random_signatures(rng, count):
+    return rng.integers(0, 2 ** 63, size=(count, 2), dtype=np.uint64) * np.uint64(2)
+
+def test_rescan_is_close_and_different_layout_is_far():
+    original = form_page("50,000.00")
+    rescan = cv2.GaussianBlur(form_page("50,000.00", seed=1), (3, 3), 0)
+    other = np.full((1100, 850), 255, dtype=np.uint8)
+    cv2.putText(other, "Dear taxpayer", (80, 400), cv2.FONT_HERSHEY_SIMPLEX, 2.0, 0, 3)
+
+    assert hamming_distance(page_signature(original), page_signature(rescan)) <= 10
+    assert hamming_distance(page_signature(original), page_signature(other)) > 20
+
+@pytest.mark.parametrize("max_distance", [4, 10, 16])
+def test_query_matches_brute_force(max_distance):
+    rng = np.random.default_rng(max_distance)
+    stored = random_signatures(rng, 3000)
+    index = PageHashIndex(max_distance=max_distance, buffer_size=64)
+    index.add_many(stored[:2000], range(2000))
+    for ref in range(2000, 3000):
+        index.add((int(stored[ref, 0]), int(stored[ref, 1])), ref)
+    assert len(index) == 3000
+    assert index.get_stats()['merges'] > 1
+
+    for _ in range(50):
+        query = stored[rng.integers(3000)].copy()
+        for bit in rng.choice(128, size=rng.integers(0, max_distance + 3), replace=False):
+            query[bit // 64] ^= np.uint64(1) << np.uint64(bit % 64)
+        signature = (int(query[0]), int(query[1]))
+        expected = sorted(
+            (hamming_distance(signature, (int(h[0]), int(h[1]))), ref)
+            for ref, h in enumerate(stored)
+            if hamming_distance(signature, (int(h[0]), int(h[1]))) <= max_distance
+        )
+        assert sorted((d, r) for r, d in index.query(signature)) == expected
+
+def test_removed_entries_are_not_found():
+    rng = np.random.default_rng(1)
+    stored = random_signatures(rng, 1000)
+    index = PageHashIndex(max_distance=10, buffer_size=64)
+    index.add_many(stored[:900], range(900))
+    # Some entries are merged, the rest still in the buffer
+    for ref in range(900, 1000):
+        index.add((int(stored[ref, 0]), int(stored[ref, 1])), ref)
+    removed = set(rng.choice(1000, size=400, replace=False).tolist())
+    assert index.remove(sorted(removed)) == 400
+    assert index.remove([5000]) == 0
+    assert len(index) == 600
+
+    for ref, h in enumerate(stored):
+        found = [r for r, _ in index.query((int(h[0]), int(h[1])))]
+        assert (ref in found) == (ref not in removed)
+    # A removed page can be indexed again
+    ref = min(removed)
+    signature = (int(stored[ref, 0]), int(stored[ref, 1]))
+    index.add(signature, 5000)
+    assert index.nearest(signature) == (5000, 0)
+
+def test_text_similarity_uses_numbers():
+    stored = "Form W-2 Wage and Tax Statement 2023 Box 1 50,000.00 Box 2 8,000.00 SSN 123-45-6789"
+    assert text_similarity("W-2 2023 Box 1 50000.00 Box 2 8000.00 123-45-6789", stored) == 1.0
+    assert text_similarity("Form W-2 Wage and Tax Statement 2023 Box 1 61,250.00 Box 2 9,800.00 SSN 987-65-4321", stored) < 0.5
+
+W2_TEXT = "Form W-2 Wage and Tax Statement 2023 Box 1 50,000.00 Box 2 8,000.00"
+
+def test_processor_reuses_verified_near_duplicates(tmp_path, fake_ocr_pool):
+    store = OCRStore(str(tmp_path / "ocr.sqlite3"))
+    first, rescan = tmp_path / "first.png", tmp_path / "rescan.png"
+    Image.fromarray(form_page("50,000.00")).save(first)
+    Image.fromarray(form_page("50,000.00", seed=1)).save(rescan)
+
+    pool = fake_ocr_pool(W2_TEXT, {'text': W2_TEXT.split(), 'conf': [90.0]})
+    processor = DocumentProcessor(
+        temp_dir=str(tmp_path / "temp"), ocr_pool=pool, ocr_store=store, page_index=PageHashIndex()
+    )
+    processor.process_document(str(first), 'w2')
+    assert pool.page_calls == 1
+
+    result = processor.process_document(str(rescan))
+    assert result['from_store'] is False
+    assert pool.page_calls == 1
+    assert result['results'][0]['text'] == W2_TEXT
+    assert result['results'][0]['near_duplicate']['similarity'] == 1.0
+    assert result['classification']['stage'] == 'near_duplicate'
+
+    # Same template, different amounts: the hash matches but verification rejects it
+    other = tmp_path / "other.png"
+    Image.fromarray(form_page("50,000.00", seed=2)).save(other)
+    pool.check_text = "Form W-2 2023 Box 1 72,400.00 Box 2 11,900.00"
+    result = processor.process_document(str(other), 'w2')
+    assert pool.page_calls == 2
+    assert 'near_duplicate' not in result['results'][0]
+
+    # A restarted processor rebuilds its index from the store
+    restarted = DocumentProcessor(
+        temp_dir=str(tmp_path / "temp"), ocr_pool=pool, ocr_store=store, page_index=PageHashIndex()
+    )
+    assert len(restarted.page_index) == 3
+    store.close()
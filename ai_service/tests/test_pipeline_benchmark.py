@@ -0,0 +1,66 @@
+import os
+import pytest
+from ..benchmarks.synthetic_corpus import generate_corpus, _lines
+from ..benchmarks.pipeline_benchmark import compare, run
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    corpus_dir = tmp_path_factory.mktemp("corpus")
+    return str(corpus_dir), generate_corpus(str(corpus_dir), documents=8, seed=7)
+
+class GroundTruthProcessor:
+    """Stands in for DocumentProcessor by 'reading' the rendered ground truth."""
+    def __init__(self, manifest, garble=()):
+        self.entries = {entry['file']: entry for entry in manifest['documents']}
+        self.garble = garble
+
+    def process_document(self, file_path, doc_type):
+        entry = self.entries[os.path.basename(file_path)]
+        text = "\n".join(_lines(entry['form_type'], entry['year'], entry['fields']))
+        if entry['file'] in self.garble:
+            text = text.replace("Box 1 ", "Box I ")
+        return {
+            'success': True,
+            'doc_type': entry['doc_type'],
+            'pages': entry['pages'],
+            'results': [{'page': 1, 'text': text}],
+            'classification': {'form_type': entry['form_type'], 'year': entry['year']}
+        }
+
+def test_corpus_is_reproducible(corpus, tmp_path):
+    corpus_dir, manifest = corpus
+    again = generate_corpus(str(tmp_path), documents=8, seed=7)
+    assert again == manifest
+
+    variants = {entry['distortions']['variant'] for entry in manifest['documents']}
+    assert variants == {'clean', 'degraded', 'jpeg', 'pdf'}
+    assert {entry['form_type'] for entry in manifest['documents']} >= {'W-2', '1099-NEC'}
+    assert all(entry['pages'] == 2 for entry in manifest['documents'] if entry['file'].endswith('.pdf'))
+    for entry in manifest['documents']:
+        assert os.path.exists(os.path.join(corpus_dir, entry['file']))
+
+def test_run_reports_metrics(corpus):
+    corpus_dir, manifest = corpus
+    garbled = manifest['documents'][0]['file']
+    results = run(corpus_dir, processor=GroundTruthProcessor(manifest, garble={garbled}), concurrency=2)
+
+    assert results['documents'] == 8
+    assert results['pages'] == sum(entry['pages'] for entry in manifest['documents'])
+    assert results['pages_per_sec'] > 0
+    assert results['page_latency_p95_ms'] >= results['page_latency_p50_ms']
+    assert results['peak_rss_mb'] > 0
+    assert results['classification_accuracy'] == 1.0
+    assert 0.9 < results['field_accuracy'] < 1.0
+    assert results['field_accuracy_by_field']['employer_ein'] == 1.0
+    record = next(r for r in results['records'] if r['file'] == garbled)
+    assert record['fields']['wages'] is False
+
+def test_compare_flags_regressions():
+    baseline = {'pages_per_sec': 10.0, 'page_latency_p95_ms': 100.0, 'field_accuracy': 0.95}
+    current = {'pages_per_sec': 9.8, 'page_latency_p95_ms': 130.0, 'field_accuracy': 0.80}
+    comparison = compare(current, baseline, tolerance=0.05)
+
+    assert comparison['pages_per_sec']['regressed'] is False
+    assert comparison['page_latency_p95_ms']['regressed'] is True
+    assert comparison['field_accuracy']['regressed'] is True
+    assert 'peak_rss_mb' not in comparison
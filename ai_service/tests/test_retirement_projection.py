@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from ..src.retirement_projection import RetirementProjector, plan_from_w2
+
+def _fixed_plan(**changes):
+    """A plan without volatility whose returns match inflation, so balances follow by hand."""
+    plan = {
+        'age': 60, 'retirement_age': 65, 'end_age': 70, 'traditional_balance': 100000.0,
+        'traditional_contribution': 10000.0, 'expected_return': 0.02, 'inflation': 0.02, 'volatility': 0.0,
+        'tax_drag': 0.0, 'annual_spending': 40000.0, 'tax_year': 2024
+    }
+    return {**plan, **changes}
+
+def test_fixed_returns_match_hand_computation():
+    result = RetirementProjector(paths=50).project(_fixed_plan())
+    assert result['balance_at_retirement']['p50'] == pytest.approx(150000.0)
+    # 40,000 from the traditional account at 65 is taxed on 40,000 - 16,550 of deductions: 2,582
+    assert result['first_year_income']['p50'] == pytest.approx(37418.0)
+    assert result['balance_bands']['p50'][5:] == pytest.approx([110000.0, 70000.0, 30000.0, 0.0, 0.0])
+    # At 68 only 30,000 is left
+    assert result['income_bands']['p50'][8] == pytest.approx(28618.0)
+    assert (result['success_probability'], result['depletion_age']) == (0.0, 68)
+    assert result['rmd_start_age'] == 75
+    assert result['lifetime_rmds']['p50'] == 0.0
+
+def test_rmds_start_at_the_starting_age():
+    projector = RetirementProjector(paths=20)
+    # Born in 1950: RMDs from 72, and spending below the RMD is covered by it
+    result = projector.project(_fixed_plan(age=74, retirement_age=60, end_age=77, traditional_contribution=0.0,
+                                           traditional_balance=1000000.0, annual_spending=0.0))
+    first = 1000000.0 / 25.5
+    assert result['rmd_start_age'] == 72
+    assert result['rmd_bands']['p50'][0] == pytest.approx(first)
+    # The RMD beyond the spending pays its tax and is reinvested, leaving no income
+    assert result['income_bands']['p50'][0] == pytest.approx(0.0, abs=1e-6)
+    assert result['balance_bands']['p50'][0] == pytest.approx(1000000.0 - 2487.88, abs=0.01)
+    fields = projector.retirement_fields(result)
+    rmds = fields['required_minimum_distributions']
+    assert (rmds['start_age'], rmds['first_year'], rmds['first_rmd']) == (72, 2024, round(first, 2))
+    assert [row['age'] for row in rmds['schedule']] == [74, 75, 76]
+    assert fields['retirement_income_projection']['success_probability'] == 1.0
+
+def test_seeded_paths_are_reproducible():
+    projector = RetirementProjector(paths=2000, time_budget_ms=10000.0)
+    plan = {'age': 40, 'traditional_balance': 50000.0, 'traditional_contribution': 12000.0, 'seed': 7, 'tax_year': 2024}
+    plan = projector._normalize(plan)
+    first, second = projector._simulate(plan, 2000), projector._simulate(plan, 2000)
+    assert first == second
+    assert projector._simulate({**plan, 'seed': 8}, 2000) != first
+    # Fewer paths are the first paths of more
+    growth = projector._returns(plan, 2000, 55)
+    assert np.array_equal(projector._returns(plan, 500, 55), growth[:, :500])
+    # The arithmetic mean return is the expected one
+    assert (growth * 1.025).mean() == pytest.approx(1.06, abs=0.005)
+    assert np.log(growth * 1.025).std() == pytest.approx(np.sqrt(np.log1p((0.15 / 1.06) ** 2)), abs=0.005)
+
+def test_saving_years_match_a_loop():
+    rng = np.random.default_rng(3)
+    growth = rng.uniform(0.8, 1.3, (12, 40))
+    contributions = rng.uniform(0, 5000, 12)
+    expected, balance = [], np.full(40, 1000.0)
+    for t in range(12):
+        balance = (balance + contributions[t]) * growth[t]
+        expected.append(balance)
+    assert np.allclose(RetirementProjector._save(1000.0, contributions, growth), expected)
+
+def test_time_budget_and_cache():
+    projector = RetirementProjector(paths=10000, min_paths=300, time_budget_ms=0.01)
+    plan = {'age': 30, 'traditional_balance': 10000.0, 'traditional_contribution': 8000.0, 'tax_year': 2024}
+    first = projector.project(plan)
+    second = projector.project({**plan, 'seed': 1})
+    # No number of paths fits the budget, so both use the fewest allowed
+    assert (first['paths'], second['paths']) == (300, 300)
+    assert projector.get_stats()['coarsened'] == 2
+    again = projector.project({**plan, 'seed': 1})
+    assert again['cached'] and not second['cached']
+    assert {k: v for k, v in again.items() if k != 'cached'} == {k: v for k, v in second.items() if k != 'cached'}
+    assert projector.get_stats()['hits'] == 1
+
+def test_coarsened_projections_are_cached_by_their_paths():
+    projector = RetirementProjector(paths=2000, min_paths=300, time_budget_ms=0.01)
+    plan = {'age': 30, 'traditional_balance': 10000.0, 'traditional_contribution': 8000.0, 'tax_year': 2024, 'seed': 3}
+    coarse = projector.project(plan)
+    normalized = projector._normalize(plan)
+    assert coarse['paths'] == 300
+    assert coarse['fingerprint'] == projector.fingerprint(normalized, 300) != projector.fingerprint(normalized)
+
+    # Once the budget allows all paths, the coarse projection is not reused
+    projector.time_budget_ms = None
+    full = projector.project(plan)
+    assert not full['cached'] and full['paths'] == 2000
+    fresh = RetirementProjector(paths=2000, time_budget_ms=None).project(plan)
+    same = lambda result: {k: v for k, v in result.items() if k not in ('cached', 'elapsed_ms')}
+    assert same(full) == same(fresh)
+
+def test_time_model_separates_fixed_overhead():
+    projector = RetirementProjector(paths=10000, time_budget_ms=100.0)
+    # A one-year plan's 2 ms is mostly overhead, so 65 years of all paths still fit
+    for _ in range(5):
+        projector._record_timing(10000, 1, 0.002)
+    assert projector._fit_paths(65) == 10000
+    # Slow long projections do reduce the paths
+    projector._record_timing(10000, 65, 0.2)
+    assert projector.min_paths < projector._fit_paths(65) < 10000
+
+def test_invalid_plans():
+    projector = RetirementProjector(paths=10)
+    for plan in ({}, {'age': 70, 'end_age': 60}, {'age': 40, 'traditional_balance': -1.0},
+                 {'age': 40, 'volatility': -0.1}, {'age': 40, 'filing_status': 'unknown'}):
+        with pytest.raises(ValueError):
+            projector.project(plan)
+
+def test_plan_from_w2():
+    data = {'tax_year': '2024', 'deferrals': [{'code': 'D', 'amount': 15000.0}, {'code': 'AA', 'amount': 3000.0},
+                                               {'code': 'DD', 'amount': 8000.0}]}
+    plan = plan_from_w2(data, age=35, traditional_balance=40000.0)
+    assert (plan['traditional_contribution'], plan['roth_contribution']) == (15000.0, 3000.0)
+    assert (plan['tax_year'], plan['traditional_balance']) == (2024, 40000.0)
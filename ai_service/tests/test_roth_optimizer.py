@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from ..src.roth_optimizer import RMDTable, RothConversionOptimizer
+
+PLAN = {
+    'traditional_balance': 1000000.0,
+    'age': 60,
+    'years': 30,
+    'other_income': [60000.0] * 7 + [35000.0],
+    'growth_rate': 0.05,
+    'tax_year': 2024,
+    'heir_income': 120000.0
+}
+
+def test_rmd_table():
+    table = RMDTable()
+    assert [table.start_age(year) for year in (1950, 1951, 1959, 1960)] == [72, 73, 73, 75]
+    assert table.divisor(73) == 26.5
+    assert table.divisor(120) == table.divisor(130) == 2.0
+
+def _brute_force(optimizer, plan, levels=16):
+    """Least lifetime tax over every schedule of evenly spaced and bracket-filling conversions."""
+    plan = optimizer._normalize(plan)
+    schedules = optimizer._schedules(plan)
+    _, rmd_fractions = optimizer._rmd_ages(plan)
+    growth = 1.0 + plan['growth_rate']
+    discount = 1.0 + plan['discount_rate']
+
+    def best(t, balance):
+        if t == len(schedules):
+            return float(optimizer._heir_tax(plan, schedules[-1][0], np.array(balance)))
+        schedule, deduction = schedules[t]
+        rmd = balance * rmd_fractions[t]
+        income = plan['other_income'][t] + rmd - deduction
+        candidates = np.clip(np.concatenate((np.linspace(0.0, balance - rmd, levels), schedule.thresholds[1:] - income)), 0.0, balance - rmd)
+        return min(
+            float(schedule.tax(max(income + conversion, 0.0))) / discount ** t + best(t + 1, (balance - rmd - conversion) * growth)
+            for conversion in np.unique(candidates)
+        )
+    return best(0, plan['traditional_balance'])
+
+def test_matches_brute_force():
+    optimizer = RothConversionOptimizer()
+    for plan in (
+        {'traditional_balance': 200000.0, 'age': 73, 'years': 3, 'other_income': 20000.0, 'tax_year': 2024, 'heir_income': 150000.0},
+        {'traditional_balance': 600000.0, 'age': 64, 'years': 3, 'other_income': [90000.0, 30000.0], 'heir_income': 60000.0, 'heir_years': 5}
+    ):
+        result = optimizer.optimize(plan)
+        brute_force = _brute_force(optimizer, plan)
+        assert result['savings'] > 0
+        assert result['lifetime_tax'] <= brute_force + 0.01
+        assert result['lifetime_tax'] == pytest.approx(brute_force, rel=0.002)
+
+def test_thirty_year_schedule():
+    result = RothConversionOptimizer().optimize(PLAN)
+    schedule = result['schedule']
+    assert len(schedule) == 30
+    assert result['rmd_start_age'] == 75
+    assert result['savings'] > 0
+    assert result['lifetime_tax'] < result['baseline_lifetime_tax']
+    # Conversions fill the low brackets before RMDs start and the heirs' higher bracket applies
+    assert schedule[0]['conversion'] > 0
+    assert all(row['marginal_rate'] <= 0.24 for row in schedule)
+    assert all(row['rmd'] == 0 for row in schedule if row['age'] < 75)
+    for row, following in zip(schedule, schedule[1:]):
+        expected = (row['traditional_balance'] - row['rmd'] - row['conversion']) * 1.05
+        assert following['traditional_balance'] == pytest.approx(expected, abs=0.05)
+    assert sum(row['conversion'] for row in schedule) == pytest.approx(result['total_conversions'], abs=0.5)
+
+def test_no_conversions_when_they_do_not_pay():
+    optimizer = RothConversionOptimizer()
+    result = optimizer.optimize({'traditional_balance': 300000.0, 'age': 62, 'years': 10, 'other_income': 400000.0, 'heir_income': 0.0})
+    assert result['savings'] == 0.0
+    assert result['total_conversions'] == 0.0
+    fields = optimizer.retirement_fields(result)
+    assert not fields['roth_conversion_opportunity']['recommended']
+    assert fields['retirement_tax_planning']['conversion_schedule'] == result['schedule']
+
+def test_results_are_cached_by_fingerprint():
+    optimizer = RothConversionOptimizer(cache_size=1)
+    first = optimizer.optimize(PLAN)
+    again = optimizer.optimize({**PLAN, 'other_income': [60000.0] * 7 + [35000.0] * 23})
+    assert not first['cached'] and again['cached']
+    assert again['fingerprint'] == first['fingerprint']
+    again['schedule'].clear()
+    assert optimizer.optimize(PLAN)['schedule']
+
+    optimizer.optimize({**PLAN, 'growth_rate': 0.04})
+    assert not optimizer.optimize(PLAN)['cached']
+    assert optimizer.get_stats()['hits'] == 2
+
+def test_grid_is_coarsened_to_the_time_budget():
+    optimizer = RothConversionOptimizer(max_states=5000, time_budget_ms=50)
+    result = optimizer.optimize(PLAN)
+    assert optimizer.min_states <= result['states'] < 5000
+    assert optimizer.get_stats()['coarsened'] >= 1
+    assert result['savings'] > 0
+
+def test_coarsened_results_are_cached_by_their_grid():
+    optimizer = RothConversionOptimizer(max_states=400, min_states=25, time_budget_ms=0.001)
+    coarse = optimizer.optimize(PLAN)
+    plan = optimizer._normalize(PLAN)
+    assert coarse['states'] == 25
+    assert coarse['fingerprint'] == optimizer.fingerprint(plan, 25) != optimizer.fingerprint(plan)
+    assert optimizer.optimize(PLAN)['cached']
+
+    # Once the budget allows the full grid, the coarse result is not reused
+    optimizer.time_budget_ms = 60000.0
+    full = optimizer.optimize(PLAN)
+    assert not full['cached'] and full['states'] == 400
+    assert full['fingerprint'] == optimizer.fingerprint(plan)
+    # The full grid's result is preferred from then on, even under load
+    optimizer.time_budget_ms = 0.001
+    assert optimizer.optimize(PLAN)['states'] == 400
+
+def test_invalid_plans():
+    optimizer = RothConversionOptimizer()
+    with pytest.raises(ValueError):
+        optimizer.optimize({'traditional_balance': 1000.0})
+    with pytest.raises(ValueError):
+        optimizer.optimize({'traditional_balance': 1000.0, 'age': 60, 'filing_status': 'married'})
@@ -0,0 +1,109 @@
+import json
+import numpy as np
+import pytest
+from ..src.tax_engine import FILING_STATUSES, PARAMETERS_DIR, TaxEngine, get_tax_engine
+from ..src.tax_analyzer import TaxAnalyzer
+
+def _reference_tax(brackets, taxable_income):
+    """Tax summed bracket by bracket."""
+    tax = 0.0
+    bounds = [threshold for threshold, _ in brackets[1:]] + [float('inf')]
+    for (threshold, rate), upper in zip(brackets, bounds):
+        if taxable_income > threshold:
+            tax += (min(taxable_income, upper) - threshold) * rate
+    return tax
+
+def test_parameters_cover_every_year_and_filing_status():
+    engine = get_tax_engine()
+    assert engine.tax_years == [2023, 2024]
+    for year in engine.tax_years:
+        for status in FILING_STATUSES:
+            assert engine.schedule(year, status).tax_year == year
+        assert engine.versions[year].startswith(str(year))
+
+def test_tax_matches_bracket_by_bracket_sum():
+    engine = get_tax_engine()
+    with open(f"{PARAMETERS_DIR}/2023.json") as f:
+        parameters = json.load(f)['filing_statuses']
+    incomes = np.array([0.0, 5000.0, 11000.0, 11000.5, 44725.0, 75000.0, 250000.0, 1e6])
+    for status in FILING_STATUSES:
+        schedule = engine.schedule(2023, status)
+        expected = [_reference_tax(parameters[status]['brackets'], income) for income in incomes]
+        np.testing.assert_allclose(schedule.tax(incomes), expected)
+
+    # Incomes on a threshold are taxed at the lower bracket; there are no gaps between brackets
+    schedule = engine.schedule(2023, 'single')
+    np.testing.assert_array_equal(schedule.marginal_rate([11000.0, 11000.5, 11001.0, 600000.0]), [0.10, 0.12, 0.12, 0.37])
+
+def test_compute_mixes_years_and_filing_statuses():
+    engine = get_tax_engine()
+    result = engine.compute(
+        [75000.0, 75000.0, 1e6, -10.0],
+        [2023, 2024, 2024, 2024],
+        ['single', 'single', 'head_of_household', 'married_filing_jointly']
+    )
+    np.testing.assert_allclose(result['taxable_income'], [61150.0, 60400.0, 1e6 - 21900.0, 0.0])
+    np.testing.assert_allclose(result['tax'], [8760.5, 8341.0, 318392.0, 0.0])
+    np.testing.assert_array_equal(result['marginal_rate'], [0.22, 0.22, 0.37, 0.10])
+    assert result['effective_rate'][3] == 0.0
+    # Scalars in, scalars out
+    assert engine.compute(75000.0, 2023)['tax'] == pytest.approx(8760.5)
+    with pytest.raises(ValueError):
+        engine.compute([1.0], 1999)
+
+def test_phase_outs_and_capital_gains():
+    schedule = get_tax_engine().schedule(2024, 'single')
+    # $50 of credit is lost per $1,000 (or part of it) above the threshold
+    np.testing.assert_allclose(schedule.phase_out('child_tax_credit', [200000.0, 200001.0, 210000.0, 300000.0], 2000.0), [2000.0, 1950.0, 1500.0, 0.0])
+    np.testing.assert_allclose(schedule.phase_out('roth_ira_contribution', [146000.0, 153500.0, 161000.0], 7000.0), [7000.0, 3500.0, 0.0])
+    # Gains stacked on ordinary income: 0% up to $47,025 and 15% above
+    assert schedule.capital_gains_tax(40000.0, 10000.0) == pytest.approx(2975.0 * 0.15)
+
+def test_self_employment_tax_stops_social_security_at_the_wage_base():
+    engine = get_tax_engine()
+    np.testing.assert_allclose(
+        engine.self_employment_tax([10000.0, 400000.0], [2023, 2024]),
+        [10000 * 0.9235 * 0.153, 168600 * 0.124 + 400000 * 0.9235 * 0.029]
+    )
+
+def test_custom_parameter_directory(tmp_path):
+    (tmp_path / "2030.json").write_text(json.dumps({
+        'tax_year': 2030,
+        'version': '2030.0',
+        'filing_statuses': {'single': {'brackets': [[0, 0.1], [1000, 0.5]], 'standard_deduction': 0}}
+    }))
+    engine = TaxEngine.from_directory(str(tmp_path))
+    assert engine.nearest_year(2023) == 2030
+    assert engine.compute(2000.0, 2030)['tax'] == pytest.approx(600.0)
+
+    (tmp_path / "2031.json").write_text(json.dumps({
+        'tax_year': 2031,
+        'filing_statuses': {'single': {'brackets': [[0, 0.1], [0, 0.2]], 'standard_deduction': 0}}
+    }))
+    with pytest.raises(ValueError):
+        TaxEngine.from_directory(str(tmp_path))
+
+def test_document_tax_calculation():
+    analyzer = TaxAnalyzer(batch_workers=1)
+    analysis = analyzer.analyze_document('w2', "Form W-2 Wage and Tax Statement 2023\nBox 1 $75,000.00\nBox 2 $9,000.00\n")
+    calculation = analyzer.calculate_tax('w2', analysis)
+    assert calculation['tax_year'] == 2023
+    assert calculation['total_tax'] == pytest.approx(8760.5)
+    assert calculation['estimated_refund'] == pytest.approx(239.5)
+    assert calculation['tax_brackets'][-1]['rate'] == 0.22
+
+    analysis = analyzer.analyze_document('1099', "Form 1099-NEC 2024\nBox 1 $10,000.00\n")
+    calculation = analyzer.calculate_tax('1099', analysis, filing_status='married_filing_jointly')
+    assert calculation['self_employment_tax'] == pytest.approx(1412.96)
+    assert calculation['estimated_payment'] == pytest.approx(1412.96)
+    assert analyzer.calculate_tax('1040', analyzer.analyze_document('1040', "Form 1040")) is None
+
+def test_1099_tax_counts_federal_income_once_and_deducts_half_the_se_tax():
+    analyzer = TaxAnalyzer(batch_workers=1)
+    analysis = analyzer.analyze_document('1099', "Form 1099-NEC 2024\nBox 1 $50,000.00\nState income $50,000.00\n")
+    calculation = analyzer.calculate_tax('1099', analysis)
+    se_tax = 50000.0 * 0.9235 * 0.153
+    assert calculation['self_employment_tax'] == pytest.approx(se_tax, abs=0.01)
+    # 50,000 less half the SE tax and the 2024 standard deduction of 14,600; the state box is not added
+    assert calculation['taxable_income'] == pytest.approx(50000.0 - se_tax / 2 - 14600.0, abs=0.01)
+    assert calculation['taxable_income'] == pytest.approx(31868.0, abs=1.0)
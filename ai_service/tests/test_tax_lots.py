@@ -0,0 +1,169 @@
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from ..src.analyzers.brokerage_statement import _held_over_a_year
+from ..src.tax_lots import TaxLotEngine
+
+def _trade(security, day, side, quantity, price, fees=0.0):
+    return {'security': security, 'date': day, 'side': side, 'quantity': quantity, 'price': price, 'fees': fees}
+
+def _random_trades(count, seed=0, securities=('AAA', 'BBB', 'CCC')):
+    """Trades of a few securities over 18 months, never selling more shares than are held."""
+    rng = np.random.default_rng(seed)
+    start, held, trades = date(2023, 1, 2), {name: 0 for name in securities}, []
+    for day in np.sort(rng.integers(0, 550, count)).tolist():
+        security = securities[int(rng.integers(0, len(securities)))]
+        price = round(float(rng.uniform(20, 80)), 2)
+        fees = float(rng.choice([0.0, 1.0]))
+        if held[security] and rng.random() < 0.45:
+            quantity = int(rng.integers(1, held[security] + 1))
+            held[security] -= quantity
+            trades.append(_trade(security, (start + timedelta(day)).isoformat(), 'sell', quantity, price, fees))
+        else:
+            quantity = int(rng.integers(1, 20))
+            held[security] += quantity
+            trades.append(_trade(security, (start + timedelta(day)).isoformat(), 'buy', quantity, price, fees))
+    return trades
+
+def _share_by_share(trades, window=30):
+    """
+    Every share its own lot, and every share sold at a loss compared with
+    every share of every purchase: sold and disallowed amounts by sale, and
+    gains by holding period.
+    """
+    order = sorted(range(len(trades)), key=lambda i: (trades[i]['security'], trades[i]['date'], i))
+    day = lambda i: date.fromisoformat(trades[i]['date'])
+    shares = []
+    for i in order:
+        trade = trades[i]
+        if trade['side'] == 'buy':
+            per_share = trade['price'] + trade['fees'] / trade['quantity']
+            shares += [{'security': trade['security'], 'buy': i, 'day': day(i), 'basis': per_share, 'acquired': day(i),
+                        'arrived': False, 'sold': False, 'replacement': False} for _ in range(trade['quantity'])]
+    sales, gains = {}, {'short_term': 0.0, 'long_term': 0.0}
+    for i in order:
+        trade = trades[i]
+        if trade['side'] == 'buy':
+            for share in shares:
+                if share['buy'] == i:
+                    share['arrived'] = True
+            continue
+        sale_day, per_share = day(i), trade['price'] - trade['fees'] / trade['quantity']
+        sold = [share for share in shares if share['security'] == trade['security'] and share['arrived'] and not share['sold']][:trade['quantity']]
+        for share in sold:
+            share['sold'] = True
+        basis = disallowed = 0.0
+        for share in sold:
+            loss = share['basis'] - per_share
+            basis += share['basis']
+            washed = 0.0
+            if loss > 1e-9:
+                for other in shares:
+                    if (other['security'] == trade['security'] and abs((other['day'] - sale_day).days) <= window
+                            and other['buy'] != share['buy'] and not other['sold'] and not other['replacement']):
+                        other['basis'] += loss
+                        other['acquired'] = other['day'] - (sale_day - share['acquired'])
+                        other['replacement'] = True
+                        washed = loss
+                        break
+            disallowed += washed
+            term = 'long_term' if _held_over_a_year(share['acquired'], sale_day) else 'short_term'
+            gains[term] += per_share - share['basis'] + washed
+        sales[i] = (basis, disallowed)
+    open_basis = sum(share['basis'] for share in shares if not share['sold'])
+    return sales, gains, open_basis
+
+def test_wash_sale_defers_the_loss_to_the_replacement():
+    engine = TaxLotEngine()
+    ledger = engine.process([
+        _trade('XYZ', '2024-01-02', 'buy', 100, 50.0),
+        _trade('XYZ', '2024-03-01', 'sell', 100, 40.0),
+        _trade('XYZ', '2024-03-15', 'buy', 60, 42.0),
+        _trade('XYZ', '2024-06-01', 'sell', 60, 45.0),
+    ])
+    first, second = ledger.records(ledger.realized)
+    assert (first['wash_sale_disallowed'], first['gain']) == (600.0, -400.0)
+    # The replacement's basis includes the disallowed loss and its holding period the 59 days of the sold shares
+    assert (second['cost_basis'], second['date_acquired'], second['gain']) == (3120.0, '2024-01-16', -420.0)
+    assert ledger.totals['gain'] == -820.0
+    assert not len(ledger.open_lots)
+
+def test_matches_share_by_share_comparison():
+    engine = TaxLotEngine()
+    for seed in range(3):
+        trades = _random_trades(300, seed)
+        ledger = engine.process(trades)
+        sales, gains, open_basis = _share_by_share(trades)
+        realized = ledger.realized
+        assert ledger.unmatched_quantity == 0
+        assert realized['wash_sale_disallowed'].sum() > 0
+        for sell, (basis, disallowed) in sales.items():
+            lots = realized[realized['sell'] == sell]
+            assert lots['cost_basis'].sum() == pytest.approx(basis, abs=1e-6)
+            assert lots['wash_sale_disallowed'].sum() == pytest.approx(disallowed, abs=1e-6)
+        assert ledger.totals['short_term_gain'] == pytest.approx(gains['short_term'], abs=0.01)
+        assert ledger.totals['long_term_gain'] == pytest.approx(gains['long_term'], abs=0.01)
+        assert ledger.totals['open_cost_basis'] == pytest.approx(open_basis, abs=0.01)
+
+def test_replacement_rules():
+    engine = TaxLotEngine()
+    # The rest of the lot a sale came from is not its replacement
+    ledger = engine.process([_trade('XYZ', '2024-01-02', 'buy', 100, 50.0), _trade('XYZ', '2024-01-10', 'sell', 50, 40.0)])
+    assert ledger.totals['wash_sale_disallowed'] == 0.0
+    # A purchase in the 30 days before the sale is; one 31 days after is not
+    ledger = engine.process([
+        _trade('XYZ', '2024-01-02', 'buy', 100, 50.0),
+        _trade('XYZ', '2024-02-01', 'buy', 30, 45.0),
+        _trade('XYZ', '2024-03-01', 'sell', 100, 40.0),
+        _trade('XYZ', '2024-04-01', 'buy', 100, 39.0),
+    ])
+    assert ledger.totals['wash_sale_disallowed'] == 300.0
+    assert ledger.records(ledger.open_lots)[0]['wash_sale_adjustment'] == 300.0
+    # Shares replace one sale only
+    ledger = engine.process({
+        'security': ['XYZ'] * 5,
+        'date': ['2023-10-02', '2023-10-03', '2024-02-01', '2024-02-02', '2024-02-10'],
+        'side': ['buy', 'buy', 'sell', 'sell', 'buy'],
+        'quantity': [10, 10, 10, 10, 10],
+        'price': [50.0, 50.0, 40.0, 40.0, 40.0]
+    })
+    assert ledger.realized['wash_sale_disallowed'].tolist() == [100.0, 0.0]
+    analysis = engine.wash_sale_analysis(ledger)
+    assert (analysis['wash_sales'], analysis['deferred_in_open_lots']) == (1, 100.0)
+    assert len(analysis['recommendations']) == 2
+
+def test_harvesting_candidates():
+    engine = TaxLotEngine()
+    ledger = engine.process([
+        _trade('OLD', '2022-01-03', 'buy', 10, 100.0),
+        _trade('NEW', '2024-05-01', 'buy', 10, 100.0),
+        _trade('RECENT', '2024-01-02', 'buy', 10, 100.0),
+        _trade('RECENT', '2024-05-20', 'buy', 1, 60.0),
+        _trade('GAIN', '2024-01-02', 'buy', 10, 10.0),
+    ])
+    prices = {'OLD': 50.0, 'NEW': 70.0, 'RECENT': 50.0, 'GAIN': 20.0}
+    opportunities = engine.harvest(ledger, prices, as_of='2024-06-01', taxable_income=100000.0, tax_year=2024)
+    assert [o['security'] for o in opportunities] == ['OLD', 'NEW', 'RECENT', 'RECENT']
+    old, new = opportunities[:2]
+    assert (old['term'], old['tax_savings']) == ('long_term', 75.0)
+    assert (new['term'], new['tax_savings']) == ('short_term', 66.0)
+    # Selling the January lot of RECENT would be a wash sale with the purchase of May 20; selling that one would not
+    assert [(o['date_acquired'], o['wash_sale_risk']) for o in opportunities[2:]] == [('2024-05-20', False), ('2024-01-02', True)]
+    assert old['repurchase_after'] == '2024-07-02'
+
+    fields = engine.investment_fields(ledger, {'OLD': 50.0})
+    assert fields['unrealized_gains'] == -500.0
+    assert fields['current_value'] == fields['cost_basis'] - 500.0
+    assert fields['tax_loss_harvesting_opportunities'][0]['tax_savings'] is None
+
+def test_invalid_trades():
+    engine = TaxLotEngine()
+    with pytest.raises(ValueError):
+        engine.process([{'security': 'XYZ', 'date': '2024-01-02', 'side': 'buy', 'quantity': 1}])
+    with pytest.raises(ValueError):
+        engine.process([_trade('XYZ', '2024-01-02', 'short', 1, 1.0)])
+    with pytest.raises(ValueError):
+        engine.process([_trade('XYZ', '2024-01-02', 'buy', 0, 1.0)])
+    ledger = engine.process([_trade('XYZ', '2024-01-02', 'buy', 5, 1.0), _trade('XYZ', '2024-01-03', 'sell', 8, 2.0)])
+    assert ledger.unmatched_quantity == 3.0
+    assert ledger.totals['proceeds'] == 10.0
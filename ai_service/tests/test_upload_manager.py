@@ -0,0 +1,135 @@
+import hashlib
+import threading
+import time
+import pytest
+from ..src.upload_manager import (
+    UploadManager, UploadError, UploadNotFoundError, OffsetMismatchError, ChecksumMismatchError
+)
+
+DATA = bytes(range(256)) * 40
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def test_interrupted_upload_resumes_from_offset(tmp_path):
+    manager = UploadManager(root_dir=str(tmp_path))
+    upload_id = manager.create("w2.pdf", [len(DATA)], "w2")['upload_id']
+
+    manager.write_chunk(upload_id, 0, 0, DATA[:4000], sha256(DATA[:4000]))
+    # The client lost the response and resends the first chunk
+    with pytest.raises(OffsetMismatchError) as exc_info:
+        manager.write_chunk(upload_id, 0, 0, DATA[:4000])
+    assert exc_info.value.expected == 4000
+
+    # Corrupt chunks are not written
+    with pytest.raises(ChecksumMismatchError):
+        manager.write_chunk(upload_id, 0, 4000, DATA[4000:8000], sha256(b"other"))
+    assert manager.status(upload_id)['offset'] == 4000
+
+    with pytest.raises(UploadError):
+        manager.finalize(upload_id)
+    status = manager.write_chunk(upload_id, 0, 4000, DATA[4000:])
+    assert status['part_completed'] == 0
+    assert status['parts'] == [{'part': 0, 'size': len(DATA), 'offset': len(DATA), 'complete': True}]
+
+    upload = manager.finalize(upload_id, checksum=sha256(DATA))
+    assert upload['content_hash'] == sha256(DATA)
+    with open(upload['paths'][0], 'rb') as f:
+        assert f.read() == DATA
+    # Finalizing again is safe, writing is not
+    assert manager.finalize(upload_id) == upload
+    with pytest.raises(UploadError):
+        manager.write_chunk(upload_id, 0, len(DATA), b"x")
+
+def test_upload_survives_restart(tmp_path):
+    upload_id = UploadManager(root_dir=str(tmp_path)).create("scan.png", [len(DATA)])['upload_id']
+    UploadManager(root_dir=str(tmp_path)).write_chunk(upload_id, 0, 0, DATA[:1000])
+
+    manager = UploadManager(root_dir=str(tmp_path))
+    assert manager.status(upload_id)['offset'] == 1000
+    manager.write_chunk(upload_id, 0, 1000, DATA[1000:])
+    assert manager.finalize(upload_id)['content_hash'] == sha256(DATA)
+
+@pytest.mark.parametrize("filename, part_sizes", [
+    ("notes.txt", [10]),
+    ("scan.pdf", [10, 10]),
+    ("scan.png", []),
+    ("scan.png", [0]),
+    ("scan.png", [2048]),
+])
+def test_invalid_uploads_are_rejected(tmp_path, filename, part_sizes):
+    manager = UploadManager(root_dir=str(tmp_path), max_upload_size=1024)
+    with pytest.raises(UploadError):
+        manager.create(filename, part_sizes)
+
+def test_unknown_and_expired_uploads(tmp_path):
+    upload_id = UploadManager(root_dir=str(tmp_path)).create("scan.png", [10])['upload_id']
+    manager = UploadManager(root_dir=str(tmp_path), expire_after=0)
+    for unknown in ("../../etc", "0" * 32):
+        with pytest.raises(UploadNotFoundError):
+            manager.status(unknown)
+    time.sleep(0.01)
+    with pytest.raises(UploadNotFoundError):
+        manager.write_chunk(upload_id, 0, 0, b"0123456789")
+    assert manager.cleanup_expired() == 1
+    assert list(tmp_path.iterdir()) == []
+
+def test_parts_are_available_while_later_parts_upload(tmp_path):
+    manager = UploadManager(root_dir=str(tmp_path))
+    parts = [b"page-one", b"page-two", b"page-three"]
+    upload_id = manager.create("scan.jpg", [len(p) for p in parts])['upload_id']
+
+    received = []
+    def consume():
+        for path in manager.iter_parts(upload_id, timeout=5):
+            with open(path, 'rb') as f:
+                received.append(f.read())
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+
+    # Parts may arrive out of order; they are consumed in page order
+    manager.write_chunk(upload_id, 0, 0, parts[0])
+    manager.write_chunk(upload_id, 2, 0, parts[2])
+    time.sleep(0.1)
+    assert received == [parts[0]]
+    manager.write_chunk(upload_id, 1, 0, parts[1][:4])
+    manager.write_chunk(upload_id, 1, 4, parts[1][4:])
+    consumer.join(5)
+    assert received == parts
+
+    # Processing finished before the client finalized
+    manager.release(upload_id)
+    assert manager.finalize(upload_id)['content_hash'] is None
+    assert list(tmp_path.iterdir()) == []
+
+def test_waiting_for_a_missing_part_times_out(tmp_path):
+    manager = UploadManager(root_dir=str(tmp_path))
+    upload_id = manager.create("scan.png", [4, 4])['upload_id']
+    manager.write_chunk(upload_id, 0, 0, b"page")
+    parts = manager.iter_parts(upload_id, timeout=0.05)
+    next(parts)
+    with pytest.raises(UploadError):
+        next(parts)
+
+def test_only_one_request_claims_the_job(tmp_path):
+    manager = UploadManager(root_dir=str(tmp_path))
+    upload_id = manager.create("scan.png", [4, 4])['upload_id']
+
+    # Requests finishing different parts race to start processing
+    start, claimed = threading.Barrier(8), []
+    def claim(job_id):
+        start.wait(5)
+        if manager.claim_job(upload_id, job_id):
+            claimed.append(job_id)
+    threads = [threading.Thread(target=claim, args=(f"job-{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(claimed) == 1
+    assert manager.status(upload_id)['job_id'] == claimed[0]
+
+    # A claim is given back, or replaced, only by whoever saw the current job
+    assert not manager.claim_job(upload_id, None, expected="job-other")
+    assert manager.claim_job(upload_id, None, expected=claimed[0])
+    assert manager.status(upload_id)['job_id'] is None
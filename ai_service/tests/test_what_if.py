@@ -0,0 +1,84 @@
+import pytest
+from ..src.analyzers.w2_analyzer import W2Analyzer
+from ..src.tax_engine import get_tax_engine
+from ..src.what_if import WhatIfEngine, household_from_w2
+
+HOUSEHOLD = {
+    'wages': 120000.0,
+    'deferrals': 5000.0,
+    'hsa_contributions': 1000.0,
+    'hsa_coverage': 'family',
+    'itemized_deductions': 16000.0,
+    'age': 52,
+    'tax_year': 2024
+}
+
+def _tax(income, deductions=None):
+    """Tax of one scenario, taking the larger of the standard and itemized deductions."""
+    engine = get_tax_engine()
+    standard = engine.schedule(2024, 'single').standard_deduction
+    return float(engine.compute(income, 2024, 'single', max(standard, deductions or 0.0))['tax'])
+
+def test_sweep_matches_scenario_by_scenario():
+    sweep = WhatIfEngine().sweep(HOUSEHOLD, step=2500.0)
+    income = 126000.0
+    assert sweep['limits'] == {'elective_deferral': 30500.0, 'hsa': 8300.0}
+    assert sweep['baseline']['tax'] == pytest.approx(_tax(income - 6000.0, 16000.0))
+    assert sweep['baseline']['itemize']
+
+    for point in sweep['savings_curve']:
+        contributions = point['deferrals'] + point['hsa_contributions']
+        assert point['contributions'] == contributions
+        assert point['tax'] == pytest.approx(_tax(income - contributions, 16000.0), abs=0.01)
+        assert point['savings'] == pytest.approx(sweep['baseline']['tax'] - point['tax'], abs=0.01)
+    totals = [point['contributions'] for point in sweep['savings_curve']]
+    assert totals == sorted(set(totals))
+
+    optimum = sweep['optimum']
+    assert (optimum['deferrals'], optimum['hsa_contributions']) == (30500.0, 8300.0)
+    assert optimum['tax'] == pytest.approx(_tax(income - 38800.0, 16000.0))
+    assert optimum['marginal_rate'] == 0.22
+    assert sweep['scenarios'] == 14 * 5 * 2
+
+def test_budget_and_ties():
+    engine = WhatIfEngine()
+    sweep = engine.sweep(HOUSEHOLD, max_contributions=10000.0)
+    assert sweep['optimum']['deferrals'] + sweep['optimum']['hsa_contributions'] == 10000.0
+    assert max(point['contributions'] for point in sweep['savings_curve']) == 10000.0
+
+    # Once taxable income is zero, more contributions save nothing: take the smallest
+    sweep = engine.sweep({'wages': 20000.0, 'tax_year': 2024}, step=100.0)
+    assert sweep['optimum']['deferrals'] == 5400.0
+    assert sweep['optimum']['tax'] == 0.0
+    assert sweep['limits']['hsa'] == 0.0
+
+def test_limits_and_grid_size():
+    engine = WhatIfEngine(max_scenarios=1000)
+    assert engine.limits(2023, age=49, hsa_coverage='self_only') == {'elective_deferral': 22500.0, 'hsa': 3850.0}
+    assert engine.limits(2023, age=55, hsa_coverage='self_only') == {'elective_deferral': 30000.0, 'hsa': 4850.0}
+    with pytest.raises(ValueError):
+        engine.limits(2024, hsa_coverage='individual')
+    with pytest.raises(ValueError):
+        engine.sweep({'wages': 1.0, 'tax_year': 1999})
+
+    sweep = engine.sweep(HOUSEHOLD, step=1.0)
+    assert sweep['scenarios'] <= 1000
+    assert sweep['step'] > 1.0
+
+def test_strategies_split_the_savings():
+    engine = WhatIfEngine()
+    sweep = engine.sweep(HOUSEHOLD)
+    strategies = engine.strategies(sweep)
+    assert [s['name'] for s in strategies] == ["Increase 401(k) Deferrals", "Increase HSA Contributions"]
+    assert sum(s['potential_savings'] for s in strategies) == pytest.approx(sweep['optimum']['savings'], abs=0.01)
+    assert strategies[0]['tax_year_applicability'] == [2024]
+    assert engine.strategies(engine.sweep({'wages': 10000.0})) == []
+
+def test_household_from_w2():
+    analysis = W2Analyzer().analyze("Form W-2 Wage and Tax Statement 2023\nBox 1 $80,000.00\nBox 12a D $4,000.00\nBox 12b W $1,200.00\n")
+    household = household_from_w2(analysis['data'], analysis['totals'])
+    assert household['wages'] == 80000.0
+    assert household['deferrals'] == 4000.0
+    assert household['hsa_contributions'] == 1200.0
+    assert household['hsa_coverage'] == 'self_only'
+    assert household['tax_year'] == 2023